@@ -1,22 +1,45 @@
 import logging
 import os
 
-from fastapi import Depends, FastAPI, HTTPException
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from mangum import Mangum
 from pydantic import UUID4
 from botocore.exceptions import ClientError
 
-from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.dynamodb_controller import get_dynamodb_controller
+from app.lib.entity_cache import get_entity_cache
+from app.lib.pagination import encode_cursor
+from app.lib.sqs_controller import SQSController
+from app.lib.responses import (
+    VERSION_PROJECTION,
+    CompressionMiddleware,
+    FastJSONResponse,
+    etag_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+    page_start_key,
+    parse_fields,
+    versioned,
+)
+from app.lib.tracing import RequestTracingMiddleware
+from app.lib.rate_limit import RateLimitMiddleware, default_rule
+from app.lib.warmup import Warmup, warm_asgi_app
 from app.models.community_schema import CommunityCreate, CommunityUpdate, OwnerAdd, MemberAdd
-from app.services.cognito_service import get_current_user
+from app.services.cognito_service import get_current_user, prefetch_jwks, token_subject
 from app.services.community_service import (
+    CommunityExistsError,
     CommunityService,
     get_community_service,
     requires_member,
     requires_owner,
 )
+from app.services.community_stats_service import CommunityStatsService
+from app.services.cascade_delete_service import CascadeDeleteService, DeletionTargetNotFound
 
 
 # Initialize logging
@@ -25,8 +48,10 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="https://your_cognito_domain/oauth2/token")
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
+# Per-user and per-community token buckets; innermost so 429 responses still get CORS headers
+app.add_middleware(RateLimitMiddleware, rules=[default_rule()], identify=token_subject)
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,12 +59,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "RateLimit-Limit", "RateLimit-Remaining"],
 )
+# gzip/br for large JSON bodies; inside tracing so Server-Timing includes the compression time
+app.add_middleware(CompressionMiddleware)
+# Server-Timing header and a per-request summary of backend calls
+app.add_middleware(RequestTracingMiddleware)
 
 # Initialize DynamoDB controller and community service
 table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-dynamodb_controller = DynamoDBController(table_name)
-community_service = CommunityService(dynamodb_controller)
+dynamodb_controller = get_dynamodb_controller(table_name)
+entity_cache = get_entity_cache()
+community_service = CommunityService(dynamodb_controller, entity_cache)
+community_stats_service = CommunityStatsService(dynamodb_controller)
+cascade_delete_sqs_controller = SQSController(queue_url=os.getenv('CASCADE_DELETE_QUEUE'))
+cascade_delete_service = CascadeDeleteService(dynamodb_controller, cascade_delete_sqs_controller, entity_cache)
 
 @app.get("/")
 def read_root():
@@ -47,12 +81,21 @@ def read_root():
     return {"message": "Welcome to the Community Management API"}
 
 @app.get("/communities/")
-def list_communities(current_user: dict = Depends(get_current_user)):
+def list_communities(
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(20, description="Number of communities to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each community")
+):
+    projection = parse_fields(fields)
+    start_key = page_start_key(next_token, "communities")
     try:
         logger.info("Received request to list communities")
-        communities = community_service.list_communities()
+        communities, last_key = community_service.list_communities(limit, start_key, projection)
+        # Counts maintained by the stream processor, one batched read for the page
+        community_stats_service.add_community_counts(communities, projection)
         logger.info("Communities listed successfully")
-        return {"communities": communities}
+        return FastJSONResponse({"communities": communities, "next_token": encode_cursor(last_key, "communities")})
     except ClientError as e:
         logger.error(f"Error listing communities: {e}")
         raise HTTPException(status_code=500, detail="Error listing communities")
@@ -65,14 +108,23 @@ def list_communities(current_user: dict = Depends(get_current_user)):
 def read_community(
     community_id: UUID4,
     current_user: dict = Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
+    if_none_match: Optional[str] = Header(None),
     community_service: CommunityService = Depends(get_community_service)
 ):
+    projection = parse_fields(fields)
     try:
         logger.info(f"Received request to read community with ID: {community_id}")
-        community = community_service.get_community(str(community_id))
+        if if_none_match:
+            current = community_service.get_community(str(community_id), VERSION_PROJECTION)
+            if current:
+                etag = make_etag('community', current, projection)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        community = community_service.get_community(str(community_id), versioned(projection))
         if community:
             logger.info(f"Community {community_id} retrieved successfully")
-            return community
+            return FastJSONResponse(community, headers=etag_headers(make_etag('community', community, projection)))
         logger.error(f"Community {community_id} not found")
         raise HTTPException(status_code=404, detail="Community not found")
     except ClientError as e:
@@ -91,14 +143,14 @@ def create_community(community: CommunityCreate, current_user: dict = Depends(ge
 
         logger.debug(f"Community data: {community}")
 
-        existing_community = community_service.get_community(str(community.community_id))
-        if existing_community:
-            logger.error(f"Community ID {community.community_id} already exists")
-            raise HTTPException(status_code=400, detail="Community ID already exists")
-
         community_service.create_community(community)
         logger.info(f"Community {community.community_id} created successfully")
         return {"message": "Community created successfully"}
+    except CommunityExistsError:
+        logger.error(f"Community ID {community.community_id} already exists")
+        raise HTTPException(status_code=400, detail="Community ID already exists")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         logger.error(f"Error creating community: {e}")
         raise HTTPException(status_code=500, detail="Error creating community")
@@ -108,7 +160,7 @@ def create_community(community: CommunityCreate, current_user: dict = Depends(ge
 
 @app.put("/communities/{community_id}")
 @requires_owner('community_id')
-def update_community(community_id: UUID4, community: CommunityUpdate, current_user: dict = Depends(get_current_user)):
+def update_community(community_id: UUID4, community: CommunityUpdate, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
     try:
         logger.info(f"Received request to update community with ID: {community_id}")
         logger.debug(f"Update data: {community}")
@@ -128,18 +180,17 @@ def update_community(community_id: UUID4, community: CommunityUpdate, current_us
         logger.error(f"Unexpected error updating community: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.delete("/communities/{community_id}")
+@app.delete("/communities/{community_id}", status_code=202)
 @requires_owner('community_id')
-def delete_community(community_id: UUID4, current_user: dict = Depends(get_current_user)):
+def delete_community(community_id: UUID4, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
+    """Hides the community at once and deletes it with its quizzes, questions, sources and members in the background."""
     try:
         logger.info(f"Received request to delete community with ID: {community_id}")
-        community = community_service.get_community(str(community_id))
-        if not community:
-            logger.error(f"Community {community_id} not found")
-            raise HTTPException(status_code=404, detail="Community not found")
-        community_service.delete_community(str(community_id))
-        logger.info(f"Community {community_id} deleted successfully")
-        return {"message": "Community deleted successfully"}
+        progress = cascade_delete_service.request_deletion('community', str(community_id), requested_by=current_user["sub"])
+        logger.info(f"Deletion of community {community_id} queued")
+        return FastJSONResponse({"message": "Community deletion started", "deletion": progress.dict()}, status_code=202)
+    except DeletionTargetNotFound:
+        raise HTTPException(status_code=404, detail="Community not found")
     except ClientError as e:
         logger.error(f"Error deleting community: {e}")
         raise HTTPException(status_code=500, detail="Error deleting community")
@@ -147,12 +198,23 @@ def delete_community(community_id: UUID4, current_user: dict = Depends(get_curre
         logger.error(f"Unexpected error deleting community: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@app.get("/communities/{community_id}/deletion")
+def read_community_deletion(community_id: UUID4, current_user: dict = Depends(get_current_user)):
+    """Progress of the community's deletion, for its owners."""
+    job = cascade_delete_service.get_job('community', str(community_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="No deletion found for this community")
+    if current_user["sub"] not in job.get('owner_ids', []):
+        raise HTTPException(status_code=403, detail="User is not authorized to view this resource")
+    return FastJSONResponse(cascade_delete_service.build_progress(job).dict())
+
 @app.post("/communities/{community_id}/owners/")
 @requires_owner('community_id')
-def add_owners(community_id: UUID4, owner: OwnerAdd, current_user: dict = Depends(get_current_user)):
+def add_owners(community_id: UUID4, owner: OwnerAdd, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
     try:
         logger.info(f"Received request to add owner to community with ID: {community_id}")
-        community_service.add_owner(str(community_id), owner.user_id)
+        if not community_service.add_owner(str(community_id), str(owner.user_id)):
+            return {"message": "User is already an owner"}
         logger.info(f"Owner {owner.user_id} added to community {community_id} successfully")
         return {"message": "Owner added successfully"}
     except ClientError as e:
@@ -164,12 +226,17 @@ def add_owners(community_id: UUID4, owner: OwnerAdd, current_user: dict = Depend
 
 @app.delete("/communities/{community_id}/owners/{user_id}")
 @requires_owner('community_id')
-def remove_owners(community_id: UUID4, user_id: UUID4, current_user: dict = Depends(get_current_user)):
+def remove_owners(community_id: UUID4, user_id: UUID4, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
     try:
         logger.info(f"Received request to remove owner {user_id} from community {community_id}")
-        community_service.remove_owner(str(community_id), str(user_id))
+        if not community_service.remove_owner(str(community_id), str(user_id)):
+            raise HTTPException(status_code=404, detail="User is not an owner")
         logger.info(f"Owner {user_id} removed from community {community_id} successfully")
         return {"message": "Owner removed successfully"}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         logger.error(f"Error removing owner: {e}")
         raise HTTPException(status_code=500, detail="Error removing owner")
@@ -179,10 +246,11 @@ def remove_owners(community_id: UUID4, user_id: UUID4, current_user: dict = Depe
 
 @app.post("/communities/{community_id}/members/")
 @requires_owner('community_id')
-def add_members(community_id: UUID4, member: MemberAdd, current_user: dict = Depends(get_current_user)):
+def add_members(community_id: UUID4, member: MemberAdd, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
     try:
         logger.info(f"Received request to add member to community with ID: {community_id}")
-        community_service.add_member(str(community_id), member)
+        if not community_service.add_member(str(community_id), member):
+            return {"message": "User is already a member"}
         logger.info(f"Member {member.user_id} added to community {community_id} successfully")
         return {"message": "Member added successfully"}
     except ClientError as e:
@@ -194,12 +262,15 @@ def add_members(community_id: UUID4, member: MemberAdd, current_user: dict = Dep
 
 @app.delete("/communities/{community_id}/members/{user_id}")
 @requires_owner('community_id')
-def remove_members(community_id: UUID4, user_id: UUID4, current_user: dict = Depends(get_current_user)):
+def remove_members(community_id: UUID4, user_id: UUID4, current_user: dict = Depends(get_current_user), community_service: CommunityService = Depends(get_community_service)):
     try:
         logger.info(f"Received request to remove member {user_id} from community {community_id}")
-        community_service.remove_member(str(community_id), str(user_id))
+        if not community_service.remove_member(str(community_id), str(user_id)):
+            raise HTTPException(status_code=404, detail="User is not a member")
         logger.info(f"Member {user_id} removed from community {community_id} successfully")
         return {"message": "Member removed successfully"}
+    except HTTPException:
+        raise
     except ClientError as e:
         logger.error(f"Error removing member: {e}")
         raise HTTPException(status_code=500, detail="Error removing member")
@@ -207,7 +278,17 @@ def remove_members(community_id: UUID4, user_id: UUID4, current_user: dict = Dep
         logger.error(f"Unexpected error removing member: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-handler = Mangum(app)
+# First-request work, done during the Lambda init phase and again on each scheduled warm-up ping
+warmup = Warmup()
+warmup.add('dynamodb', dynamodb_controller.warm_up)
+warmup.add('jwks', prefetch_jwks)
+warmup.add('sqs', cascade_delete_sqs_controller.warm_up)
+warmup.add('entity_cache', entity_cache.poll)
+warmup.add('openapi', app.openapi)
+warmup.add('asgi', lambda: warm_asgi_app(app))
+warmup.run_on_init()
+
+handler = warmup.wrap(Mangum(app))
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,16 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import UUID4
+from pydantic import UUID4, ValidationError
+from starlette.responses import StreamingResponse
+from typing import Optional
+import asyncio
 import os
 import logging
 from mangum import Mangum
 from app.services.quiz_service import QuizService
+from app.services.quiz_attempt_service import AttemptAlreadySubmitted, AttemptNotFound, QuizAttemptService
+from app.services.question_generation_service import QuestionGenerationService
 from app.services.community_service import CommunityService, requires_member, requires_quiz_owner
-from app.services.cognito_service import get_current_user
-from app.lib.dynamodb_controller import DynamoDBController
+from app.services.community_stats_service import CommunityStatsService
+from app.services.cognito_service import get_current_user, prefetch_jwks, token_subject
+from app.lib.dynamodb_controller import get_dynamodb_controller
+from app.lib.sqs_controller import SQSController
+from app.lib.entity_cache import get_entity_cache
+from app.lib.ndjson import NDJSON_MEDIA_TYPE, LineTooLong, encode_lines, iter_lines, loads
+from app.lib.pagination import encode_cursor
+from app.lib.responses import (
+    KEY_ATTRIBUTES,
+    VERSION_PROJECTION,
+    CompressionMiddleware,
+    FastJSONResponse,
+    etag_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+    page_start_key,
+    parse_fields,
+    versioned,
+)
+from app.lib.tracing import RequestTracingMiddleware
+from app.lib.rate_limit import Limit, RateLimitMiddleware, RateLimitRule, default_rule
+from app.lib.warmup import Warmup, warm_asgi_app
 from app.models.quiz_schema import QuizCreate, QuizUpdate
-from app.models.question_schema import QuestionModel
+from app.models.question_schema import QuestionModel, QuestionRecord
+from app.models.question_generation_schema import QuestionGenerationRequest
+from app.models.quiz_attempt_schema import AttemptResult, AttemptSubmit
+from app.models.leaderboard_schema import Leaderboard
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -18,8 +48,21 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="https://your_cognito_domain/oauth2/token")
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Each generation job makes many LLM calls, so requesting one has its own, much smaller buckets
+QUESTION_GENERATION_LIMIT = Limit.per_minute(float(os.getenv('QUESTION_GENERATION_BURST', '3')), float(os.getenv('QUESTION_GENERATION_PER_MINUTE', '0.5')))
+COMMUNITY_QUESTION_GENERATION_LIMIT = Limit.per_minute(float(os.getenv('COMMUNITY_QUESTION_GENERATION_BURST', '10')), float(os.getenv('COMMUNITY_QUESTION_GENERATION_PER_MINUTE', '2')))
 
+# Per-user and per-community token buckets; innermost so 429 responses still get CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    rules=[
+        RateLimitRule('question_generation', r'/questions/generate$', frozenset(['POST']), QUESTION_GENERATION_LIMIT, COMMUNITY_QUESTION_GENERATION_LIMIT),
+        default_rule(),
+    ],
+    identify=token_subject,
+)
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,13 +70,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "RateLimit-Limit", "RateLimit-Remaining"],
 )
+# gzip/br for large JSON bodies; inside tracing so Server-Timing includes the compression time
+app.add_middleware(CompressionMiddleware)
+# Server-Timing header and a per-request summary of backend calls
+app.add_middleware(RequestTracingMiddleware)
 
 # Initialize DynamoDB controller and services
 table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-dynamodb_controller = DynamoDBController(table_name)
-quiz_service = QuizService(dynamodb_controller)
-community_service = CommunityService(dynamodb_controller)
+dynamodb_controller = get_dynamodb_controller(table_name)
+entity_cache = get_entity_cache()
+quiz_service = QuizService(dynamodb_controller, entity_cache)
+community_service = CommunityService(dynamodb_controller, entity_cache)
+community_stats_service = CommunityStatsService(dynamodb_controller)
+quiz_attempt_service = QuizAttemptService(dynamodb_controller)
+question_generation_sqs_controller = SQSController(queue_url=os.getenv('QUESTION_GENERATION_QUEUE'))
+question_generation_service = QuestionGenerationService(dynamodb_controller, sqs_controller=question_generation_sqs_controller, quiz_service=quiz_service)
 
 @app.post("/community/{community_id}/quizzes/")
 @requires_member('community_id')
@@ -48,21 +101,62 @@ def create_quiz(
     quiz_service.create_quiz(quiz_data)
     return {"message": "Quiz created successfully"}
 
+@app.get("/community/{community_id}/quizzes/newest")
+@requires_member('community_id')
+def list_newest_quizzes(
+    community_id: str,
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(10, description="Number of quizzes to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each quiz"),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    scope = f"newest_quizzes:{community_id}"
+    projection = parse_fields(fields)
+    quizzes, last_key = quiz_service.list_newest_quizzes(community_id, limit, page_start_key(next_token, scope), projection)
+    community_stats_service.add_question_counts(community_id, quizzes, projection)
+    return FastJSONResponse({"quizzes": quizzes, "next_token": encode_cursor(last_key, scope)})
+
+@app.get("/quizzes/owned")
+def list_owned_quizzes(
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(10, description="Number of quizzes to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each quiz"),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    """Quizzes the caller created, newest first. Quizzes the caller was later added to as an owner are not listed."""
+    scope = f"owned_quizzes:{current_user['sub']}"
+    quizzes, last_key = quiz_service.list_owned_quizzes(current_user["sub"], limit, page_start_key(next_token, scope), parse_fields(fields))
+    return FastJSONResponse({"quizzes": quizzes, "next_token": encode_cursor(last_key, scope)})
+
 @app.get("/community/{community_id}/quizzes/{quiz_id}")
 @requires_member('community_id')
 def get_quiz(
     quiz_id: UUID4, 
     current_user: dict = Depends(get_current_user),
     community_id: str = None, 
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for the quiz and its questions"),
+    if_none_match: Optional[str] = Header(None),
     quiz_service: QuizService = Depends(lambda: quiz_service)
 ):
-    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id))
-    print(quiz_metadata)
+    projection = parse_fields(fields)
+    if if_none_match:
+        # Repeat views are answered from a projected read of the version, without fetching the questions
+        current = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), VERSION_PROJECTION)
+        if not current:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        etag = make_etag('quiz', current, projection)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), versioned(projection))
     if not quiz_metadata:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    questions, _ = quiz_service.get_questions_by_quiz_id(community_id, str(quiz_id))
-    return {"metadata": quiz_metadata, "questions": questions}
+    questions, _ = quiz_service.get_questions_by_quiz_id(community_id, str(quiz_id), projection=projection)
+    etag = make_etag('quiz', quiz_metadata, projection)
+    return FastJSONResponse({"metadata": quiz_metadata, "questions": questions}, headers=etag_headers(etag))
 
 @app.get("/community/{community_id}/quizzes/")
 @requires_member('community_id')
@@ -70,11 +164,17 @@ def list_quizzes(
     community_id: str,
     current_user: dict = Depends(get_current_user),
     limit: int = Query(10, description="Number of quizzes to return"),
-    last_evaluated_key: str = Query(None, description="Token for pagination"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    last_evaluated_key: Optional[str] = Query(None, deprecated=True, description="Former name of next_token"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each quiz"),
     quiz_service: QuizService = Depends(lambda: quiz_service)
 ):
-    quizzes, next_token = quiz_service.list_quizzes(community_id, limit, last_evaluated_key)
-    return {"quizzes": quizzes, "next_token": next_token}
+    scope = f"quizzes:{community_id}"
+    start_key = page_start_key(next_token or last_evaluated_key, scope)
+    projection = parse_fields(fields)
+    quizzes, last_key = quiz_service.list_quizzes(community_id, limit, start_key, projection)
+    community_stats_service.add_question_counts(community_id, quizzes, projection)
+    return FastJSONResponse({"quizzes": quizzes, "next_token": encode_cursor(last_key, scope)})
 
 @app.put("/community/{community_id}/quizzes/{quiz_id}")
 @requires_quiz_owner("community_id", 'quiz_id')
@@ -89,7 +189,7 @@ def update_quiz(
     if not quiz_metadata:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    quiz_service.update_quiz(quiz_id, quiz_data)
+    quiz_service.update_quiz(str(community_id), str(quiz_id), quiz_data)
     return {"message": "Quiz updated successfully"}
 
 @app.delete("/community/{community_id}/quizzes/{quiz_id}")
@@ -123,6 +223,39 @@ def create_question(
     quiz_service.create_question(str(community_id), str(quiz_id), question_data)
     return {"message": "Question created successfully"}
 
+@app.post("/community/{community_id}/quizzes/{quiz_id}/questions/generate", status_code=202)
+@requires_quiz_owner("community_id", 'quiz_id')
+def generate_questions(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    request: QuestionGenerationRequest,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    """Queues the generation of questions for the quiz from the community's knowledge sources."""
+    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), list(KEY_ATTRIBUTES))
+    if not quiz_metadata:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    progress = question_generation_service.request_generation(str(community_id), str(quiz_id), request, requested_by=current_user["sub"])
+    logger.info(f"Question generation job {progress.job_id} queued for quiz {quiz_id}")
+    return FastJSONResponse({"message": "Question generation started", "generation": progress.dict()}, status_code=202)
+
+@app.get("/community/{community_id}/quizzes/{quiz_id}/questions/generate/{job_id}")
+@requires_quiz_owner("community_id", 'quiz_id')
+def read_question_generation(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    job_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    """Progress of a question generation job."""
+    progress = question_generation_service.get_progress(str(community_id), str(quiz_id), str(job_id))
+    if not progress:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return FastJSONResponse(progress.dict())
+
 @app.get("/community/{community_id}/quizzes/{quiz_id}/questions/{question_id}")
 @requires_member('community_id')
 def get_question(
@@ -130,17 +263,23 @@ def get_question(
     quiz_id: UUID4, 
     question_id: UUID4, 
     current_user: dict = Depends(get_current_user), 
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
+    if_none_match: Optional[str] = Header(None),
     quiz_service: QuizService = Depends(lambda: quiz_service)
 ):
-    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id))
+    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), list(KEY_ATTRIBUTES))
     if not quiz_metadata:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    question = quiz_service.get_question(str(community_id), str(quiz_id), str(question_id))
+    projection = parse_fields(fields)
+    question = quiz_service.get_question(str(community_id), str(quiz_id), str(question_id), versioned(projection))
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
-    return question
+    etag = make_etag('question', question, projection)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return FastJSONResponse(question, headers=etag_headers(etag))
 
 @app.put("/community/{community_id}/quizzes/{quiz_id}/questions/{question_id}")
 @requires_quiz_owner("community_id", 'quiz_id')
@@ -182,14 +321,209 @@ def get_quiz_questions(
     quiz_id: UUID4,
     current_user: dict = Depends(get_current_user),
     limit: int = Query(10, description="Number of questions to return"),
-    last_evaluated_key: str = Query(None, description="Token for pagination"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    last_evaluated_key: Optional[str] = Query(None, deprecated=True, description="Former name of next_token"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each question"),
+    if_none_match: Optional[str] = Header(None),
     quiz_service: QuizService = Depends(lambda: quiz_service)
 ):
-    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id))
+    # An existence check that also reads the quiz version, which every question write bumps
+    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), VERSION_PROJECTION)
     if not quiz_metadata:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    questions, next_token = quiz_service.get_questions_by_quiz_id(str(community_id), str(quiz_id), limit, last_evaluated_key)
-    return {"questions": questions, "next_token": next_token}
+    projection = parse_fields(fields)
+    scope = f"questions:{community_id}:{quiz_id}"
+    token = next_token or last_evaluated_key
+    start_key = page_start_key(token, scope)
+    etag = make_etag('quiz', quiz_metadata, 'questions', limit, token, projection)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    questions, last_key = quiz_service.get_questions_by_quiz_id(str(community_id), str(quiz_id), limit, start_key, projection)
+    return FastJSONResponse({"questions": questions, "next_token": encode_cursor(last_key, scope)}, headers=etag_headers(etag))
+
+# Invalid lines reported back from an import; the rest are only counted
+MAX_IMPORT_ERRORS = 100
+
+@app.get("/community/{community_id}/quizzes/{quiz_id}/export")
+@requires_quiz_owner("community_id", 'quiz_id')
+def export_quiz(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    """Streams the quiz as NDJSON: a ``{"quiz": ...}`` header line, then one line per question, answers included."""
+    quiz_metadata = quiz_service.get_quiz_metadata(str(community_id), str(quiz_id))
+    if not quiz_metadata:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    records = quiz_service.export_records(str(community_id), str(quiz_id), quiz_metadata)
+    return StreamingResponse(
+        encode_lines(records), media_type=NDJSON_MEDIA_TYPE,
+        headers={'Content-Disposition': f'attachment; filename="quiz-{quiz_id}.ndjson"'}
+    )
+
+def import_error(line_number: int, error: Exception) -> dict:
+    if isinstance(error, ValidationError):
+        message = '; '.join(f"{'.'.join(str(part) for part in detail['loc']) or 'line'}: {detail['msg']}" for detail in error.errors())
+    else:
+        message = str(error)
+    return {"line": line_number, "error": message}
+
+@app.post("/community/{community_id}/quizzes/{quiz_id}/import")
+@requires_quiz_owner("community_id", 'quiz_id')
+async def import_questions(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    """Adds the questions of an NDJSON body, one QuestionRecord per line, to the quiz.
+
+    The body is parsed as it arrives and written in batches of 25. Header lines from an export are
+    skipped; invalid lines are reported with their line numbers and the rest are still imported.
+    """
+    importer = quiz_service.start_import(str(community_id), str(quiz_id))
+    errors, invalid = [], 0
+    try:
+        async for line_number, line in iter_lines(request.stream()):
+            try:
+                record = loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Each line must be a JSON object")
+                if isinstance(record.get('quiz'), dict):
+                    continue
+                question = QuestionRecord(**record)
+            except ValueError as e:
+                invalid += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append(import_error(line_number, e))
+                continue
+            for batch in importer.add(question):
+                await asyncio.wrap_future(batch)
+        for batch in importer.finish():
+            await asyncio.wrap_future(batch)
+    except LineTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await run_in_threadpool(importer.close)
+
+    logger.info(f"Imported {importer.written} questions into quiz {quiz_id}")
+    status_code = 400 if invalid and not importer.written else 200
+    return FastJSONResponse({"imported": importer.written, "invalid": invalid, "errors": errors}, status_code=status_code)
+
+def current_quiz_version(quiz_service: QuizService, community_id: str, quiz_id: str) -> int:
+    quiz_metadata = quiz_service.get_quiz_metadata(community_id, quiz_id, VERSION_PROJECTION)
+    if not quiz_metadata:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return int(quiz_metadata.get('version', 0))
+
+@app.post("/community/{community_id}/quizzes/{quiz_id}/attempts")
+@requires_member('community_id')
+def start_attempt(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    quiz_version = current_quiz_version(quiz_service, str(community_id), str(quiz_id))
+    try:
+        attempt = quiz_attempt_service.start_attempt(str(community_id), str(quiz_id), current_user["sub"], quiz_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(AttemptResult(**attempt).dict())
+
+@app.post("/community/{community_id}/quizzes/{quiz_id}/attempts/{attempt_id}/submit")
+@requires_member('community_id')
+def submit_attempt(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    attempt_id: UUID4,
+    submission: AttemptSubmit,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    quiz_version = current_quiz_version(quiz_service, str(community_id), str(quiz_id))
+    try:
+        attempt = quiz_attempt_service.submit_attempt(str(community_id), str(quiz_id), current_user["sub"], str(attempt_id), submission, quiz_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AttemptNotFound:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    except AttemptAlreadySubmitted:
+        raise HTTPException(status_code=409, detail="Attempt was already submitted")
+    try:
+        quiz_service.record_score(str(community_id), str(quiz_id), current_user["sub"], attempt['score'], attempt['max_score'], attempt['submitted_at'])
+    except Exception as e:
+        # The graded attempt is stored either way; only the leaderboards miss it
+        logger.error(f"Error recording the score of attempt {attempt_id}: {e}")
+    return FastJSONResponse(AttemptResult(**attempt).dict())
+
+@app.get("/community/{community_id}/quizzes/{quiz_id}/attempts/{attempt_id}")
+@requires_member('community_id')
+def get_attempt(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    attempt_id: UUID4,
+    current_user: dict = Depends(get_current_user)
+):
+    attempt = quiz_attempt_service.get_attempt(str(community_id), str(quiz_id), current_user["sub"], str(attempt_id))
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    return FastJSONResponse(AttemptResult(**attempt).dict())
+
+@app.get("/community/{community_id}/quizzes/{quiz_id}/attempts")
+@requires_member('community_id')
+def list_attempts(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(10, description="Number of attempts to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each attempt")
+):
+    scope = f"attempts:{community_id}:{quiz_id}:{current_user['sub']}"
+    attempts, last_key = quiz_attempt_service.list_attempts(
+        str(community_id), str(quiz_id), current_user["sub"], limit, page_start_key(next_token, scope), parse_fields(fields)
+    )
+    return FastJSONResponse({"attempts": attempts, "next_token": encode_cursor(last_key, scope)})
+
+def leaderboard_response(community_id: str, snapshot: Optional[dict], quiz_id: Optional[str] = None) -> FastJSONResponse:
+    snapshot = snapshot or {}
+    entries = [{**entry, 'rank': rank} for rank, entry in enumerate(snapshot.get('entries', []), start=1)]
+    leaderboard = Leaderboard(**{**snapshot, 'community_id': community_id, 'quiz_id': quiz_id, 'entries': entries})
+    return FastJSONResponse(leaderboard.dict(exclude_none=True))
+
+@app.get("/community/{community_id}/leaderboard")
+@requires_member('community_id')
+def get_community_leaderboard(
+    community_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    return leaderboard_response(str(community_id), quiz_service.get_leaderboard(str(community_id)))
+
+@app.get("/community/{community_id}/quizzes/{quiz_id}/leaderboard")
+@requires_member('community_id')
+def get_quiz_leaderboard(
+    community_id: UUID4,
+    quiz_id: UUID4,
+    current_user: dict = Depends(get_current_user),
+    quiz_service: QuizService = Depends(lambda: quiz_service)
+):
+    snapshot = quiz_service.get_leaderboard(str(community_id), str(quiz_id))
+    if snapshot is None and not quiz_service.get_quiz_metadata(str(community_id), str(quiz_id), list(KEY_ATTRIBUTES)):
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return leaderboard_response(str(community_id), snapshot, str(quiz_id))
+
+# First-request work, done during the Lambda init phase and again on each scheduled warm-up ping
+warmup = Warmup()
+warmup.add('dynamodb', dynamodb_controller.warm_up)
+warmup.add('jwks', prefetch_jwks)
+warmup.add('entity_cache', entity_cache.poll)
+warmup.add('openapi', app.openapi)
+warmup.add('asgi', lambda: warm_asgi_app(app))
+warmup.run_on_init()
 
-handler = Mangum(app)
+handler = warmup.wrap(Mangum(app))
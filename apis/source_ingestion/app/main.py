@@ -8,11 +8,24 @@ from typing import Optional
 import uuid
 import json
 from mangum import Mangum
-from app.services.cognito_service import get_current_user
+from app.services.cognito_service import get_current_user, prefetch_jwks, token_subject
 from app.services.knowledge_source_service import get_knowledge_source_service, KnowledgeSourceCreate
-from app.services.community_service import requires_owner, requires_member
+from app.services.community_service import CommunityService, get_community_service, requires_owner, requires_member
+from app.services.community_stats_service import CommunityStatsService, get_community_stats_service
 from app.services.knowledge_source_service import KnowledgeSourceService
+from app.services.usage_service import UsageService, get_usage_service
+from app.services.ingestion_job_service import IngestionJobService, get_ingestion_job_service
+from app.services.cascade_delete_service import CascadeDeleteService, DeletionTargetNotFound
+from app.models.ingestion_job_schema import IngestionJobProgress
+from app.models.usage_schema import BudgetUpdate
 from app.lib.sqs_controller import SQSController
+from app.lib.tracing import RequestTracingMiddleware
+from app.lib.rate_limit import Limit, RateLimitMiddleware, RateLimitRule, default_rule
+from app.lib.warmup import Warmup, warm_asgi_app
+from app.lib.dynamodb_controller import get_dynamodb_controller
+from app.lib.entity_cache import get_entity_cache
+from app.lib.pagination import encode_cursor
+from app.lib.responses import CompressionMiddleware, FastJSONResponse, page_start_key, parse_fields
 import os
 
 # Initialize logging
@@ -21,8 +34,21 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="https://your_cognito_domain/oauth2/token")
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
+# Scraping and summarizing a URL costs far more than any other request, so it has its own, much smaller buckets
+URL_INGESTION_LIMIT = Limit.per_minute(float(os.getenv('URL_INGESTION_BURST', '5')), float(os.getenv('URL_INGESTION_PER_MINUTE', '2')))
+COMMUNITY_URL_INGESTION_LIMIT = Limit.per_minute(float(os.getenv('COMMUNITY_URL_INGESTION_BURST', '20')), float(os.getenv('COMMUNITY_URL_INGESTION_PER_MINUTE', '10')))
+
+# Per-user and per-community token buckets; innermost so 429 responses still get CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    rules=[
+        RateLimitRule('url_ingestion', r'/source-ingestion/url/?$', frozenset(['POST']), URL_INGESTION_LIMIT, COMMUNITY_URL_INGESTION_LIMIT),
+        default_rule(),
+    ],
+    identify=token_subject,
+)
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,7 +56,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "RateLimit-Limit", "RateLimit-Remaining"],
 )
+# gzip/br for large JSON bodies; inside tracing so Server-Timing includes the compression time
+app.add_middleware(CompressionMiddleware)
+# Server-Timing header and a per-request summary of backend calls
+app.add_middleware(RequestTracingMiddleware)
+
+# Created once per container so requests reuse the SQS client and its pooled connections
+sqs_controller = SQSController(queue_url=os.getenv('KNOWLEDGE_SOURCE_URL_INITIAL_INGESTION_QUEUE'))
+cascade_delete_sqs_controller = SQSController(queue_url=os.getenv('CASCADE_DELETE_QUEUE'))
+cascade_delete_service = CascadeDeleteService(get_dynamodb_controller(), cascade_delete_sqs_controller)
 
 class UrlProcessRequest(BaseModel):
     url: HttpUrl
@@ -67,85 +103,8 @@ class UrlProcessRequest(BaseModel):
         
 #         # Step 3: Process the content with GPT-4-O
 #         content_processor_service.openai_controller.set_model("gpt-4o", 4096)
-#         system_message = (
-#             "You are a highly skilled educational assistant tasked with extracting, synthesizing, and organizing key information from complex content to serve as an educational tool for generating quiz questions, study materials, and comprehensive content summaries. Your goal is to deliver precise, structured, and comprehensive outputs that ensure thorough coverage of the content, including detailed metadata and core insights."
-#             "1. Identify the Author(s): Determine who created or contributed to the content. If multiple authors are mentioned, list them all. If no explicit author is found but the content is from an official source (e.g., company documentation), infer the organization or team responsible (e.g., 'AWS Documentation Team'). If no author can be identified, return 'unknown'."
-#             "2. Determine the Publication/Site: Identify the full name of the website or publication where the content is published. Use the complete publication name, not acronyms. If available, extract this information from the URL, header, or footer of the page. If the site or publication name is not explicitly stated, use the name of the organization or entity associated with the content. If the publication or site cannot be accurately determined, return 'unknown'."
-#             "3. Extract the Publish Date: Look for the publication date, usually near the title or byline. If the exact date is not clear, attempt to extract the last updated date from the documentation page. If no date is available, return 'unknown'."
-#             "4. Ascertain the Main Topic: Identify the primary focus or subject matter of the content. Summarize it in a single, clear sentence. If the main topic is unclear, return 'unknown'."
-#             "5. Classify the Parent Topic: Determine the broader category under which the main topic falls (e.g., 'Technology,' 'Health'). If no parent topic can be identified, return 'unknown'."
-#             "6. Identify the Field: Pinpoint the academic or professional field related to the content, such as 'Computer Science,' 'History,' or 'Medicine.' If the field is not clear, return 'unknown'."
-#             "7. Extract Keywords and People: Pull out key terms that define core concepts or topics discussed, aiming for between 10 and 30 keywords, depending on subject length. For each keyword: "
-#             "- Provide a Definition: Clearly define the term in the context of the article. Ensure the definition is concise yet informative."
-#             "- Explain Its Relation to the Topic: Elaborate on how the keyword connects to the main point or focus of the article, using specific mentions from the article to reinforce the explanation."
-#             "8. Summarize Major Insights or Novel Concepts: Identify and summarize key ideas, breakthroughs, or perspectives in the content. Format these insights as {'insight': 'summary of the idea', 'concept': 'related concept'}. If none are found, return an empty array '[]'."
-#             "9. Gather Supporting Details: Provide additional context, examples, or explanations that enrich the understanding of the major insights. Ensure this section is distinct from 'major insights' to avoid redundancy. If no supporting details are available, return an empty array '[]'."
-#             "10. Extract Relevant Quotations: Look for impactful or informative statements within the content to pull out as quotes. Ensure quotes are concise and directly relevant. If no relevant quotations are found, return an empty array '[]'."
-#             "11. Identify External Links: If the content references or links to other relevant sources, include those links. These should be useful for further reading or supporting the information presented. If no external links are found, return an empty array '[]'."
-#             "12. Content Chunk Summary: Summarize each chunk of content. Format the output as a clean, well-organized JSON object with all the exact keys and values mentioned. Ensure your response is concise yet thorough, delivering maximum educational value."
-#             "Use these examples as a guide to ensure your output aligns with the expected format. Remember to follow the steps methodically for the most accurate and valuable response."
-#             "Example 1: {"
-#             " 'author': 'John Doe', "
-#             " 'site': 'Example.com', "
-#             " 'publish_date': '2024-08-19', "
-#             " 'main_topic': 'The Impact of Artificial Intelligence on Healthcare', "
-#             " 'parent_topic': 'Technology and Medicine', "
-#             " 'field': 'Health Technology', "
-#             " 'keywords': ["
-#             "   {"
-#             "     'keyword': 'Artificial Intelligence', "
-#             "     'definition': 'A branch of computer science focused on creating systems capable of performing tasks that require human intelligence.', "
-#             "     'relation_to_topic': 'The article discusses how AI is transforming healthcare by improving diagnostic accuracy and reducing human error.'"
-#             "   }, "
-#             "   {"
-#             "     'keyword': 'Machine Learning', "
-#             "     'definition': 'A subset of AI involving the development of algorithms that allow computers to learn from and make predictions based on data.', "
-#             "     'relation_to_topic': 'The article highlights the role of machine learning in analyzing vast amounts of medical data to support clinical decisions.'"
-#             "   }"
-#             " ], "
-#             " 'major_insights_or_novel_concepts': ["
-#             "   {"
-#             "     'insight': 'AI-driven diagnostics reduce human error by applying machine learning to medical imaging.', "
-#             "     'concept': 'AI Diagnostics'"
-#             "   }"
-#             " ], "
-#             " 'supporting_details': ['Studies show a 20 percent reduction in diagnostic errors using AI.', 'Hospitals worldwide are beginning to implement AI tools, such as the Mayo Clinic’s adoption of AI for radiology.'], "
-#             " 'relevant_quotations': ['AI is revolutionizing healthcare, reducing errors and saving lives, says Dr. Smith, a leading expert in AI healthcare applications.'], "
-#             " 'external_links': ['https://example.com/ai-healthcare']"
-#             "} "
-            
-#             "Example 2: {"
-#             " 'author': 'Jane Smith', "
-#             " 'site': 'ScienceDaily.com', "
-#             " 'publish_date': '2023-05-10', "
-#             " 'main_topic': 'The Role of Quantum Computing in Cryptography', "
-#             " 'parent_topic': 'Computer Science', "
-#             " 'field': 'Quantum Computing', "
-#             " 'keywords': ["
-#             "   {"
-#             "     'keyword': 'Quantum Computing', "
-#             "     'definition': 'A type of computing that uses quantum bits, or qubits, to perform calculations at speeds unattainable by classical computers.', "
-#             "     'relation_to_topic': 'The article explores how quantum computing challenges traditional cryptography by making current encryption methods vulnerable.'"
-#             "   }, "
-#             "   {"
-#             "     'keyword': 'Cryptography', "
-#             "     'definition': 'The practice of secure communication in the presence of third parties, often through encryption.', "
-#             "     'relation_to_topic': 'The article examines how advancements in quantum computing are prompting a reevaluation of cryptographic techniques.'"
-#             "   }"
-#             " ], "
-#             " 'major_insights_or_novel_concepts': ["
-#             "   {"
-#             "     'insight': 'Quantum computers exploit quantum mechanics to perform calculations that are infeasible for classical computers, challenging existing encryption methods.', "
-#             "     'concept': 'Quantum Cryptography'"
-#             "   }"
-#             " ], "
-#             " 'supporting_details': ['Quantum computers leverage superposition and entanglement to achieve unprecedented computational speeds.', 'Current encryption methods, like RSA, could become obsolete without quantum-resistant algorithms.'], "
-#             " 'relevant_quotations': ['Quantum computing poses a significant challenge to traditional encryption, necessitating a new era of cryptography, says Dr. Allen, a pioneer in the field.'], "
-#             " 'external_links': ['https://sciencedaily.com/quantum-cryptography']"
-#             "} "
-#             "Finally, minify your response, use double quotes for property names, and do not include any line breaks or newline characters in the JSON. The JSON FORMAT MUST BE PERFECT!!!")
         
-#         processed_chunks = content_processor_service.process_content(scraped_content, system_message)
+#         processed_chunks = content_processor_service.process_content(scraped_content)
 #         if not processed_chunks:
 #             raise HTTPException(status_code=500, detail="Failed to process content")
 
@@ -197,8 +156,6 @@ async def process_url(
     knowledge_source_service.create_knowledge_source(knowledge_source)
 
     # Step 2: Send a message to SQS to trigger the next step
-    sqs_queue_url = os.getenv('KNOWLEDGE_SOURCE_URL_INITIAL_INGESTION_QUEUE')
-    sqs_controller = SQSController(queue_url=sqs_queue_url)
     
     message = {
         'community_id': str(community),
@@ -225,22 +182,115 @@ async def process_url(
 def list_knowledge_sources(
     community: str,
     limit: int = Query(20, description="Number of items to return"),
-    last_evaluated_key: Optional[str] = Query(None, description="Token for pagination"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    last_evaluated_key: Optional[str] = Query(None, deprecated=True, description="Former name of next_token"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each source"),
+    knowledge_source_service: KnowledgeSourceService = Depends(get_knowledge_source_service),
+    community_stats_service: CommunityStatsService = Depends(get_community_stats_service),
+    current_user: dict = Depends(get_current_user)
+):
+    scope = f"knowledge_sources:{community}"
+    start_key = page_start_key(next_token or last_evaluated_key, scope)
+    items, last_key = knowledge_source_service.list_knowledge_sources(community, limit, start_key, parse_fields(fields))
+    return FastJSONResponse({
+        "items": items,
+        "counts": community_stats_service.knowledge_source_counts(community),
+        "next_token": encode_cursor(last_key, scope)
+    })
+
+@app.get("/community/{community}/knowledge-sources/newest")
+@requires_member('community')
+def list_newest_knowledge_sources(
+    community: str,
+    limit: int = Query(20, description="Number of items to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return for each source"),
     knowledge_source_service: KnowledgeSourceService = Depends(get_knowledge_source_service),
     current_user: dict = Depends(get_current_user)
 ):
-    items, last_key = knowledge_source_service.list_knowledge_sources(community, limit, last_evaluated_key)
-    return {"items": items, "next_token": last_key}
+    """The community's knowledge sources, most recently submitted first."""
+    scope = f"newest_knowledge_sources:{community}"
+    start_key = page_start_key(next_token, scope)
+    items, last_key = knowledge_source_service.list_newest_knowledge_sources(community, limit, start_key, parse_fields(fields))
+    return FastJSONResponse({"items": items, "next_token": encode_cursor(last_key, scope)})
 
+@app.delete("/community/{community}/knowledge-source/{source_id}", status_code=202)
 @requires_owner('community')
-@app.delete("/community/{community}/knowledge-source/{source_id}")
 def delete_knowledge_source(
     community: str,
     source_id: uuid.UUID,
-    knowledge_source_service: KnowledgeSourceService = Depends(get_knowledge_source_service)
+    current_user: dict = Depends(get_current_user),
+    community_service: CommunityService = Depends(get_community_service)
+):
+    """Hides the knowledge source at once and deletes it with its chunks and output in the background."""
+    try:
+        progress = cascade_delete_service.request_deletion('knowledge_source', community, str(source_id), requested_by=current_user["sub"])
+    except DeletionTargetNotFound:
+        raise HTTPException(status_code=404, detail="Knowledge source not found")
+    return FastJSONResponse({"message": "Knowledge source deletion started", "deletion": progress.dict()}, status_code=202)
+
+@app.get("/community/{community}/knowledge-source/{source_id}/deletion")
+@requires_owner('community')
+def get_knowledge_source_deletion(
+    community: str,
+    source_id: uuid.UUID,
+    current_user: dict = Depends(get_current_user),
+    community_service: CommunityService = Depends(get_community_service)
+):
+    """Progress of the knowledge source's deletion."""
+    progress = cascade_delete_service.get_progress('knowledge_source', community, str(source_id))
+    if not progress:
+        raise HTTPException(status_code=404, detail="No deletion found for this knowledge source")
+    return FastJSONResponse(progress.dict())
+
+@app.get("/community/{community}/knowledge-source/{source_id}/progress", response_model=IngestionJobProgress)
+@requires_member('community')
+def get_knowledge_source_progress(
+    community: str,
+    source_id: uuid.UUID,
+    current_user: dict = Depends(get_current_user),
+    ingestion_job_service: IngestionJobService = Depends(get_ingestion_job_service)
+):
+    """Ingestion state, chunk counts and per-stage timings for a knowledge source."""
+    progress = ingestion_job_service.get_progress(community, str(source_id))
+    if not progress:
+        raise HTTPException(status_code=404, detail="Knowledge source not found")
+    return progress
+
+@app.get("/community/{community}/usage")
+@requires_member('community')
+def get_usage(
+    community: str,
+    current_user: dict = Depends(get_current_user),
+    usage_service: UsageService = Depends(get_usage_service)
+):
+    """Token usage and cost for the community, with its knowledge sources ordered by cost."""
+    return {
+        "community": usage_service.get_community_usage(community),
+        "sources": usage_service.list_source_usage(community)
+    }
+
+@app.put("/community/{community}/usage/budget")
+@requires_owner('community')
+def update_usage_budget(
+    community: str,
+    budget: BudgetUpdate,
+    current_user: dict = Depends(get_current_user),
+    community_service: CommunityService = Depends(get_community_service),
+    usage_service: UsageService = Depends(get_usage_service)
 ):
-    knowledge_source_service.delete_knowledge_source(community, str(source_id))
-    return {"message": "Knowledge source deleted successfully"}
+    usage_service.set_budget(community, budget.token_budget)
+    return {"message": "Token budget updated successfully", "token_budget": budget.token_budget}
 
+# First-request work, done during the Lambda init phase and again on each scheduled warm-up ping
+warmup = Warmup()
+warmup.add('dynamodb', get_dynamodb_controller().warm_up)
+warmup.add('sqs', sqs_controller.warm_up)
+warmup.add('cascade_delete_sqs', cascade_delete_sqs_controller.warm_up)
+warmup.add('jwks', prefetch_jwks)
+warmup.add('entity_cache', get_entity_cache().poll)
+warmup.add('openapi', app.openapi)
+warmup.add('asgi', lambda: warm_asgi_app(app))
+warmup.run_on_init()
 
-handler = Mangum(app)
+handler = warmup.wrap(Mangum(app))
@@ -1,17 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from mangum import Mangum
 from app.services.user_service import UserService
-from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.dynamodb_controller import get_dynamodb_controller
+from app.lib.pagination import encode_cursor
+from app.lib.responses import CompressionMiddleware, FastJSONResponse, page_start_key
+from app.lib.tracing import RequestTracingMiddleware
+from app.lib.warmup import Warmup, warm_asgi_app
 from app.models.user_schema import UserCreate, UserUpdate
 import os
 import logging
+from typing import Optional
 from uuid import UUID
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+# gzip/br for large JSON bodies; inside tracing so Server-Timing includes the compression time
+app.add_middleware(CompressionMiddleware)
+# Server-Timing header and a per-request summary of backend calls
+app.add_middleware(RequestTracingMiddleware)
 logger = logging.getLogger(__name__)
 
 table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-dynamodb_controller = DynamoDBController(table_name)
+dynamodb_controller = get_dynamodb_controller(table_name)
 user_service = UserService(dynamodb_controller)
 
 @app.get("/")
@@ -24,6 +33,30 @@ def read_root():
     logger.info("Root endpoint called")
     return {"message": "Welcome to the User Management API"}
 
+@app.get("/users/")
+def list_users(
+    since: Optional[int] = Query(None, description="Only users who joined at or after this epoch second"),
+    limit: int = Query(20, description="Number of users to return"),
+    next_token: Optional[str] = Query(None, description="next_token from the previous page")
+):
+    """List users, or the users who joined since a point in time, oldest first.
+
+    Args:
+        since (Optional[int]): Epoch seconds; read from GSI3 when given.
+        limit (int): Number of users to return.
+        next_token (Optional[str]): Cursor from the previous page.
+
+    Returns:
+        dict: The users and the cursor for the next page.
+    """
+    scope = "users" if since is None else f"users_since:{since}"
+    start_key = page_start_key(next_token, scope)
+    if since is None:
+        users, last_key = user_service.list_users(limit, start_key)
+    else:
+        users, last_key = user_service.list_users_joined_since(since, limit, start_key)
+    return FastJSONResponse({"users": users, "next_token": encode_cursor(last_key, scope)})
+
 @app.get("/users/{user_id}")
 def read_user(user_id: UUID):
     """Read a user by its ID.
@@ -65,7 +98,14 @@ def update_user(user_id: UUID, user: UserUpdate):
         logger.error(f"Error updating user: {e}")
         raise HTTPException(status_code=500, detail="Error updating user")
 
-handler = Mangum(app)
+# First-request work, done during the Lambda init phase and again on each scheduled warm-up ping
+warmup = Warmup()
+warmup.add('dynamodb', dynamodb_controller.warm_up)
+warmup.add('openapi', app.openapi)
+warmup.add('asgi', lambda: warm_asgi_app(app))
+warmup.run_on_init()
+
+handler = warmup.wrap(Mangum(app))
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,199 @@
+"""In-process benchmarks of the four FastAPI apps, called through TestClient with authentication overridden."""
+import importlib
+import itertools
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+from fastapi import Request
+from fastapi.testclient import TestClient
+from benchmarks.harness import BenchmarkConfig, load_target, quiet, run_workload
+
+SUITE = 'apis'
+
+USER_HEADER = 'X-Benchmark-User'
+# Questions in each import_questions body
+IMPORT_QUESTIONS = 500
+
+def benchmark_user(request: Request) -> Dict[str, str]:
+    user_id = request.headers[USER_HEADER]
+    return {'username': f'bench-{user_id[:8]}', 'email': f'{user_id[:8]}@example.com', 'sub': user_id}
+
+def api_client(app: Any, user_id: str) -> TestClient:
+    """A TestClient whose requests are authenticated as ``user_id`` without a Cognito round trip.
+
+    The user travels in a header so several clients of the same app can act as different users.
+    """
+    cognito_service = importlib.import_module('app.services.cognito_service')
+    app.dependency_overrides[cognito_service.get_current_user] = benchmark_user
+    return TestClient(app, headers={USER_HEADER: user_id})
+
+def measure(results: Dict[str, Dict[str, Any]], target: str, workloads: Dict[str, Callable[[], Any]], config: BenchmarkConfig) -> None:
+    for name, fn in workloads.items():
+        results[f'{target}.{name}'] = run_workload(SUITE, target, name, fn, config)
+
+def now() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+def seed_community(member_ids, owner_ids, community_id: str = None) -> str:
+    community_schema = importlib.import_module('app.models.community_schema')
+    community_service = importlib.import_module('app.services.community_service').get_community_service()
+    community_id = community_id or str(uuid.uuid4())
+    community_service.create_community(community_schema.CommunityCreate(
+        community_id=community_id,
+        community_name=f'Community {community_id[:8]}',
+        description='Benchmark community',
+        members=list(member_ids),
+        keywords=['benchmark', 'learning'],
+        owner_ids=list(owner_ids)
+    ))
+    return community_id
+
+def bench_community_management(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'community_management'
+    main = load_target(target)
+    owner = str(uuid.uuid4())
+    with quiet():
+        community_id = seed_community([owner], [owner])
+        for _ in range(50):
+            seed_community([owner, str(uuid.uuid4())], [owner])
+        doomed = iter([seed_community([owner], [owner]) for _ in range(config.total)])
+    client = api_client(main.app, owner)
+
+    def create_community():
+        return client.post('/communities/', json={
+            'community_id': str(uuid.uuid4()),
+            'community_name': 'Created community',
+            'description': 'Created by the benchmark',
+            'members': [owner],
+            'keywords': ['benchmark'],
+        }).status_code
+
+    renames = itertools.count()
+    measure(results, target, {
+        'list_communities': lambda: client.get('/communities/').status_code,
+        'read_community': lambda: client.get(f'/communities/{community_id}').status_code,
+        'update_community': lambda: client.put(f'/communities/{community_id}', json={
+            'community_name': f'Renamed {next(renames)}', 'owner_ids': [owner]
+        }).status_code,
+        'delete_community': lambda: client.delete(f'/communities/{next(doomed)}').status_code,
+        'create_community': create_community,
+    }, config)
+
+def bench_quiz_management(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'quiz_management'
+    main = load_target(target)
+    quiz_schema = importlib.import_module('app.models.quiz_schema')
+    member, outsider = str(uuid.uuid4()), str(uuid.uuid4())
+    with quiet():
+        community_id = seed_community([member], [member])
+        quiz_ids = [str(uuid.uuid4()) for _ in range(50)]
+        for quiz_id in quiz_ids:
+            main.quiz_service.create_quiz(quiz_schema.QuizCreate(
+                community_id=community_id, quiz_id=quiz_id, title=f'Quiz {quiz_id[:8]}',
+                description='Benchmark quiz', owner_ids=[member]
+            ))
+        quiz_id = quiz_ids[0]
+        question_ids = [str(uuid.uuid4()) for _ in range(20)]
+        # Written directly in the shape create_question stores, so seeding does not depend on the route
+        main.dynamodb_controller.batch_write_items([{
+            'PK': 'QUESTION',
+            'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question_id}',
+            'EntityType': 'Question',
+            'CreatedAt': now(),
+            'question_id': question_id,
+            'quiz_id': quiz_id,
+            'community_id': community_id,
+            'question_text': f'Question {index}?',
+            'options': ['A', 'B', 'C', 'D'],
+            'answer': ['A'],
+            'type': 'multiple_choice',
+        } for index, question_id in enumerate(question_ids)])
+    client = api_client(main.app, member)
+    outsider_client = api_client(main.app, outsider)
+    base = f'/community/{community_id}/quizzes'
+    quiz_etag = client.get(f'{base}/{quiz_id}').headers['etag']
+    # Every submission needs an attempt still in progress
+    attempt_ids = iter([client.post(f'{base}/{quiz_id}/attempts').json()['attempt_id'] for _ in range(config.total)])
+    submission = {'answers': [{'question_id': question_id, 'selected': ['A']} for question_id in question_ids]}
+    # The same bank every call, so each import overwrites the last one instead of growing the quiz
+    import_body = ''.join(json.dumps({
+        'question_id': str(uuid.uuid4()), 'question_text': f'Imported question {index}?',
+        'options': ['A', 'B', 'C', 'D'], 'answer': ['B'], 'question_type': 'multiple_choice',
+    }) + '\n' for index in range(IMPORT_QUESTIONS)).encode()
+
+    measure(results, target, {
+        'get_quiz': lambda: client.get(f'{base}/{quiz_id}').status_code,
+        'get_quiz_not_modified': lambda: client.get(f'{base}/{quiz_id}', headers={'If-None-Match': quiz_etag}).status_code,
+        'list_quizzes': lambda: client.get(f'{base}/', params={'limit': 10}).status_code,
+        'list_newest_quizzes': lambda: client.get(f'{base}/newest', params={'limit': 10}).status_code,
+        'get_quiz_questions': lambda: client.get(f'{base}/{quiz_id}/questions', params={'limit': 10}).status_code,
+        'get_question': lambda: client.get(f'{base}/{quiz_id}/questions/{question_ids[0]}').status_code,
+        'get_quiz_non_member': lambda: outsider_client.get(f'{base}/{quiz_id}').status_code,
+        'start_attempt': lambda: client.post(f'{base}/{quiz_id}/attempts').status_code,
+        'submit_attempt': lambda: client.post(f'{base}/{quiz_id}/attempts/{next(attempt_ids)}/submit', json=submission).status_code,
+        'get_quiz_leaderboard': lambda: client.get(f'{base}/{quiz_id}/leaderboard').status_code,
+        'export_quiz': lambda: client.get(f'{base}/{quiz_id}/export').status_code,
+        'import_questions': lambda: client.post(f'{base}/{quiz_ids[1]}/import', content=import_body).status_code,
+    }, config)
+
+def bench_source_ingestion(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'source_ingestion'
+    main = load_target(target)
+    knowledge_source_service = importlib.import_module('app.services.knowledge_source_service')
+    usage_service = importlib.import_module('app.services.usage_service').get_usage_service()
+    ingestion_job_service = importlib.import_module('app.services.ingestion_job_service').get_ingestion_job_service()
+    states = importlib.import_module('app.models.ingestion_job_schema').IngestionState
+    member = str(uuid.uuid4())
+    with quiet():
+        community_id = seed_community([member], [member])
+        sources = knowledge_source_service.get_knowledge_source_service()
+        source_ids = [str(uuid.uuid4()) for _ in range(30)]
+        for source_id in source_ids:
+            sources.create_knowledge_source(knowledge_source_service.KnowledgeSourceCreate(
+                source_id=source_id, community_id=community_id, url=f'https://example.com/{source_id}'
+            ))
+            usage_service.record_usage(community_id, source_id, {
+                'model': 'gpt-4o-mini', 'prompt_tokens': 1200, 'completion_tokens': 300, 'cached_tokens': 0, 'latency_ms': 900
+            })
+        source_id = source_ids[0]
+        for state in (states.SCRAPING, states.CHUNKING):
+            ingestion_job_service.transition(community_id, source_id, state)
+        ingestion_job_service.transition(community_id, source_id, states.PROCESSING, chunks_total=12)
+        sources.record_chunks_processed(community_id, source_id, list(range(7)))
+    client = api_client(main.app, member)
+    base = f'/community/{community_id}'
+
+    measure(results, target, {
+        'list_knowledge_sources': lambda: client.get(f'{base}/knowledge-sources/', params={'limit': 20}).status_code,
+        'get_progress': lambda: client.get(f'{base}/knowledge-source/{source_id}/progress').status_code,
+        'get_usage': lambda: client.get(f'{base}/usage').status_code,
+        'submit_url': lambda: client.post(f'{base}/source-ingestion/url/', json={'url': 'https://example.com/article'}).status_code,
+    }, config)
+
+def bench_user_management(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'user_management'
+    main = load_target(target)
+    user_id = str(uuid.uuid4())
+    with quiet():
+        # Stored under the keys create_user writes and get_user reads
+        main.dynamodb_controller.put_item({
+            'PK': 'USER', 'SK': f'USER#{user_id}', 'EntityType': 'User', 'CreatedAt': now(),
+            'user_id': user_id, 'name': 'Benchmark User'
+        })
+    client = TestClient(main.app)
+    renames = itertools.count()
+
+    measure(results, target, {
+        'read_user': lambda: client.get(f'/users/{user_id}').status_code,
+        'list_users_joined_since': lambda: client.get('/users/', params={'since': now() - 3600, 'limit': 20}).status_code,
+        'update_user': lambda: client.put(f'/users/{user_id}', json={'name': f'Renamed {next(renames)}'}).status_code,
+    }, config)
+
+BENCHMARKS = [bench_community_management, bench_quiz_management, bench_source_ingestion, bench_user_management]
+
+def run(config: BenchmarkConfig) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for benchmark in BENCHMARKS:
+        benchmark(config, results)
+    return results
@@ -0,0 +1,146 @@
+"""Benchmarks of the ingestion Lambdas, driven with synthetic SQS batches and a stubbed LLM."""
+import importlib
+import json
+import uuid
+from typing import Any, Dict, List
+from benchmarks.harness import BenchmarkConfig, load_target, quiet, run_workload, skipped
+from benchmarks.stubs import WORDS, install_stub_llm, synthetic_article, synthetic_responses, synthetic_text
+
+SUITE = 'ingestion'
+ARTICLE_CHARS = 24000
+BATCH_SIZE = 5
+CHUNKS_PER_SOURCE = 8
+QUESTIONS_PER_JOB = 50
+
+def sqs_record(body: Dict[str, Any], queue_name: str) -> Dict[str, Any]:
+    """A record shaped like the ones the SQS event source mapping delivers to a Lambda."""
+    return {
+        'messageId': str(uuid.uuid4()),
+        'receiptHandle': uuid.uuid4().hex,
+        'body': json.dumps(body),
+        'attributes': {'ApproximateReceiveCount': '1'},
+        'messageAttributes': {},
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': f'arn:aws:sqs:us-east-2:000000000000:{queue_name}',
+        'awsRegion': 'us-east-2',
+    }
+
+def create_sources(count: int) -> List[Dict[str, str]]:
+    knowledge_source_service = importlib.import_module('app.services.knowledge_source_service')
+    sources = knowledge_source_service.get_knowledge_source_service()
+    created = []
+    for _ in range(count):
+        community_id, source_id = str(uuid.uuid4()), str(uuid.uuid4())
+        url = f'https://example.com/articles/{source_id}'
+        sources.create_knowledge_source(knowledge_source_service.KnowledgeSourceCreate(
+            source_id=source_id, community_id=community_id, url=url
+        ))
+        created.append({'community_id': community_id, 'source_id': source_id, 'url': url})
+    return created
+
+def bench_web_scraper(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'web_scraper'
+    try:
+        module = load_target(target)
+    except ImportError as e:
+        results[f'{target}.lambda_handler'] = skipped(SUITE, target, f'cannot import {target}: {e}')
+        return
+
+    # Scraping is replaced by synthetic article text; minify_content still runs on it
+    scraper = importlib.import_module('app.services.webscraper_service').WebScraperService
+    scraper.scrape_content = lambda self, url: self.minify_content(synthetic_article(ARTICLE_CHARS, seed=len(url)))
+
+    with quiet():
+        pending = create_sources(config.total * BATCH_SIZE)
+    batches = iter([pending[start:start + BATCH_SIZE] for start in range(0, len(pending), BATCH_SIZE)])
+
+    def handle_batch():
+        event = {'Records': [
+            sqs_record({**source, 'message_type': 'initial_ingestion'}, 'knowledge_source_url_initial_ingestion_queue')
+            for source in next(batches)
+        ]}
+        return module.lambda_handler(event, None)['statusCode']
+
+    results[f'{target}.lambda_handler'] = run_workload(SUITE, target, 'lambda_handler', handle_batch, config)
+
+def bench_chunk_processor(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'chunk_processor'
+    module = load_target(target)
+    install_stub_llm(
+        module.content_processor_service.openai_controller,
+        module.combination_cleanup_service.openai_controller,
+        latency_ms=config.llm_latency_ms
+    )
+    states = importlib.import_module('app.models.ingestion_job_schema').IngestionState
+
+    with quiet():
+        sources = create_sources(config.total)
+        for index, source in enumerate(sources):
+            chunks = [synthetic_text(3500, seed=index * CHUNKS_PER_SOURCE + n) for n in range(CHUNKS_PER_SOURCE)]
+            source['chunks'] = chunks
+            for state in (states.SCRAPING, states.CHUNKING):
+                module.ingestion_job_service.transition(source['community_id'], source['source_id'], state)
+            module.knowledge_source_service.store_chunks(source['community_id'], source['source_id'], chunks)
+            module.ingestion_job_service.transition(source['community_id'], source['source_id'], states.PROCESSING, chunks_total=len(chunks))
+    remaining = iter(sources)
+
+    def handle_source():
+        # Every chunk of one source in a single batch, so each call also runs the combine step
+        source = next(remaining)
+        event = {'Records': [
+            sqs_record({
+                'community_id': source['community_id'],
+                'source_id': source['source_id'],
+                'chunk_id': index,
+                'chunk_count': len(source['chunks']),
+                'chunk_content': chunk,
+                'message_type': 'chunk',
+            }, 'knowledge_source_chunk_processing_queue')
+            for index, chunk in enumerate(source['chunks'])
+        ]}
+        failures = module.lambda_handler(event, None)['batchItemFailures']
+        return 'ok' if not failures else f'{len(failures)} failed'
+
+    results[f'{target}.lambda_handler'] = run_workload(SUITE, target, 'lambda_handler', handle_source, config)
+
+def bench_question_generator(config: BenchmarkConfig, results: Dict[str, Dict[str, Any]]) -> None:
+    target = 'question_generator'
+    module = load_target(target)
+    install_stub_llm(module.question_generation_service.openai_controller, latency_ms=config.llm_latency_ms)
+    schema = importlib.import_module('app.models.question_generation_schema')
+    quiz_schema = importlib.import_module('app.models.quiz_schema')
+    quiz_service = module.question_generation_service.quiz_service
+
+    with quiet():
+        jobs = []
+        for index in range(config.total):
+            community_id, quiz_id = str(uuid.uuid4()), str(uuid.uuid4())
+            quiz_service.create_quiz(quiz_schema.QuizCreate(
+                quiz_id=quiz_id, community_id=community_id, title=f'Quiz on {WORDS[index % len(WORDS)]}',
+                description=synthetic_text(200, seed=index), owner_ids=[str(uuid.uuid4())]
+            ))
+            output = synthetic_responses(1, seed=index)[0]
+            module.dynamodb_controller.put_item({
+                'PK': 'KNOWLEDGE_SOURCE_UNCHUNK', 'SK': f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{uuid.uuid4()}',
+                'EntityType': 'KnowledgeSourceUnchunk', 'CreatedAt': 0, 'data': json.dumps(output),
+            })
+            progress = module.question_generation_service.request_generation(
+                community_id, quiz_id, schema.QuestionGenerationRequest(question_count=QUESTIONS_PER_JOB)
+            )
+            jobs.append({'community_id': community_id, 'quiz_id': quiz_id, 'job_id': progress.job_id})
+    remaining = iter(jobs)
+
+    def handle_job():
+        event = {'Records': [sqs_record(next(remaining), 'question_generation_queue')]}
+        failures = module.lambda_handler(event, None)['batchItemFailures']
+        return 'ok' if not failures else f'{len(failures)} failed'
+
+    results[f'{target}.lambda_handler'] = run_workload(SUITE, target, 'lambda_handler', handle_job, config)
+
+BENCHMARKS = [bench_web_scraper, bench_chunk_processor, bench_question_generator]
+
+def run(config: BenchmarkConfig) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for benchmark in BENCHMARKS:
+        benchmark(config, results)
+    return results
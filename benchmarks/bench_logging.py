@@ -0,0 +1,82 @@
+"""Per-call overhead of the method logging decorator.
+
+Each workload makes CALLS_PER_ITERATION calls of a trivial method, so p50 ms x 10 is the cost per call
+in microseconds. Records are formatted and written to /dev/null, as a Lambda's handler would do.
+"""
+import importlib
+import logging
+import os
+from functools import wraps
+from typing import Any, Callable, Dict
+from benchmarks.harness import BenchmarkConfig, load_target, run_workload
+from benchmarks.stubs import synthetic_text
+
+SUITE = 'logging'
+TARGET = 'chunk_processor'
+CALLS_PER_ITERATION = 100
+
+def legacy_log_and_handle_exceptions(method):
+    """The decorator as it was before structured logging, kept as the baseline."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            self.logger.info(f"Calling {method.__name__} with args: {args}, kwargs: {kwargs}")
+            result = method(self, *args, **kwargs)
+            self.logger.info(f"{method.__name__} completed successfully")
+            return result
+        except Exception as e:
+            self.logger.error(f"Unexpected error in {method.__name__}: {e}")
+            raise
+    return wrapper
+
+def devnull_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+    logger = logging.getLogger(f'benchmarks.logging.{name}')
+    logger.handlers = []
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+def make_service(decorator: Callable, logger: logging.Logger) -> Any:
+    class Service:
+        def __init__(self):
+            self.logger = logger
+
+        def store(self, community_id: str, items: list) -> int:
+            return len(items)
+
+    if decorator is not None:
+        Service.store = decorator(Service.store)
+    return Service()
+
+def run(config: BenchmarkConfig) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    load_target(TARGET)
+    structured = importlib.import_module('app.lib.logging')
+    structured.set_sample_rate('benchmarks.logging.sampled_1pct', 0.01)
+
+    small = ['5f0c3a52-2d1e-4a7b-9a55-0a6f8c1d2e3f', [{'PK': 'QUIZ', 'SK': 'COMMUNITY#c#QUIZ#q', 'title': 'Quiz'}]]
+    # A batch of chunk items, the shape batch_write_items and store_chunks see
+    large = ['5f0c3a52-2d1e-4a7b-9a55-0a6f8c1d2e3f', [
+        {'PK': 'KNOWLEDGE_SOURCE', 'SK': f'COMMUNITY#c#KNOWLEDGE_SOURCE#s#CHUNK#{index:05d}', 'content': synthetic_text(3500, seed=index)}
+        for index in range(25)
+    ]]
+
+    variants = {
+        'undecorated': make_service(None, devnull_logger('undecorated')),
+        'legacy': make_service(legacy_log_and_handle_exceptions, devnull_logger('legacy')),
+        'structured': make_service(structured.log_and_handle_exceptions, devnull_logger('structured')),
+        'sampled_1pct': make_service(structured.log_and_handle_exceptions, devnull_logger('sampled_1pct')),
+        'info_disabled': make_service(structured.log_and_handle_exceptions, devnull_logger('info_disabled', logging.WARNING)),
+    }
+    for payload_name, payload in (('small', small), ('large', large)):
+        for variant, service in variants.items():
+            def calls(service=service, payload=payload):
+                for _ in range(CALLS_PER_ITERATION):
+                    service.store(*payload)
+                return CALLS_PER_ITERATION
+            name = f'{variant}_{payload_name}_x{CALLS_PER_ITERATION}'
+            results[f'{SUITE}.{name}'] = run_workload(SUITE, TARGET, name, calls, config)
+    return results
@@ -0,0 +1,61 @@
+"""Micro-benchmarks of the pure content-processing helpers."""
+import importlib
+from decimal import Decimal
+from typing import Any, Dict
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from benchmarks.harness import BenchmarkConfig, load_target, run_workload, skipped
+from benchmarks.stubs import StubChatClient, synthetic_article, synthetic_responses, synthetic_text
+
+SUITE = 'micro'
+# The chunk processor's package has every service the helpers live in except the scraper
+TARGET = 'chunk_processor'
+
+def run(config: BenchmarkConfig) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    load_target(TARGET)
+    openai_controller = importlib.import_module('app.lib.openai_controller').OpenAIController(api_key='benchmark')
+    openai_controller.client = StubChatClient()
+    content_processor = importlib.import_module('app.services.content_processor_service').ContentProcessorService(openai_controller)
+    combiner = importlib.import_module('app.services.combine_cleanup_service').CombinationCleanupService(openai_controller)
+
+    text_50k, text_500k = synthetic_text(50_000), synthetic_text(500_000)
+    responses = synthetic_responses(50)
+    items = [item for response in responses for item in response['supporting_details'] + response['keywords']] * 10
+
+    workloads = {
+        'split_content_50k': lambda: len(content_processor.split_content(text_50k, 4000)),
+        'split_content_500k': lambda: len(content_processor.split_content(text_500k, 4000)),
+        'combine_responses_50': lambda: len(combiner.combine_responses(responses)['supporting_details']),
+        'remove_duplicates_10k': lambda: len(combiner.remove_duplicates(items)),
+    }
+
+    # A page of question items as DynamoDB returns them, rendered the way FastAPI does by default and with FastJSONResponse
+    responses_module = importlib.import_module('app.lib.responses')
+    page = {'questions': [{
+        'PK': 'QUESTION', 'SK': f'COMMUNITY#c#QUIZ#q#QUESTION#{index}', 'EntityType': 'Question',
+        'CreatedAt': Decimal(1700000000 + index), 'question_text': synthetic_text(200, seed=index),
+        'options': ['A', 'B', 'C', 'D'], 'answer': ['A'], 'score': Decimal('0.5'),
+    } for index in range(200)]}
+    workloads['render_json_default_200'] = lambda: len(JSONResponse(jsonable_encoder(page)).body)
+    workloads['render_json_fast_200'] = lambda: len(responses_module.FastJSONResponse(page).body)
+
+    # A take served from the container's lease, and one written through to the shared bucket item
+    rate_limit = importlib.import_module('app.lib.rate_limit')
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryBucketStore())
+    bucket_keys = [('bench#user#u', rate_limit.Limit(1e9, 1e9)), ('bench#community#c', rate_limit.Limit(1e9, 1e9))]
+    shared_store = rate_limit.DynamoDBBucketStore(importlib.import_module('app.lib.dynamodb_controller').get_dynamodb_controller())
+    workloads['rate_limit_check_local'] = lambda: limiter.check(bucket_keys).allowed
+    workloads['rate_limit_take_shared'] = lambda: shared_store.take('bench#user#u', bucket_keys[0][1], 1)[0]
+
+    for name, fn in workloads.items():
+        results[f'{SUITE}.{name}'] = run_workload(SUITE, TARGET, name, fn, config)
+
+    try:
+        scraper = importlib.import_module('app.services.webscraper_service').WebScraperService()
+    except ImportError as e:
+        results[f'{SUITE}.minify_content_100k'] = skipped(SUITE, TARGET, f'cannot import the web scraper service: {e}')
+    else:
+        article = synthetic_article(100_000)
+        results[f'{SUITE}.minify_content_100k'] = run_workload(SUITE, TARGET, 'minify_content_100k', lambda: len(scraper.minify_content(article)), config)
+    return results
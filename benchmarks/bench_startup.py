@@ -0,0 +1,103 @@
+"""Cold-start import time of every API and Lambda entry point, checked against an import budget.
+
+Each entry module is imported in a fresh interpreter, the way a new Lambda container loads it. A target is
+over budget when its median import time exceeds IMPORT_BUDGET_MS, when importing it loads a module that
+should only be imported on first use, or when it fails to import at all. ``benchmarks.run`` exits with status 1
+when any target is over budget.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+from benchmarks.harness import TARGETS, BenchmarkConfig, configure_environment, stage_target, summarize
+
+SUITE = 'startup'
+STARTUP_RUNS = 5
+
+# Median import time allowed per entry point, with headroom over a developer laptop; scale with
+# STARTUP_BUDGET_SCALE on slower machines
+IMPORT_BUDGET_MS = {
+    'community_management': 400,
+    'quiz_management': 400,
+    'source_ingestion': 400,
+    'user_management': 350,
+    'web_scraper': 250,
+    'chunk_processor': 250,
+    'stream_processor': 200,
+    'cache_invalidator': 200,
+    'cascade_delete': 250,
+    'leaderboard_compactor': 250,
+    'question_generator': 250,
+}
+
+# Heavy packages that must not load at import time; they are imported inside the functions that use them
+DEFERRED_MODULES = ('openai', 'newspaper', 'nltk', 'lxml', 'uvicorn')
+
+PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed_ms = (time.perf_counter() - start) * 1000
+deferred = sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[2:]))
+print(json.dumps({'import_ms': elapsed_ms, 'deferred_loaded': deferred}))
+"""
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)")
+
+def probe(target: str, importtime: bool = False) -> Tuple[Dict[str, Any], str]:
+    """Imports the target's entry module in a new interpreter and returns its measurements and stderr."""
+    _, module = TARGETS[target]
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE, module, *DEFERRED_MODULES]
+    completed = subprocess.run(command, cwd=stage_target(target), env=dict(os.environ), capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit status {completed.returncode}')
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+def heaviest_imports(importtime_output: str, count: int = 8) -> List[Dict[str, Any]]:
+    """Third-party and standard library packages by total import time, from ``python -X importtime`` output."""
+    totals: Dict[str, int] = {}
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            package = match.group(2).split('.')[0]
+            if package != 'app':
+                totals[package] = totals.get(package, 0) + int(match.group(1))
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [{'module': package, 'ms': round(us / 1000, 1)} for package, us in ranked]
+
+def run(config: BenchmarkConfig) -> Dict[str, Dict[str, Any]]:
+    configure_environment()
+    scale = float(os.getenv('STARTUP_BUDGET_SCALE', '1'))
+    results: Dict[str, Dict[str, Any]] = {}
+    for target in TARGETS:
+        name = f'{target}.import'
+        # A target without a budget is reported, but only its deferred modules or a failed import can put it over budget
+        budget_ms = IMPORT_BUDGET_MS[target] * scale if target in IMPORT_BUDGET_MS else None
+        try:
+            runs = [probe(target)[0] for _ in range(STARTUP_RUNS)]
+            _, importtime_output = probe(target, importtime=True)
+        except RuntimeError as e:
+            # An entry point that cannot be imported would fail every cold start
+            results[name] = {'suite': SUITE, 'target': target, 'failed': f'import failed: {e}', 'budget_ms': budget_ms, 'over_budget': True}
+            continue
+        latency = summarize([run['import_ms'] for run in runs])
+        deferred_loaded = sorted({module for run in runs for module in run['deferred_loaded']})
+        over_budget = (budget_ms is not None and latency['p50'] > budget_ms) or bool(deferred_loaded)
+        results[name] = {
+            'suite': SUITE,
+            'target': target,
+            'iterations': STARTUP_RUNS,
+            'latency_ms': latency,
+            'backend_calls_per_iteration': {},
+            'backend_calls_total_per_iteration': 0,
+            'throttles': 0,
+            'peak_alloc_kb': 0.0,
+            'budget_ms': budget_ms,
+            'deferred_modules_loaded': deferred_loaded,
+            'heaviest_imports': heaviest_imports(importtime_output),
+            'over_budget': over_budget,
+            'outcomes': {'over budget' if over_budget else 'within budget' if budget_ms is not None else 'no budget': STARTUP_RUNS},
+        }
+    return results
@@ -0,0 +1,267 @@
+"""Shared plumbing for the benchmark suite: loading app packages, timing, memory and result storage.
+
+Every API and Lambda ships its own ``app`` package (its ``app/`` directory plus ``lib``, ``models`` and
+``services``, as assembled by its Dockerfile). The harness recreates that layout in a staging directory and
+swaps the ``app`` package in ``sys.modules`` between targets, so all of them can be benchmarked in-process.
+"""
+import atexit
+import contextlib
+import importlib
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / 'benchmarks' / 'results'
+
+TARGETS = {
+    'community_management': ('apis/community_management', 'app.main'),
+    'quiz_management': ('apis/quiz_management', 'app.main'),
+    'source_ingestion': ('apis/source_ingestion', 'app.main'),
+    'user_management': ('apis/user_management', 'app.main'),
+    'web_scraper': ('lambdas/web_scraper', 'app.web_scraper'),
+    'chunk_processor': ('lambdas/chunk_processor', 'app.chunk_processor'),
+    'stream_processor': ('lambdas/stream_processor', 'app.stream_processor'),
+    'cache_invalidator': ('lambdas/cache_invalidator', 'app.cache_invalidator'),
+    'cascade_delete': ('lambdas/cascade_delete', 'app.cascade_delete'),
+    'leaderboard_compactor': ('lambdas/leaderboard_compactor', 'app.leaderboard_compactor'),
+    'question_generator': ('lambdas/question_generator', 'app.question_generator'),
+}
+
+# Benchmarks never talk to AWS; everything else can be overridden from the environment
+FORCED_ENV = {'AWS_BACKEND': 'local'}
+DEFAULT_ENV = {
+    'TABLE_NAME': 'sharp_app_data',
+    'OPENAI_API_KEY': 'benchmark',
+    'KNOWLEDGE_SOURCE_URL_INITIAL_INGESTION_QUEUE': 'https://sqs.local/000000000000/knowledge_source_url_initial_ingestion_queue',
+    'KNOWLEDGE_SOURCE_CHUNK_PROCESSING_QUEUE': 'https://sqs.local/000000000000/knowledge_source_chunk_processing_queue',
+    'CASCADE_DELETE_QUEUE': 'https://sqs.local/000000000000/cascade_delete_queue',
+    'QUESTION_GENERATION_QUEUE': 'https://sqs.local/000000000000/question_generation_queue',
+    'COGNITO_REGION': 'us-east-2',
+    'USER_POOL_ID': 'benchmark',
+    'APP_CLIENT_ID': 'benchmark',
+    # Every request still passes through the rate limiter, with limits no workload reaches
+    'RATE_LIMIT_BACKEND': 'memory',
+    'RATE_LIMIT_USER_BURST': '1000000000',
+    'RATE_LIMIT_COMMUNITY_BURST': '1000000000',
+    'URL_INGESTION_BURST': '1000000000',
+    'COMMUNITY_URL_INGESTION_BURST': '1000000000',
+}
+
+@dataclass
+class BenchmarkConfig:
+    iterations: int = 200
+    warmup: int = 20
+    memory_iterations: int = 20
+    llm_latency_ms: float = 0.0
+
+    @property
+    def total(self) -> int:
+        """Number of times each workload is called across the warm-up, timing and memory passes."""
+        return self.warmup + self.iterations + self.memory_iterations
+
+def configure_environment() -> None:
+    for name, value in DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.update(FORCED_ENV)
+
+_staging_dir: Optional[Path] = None
+
+def stage_target(target: str) -> Path:
+    """Lays out a target's ``app`` package in the staging directory and returns the directory containing it."""
+    global _staging_dir
+    if _staging_dir is None:
+        _staging_dir = Path(tempfile.mkdtemp(prefix='sharp-bench-'))
+        atexit.register(shutil.rmtree, _staging_dir, True)
+    root = _staging_dir / target
+    if not root.exists():
+        source_dir, _ = TARGETS[target]
+        package = root / 'app'
+        package.mkdir(parents=True)
+        for entry in (REPO_ROOT / source_dir / 'app').iterdir():
+            if entry.name != '__pycache__':
+                (package / entry.name).symlink_to(entry)
+        for shared in ('lib', 'models', 'services'):
+            (package / shared).symlink_to(REPO_ROOT / shared)
+    return root
+
+def load_target(target: str) -> ModuleType:
+    """Imports a target's entry module with a fresh ``app`` package, as it would be laid out in its container."""
+    configure_environment()
+    for name in [name for name in sys.modules if name == 'app' or name.startswith('app.')]:
+        del sys.modules[name]
+    root = str(stage_target(target))
+    sys.path[:] = [path for path in sys.path if not path.startswith(str(_staging_dir))]
+    sys.path.insert(0, root)
+    with quiet():
+        module = importlib.import_module(TARGETS[target][1])
+    silence_logging()
+    return module
+
+def backend():
+    """Returns the local backend module of the currently loaded target."""
+    return importlib.import_module('app.lib.local_backend')
+
+def silence_logging() -> None:
+    """Keeps log records flowing through the loggers (as in production) but drops them at the handler."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.NullHandler())
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        'p50': round(percentile(ordered, 50), 4),
+        'p95': round(percentile(ordered, 95), 4),
+        'p99': round(percentile(ordered, 99), 4),
+        'mean': round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+        'max': round(ordered[-1], 4) if ordered else 0.0,
+    }
+
+def run_workload(suite: str, target: str, name: str, fn: Callable[[], Any], config: BenchmarkConfig) -> Dict[str, Any]:
+    """Times a workload and measures its backend calls and memory.
+
+    The workload is called ``config.total`` times: warm-up calls first, then the timed calls (during which
+    backend calls are counted), then a few calls under tracemalloc for the allocation peak. Memory is
+    measured in its own pass because tracing allocations slows everything down. Whatever the workload
+    returns (e.g. an HTTP status code) is tallied under ``outcomes``.
+    """
+    outcomes: Counter = Counter()
+    simulator = backend().get_simulator()
+
+    with quiet():
+        for _ in range(config.warmup):
+            fn()
+
+        simulator.reset_stats()
+        samples = []
+        for _ in range(config.iterations):
+            start = time.perf_counter()
+            outcome = fn()
+            samples.append((time.perf_counter() - start) * 1000)
+            outcomes[str(outcome)] += 1
+        stats = simulator.stats()
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(config.memory_iterations):
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                fn()
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+    calls = {operation: round(count / config.iterations, 3) for operation, count in sorted(stats['calls'].items())}
+    return {
+        'suite': suite,
+        'target': target,
+        'iterations': config.iterations,
+        'latency_ms': summarize(samples),
+        'backend_calls_per_iteration': calls,
+        'backend_calls_total_per_iteration': round(sum(calls.values()), 3),
+        'throttles': stats['throttles'],
+        'peak_alloc_kb': round(peak / 1024, 1),
+        'outcomes': dict(outcomes),
+    }
+
+def skipped(suite: str, target: str, reason: str) -> Dict[str, Any]:
+    return {'suite': suite, 'target': target, 'skipped': reason}
+
+# -- Results ------------------------------------------------------------------------------------------------
+
+def current_commit() -> str:
+    """Short hash of HEAD, suffixed with -dirty when tracked files have uncommitted changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def build_report(workloads: Dict[str, Dict[str, Any]], config: BenchmarkConfig) -> Dict[str, Any]:
+    return {
+        'commit': current_commit(),
+        'created_at': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'iterations': config.iterations,
+            'warmup': config.warmup,
+            'memory_iterations': config.memory_iterations,
+            'llm_latency_ms': config.llm_latency_ms,
+            'backend_latency_ms': float(os.getenv('LOCAL_BACKEND_LATENCY_MS', '0')),
+            'backend_throttle_rate': float(os.getenv('LOCAL_BACKEND_THROTTLE_RATE', '0')),
+        },
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1),
+        'workloads': workloads,
+    }
+
+def save_report(report: Dict[str, Any]) -> Path:
+    """Stores a report as results/<commit>.json, replacing an earlier run of the same commit."""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{report['commit']}.json"
+    path.write_text(json.dumps(report, indent=2, sort_keys=True))
+    return path
+
+def latest_report(exclude_commit: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Returns the most recently created stored report, skipping the given commit."""
+    reports = []
+    for path in RESULTS_DIR.glob('*.json'):
+        report = json.loads(path.read_text())
+        if report.get('commit') != exclude_commit:
+            reports.append(report)
+    return max(reports, key=lambda report: report.get('created_at', 0)) if reports else None
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """Compares p50/p95 latency and backend calls per iteration against a baseline report.
+
+    A workload regresses when its p95 grows by more than ``threshold`` (relative), or when it makes more
+    backend calls per iteration than before.
+    """
+    rows = []
+    for name, result in sorted(current['workloads'].items()):
+        before = baseline['workloads'].get(name)
+        # Skipped and failed workloads have no latency to compare
+        if 'latency_ms' not in result or not before or 'latency_ms' not in before:
+            continue
+        p50, p95 = result['latency_ms']['p50'], result['latency_ms']['p95']
+        old_p50, old_p95 = before['latency_ms']['p50'], before['latency_ms']['p95']
+        calls, old_calls = result['backend_calls_total_per_iteration'], before['backend_calls_total_per_iteration']
+        p95_change = (p95 - old_p95) / old_p95 if old_p95 else 0.0
+        rows.append({
+            'workload': name,
+            'p50_change': (p50 - old_p50) / old_p50 if old_p50 else 0.0,
+            'p95_change': p95_change,
+            'calls_change': calls - old_calls,
+            'regressed': p95_change > threshold or calls > old_calls,
+        })
+    return rows
@@ -0,0 +1,101 @@
+"""Runs the benchmark suite and stores the results per commit.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run                         # every suite, results saved to benchmarks/results/
+    python -m benchmarks.run --suite micro -n 500
+    python -m benchmarks.run --compare --fail-on-regression
+
+Simulated backend latency and throttling are configured through LOCAL_BACKEND_LATENCY_MS,
+LOCAL_BACKEND_LATENCY_JITTER_MS and LOCAL_BACKEND_THROTTLE_RATE (see lib/local_backend.py).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+from benchmarks import bench_apis, bench_ingestion, bench_logging, bench_micro, bench_startup
+from benchmarks.harness import BenchmarkConfig, build_report, compare_reports, latest_report, save_report
+
+SUITES = {
+    'apis': bench_apis.run,
+    'ingestion': bench_ingestion.run,
+    'logging': bench_logging.run,
+    'micro': bench_micro.run,
+    'startup': bench_startup.run,
+}
+
+def format_results(workloads: Dict[str, Dict[str, Any]]) -> str:
+    header = f"{'workload':<48} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls':>7} {'alloc KB':>9}  outcomes"
+    lines = [header, '-' * len(header)]
+    for name, result in sorted(workloads.items()):
+        if 'skipped' in result:
+            lines.append(f"{name:<48} skipped: {result['skipped']}")
+            continue
+        if 'failed' in result:
+            lines.append(f"{name:<48} FAILED: {result['failed']}")
+            continue
+        latency = result['latency_ms']
+        outcomes = ', '.join(f'{outcome} x{count}' for outcome, count in sorted(result['outcomes'].items()))
+        lines.append(
+            f"{name:<48} {latency['p50']:>9.3f} {latency['p95']:>9.3f} {latency['p99']:>9.3f} "
+            f"{result['backend_calls_total_per_iteration']:>7.2f} {result['peak_alloc_kb']:>9.1f}  {outcomes}"
+        )
+    return '\n'.join(lines)
+
+def format_comparison(rows: List[Dict[str, Any]], baseline_commit: str) -> str:
+    lines = [f"Compared with {baseline_commit}:"]
+    for row in rows:
+        flag = '  REGRESSION' if row['regressed'] else ''
+        lines.append(
+            f"  {row['workload']:<48} p50 {row['p50_change']:+.1%}  p95 {row['p95_change']:+.1%}  calls {row['calls_change']:+.2f}{flag}"
+        )
+    return '\n'.join(lines)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the APIs, ingestion Lambdas and content helpers against local stand-ins.')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help='Suite to run (repeatable); defaults to all')
+    parser.add_argument('-n', '--iterations', type=int, default=200, help='Timed calls per workload')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed calls per workload before timing')
+    parser.add_argument('--memory-iterations', type=int, default=20, help='Calls per workload traced for allocations')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Simulated latency of each stubbed LLM request')
+    parser.add_argument('--no-save', action='store_true', help='Do not store the results under benchmarks/results/')
+    parser.add_argument('--output', type=Path, help='Also write the report to this file')
+    parser.add_argument('--compare', nargs='?', const='latest', metavar='REPORT', help='Compare with a stored report (default: the latest from another commit)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative p95 increase that counts as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any workload regressed')
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(args.iterations, args.warmup, args.memory_iterations, args.llm_latency_ms)
+    workloads: Dict[str, Dict[str, Any]] = {}
+    for suite in args.suite or sorted(SUITES):
+        print(f"Running {suite} benchmarks...", file=sys.stderr)
+        workloads.update(SUITES[suite](config))
+
+    report = build_report(workloads, config)
+    print(format_results(workloads))
+    print(f"\nmax RSS: {report['max_rss_kb'] / 1024:.1f} MB")
+    if not args.no_save:
+        print(f"Saved {save_report(report)}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    status = 0
+    over_budget = sorted(name for name, result in workloads.items() if result.get('over_budget'))
+    if over_budget:
+        print(f"Over the startup import budget: {', '.join(over_budget)}")
+        status = 1
+
+    if args.compare:
+        baseline = latest_report(exclude_commit=report['commit']) if args.compare == 'latest' else json.loads(Path(args.compare).read_text())
+        if not baseline:
+            print("No earlier report to compare with.")
+            return status
+        rows = compare_reports(report, baseline, args.threshold)
+        print(format_comparison(rows, baseline.get('commit', args.compare)))
+        if args.fail_on_regression and any(row['regressed'] for row in rows):
+            return 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
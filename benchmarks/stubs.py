@@ -0,0 +1,126 @@
+"""Deterministic stand-ins for the LLM and for scraped content."""
+import json
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+SECTION_RE = re.compile(r"=== SECTION (\d+) ===")
+QUESTION_COUNT_RE = re.compile(r"^Write (\d+) questions", re.MULTILINE)
+
+WORDS = (
+    "learning memory retrieval practice spacing interleaving feedback community quiz knowledge source "
+    "insight concept evidence study research method result analysis model theory signal context "
+    "attention curriculum assessment question answer review summary detail example principle"
+).split()
+
+def synthetic_text(chars: int, seed: int = 0) -> str:
+    """Plain sentences of pseudo-random words, about ``chars`` characters long."""
+    rng = random.Random(seed)
+    sentences, length = [], 0
+    while length < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+def synthetic_article(chars: int, seed: int = 0) -> str:
+    """Article text with the markup and irregular whitespace that minify_content strips."""
+    paragraphs = synthetic_text(chars, seed).split(". ")
+    return "\n\n".join(f"<p>  {paragraph}.\t</p>" for paragraph in paragraphs)
+
+def extraction_result(text: str, seed: int = 0) -> Dict[str, Any]:
+    """A knowledge extraction response in the shape the extraction prompt asks for."""
+    rng = random.Random(f"{seed}:{len(text)}")
+    words = text.split()[:200] or WORDS
+    return {
+        "author": "Benchmark Author",
+        "site": "example.com",
+        "publish_date": "2024-01-01",
+        "main_topic": rng.choice(WORDS),
+        "parent_topic": rng.choice(WORDS),
+        "field": "education",
+        "keywords": [rng.choice(words) for _ in range(10)],
+        "major_insights_or_novel_concepts": [" ".join(rng.choice(words) for _ in range(12)) for _ in range(4)],
+        "supporting_details": [" ".join(rng.choice(words) for _ in range(16)) for _ in range(6)],
+        "relevant_quotations": [" ".join(rng.choice(words) for _ in range(10)) for _ in range(2)],
+        "external_links": [f"https://example.com/{rng.choice(WORDS)}" for _ in range(2)],
+    }
+
+def synthetic_responses(count: int, duplicate_rate: float = 0.3, seed: int = 0) -> List[Dict[str, Any]]:
+    """Extraction responses whose list fields repeat earlier entries at roughly ``duplicate_rate``."""
+    rng = random.Random(seed)
+    responses, seen = [], []
+    for index in range(count):
+        response = extraction_result(synthetic_text(800, seed + index), seed + index)
+        for field in ("keywords", "major_insights_or_novel_concepts", "supporting_details"):
+            values = response[field]
+            for position in range(len(values)):
+                if seen and rng.random() < duplicate_rate:
+                    values[position] = rng.choice(seen)
+            seen.extend(values)
+        responses.append(response)
+    return responses
+
+def generated_questions(content: str, count: int) -> Dict[str, Any]:
+    """A question generation response with ``count`` multiple choice questions drawn from the prompt's words."""
+    rng = random.Random(content)
+    words = content.split()[-400:] or WORDS
+    questions = []
+    for _ in range(count):
+        options = [" ".join(rng.choice(words) for _ in range(3)) for _ in range(4)]
+        questions.append({
+            "question_text": f"Which statement about {' '.join(rng.choice(words) for _ in range(6))} is correct?",
+            "options": options,
+            "answer": [options[rng.randrange(4)]],
+            "question_type": "multiple_choice",
+        })
+    return {"questions": questions}
+
+class StubChatCompletions:
+    """Answers chat completion requests with canned extraction JSON after an optional simulated latency.
+
+    Packed requests (whose content is split into numbered sections) get one result per section, keyed by
+    section number, as the packed prompt asks for; question generation requests get the questions they ask for.
+    """
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.requests = 0
+
+    def create(self, model: str, messages: List[Dict[str, str]], max_tokens: int = None, temperature: float = None, **kwargs) -> Any:
+        self.requests += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        content = messages[-1]['content']
+        sections = SECTION_RE.findall(content)
+        question_count = QUESTION_COUNT_RE.search(content)
+        if question_count:
+            body = generated_questions(content, int(question_count.group(1)))
+        elif sections:
+            body = {number: extraction_result(content, int(number)) for number in sections}
+        else:
+            body = extraction_result(content)
+        output = json.dumps(body)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=output))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_chars // 4,
+                completion_tokens=len(output) // 4,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+            )
+        )
+
+class StubChatClient:
+    """Drop-in for ``openai.Client`` as used by OpenAIController (``client.chat.completions.create``)."""
+    def __init__(self, latency_ms: float = 0.0):
+        self.chat = SimpleNamespace(completions=StubChatCompletions(latency_ms))
+
+def install_stub_llm(*openai_controllers: Any, latency_ms: float = 0.0) -> StubChatClient:
+    """Points OpenAIControllers at the stub client, keeping their caching and usage accounting in the path."""
+    client = StubChatClient(latency_ms)
+    for controller in openai_controllers:
+        controller.client = client
+    return client
@@ -0,0 +1,40 @@
+import logging
+import os
+from typing import Any, Dict, Set
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.dynamodb_stream import deserialize_image, replay_local_stream
+from app.lib.entity_cache import InvalidationLog, cache_key_for
+from app.lib.tracing import traced_handler
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse the client
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+invalidation_log = InvalidationLog(dynamodb_controller)
+
+@traced_handler('cache_invalidator')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Publishes the cache keys of the communities, quizzes and questions a batch of stream records changed.
+
+    Each entity type with changes gets one log entry and one watermark increment per batch, however
+    many records it held. A batch that is delivered again publishes again, which only evicts again.
+    """
+    changed: Dict[str, Set[str]] = {}
+    for record in event.get('Records', []):
+        target = cache_key_for(deserialize_image(record['dynamodb']['Keys']))
+        if target is not None:
+            entity_type, cache_key = target
+            changed.setdefault(entity_type, set()).add(cache_key)
+    for entity_type, cache_keys in changed.items():
+        invalidation_log.publish(entity_type, cache_keys)
+    published = {entity_type: len(cache_keys) for entity_type, cache_keys in changed.items()}
+    logger.info("Published cache invalidations: %s", published)
+    return {'published': published}
+
+def replay(batch_size: int = 100) -> int:
+    """Processes the local table's stream (AWS_BACKEND=local) from where the last replay stopped."""
+    return replay_local_stream(lambda_handler, dynamodb_controller, batch_size, consumer='cache_invalidator', tumbling_window=False)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Replayed {replay()} stream records")
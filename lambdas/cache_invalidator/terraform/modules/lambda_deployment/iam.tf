@@ -0,0 +1,58 @@
+data "aws_dynamodb_table" "sharp_app_data" {
+  name = var.dynamodb_table_name
+}
+
+resource "aws_iam_policy" "lambda_stream_policy" {
+  name        = "cache_invalidator_stream_policy"
+  description = "IAM policy for Lambda to read the app table's stream"
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ],
+        Resource = "${data.aws_dynamodb_table.sharp_app_data.stream_arn}"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_stream_attachment" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.lambda_stream_policy.arn
+}
+
+# No batching window or tumbling window: invalidations should reach the API containers within about a
+# second of the write. Records older than the API cache TTL are dropped rather than retried, since the
+# entries they would evict have expired by then.
+resource "aws_lambda_event_source_mapping" "table_stream_trigger" {
+  event_source_arn                   = data.aws_dynamodb_table.sharp_app_data.stream_arn
+  function_name                      = aws_lambda_function.lambda.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 0
+  maximum_retry_attempts             = 3
+  maximum_record_age_in_seconds      = 300
+  bisect_batch_on_function_error     = true
+  parallelization_factor             = 2
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        dynamodb = {
+          Keys = {
+            PK = {
+              S = ["COMMUNITY", "QUIZ", "QUESTION"]
+            }
+          }
+        }
+      })
+    }
+  }
+}
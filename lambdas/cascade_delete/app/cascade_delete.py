@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.sqs_controller import SQSController
+from app.lib.tracing import traced_handler
+from app.services.cascade_delete_service import CascadeDeleteService, TARGETS, parent_key
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse clients
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+cascade_delete_service = CascadeDeleteService(dynamodb_controller, SQSController(queue_url=os.getenv('CASCADE_DELETE_QUEUE')))
+
+# Time left for the page in flight and the job update once a run decides to stop
+TIME_MARGIN_MS = int(os.getenv('CASCADE_DELETE_TIME_MARGIN_MS', '20000'))
+
+@traced_handler('cascade_delete')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Runs the cascade deletes delivered by the SQS event source mapping.
+
+    A job that nears the Lambda's timeout queues itself again and its message succeeds; a job that
+    fails keeps its position and is reported through batchItemFailures, so its redelivery resumes.
+    """
+    should_stop = deadline_check(context)
+    failed_ids = []
+    for record in event.get('Records', []):
+        if not process_message(record['body'], should_stop):
+            failed_ids.append(record['messageId'])
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+def deadline_check(context) -> Callable[[], bool]:
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return lambda: False
+    return lambda: context.get_remaining_time_in_millis() < TIME_MARGIN_MS
+
+def process_message(body: str, should_stop: Callable[[], bool]) -> bool:
+    """Runs one job; returns False if its message should be retried."""
+    try:
+        message = json.loads(body)
+        target, community_id, source_id = message['target'], message['community_id'], message.get('source_id')
+        if target not in TARGETS or (target == 'knowledge_source' and not source_id):
+            raise ValueError(f"unknown deletion target {target!r}")
+    except (ValueError, KeyError) as e:
+        # Malformed messages can never succeed, so they are dropped instead of retried
+        logger.error("Dropping malformed cascade delete message: %s", e)
+        return True
+    try:
+        cascade_delete_service.run(target, community_id, source_id, should_stop=should_stop)
+        return True
+    except Exception as e:
+        logger.error("Deletion of %s %s failed: %s", target, source_id or community_id, e)
+        try:
+            cascade_delete_service.record_error(parent_key(target, community_id, source_id)[1], str(e))
+        except Exception:
+            pass
+        return False
+
+def drain(sqs_controller: Optional[SQSController] = None, max_batches: Optional[int] = None) -> int:
+    """Runs queued jobs until the queue is empty, for running the worker outside Lambda; returns the jobs run."""
+    sqs_controller = sqs_controller or cascade_delete_service.sqs_controller
+    runs = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        received = sqs_controller.receive_messages(max_number=1, wait_time_seconds=0, visibility_timeout=360)
+        batches += 1
+        if not received:
+            return runs
+        runs += 1
+        if process_message(received[0]['Body'], lambda: False):
+            sqs_controller.delete_message(received[0]['ReceiptHandle'])
+    return runs
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Ran {drain()} cascade delete jobs")
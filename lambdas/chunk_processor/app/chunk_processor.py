@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.content_processor_service import ContentProcessorService
+from app.services.combine_cleanup_service import CombinationCleanupService
+from app.services.knowledge_source_service import KnowledgeSourceService
+from app.services.ingestion_job_service import IngestionJobService, InvalidTransitionError
+from app.models.ingestion_job_schema import IngestionState
+from app.services.usage_service import UsageService, BudgetExceededError
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.sqs_controller import SQSController
+from app.lib.tracing import bind_trace, traced_handler
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse clients and the LLM response cache
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+knowledge_source_service = KnowledgeSourceService(dynamodb_controller)
+usage_service = UsageService(dynamodb_controller)
+ingestion_job_service = IngestionJobService(dynamodb_controller)
+content_processor_service = ContentProcessorService(usage_service=usage_service)
+combination_cleanup_service = CombinationCleanupService(usage_service=usage_service)
+
+MAX_SOURCE_WORKERS = int(os.getenv('CHUNK_PROCESSOR_SOURCE_WORKERS', '4'))
+# Chunk messages that fail on every delivery are redriven to this queue, which the chunk processor also consumes
+DEAD_LETTER_QUEUE_NAME = os.getenv('CHUNK_PROCESSING_DLQ_NAME', 'knowledge_source_chunk_processing_dlq')
+
+@traced_handler('chunk_processor')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Processes a batch of chunk messages delivered by the SQS event source mappings.
+
+    Failed messages are reported through batchItemFailures so only they are redelivered. Messages from the
+    dead-letter queue are chunks that failed on every delivery; they are recorded as abandoned so their job
+    still finishes.
+    """
+    records = event.get('Records', [])
+    messages = [(record['messageId'], record['body']) for record in records if not is_dead_letter(record)]
+    dead_letters = [(record['messageId'], record['body']) for record in records if is_dead_letter(record)]
+    logger.info("Chunk processor received %d messages and %d dead letters", len(messages), len(dead_letters))
+    failed_ids = process_messages(messages) + abandon_messages(dead_letters)
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+def is_dead_letter(record: Dict[str, Any]) -> bool:
+    return record.get('eventSourceARN', '').endswith(f':{DEAD_LETTER_QUEUE_NAME}')
+
+def group_by_source(messages: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[Tuple[str, int, str]]]:
+    """Groups (message_id, body) pairs by (community_id, source_id) as (message_id, chunk_index, chunk_content)."""
+    by_source: Dict[Tuple[str, str], List[Tuple[str, int, str]]] = defaultdict(list)
+    for message_id, body in messages:
+        try:
+            message = json.loads(body)
+            key = (message['community_id'], message['source_id'])
+            by_source[key].append((message_id, int(message['chunk_id']), message['chunk_content']))
+        except (ValueError, KeyError) as e:
+            # Malformed messages can never succeed, so they are dropped instead of retried
+            logger.error("Dropping malformed chunk message %s: %s", message_id, e)
+    return by_source
+
+def process_messages(messages: List[Tuple[str, str]]) -> List[str]:
+    """Processes (message_id, body) pairs and returns the ids of the messages that should be retried."""
+    failed_ids = []
+    with ThreadPoolExecutor(max_workers=MAX_SOURCE_WORKERS) as executor:
+        for source_failures in executor.map(bind_trace(lambda item: process_source(*item[0], item[1])), group_by_source(messages).items()):
+            failed_ids.extend(source_failures)
+    return failed_ids
+
+def abandon_messages(messages: List[Tuple[str, str]]) -> List[str]:
+    """Records dead-lettered chunks as abandoned and returns the ids of the messages that should be retried."""
+    failed_ids = []
+    for (community_id, source_id), chunk_messages in group_by_source(messages).items():
+        logger.error("Abandoning %d chunks of source %s after every delivery failed", len(chunk_messages), source_id)
+        try:
+            finish_chunks(community_id, source_id, [], [chunk_index for _, chunk_index, _ in chunk_messages], last_attempt=True)
+        except Exception as e:
+            logger.error("Abandoning chunks of source %s failed: %s", source_id, e)
+            failed_ids.extend(message_id for message_id, _, _ in chunk_messages)
+    return failed_ids
+
+def process_source(community_id: str, source_id: str, chunk_messages: List[Tuple[str, int, str]]) -> List[str]:
+    """Processes one source's chunks; an error fails only that source's messages, not the whole batch."""
+    try:
+        return process_source_chunks(community_id, source_id, chunk_messages)
+    except Exception as e:
+        logger.error("Processing chunks of source %s failed: %s", source_id, e)
+        return [message_id for message_id, _, _ in chunk_messages]
+
+def process_source_chunks(community_id: str, source_id: str, chunk_messages: List[Tuple[str, int, str]]) -> List[str]:
+    """Processes the chunks of one source from a batch and returns the ids of failed messages."""
+    try:
+        usage_service.check_budget(community_id)
+    except BudgetExceededError as e:
+        logger.error("Stopping ingestion of source %s: %s", source_id, e)
+        ingestion_job_service.fail(community_id, source_id, str(e))
+        return []
+
+    contents = [content for _, _, content in chunk_messages]
+    results = content_processor_service.process_chunks(contents, community_id=community_id, source_id=source_id)
+
+    succeeded = [(chunk_index, content, result) for (_, chunk_index, content), result in zip(chunk_messages, results) if result is not None]
+    failed = [(message_id, chunk_index) for (message_id, chunk_index, _), result in zip(chunk_messages, results) if result is None]
+    failed_ids = [message_id for message_id, _ in failed]
+    ingestion_job_service.record_chunk_failures(community_id, source_id, [chunk_index for _, chunk_index in failed])
+    if not succeeded:
+        return failed_ids
+
+    knowledge_source_service.store_chunk_results(community_id, source_id, succeeded)
+    finish_chunks(community_id, source_id, [chunk_index for chunk_index, _, _ in succeeded], [])
+    return failed_ids
+
+def finish_chunks(community_id: str, source_id: str, processed: List[int], abandoned: List[int], last_attempt: bool = False) -> None:
+    """Records chunks as processed or abandoned and combines the source once no chunk is outstanding."""
+    done, total = knowledge_source_service.record_chunks_processed(community_id, source_id, processed, abandoned)
+    logger.info("Source %s has %d of %d chunks finished", source_id, done, total)
+    if total and done >= total and knowledge_source_service.claim_combine(community_id, source_id):
+        combine_source(community_id, source_id, last_attempt)
+
+def combine_source(community_id: str, source_id: str, last_attempt: bool = False) -> None:
+    """Combines every chunk result of a source, cleans it up and marks the source completed.
+
+    Chunks that were abandoned are left out, and a source without any processed chunk is failed. If combining
+    fails, the claim is given back and the error re-raised, so the source's messages are redelivered and the
+    next delivery claims and combines the source again; on the last attempt the job is failed instead.
+    """
+    logger.info("All chunks finished for source %s; combining", source_id)
+    try:
+        ingestion_job_service.transition(community_id, source_id, IngestionState.COMBINING)
+        chunk_results = knowledge_source_service.get_chunk_results(community_id, source_id)
+        if not chunk_results:
+            ingestion_job_service.fail(community_id, source_id, "No chunk of the source could be processed")
+            return
+        combination_cleanup_service.openai_controller.set_model("gpt-4o-mini", 16000)
+        combined_response = combination_cleanup_service.combine_responses(chunk_results)
+        final_response = combination_cleanup_service.clean_up_response(combined_response, community_id, source_id)
+        knowledge_source_service.store_combined_output(community_id, source_id, final_response)
+        ingestion_job_service.transition(community_id, source_id, IngestionState.COMPLETED)
+    except InvalidTransitionError as e:
+        # e.g. the job was failed for exceeding its budget while the last chunks were in flight, or a
+        # redelivered ingestion message is scraping it again; in that case the rescrape's chunks combine it
+        logger.warning("Not combining source %s: %s", source_id, e)
+        knowledge_source_service.release_combine(community_id, source_id)
+    except Exception as e:
+        if last_attempt:
+            logger.error("Combining source %s failed on its last attempt: %s", source_id, e)
+            ingestion_job_service.fail(community_id, source_id, f"Combining failed: {e}")
+            return
+        knowledge_source_service.release_combine(community_id, source_id)
+        raise
+
+def poll(sqs_controller: Optional[SQSController] = None, max_batches: Optional[int] = None, dead_letter_sqs_controller: Optional[SQSController] = None) -> None:
+    """Long-polls the chunk queue and processes batches, for running the worker outside Lambda.
+
+    With ``dead_letter_sqs_controller``, dead-lettered chunks are abandoned after each batch, as the DLQ's event
+    source mapping does in Lambda.
+    """
+    sqs_controller = sqs_controller or SQSController(queue_url=os.getenv('KNOWLEDGE_SOURCE_CHUNK_PROCESSING_QUEUE'))
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        if dead_letter_sqs_controller is not None:
+            drain_batch(dead_letter_sqs_controller, abandon_messages, wait_time_seconds=0)
+        drain_batch(sqs_controller, process_messages, wait_time_seconds=20)
+
+def drain_batch(sqs_controller: SQSController, handle: Callable[[List[Tuple[str, str]]], List[str]], wait_time_seconds: int) -> None:
+    received = sqs_controller.receive_messages(max_number=10, wait_time_seconds=wait_time_seconds, visibility_timeout=120)
+    if not received:
+        return
+    failed_ids = set(handle([(message['MessageId'], message['Body']) for message in received]))
+    # Failed messages are left on the queue to become visible again and eventually reach the DLQ
+    sqs_controller.delete_messages([message['ReceiptHandle'] for message in received if message['MessageId'] not in failed_ids])
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    poll()
@@ -0,0 +1,60 @@
+data "aws_sqs_queue" "knowledge_source_chunk_processing_queue" {
+  name = "knowledge_source_chunk_processing_queue"
+}
+
+data "aws_sqs_queue" "knowledge_source_chunk_processing_dlq" {
+  name = "knowledge_source_chunk_processing_dlq"
+}
+
+resource "aws_lambda_permission" "allow_sqs_trigger" {
+  statement_id  = "AllowSQSTrigger_chunk_processor"
+  action        = "lambda:InvokeFunction"
+  function_name = "chunk_processor"
+  principal     = "sqs.amazonaws.com"
+  source_arn    = data.aws_sqs_queue.knowledge_source_chunk_processing_queue.arn
+}
+
+resource "aws_iam_policy" "lambda_sqs_policy" {
+  name        = "chunk_processor_sqs_policy"
+  description = "IAM policy for Lambda to read from the chunk processing queue and its DLQ"
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ],
+        Resource = [
+          data.aws_sqs_queue.knowledge_source_chunk_processing_queue.arn,
+          data.aws_sqs_queue.knowledge_source_chunk_processing_dlq.arn,
+        ]
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_sqs_attachment" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.lambda_sqs_policy.arn
+}
+
+# Concurrency scales with queue depth; failed chunks are reported individually and retried until the DLQ
+resource "aws_lambda_event_source_mapping" "chunk_processing_trigger" {
+  event_source_arn                   = data.aws_sqs_queue.knowledge_source_chunk_processing_queue.arn
+  function_name                      = aws_lambda_function.lambda.arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# Chunks that failed on every delivery are recorded as abandoned, so their ingestion job can still finish
+resource "aws_lambda_event_source_mapping" "chunk_dead_letter_trigger" {
+  event_source_arn        = data.aws_sqs_queue.knowledge_source_chunk_processing_dlq.arn
+  function_name           = aws_lambda_function.lambda.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+}
@@ -0,0 +1,34 @@
+import logging
+import os
+from typing import Any, Callable, Dict
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.tracing import traced_handler
+from app.services.leaderboard_service import LeaderboardService
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse the client
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+leaderboard_service = LeaderboardService(dynamodb_controller)
+
+# Time left for the snapshots in flight once a run decides to stop
+TIME_MARGIN_MS = int(os.getenv('LEADERBOARD_COMPACTOR_TIME_MARGIN_MS', '10000'))
+
+@traced_handler('leaderboard_compactor')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Merges the scores recorded since the last run into the quiz and community leaderboard snapshots.
+
+    Runs on a schedule. Updates a run does not reach stay pending and are merged by the next one.
+    """
+    written = leaderboard_service.compact(deadline_check(context))
+    logger.info("Compacted %s leaderboards", written)
+    return {'compacted': written}
+
+def deadline_check(context) -> Callable[[], bool]:
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return lambda: False
+    return lambda: context.get_remaining_time_in_millis() < TIME_MARGIN_MS
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Compacted {lambda_handler({}, None)['compacted']} leaderboards")
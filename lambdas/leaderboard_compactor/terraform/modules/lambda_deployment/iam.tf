@@ -0,0 +1,19 @@
+# Leaderboards lag recorded scores by up to one period; the timeout is shorter, so runs do not overlap
+resource "aws_cloudwatch_event_rule" "leaderboard_compaction" {
+  name                = "leaderboard_compactor_schedule"
+  description         = "Merges recorded quiz scores into the leaderboard snapshots"
+  schedule_expression = "rate(1 minute)"
+}
+
+resource "aws_cloudwatch_event_target" "leaderboard_compaction" {
+  rule = aws_cloudwatch_event_rule.leaderboard_compaction.name
+  arn  = aws_lambda_function.lambda.arn
+}
+
+resource "aws_lambda_permission" "allow_leaderboard_compaction" {
+  statement_id  = "AllowEventBridgeLeaderboardCompaction"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.leaderboard_compaction.arn
+}
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.sqs_controller import SQSController
+from app.lib.tracing import traced_handler
+from app.services.question_generation_service import GenerationJobNotFound, QuestionGenerationService, job_sort_key
+from app.services.usage_service import UsageService
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse clients and the LLM response cache
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+question_generation_service = QuestionGenerationService(
+    dynamodb_controller,
+    sqs_controller=SQSController(queue_url=os.getenv('QUESTION_GENERATION_QUEUE')),
+    usage_service=UsageService(dynamodb_controller),
+)
+
+# Time left for the calls in flight and the job update once a run decides to stop
+TIME_MARGIN_MS = int(os.getenv('QUESTION_GENERATOR_TIME_MARGIN_MS', '60000'))
+
+@traced_handler('question_generator')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Runs the question generation jobs delivered by the SQS event source mapping.
+
+    A job that nears the Lambda's timeout queues itself again and its message succeeds; a job that
+    fails keeps its progress and is reported through batchItemFailures, so its redelivery resumes.
+    """
+    should_stop = deadline_check(context)
+    failed_ids = []
+    for record in event.get('Records', []):
+        if not process_message(record['body'], should_stop):
+            failed_ids.append(record['messageId'])
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+def deadline_check(context) -> Callable[[], bool]:
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return lambda: False
+    return lambda: context.get_remaining_time_in_millis() < TIME_MARGIN_MS
+
+def process_message(body: str, should_stop: Callable[[], bool]) -> bool:
+    """Runs one job; returns False if its message should be retried."""
+    try:
+        message = json.loads(body)
+        community_id, quiz_id, job_id = message['community_id'], message['quiz_id'], message['job_id']
+    except (ValueError, KeyError) as e:
+        # Malformed messages can never succeed, so they are dropped instead of retried
+        logger.error("Dropping malformed question generation message: %s", e)
+        return True
+    try:
+        question_generation_service.run(community_id, quiz_id, job_id, should_stop=should_stop)
+        return True
+    except GenerationJobNotFound as e:
+        logger.error("Dropping question generation message: %s", e)
+        return True
+    except Exception as e:
+        logger.error("Question generation job %s failed: %s", job_id, e)
+        try:
+            question_generation_service.record_error(job_sort_key(community_id, quiz_id, job_id), str(e))
+        except Exception:
+            pass
+        return False
+
+def drain(sqs_controller: Optional[SQSController] = None, max_batches: Optional[int] = None) -> int:
+    """Runs queued jobs until the queue is empty, for running the worker outside Lambda; returns the jobs run."""
+    sqs_controller = sqs_controller or question_generation_service.sqs_controller
+    runs = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        received = sqs_controller.receive_messages(max_number=1, wait_time_seconds=0, visibility_timeout=960)
+        batches += 1
+        if not received:
+            return runs
+        runs += 1
+        if process_message(received[0]['Body'], lambda: False):
+            sqs_controller.delete_message(received[0]['ReceiptHandle'])
+    return runs
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Ran {drain()} question generation jobs")
@@ -0,0 +1,45 @@
+data "aws_sqs_queue" "question_generation_queue" {
+  name = "question_generation_queue"
+}
+
+resource "aws_lambda_permission" "allow_sqs_trigger" {
+  statement_id  = "AllowSQSTrigger_question_generator"
+  action        = "lambda:InvokeFunction"
+  function_name = "question_generator"
+  principal     = "sqs.amazonaws.com"
+  source_arn    = data.aws_sqs_queue.question_generation_queue.arn
+}
+
+resource "aws_iam_policy" "lambda_sqs_policy" {
+  name        = "question_generator_sqs_policy"
+  description = "IAM policy for Lambda to read from and continue jobs on the question generation queue"
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes",
+          "sqs:SendMessage"
+        ],
+        Resource = "${data.aws_sqs_queue.question_generation_queue.arn}"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_sqs_attachment" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.lambda_sqs_policy.arn
+}
+
+# One job per invocation; a job nearing the timeout queues itself again and resumes at its next batch
+resource "aws_lambda_event_source_mapping" "question_generator_trigger" {
+  event_source_arn        = data.aws_sqs_queue.question_generation_queue.arn
+  function_name           = aws_lambda_function.lambda.arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+}
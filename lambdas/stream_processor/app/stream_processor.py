@@ -0,0 +1,158 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.dynamodb_stream import StreamRecord, replay_local_stream, sequence_key
+from app.lib.tracing import bind_trace, traced_handler
+from app.services.community_stats_service import CommunityStatsService, empty_deltas
+
+logger = logging.getLogger()
+
+# Created once per container so warm invocations reuse the client
+dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+community_stats_service = CommunityStatsService(dynamodb_controller)
+
+MAX_COMMUNITY_WORKERS = int(os.getenv('STREAM_PROCESSOR_COMMUNITY_WORKERS', '8'))
+
+class WindowState:
+    """Counter deltas per community accumulated over one tumbling window of a shard.
+
+    Lambda hands the state returned by one invocation to the next invocation of the same window,
+    so it round-trips through ``to_state``/``from_state`` as plain JSON.
+    """
+    def __init__(self, communities: Optional[Dict[str, Dict[str, Any]]] = None, last_sequence: Optional[str] = None, last_created_at: int = 0):
+        self.communities = communities or {}
+        self.last_sequence = last_sequence
+        self.last_created_at = last_created_at
+
+    @classmethod
+    def from_state(cls, state: Optional[Dict[str, Any]]) -> 'WindowState':
+        state = state or {}
+        return cls(state.get('communities'), state.get('last_sequence'), state.get('last_created_at', 0))
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'communities': self.communities, 'last_sequence': self.last_sequence, 'last_created_at': self.last_created_at}
+
+    def deltas(self, community_id: str) -> Dict[str, Any]:
+        if community_id not in self.communities:
+            self.communities[community_id] = empty_deltas()
+        return self.communities[community_id]
+
+    def add(self, record: StreamRecord) -> None:
+        self.last_sequence = record.sequence_number
+        self.last_created_at = record.created_at
+        change = record_change(record)
+        if change is None:
+            return
+        community_id, apply = change
+        deltas = self.deltas(community_id)
+        if deltas['first_sequence'] is None:
+            deltas['first_sequence'] = sequence_key(record.sequence_number)
+        apply(deltas)
+
+def sign(record: StreamRecord) -> int:
+    return {'INSERT': 1, 'REMOVE': -1}.get(record.event_name, 0)
+
+def record_change(record: StreamRecord) -> Optional[Tuple[str, Any]]:
+    """The community a record counts towards and a function adding its deltas, or None if it counts towards nothing."""
+    pk = record.keys['PK']
+    parts = record.keys['SK'].split('#')
+    if len(parts) < 2 or parts[0] != 'COMMUNITY':
+        return None
+    community_id = parts[1]
+
+    if pk == 'COMMUNITY' and len(parts) == 2:
+        if record.event_name == 'REMOVE':
+            def apply(deltas):
+                deltas['deleted'] = True
+        else:
+            def apply(deltas):
+                deltas['member_count'] += len((record.new_image or {}).get('members', [])) - len((record.old_image or {}).get('members', []))
+        return community_id, apply
+
+    if pk == 'QUIZ' and len(parts) == 4 and sign(record):
+        def apply(deltas):
+            deltas['quiz_count'] += sign(record)
+        return community_id, apply
+
+    if pk == 'QUESTION' and len(parts) == 6 and sign(record):
+        quiz_id = parts[3]
+        def apply(deltas):
+            deltas['question_counts'][quiz_id] = deltas['question_counts'].get(quiz_id, 0) + sign(record)
+        return community_id, apply
+
+    if pk == 'KNOWLEDGE_SOURCE' and len(parts) == 4:
+        old_status = (record.old_image.get('source_status') or 'Unknown') if record.old_image is not None else None
+        new_status = (record.new_image.get('source_status') or 'Unknown') if record.new_image is not None else None
+        if old_status == new_status:
+            # e.g. chunk progress counters on the source item
+            return None
+        def apply(deltas):
+            by_status = deltas['knowledge_sources_by_status']
+            deltas['knowledge_source_count'] += sign(record)
+            if old_status is not None:
+                by_status[old_status] = by_status.get(old_status, 0) - 1
+            if new_status is not None:
+                by_status[new_status] = by_status.get(new_status, 0) + 1
+        return community_id, apply
+    return None
+
+def has_changes(deltas: Dict[str, Any]) -> bool:
+    return bool(
+        deltas['deleted'] or deltas['member_count'] or deltas['quiz_count'] or deltas['knowledge_source_count']
+        or any(deltas['question_counts'].values()) or any(deltas['knowledge_sources_by_status'].values())
+    )
+
+def apply_window(shard_id: str, window: WindowState) -> int:
+    """Applies a window's deltas to every community it touched, in parallel, and returns how many were updated.
+
+    Raises the first error after every community has been tried; the retried window skips the
+    communities whose checkpoint already covers it.
+    """
+    changed = {community_id: deltas for community_id, deltas in window.communities.items() if has_changes(deltas)}
+    if not changed or window.last_sequence is None:
+        return 0
+    checkpoint = sequence_key(window.last_sequence)
+
+    def apply(item):
+        community_id, deltas = item
+        try:
+            return community_stats_service.apply_deltas(community_id, deltas, shard_id, checkpoint, window.last_created_at), None
+        except Exception as e:
+            return False, e
+
+    with ThreadPoolExecutor(max_workers=MAX_COMMUNITY_WORKERS) as executor:
+        results = list(executor.map(bind_trace(apply), changed.items()))
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        logger.error("Failed to apply shard %s window to %d of %d communities", shard_id, len(errors), len(changed))
+        raise errors[0]
+    return sum(1 for applied, _ in results if applied)
+
+@traced_handler('stream_processor')
+def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Folds a batch of table stream records into its tumbling window and applies the window when it closes.
+
+    The event source mapping runs with a tumbling window, which is what puts the shard id in the event
+    and carries ``state`` between the invocations of a window.
+    """
+    shard_id = event.get('shardId')
+    if not shard_id:
+        raise ValueError("stream_processor needs a tumbling window on its event source mapping to identify the shard")
+    window = WindowState.from_state(event.get('state'))
+    for record in event.get('Records', []):
+        window.add(StreamRecord.from_event(record))
+    if not event.get('isFinalInvokeForWindow'):
+        return {'state': window.to_state()}
+    updated = apply_window(shard_id, window)
+    logger.info("Applied shard %s window to %d communities", shard_id, updated)
+    return {'state': {}}
+
+def replay(batch_size: int = 100) -> int:
+    """Processes the local table's stream (AWS_BACKEND=local) from the last checkpoint of each shard."""
+    return replay_local_stream(lambda_handler, dynamodb_controller, batch_size, consumer='stream_processor')
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Replayed {replay()} stream records")
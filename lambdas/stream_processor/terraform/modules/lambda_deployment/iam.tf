@@ -0,0 +1,58 @@
+data "aws_dynamodb_table" "sharp_app_data" {
+  name = var.dynamodb_table_name
+}
+
+resource "aws_iam_policy" "lambda_stream_policy" {
+  name        = "stream_processor_stream_policy"
+  description = "IAM policy for Lambda to read the app table's stream"
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ],
+        Resource = "${data.aws_dynamodb_table.sharp_app_data.stream_arn}"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_stream_attachment" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.lambda_stream_policy.arn
+}
+
+# The tumbling window puts the shard id in each event and carries the window's deltas between
+# invocations, so each community's counts get one write per window per shard. Only the items the
+# aggregates count are delivered; the processor's own COMMUNITY_STATS writes are filtered out.
+# parallelization_factor stays 1: the per-shard checkpoints assume a shard's windows apply in order.
+resource "aws_lambda_event_source_mapping" "table_stream_trigger" {
+  event_source_arn                   = data.aws_dynamodb_table.sharp_app_data.stream_arn
+  function_name                      = aws_lambda_function.lambda.arn
+  starting_position                  = "TRIM_HORIZON"
+  batch_size                         = 500
+  maximum_batching_window_in_seconds = 5
+  tumbling_window_in_seconds         = 30
+  maximum_retry_attempts             = 10
+  parallelization_factor             = 1
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        dynamodb = {
+          Keys = {
+            PK = {
+              S = ["COMMUNITY", "QUIZ", "QUESTION", "KNOWLEDGE_SOURCE"]
+            }
+          }
+        }
+      })
+    }
+  }
+}
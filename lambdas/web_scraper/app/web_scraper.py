@@ -2,102 +2,140 @@ import json
 from typing import Any, Dict, List
 from app.services.content_processor_service import ContentProcessorService
 from app.services.webscraper_service import WebScraperService
-from app.services.knowledge_source_service import KnowledgeSourceService, KnowledgeSourceUpdate
+from app.services.knowledge_source_service import KnowledgeSourceService
+from app.services.ingestion_job_service import IngestionJobService, InvalidTransitionError
+from app.services.usage_service import UsageService, BudgetExceededError
+from app.models.ingestion_job_schema import IngestionState
 from app.lib.dynamodb_controller import DynamoDBController
 from app.lib.sqs_controller import SQSController
+from app.lib.tracing import traced_handler
+from app.lib.logging import Summarized
 import logging
 import os
 
+# Matches maxReceiveCount of the ingestion queue's redrive policy; the last delivery fails the job instead of retrying
+MAX_RECEIVE_COUNT = int(os.getenv('INGESTION_MAX_RECEIVE_COUNT', '5'))
+
+class IngestionRetry(Exception):
+    """Raised so SQS redelivers the batch when some of its sources should be scraped again."""
+
+@traced_handler('web_scraper')
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """Scrapes, chunks and queues the knowledge sources in a batch of ingestion messages.
+
+    A source that fails is scraped again on redelivery: the handler raises once the batch is done, and sources
+    that already reached Processing skip the redelivered message as a duplicate. On its last delivery, a source
+    that fails is marked failed instead.
+    """
     # Initialize your custom logger
     logger = logging.getLogger()
 
-    logger.info("Lambda handler started with event: %s", json.dumps(event))
-    
+    logger.info("Lambda handler started with event: %s", Summarized(event))
+
+    dynamodb_controller = DynamoDBController('sharp_app_data')
+    ingestion_job_service = IngestionJobService(dynamodb_controller)
+    retry_ids = []
+
     # Iterate over each record in the event
     for record in event['Records']:
         try:
             # Parse the body of the SQS message
             body = json.loads(record['body'])
-            logger.info("Parsed message body: %s", json.dumps(body))
-            
-            # Extract necessary information from the body
-            community_id = body.get('community_id')
-            source_id = body.get('source_id')
-            url = body.get('url')
-            
-            if not community_id or not source_id or not url:
-                logger.error("Missing required parameters: community_id, source_id, or url")
-                return {
-                    'statusCode': 400,
-                    'body': json.dumps('Community ID, Source ID, and URL are required')
-                }
-
-            # Initialize services
-            scraper_service = WebScraperService()
-            content_processor_service = ContentProcessorService()
-            dynamodb_controller = DynamoDBController('sharp_app_data')
-            knowledge_source_service = KnowledgeSourceService(dynamodb_controller)
-
-            # Initialize SQS controller
-            sqs_queue_url = os.getenv('KNOWLEDGE_SOURCE_CHUNK_PROCESSING_QUEUE')
-            sqs_controller = SQSController(queue_url=sqs_queue_url)
-
-            # Update knowledge source status to "Processing"
-            update_data = KnowledgeSourceUpdate(source_status="Processing")
-            knowledge_source_service.update_knowledge_source(community_id, source_id, update_data)
-            logger.info("Knowledge source status updated to 'Processing' for community_id: %s, source_id: %s", community_id, source_id)
-            
-            # Scrape the content
-            content = scraper_service.scrape_content(url)
-            
-            if content is None:
-                # Update knowledge source status to "Failed"
-                update_data = KnowledgeSourceUpdate(source_status="Failed")
-                knowledge_source_service.update_knowledge_source(community_id, source_id, update_data)
-                logger.error("Failed to scrape content from the URL: %s", url)
-                return {
-                    'statusCode': 500,
-                    'body': json.dumps('Failed to scrape content from the provided URL')
-                }
-            
-            # Chunk the content
-            chunks = content_processor_service.split_content(content, 4000)
-            logger.info("Content chunked into %d parts", len(chunks))
-            
-            # Send each chunk as an SQS message
-            send_chunk_messages(sqs_controller, community_id, source_id, chunks)
-            
-            # Store the chunks in DynamoDB (optional, depending on your workflow)
-            knowledge_source_service.store_chunks(community_id, source_id, chunks)
-            logger.info("Chunks stored in DynamoDB for community_id: %s, source_id: %s", community_id, source_id)
-
-            # Update knowledge source status to "Completed"
-            update_data = KnowledgeSourceUpdate(source_status="Completed")
-            knowledge_source_service.update_knowledge_source(community_id, source_id, update_data)
-            logger.info("Knowledge source status updated to 'Completed' for community_id: %s, source_id: %s", community_id, source_id)
-        
+            logger.info("Parsed message body: %s", Summarized(body))
+        except ValueError as e:
+            logger.error("Dropping malformed ingestion message %s: %s", record.get('messageId'), e)
+            continue
+
+        # Extract necessary information from the body
+        community_id = body.get('community_id')
+        source_id = body.get('source_id')
+        url = body.get('url')
+
+        if not community_id or not source_id or not url:
+            # Messages without them can never succeed, so they are dropped instead of retried
+            logger.error("Missing required parameters: community_id, source_id, or url")
+            continue
+
+        try:
+            ingest_source(dynamodb_controller, ingestion_job_service, community_id, source_id, url)
         except Exception as e:
             logger.error("An error occurred: %s", str(e))
-            return {
-                'statusCode': 500,
-                'body': json.dumps(f"An error occurred: {str(e)}")
-            }
+            receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            if receive_count >= MAX_RECEIVE_COUNT:
+                ingestion_job_service.fail(community_id, source_id, f"Ingestion failed: {e}")
+            else:
+                retry_ids.append(record.get('messageId'))
 
+    if retry_ids:
+        raise IngestionRetry(f"Ingestion of {len(retry_ids)} messages failed and will be retried: {retry_ids}")
     return {
         'statusCode': 200,
         'body': json.dumps('Processing completed successfully')
     }
 
+def ingest_source(dynamodb_controller: DynamoDBController, ingestion_job_service: IngestionJobService, community_id: str, source_id: str, url: str) -> None:
+    logger = logging.getLogger()
+
+    # Initialize services
+    scraper_service = WebScraperService()
+    content_processor_service = ContentProcessorService()
+    knowledge_source_service = KnowledgeSourceService(dynamodb_controller)
+    usage_service = UsageService(dynamodb_controller)
+
+    # Initialize SQS controller
+    sqs_queue_url = os.getenv('KNOWLEDGE_SOURCE_CHUNK_PROCESSING_QUEUE')
+    sqs_controller = SQSController(queue_url=sqs_queue_url)
+
+    # Move the ingestion job to "Scraping"; a job that is already past chunking is a duplicate delivery
+    try:
+        ingestion_job_service.transition(community_id, source_id, IngestionState.SCRAPING)
+    except InvalidTransitionError as e:
+        logger.warning("Skipping duplicate ingestion message: %s", e)
+        return
+    logger.info("Ingestion job moved to 'Scraping' for community_id: %s, source_id: %s", community_id, source_id)
+
+    # Stop before scraping if the community has already spent its token budget
+    try:
+        usage_service.check_budget(community_id)
+    except BudgetExceededError as e:
+        ingestion_job_service.fail(community_id, source_id, str(e))
+        logger.error("Skipping ingestion: %s", e)
+        return
+
+    # Scrape the content
+    content = scraper_service.scrape_content(url)
+
+    if content is None:
+        ingestion_job_service.fail(community_id, source_id, f"Failed to scrape content from {url}")
+        logger.error("Failed to scrape content from the URL: %s", url)
+        return
+
+    # Chunk the content and record the chunk count before any chunk can be picked up by the chunk processor
+    chunks = content_processor_service.split_content(content, 4000)
+    logger.info("Content chunked into %d parts", len(chunks))
+    ingestion_job_service.transition(community_id, source_id, IngestionState.CHUNKING, chunks_total=len(chunks))
+    knowledge_source_service.store_chunks(community_id, source_id, chunks)
+    logger.info("Chunks stored in DynamoDB for community_id: %s, source_id: %s", community_id, source_id)
+
+    # Send each chunk as an SQS message while the job is still in Chunking, so a failed send leaves it where a
+    # redelivered message scrapes it again; the chunk processor completes the job once every chunk is done
+    send_chunk_messages(sqs_controller, community_id, source_id, chunks)
+    try:
+        ingestion_job_service.transition(community_id, source_id, IngestionState.PROCESSING)
+    except InvalidTransitionError as e:
+        # Every chunk was already processed and the chunk processor has moved the job on
+        logger.info("Not moving source %s to Processing: %s", source_id, e)
+
 def send_chunk_messages(sqs_controller: SQSController, community_id: str, source_id: str, chunks: List[str]) -> None:
+    messages = []
     for idx, chunk in enumerate(chunks):
         message = {
             'community_id': community_id,
             'source_id': source_id,
             'chunk_id': idx,  # Adding an index to identify the chunk
+            'chunk_count': len(chunks),
             'chunk_content': chunk,
             'message_type': 'chunk'  # Include metadata to identify the message type
         }
-        sqs_controller.send_message(
-            message_body=json.dumps(message)
-        )
+        messages.append(json.dumps(message))
+    sqs_controller.send_messages(messages)
@@ -1,32 +1,101 @@
 import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import ConditionExpressionBuilder, Key
+from botocore.exceptions import ClientError
 import logging
-from functools import wraps
+import os
+import re
+import threading
+import time
+import uuid
+from app.lib.local_backend import is_local_backend, get_local_dynamodb
+from app.lib.logging import Summarized, log_and_handle_exceptions
+from app.lib.tracing import traced
+from app.lib.update_expression import UpdateExpression
 from typing import Dict, Any, List, Optional, Tuple
 
+# Key attributes of the global secondary indexes in terraform/common/dynamodb.tf; GSI2, GSI3 and GSI4 are KEYS_ONLY
+INDEX_KEYS = {
+    'GSI1': ('SK', 'PK'),
+    'GSI2': ('Owner_ID', 'CreatedAt'),
+    'GSI3': ('EntityType', 'CreatedAt'),
+    'GSI4': ('CommunityEntity', 'CreatedAt'),
+}
+MAX_BATCH_GET_KEYS = 100
+BATCH_GET_MAX_ATTEMPTS = 5
+# Keys-only index entries are small, so filtered index queries read generously sized pages
+FILTERED_INDEX_PAGE_SIZE = 100
+MAX_INDEX_PAGES = 10
+MAX_TRANSACT_ITEMS = 100
+TRANSACT_MAX_ATTEMPTS = 3
+# Namespace of the client request tokens derived from caller-supplied idempotency keys
+IDEMPOTENCY_NAMESPACE = uuid.UUID('6c1f7a52-3f0e-4d8a-9a53-2b8f0c6f1e47')
+
+def community_entity_key(community_id: str, entity_type: str) -> str:
+    """The GSI4 partition of one community's items of a type, e.g. ``COMMUNITY#<id>#Quiz``."""
+    return f'COMMUNITY#{community_id}#{entity_type}'
+
+class TransactionCanceledError(Exception):
+    """Raised when a transaction is canceled; nothing in it was written.
+
+    ``reasons`` holds one code per operation, in order: 'None' for operations that would have
+    succeeded, 'ConditionalCheckFailed' for those whose condition did not hold, and so on.
+    """
+    def __init__(self, reasons: List[str]):
+        super().__init__(f"Transaction canceled: {reasons}")
+        self.reasons = reasons
+
+    def condition_failed(self, index: int) -> bool:
+        return index < len(self.reasons) and self.reasons[index] == 'ConditionalCheckFailed'
+
+def idempotency_token(scope: str, key: str) -> str:
+    """The ClientRequestToken for a caller-supplied idempotency key, scoped to one logical operation."""
+    return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, f'{scope}#{key}'))
+
+def condition_params(condition: Optional[Any], names: Optional[Dict[str, str]] = None, values: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """ConditionExpression, ExpressionAttributeNames and ExpressionAttributeValues for one transaction operation.
+
+    boto3 only turns condition objects into expressions for top-level parameters, so operations inside
+    a transaction are built here. The condition's placeholders are renamed so they cannot clash with
+    the caller's ``names`` and ``values``.
+    """
+    names, values = dict(names or {}), dict(values or {})
+    params: Dict[str, Any] = {}
+    if condition is not None:
+        built = ConditionExpressionBuilder().build_expression(condition)
+        expression = built.condition_expression
+        for placeholder, name in built.attribute_name_placeholders.items():
+            expression = re.sub(re.escape(placeholder) + r'\b', f'#cond{placeholder[2:]}', expression)
+            names[f'#cond{placeholder[2:]}'] = name
+        for placeholder, value in built.attribute_value_placeholders.items():
+            expression = re.sub(re.escape(placeholder) + r'\b', f':cond{placeholder[2:]}', expression)
+            values[f':cond{placeholder[2:]}'] = value
+        params['ConditionExpression'] = expression
+    if names:
+        params['ExpressionAttributeNames'] = names
+    if values:
+        params['ExpressionAttributeValues'] = values
+    return params
+
 class DynamoDBController:
     def __init__(self, table_name: str, region_name: str = 'us-east-2'):
         self.table_name = table_name
         self.region_name = region_name
-        self.session = boto3.Session(region_name=region_name)
-        self.dynamodb = self.session.resource('dynamodb')
+        if is_local_backend():
+            # In-memory stand-in for offline load tests and benchmarks (AWS_BACKEND=local)
+            self.session = None
+            self.dynamodb = get_local_dynamodb()
+        else:
+            self.session = boto3.Session(region_name=region_name)
+            self.dynamodb = self.session.resource('dynamodb')
         self.table = self.dynamodb.Table(table_name)
+        # Transactions are client-only operations; the resource's client still converts Python values
+        self.client = self.dynamodb.meta.client
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
-    def log_and_handle_exceptions(method):
-        """Decorator for logging method calls and handling exceptions."""
-        @wraps(method)
-        def wrapper(self, *args, **kwargs):
-            try:
-                self.logger.info(f"Calling {method.__name__} with args: {args}, kwargs: {kwargs}")
-                result = method(self, *args, **kwargs)
-                self.logger.info(f"{method.__name__} completed successfully")
-                return result
-            except Exception as e:
-                self.logger.error(f"Unexpected error in {method.__name__}: {e}")
-                raise
-        return wrapper
+    def warm_up(self) -> None:
+        """Resolves the endpoint and opens a pooled connection with a read of a key that never exists."""
+        self.table.get_item(Key={'PK': 'WARMUP', 'SK': 'WARMUP'})
 
     def validate_item(self, item: Dict[str, Any]) -> None:
         """Validate the item to ensure it has the required keys."""
@@ -40,78 +109,189 @@ class DynamoDBController:
         if not pk or not sk:
             raise ValueError("Partition key (PK) and sort key (SK) must be provided.")
 
+    @staticmethod
+    def projection_params(attributes: List[str]) -> Dict[str, Any]:
+        """ProjectionExpression and ExpressionAttributeNames reading only ``attributes``.
+
+        Every path segment gets a placeholder, so reserved words like ``name`` or ``status`` can be projected.
+
+        Args:
+            attributes (List[str]): Attribute names; nested map attributes as ``a.b``.
+        """
+        names: Dict[str, str] = {}
+        placeholders: Dict[str, str] = {}
+        paths = []
+        for attribute in attributes:
+            segments = []
+            for segment in attribute.split('.'):
+                placeholder = placeholders.get(segment)
+                if placeholder is None:
+                    placeholder = placeholders[segment] = f'#p{len(placeholders)}'
+                    names[placeholder] = segment
+                segments.append(placeholder)
+            paths.append('.'.join(segments))
+        return {'ProjectionExpression': ', '.join(paths), 'ExpressionAttributeNames': names}
+
     @log_and_handle_exceptions
-    def put_item(self, item: Dict[str, Any]) -> None:
+    @traced('dynamodb')
+    def put_item(self, item: Dict[str, Any], condition: Optional[Any] = None) -> None:
         """Save an item to the DynamoDB table.
 
         Args:
             item (Dict[str, Any]): The item to save.
+            condition (Optional[Any]): A boto3 condition that must hold for the item to be replaced.
+
+        Raises:
+            ClientError: With code ConditionalCheckFailedException if the condition does not hold.
         """
         self.validate_item(item)
-        self.table.put_item(Item=item)
+        if condition is not None:
+            self.table.put_item(Item=item, ConditionExpression=condition)
+        else:
+            self.table.put_item(Item=item)
 
     @log_and_handle_exceptions
-    def get_item(self, pk: str, sk: str) -> Optional[Dict[str, Any]]:
+    @traced('dynamodb')
+    def get_item(self, pk: str, sk: str, projection: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """Retrieve an item from the DynamoDB table.
 
         Args:
             pk (str): The partition key of the item.
             sk (str): The sort key of the item.
+            projection (Optional[List[str]]): Attributes to read; the whole item when omitted.
 
         Returns:
             Optional[Dict[str, Any]]: The retrieved item or None if not found.
         """
         self.validate_keys(pk, sk)
+        params = self.projection_params(projection) if projection else {}
         response = self.table.get_item(
             Key={
                 'PK': pk,
                 'SK': sk
-            }
+            },
+            **params
         )
         return response.get('Item')
 
     @log_and_handle_exceptions
-    def update_item(self, pk: str, sk: str, update_data: Dict[str, Any]) -> None:
-        """Update an item in the DynamoDB table.
+    @traced('dynamodb')
+    def update_item(self, pk: str, sk: str, update_data: Optional[Dict[str, Any]] = None, condition: Optional[Any] = None, expression: Optional[UpdateExpression] = None, return_values: str = 'NONE') -> Dict[str, Any]:
+        """Update an item in the DynamoDB table in one atomic call.
 
         Args:
             pk (str): The partition key of the item.
             sk (str): The sort key of the item.
-            update_data (Dict[str, Any]): A dictionary of attributes to update.
+            update_data (Optional[Dict[str, Any]]): Attributes to overwrite.
+            condition (Optional[Any]): A boto3 condition (e.g. Attr('status').eq('x')) that must hold for the update to apply.
+            expression (Optional[UpdateExpression]): Further actions (ADD, REMOVE, list_append, if_not_exists, ...);
+                ``update_data`` is added to it as SET actions.
+            return_values (str): The ReturnValues option, e.g. 'ALL_NEW' or 'UPDATED_OLD'.
+
+        Returns:
+            Dict[str, Any]: The returned attribute values, empty for 'NONE'.
+
+        Raises:
+            ClientError: With code ConditionalCheckFailedException if the condition does not hold.
         """
         self.validate_keys(pk, sk)
-        if not update_data:
+        expression = expression or UpdateExpression()
+        for name, value in (update_data or {}).items():
+            expression.set(name, value)
+        if not expression:
             raise ValueError("Update data must be provided.")
-        
-        update_expr = "set " + ", ".join(f"{k}=:{k}" for k in update_data.keys())
-        expr_attr_values = {f":{k}": v for k, v in update_data.items()}
-        self.table.update_item(
-            Key={
+
+        update_params: Dict[str, Any] = {
+            'Key': {
                 'PK': pk,
                 'SK': sk
             },
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_attr_values
-        )
+            **expression.build(),
+            'ReturnValues': return_values
+        }
+        if condition is not None:
+            update_params['ConditionExpression'] = condition
+        response = self.table.update_item(**update_params)
+        return response.get('Attributes', {})
+
+    def increment_counters(self, pk: str, sk: str, counters: Dict[str, Any], update_data: Optional[Dict[str, Any]] = None, defaults: Optional[Dict[str, Any]] = None, return_values: str = 'UPDATED_NEW') -> Dict[str, Any]:
+        """Atomically add to counters on an item, creating the item if it does not exist.
+
+        Args:
+            pk (str): The partition key of the item.
+            sk (str): The sort key of the item.
+            counters (Dict[str, Any]): Attributes to ADD to (numbers, or sets to union into).
+            update_data (Optional[Dict[str, Any]]): Attributes to overwrite.
+            defaults (Optional[Dict[str, Any]]): Attributes only written when not already present.
+            return_values (str): Which attributes to return, 'UPDATED_NEW' or 'ALL_NEW'.
+
+        Returns:
+            Dict[str, Any]: The returned attribute values.
+        """
+        if not counters and not update_data:
+            raise ValueError("Counters or update data must be provided.")
+        expression = UpdateExpression()
+        for name, amount in counters.items():
+            expression.add(name, amount)
+        for name, value in (defaults or {}).items():
+            expression.set_if_not_exists(name, value)
+        return self.update_item(pk, sk, update_data, expression=expression, return_values=return_values)
+
+    @log_and_handle_exceptions
+    @traced('dynamodb')
+    def batch_write_items(self, items: List[Dict[str, Any]]) -> None:
+        """Save many items using batched writes of up to 25 items, retrying unprocessed items.
+
+        Args:
+            items (List[Dict[str, Any]]): The items to save.
+        """
+        for item in items:
+            self.validate_item(item)
+        with self.table.batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+    @log_and_handle_exceptions
+    @traced('dynamodb')
+    def batch_delete_items(self, keys: List[Dict[str, Any]]) -> None:
+        """Delete many items using batched writes of up to 25 deletes, retrying unprocessed items.
+
+        Args:
+            keys (List[Dict[str, Any]]): The PK and SK of each item; duplicate keys are deleted once.
+        """
+        for key in keys:
+            self.validate_keys(key['PK'], key['SK'])
+        with self.table.batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+            for key in keys:
+                batch.delete_item(Key={'PK': key['PK'], 'SK': key['SK']})
 
     @log_and_handle_exceptions
-    def delete_item(self, pk: str, sk: str) -> None:
+    @traced('dynamodb')
+    def delete_item(self, pk: str, sk: str, condition: Optional[Any] = None) -> None:
         """Delete an item from the DynamoDB table.
 
         Args:
             pk (str): The partition key of the item.
             sk (str): The sort key of the item.
+            condition (Optional[Any]): A boto3 condition that must hold for the delete to apply.
+
+        Raises:
+            ClientError: With code ConditionalCheckFailedException if the condition does not hold.
         """
         self.validate_keys(pk, sk)
-        self.table.delete_item(
-            Key={
+        delete_params: Dict[str, Any] = {
+            'Key': {
                 'PK': pk,
                 'SK': sk
             }
-        )
+        }
+        if condition is not None:
+            delete_params['ConditionExpression'] = condition
+        self.table.delete_item(**delete_params)
 
     @log_and_handle_exceptions
-    def query_with_pagination(self, partition_key: Key, sort_key_condition: Optional[Key] = None, filter_condition: Optional[Any] = None, index_name: Optional[str] = None, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    @traced('dynamodb')
+    def query_with_pagination(self, partition_key: Key, sort_key_condition: Optional[Key] = None, filter_condition: Optional[Any] = None, index_name: Optional[str] = None, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None, scan_index_forward: bool = True) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         key_condition = partition_key
         if sort_key_condition:
             key_condition = key_condition & sort_key_condition
@@ -126,8 +306,13 @@ class DynamoDBController:
             query_params['IndexName'] = index_name
         if last_evaluated_key:
             query_params['ExclusiveStartKey'] = last_evaluated_key
+        if not scan_index_forward:
+            query_params['ScanIndexForward'] = False
+        if projection:
+            # boto3 merges these names with the ones it generates for the key and filter conditions
+            query_params.update(self.projection_params(projection))
 
-        self.logger.info(f"Querying with params: {query_params}")
+        self.logger.debug("Querying with params: %s", Summarized(query_params))
         response = self.table.query(**query_params)
 
         items = response.get('Items', [])
@@ -135,3 +320,186 @@ class DynamoDBController:
 
         return items, last_evaluated_key
 
+    @log_and_handle_exceptions
+    @traced('dynamodb')
+    def batch_get_items(self, keys: List[Dict[str, Any]], projection: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Read many items with batched gets of up to 100 keys, retrying unprocessed keys.
+
+        Args:
+            keys (List[Dict[str, Any]]): The PK/SK of each item.
+            projection (Optional[List[str]]): Attributes to read; whole items when omitted.
+
+        Returns:
+            List[Dict[str, Any]]: The items in the order of ``keys``; keys with no item are skipped.
+        """
+        if projection:
+            # Results are matched back to their keys
+            projection = ['PK', 'SK'] + [attribute for attribute in projection if attribute not in ('PK', 'SK')]
+        found: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        unique_keys = list({(key['PK'], key['SK']): key for key in keys}.values())
+        extra = self.projection_params(projection) if projection else {}
+        for start in range(0, len(unique_keys), MAX_BATCH_GET_KEYS):
+            request = {self.table_name: {'Keys': unique_keys[start:start + MAX_BATCH_GET_KEYS], **extra}}
+            for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    found[(item['PK'], item['SK'])] = item
+                request = response.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+                time.sleep(0.05 * 2 ** attempt)
+            else:
+                raise RuntimeError(f"{len(request[self.table_name]['Keys'])} keys were still unprocessed after {BATCH_GET_MAX_ATTEMPTS} attempts")
+        return [found[(key['PK'], key['SK'])] for key in keys if (key['PK'], key['SK']) in found]
+
+    @staticmethod
+    def put_op(item: Dict[str, Any], condition: Optional[Any] = None) -> Dict[str, Any]:
+        """A transaction operation that saves ``item``, if ``condition`` holds."""
+        return {'Put': {'Item': item, **condition_params(condition)}}
+
+    @staticmethod
+    def update_op(pk: str, sk: str, expression: UpdateExpression, condition: Optional[Any] = None) -> Dict[str, Any]:
+        """A transaction operation that applies an update expression, if ``condition`` holds."""
+        built = expression.build()
+        params = condition_params(condition, built['ExpressionAttributeNames'], built.get('ExpressionAttributeValues'))
+        return {'Update': {'Key': {'PK': pk, 'SK': sk}, 'UpdateExpression': built['UpdateExpression'], **params}}
+
+    @staticmethod
+    def delete_op(pk: str, sk: str, condition: Optional[Any] = None) -> Dict[str, Any]:
+        """A transaction operation that deletes an item, if ``condition`` holds."""
+        return {'Delete': {'Key': {'PK': pk, 'SK': sk}, **condition_params(condition)}}
+
+    @staticmethod
+    def condition_check_op(pk: str, sk: str, condition: Any) -> Dict[str, Any]:
+        """A transaction operation that writes nothing but cancels the transaction unless ``condition`` holds."""
+        return {'ConditionCheck': {'Key': {'PK': pk, 'SK': sk}, **condition_params(condition)}}
+
+    @log_and_handle_exceptions
+    @traced('dynamodb')
+    def transact_write(self, operations: List[Dict[str, Any]], client_request_token: Optional[str] = None) -> None:
+        """Apply up to 100 put, update, delete and condition check operations atomically.
+
+        Transactions canceled only by conflicts with concurrent writes are retried.
+
+        Args:
+            operations (List[Dict[str, Any]]): Operations from put_op, update_op, delete_op and
+                condition_check_op; at most one per item.
+            client_request_token (Optional[str]): Makes the transaction idempotent for 10 minutes: a
+                repeat with the same token and operations succeeds without writing again. See
+                idempotency_token.
+
+        Raises:
+            TransactionCanceledError: If a condition did not hold, or conflicts persisted.
+            ClientError: With code IdempotentParameterMismatchException if the token was used for
+                different operations.
+        """
+        if not operations:
+            return
+        if len(operations) > MAX_TRANSACT_ITEMS:
+            raise ValueError(f"A transaction can hold at most {MAX_TRANSACT_ITEMS} operations, not {len(operations)}")
+        transact_items = []
+        for operation in operations:
+            (kind, params), = operation.items()
+            if kind == 'Put':
+                self.validate_item(params['Item'])
+            else:
+                self.validate_keys(params['Key']['PK'], params['Key']['SK'])
+            transact_items.append({kind: {**params, 'TableName': self.table_name}})
+        request: Dict[str, Any] = {'TransactItems': transact_items}
+        if client_request_token:
+            request['ClientRequestToken'] = client_request_token
+        for attempt in range(TRANSACT_MAX_ATTEMPTS):
+            try:
+                self.client.transact_write_items(**request)
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                reasons = [reason.get('Code', 'None') for reason in e.response.get('CancellationReasons', [])]
+                retryable = reasons and all(reason in ('None', 'TransactionConflict') for reason in reasons)
+                if not retryable or attempt == TRANSACT_MAX_ATTEMPTS - 1:
+                    raise TransactionCanceledError(reasons) from None
+            time.sleep(0.05 * 2 ** attempt)
+
+    @log_and_handle_exceptions
+    @traced('dynamodb')
+    def transact_get(self, keys: List[Dict[str, Any]], projection: Optional[List[str]] = None) -> List[Optional[Dict[str, Any]]]:
+        """Read up to 100 items as one consistent snapshot.
+
+        Args:
+            keys (List[Dict[str, Any]]): The PK/SK of each item.
+            projection (Optional[List[str]]): Attributes to read from every item; whole items when omitted.
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: The items in the order of ``keys``, None where there is no item.
+        """
+        if len(keys) > MAX_TRANSACT_ITEMS:
+            raise ValueError(f"A transaction can read at most {MAX_TRANSACT_ITEMS} items, not {len(keys)}")
+        if not keys:
+            return []
+        extra = self.projection_params(projection) if projection else {}
+        for key in keys:
+            self.validate_keys(key['PK'], key['SK'])
+        response = self.client.transact_get_items(TransactItems=[
+            {'Get': {'TableName': self.table_name, 'Key': {'PK': key['PK'], 'SK': key['SK']}, **extra}} for key in keys
+        ])
+        return [entry.get('Item') for entry in response.get('Responses', [])]
+
+    @log_and_handle_exceptions
+    def query_index(self, index_name: str, partition_key: Key, sort_key_condition: Optional[Key] = None, filter_condition: Optional[Any] = None, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None, scan_index_forward: bool = True) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Query a keys-only index and hydrate the matching items from the table with batched gets.
+
+        Filters can only use attributes the index projects: PK, SK and the index's own keys. The
+        query continues past pages the filter empties, up to MAX_INDEX_PAGES reads.
+
+        Args:
+            index_name (str): 'GSI2', 'GSI3' or 'GSI4'.
+            partition_key (Key): Equality condition on the index's partition key.
+            sort_key_condition (Optional[Key]): Condition on the index's sort key.
+            filter_condition (Optional[Any]): Filter on the projected key attributes.
+            limit (int): The most items to return.
+            last_evaluated_key (Optional[Dict[str, Any]]): The cursor returned with the previous page.
+            projection (Optional[List[str]]): Attributes to read from the hydrated items.
+            scan_index_forward (bool): False for descending sort key order, e.g. newest first.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]: The items and the cursor for the next page.
+        """
+        key_names = ['PK', 'SK'] + [name for name in INDEX_KEYS[index_name] if name not in ('PK', 'SK')]
+        keys: List[Dict[str, Any]] = []
+        start_key = last_evaluated_key
+        for _ in range(MAX_INDEX_PAGES):
+            remaining = limit - len(keys)
+            page_size = remaining if filter_condition is None else max(remaining, FILTERED_INDEX_PAGE_SIZE)
+            page, start_key = self.query_with_pagination(
+                partition_key, sort_key_condition, filter_condition, index_name, page_size, start_key,
+                scan_index_forward=scan_index_forward
+            )
+            keys.extend(page)
+            if len(keys) > limit:
+                # The page ran past the limit, so the next page resumes after the last key returned
+                keys = keys[:limit]
+                start_key = {name: keys[-1][name] for name in key_names}
+                break
+            if len(keys) == limit or not start_key:
+                break
+
+        items = self.batch_get_items([{'PK': key['PK'], 'SK': key['SK']} for key in keys], projection) if keys else []
+        return items, start_key
+
+_controllers: Dict[Tuple[str, str], DynamoDBController] = {}
+_controllers_lock = threading.Lock()
+
+def get_dynamodb_controller(table_name: Optional[str] = None, region_name: str = 'us-east-2') -> DynamoDBController:
+    """Returns the container-wide controller for a table, so every service shares one connection pool.
+
+    Args:
+        table_name (Optional[str]): The table; defaults to TABLE_NAME.
+        region_name (str): The table's region.
+    """
+    key = (table_name or os.getenv('TABLE_NAME', 'sharp_app_data'), region_name)
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = _controllers[key] = DynamoDBController(*key)
+        return controller
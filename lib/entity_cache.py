@@ -0,0 +1,245 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from boto3.dynamodb.conditions import Key
+
+from app.lib.dynamodb_controller import get_dynamodb_controller
+from app.lib.tracing import record_cache_result
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the cache; only enable it where the cache_invalidator Lambda consumes the table's stream
+ENTITY_CACHE_TTL_SECONDS = int(os.getenv('ENTITY_CACHE_TTL_SECONDS', '0'))
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv('ENTITY_CACHE_MAX_ENTRIES', '2048'))
+INVALIDATION_POLL_SECONDS = float(os.getenv('INVALIDATION_POLL_SECONDS', '1'))
+# Reads bypass the cache when the invalidation log could not be polled for this long
+INVALIDATION_MAX_STALENESS_SECONDS = float(os.getenv('INVALIDATION_MAX_STALENESS_SECONDS', '10'))
+
+INVALIDATION_PK = 'CACHE_INVALIDATION'
+ENTITY_TYPES = ('community', 'quiz')
+INVALIDATION_LOG_RETENTION_SECONDS = 3600
+# Concurrent publishers can write log entries out of time order by up to this much
+INVALIDATION_LOG_OVERLAP_MS = 10000
+MAX_KEYS_PER_LOG_ENTRY = 500
+LOG_PAGE_SIZE = 100
+
+def community_cache_key(community_id: str) -> str:
+    return f'community#{community_id}'
+
+def quiz_cache_key(community_id: str, quiz_id: str) -> str:
+    """Cache key of a quiz and of its questions, since question writes change what quiz reads return."""
+    return f'quiz#{community_id}#{quiz_id}'
+
+def cache_key_for(keys: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """The entity type and cache key a table item is cached under, or None if no cache holds it."""
+    pk = keys.get('PK')
+    parts = str(keys.get('SK', '')).split('#')
+    if len(parts) < 2 or parts[0] != 'COMMUNITY':
+        return None
+    if pk == 'COMMUNITY' and len(parts) == 2:
+        return 'community', community_cache_key(parts[1])
+    if pk in ('QUIZ', 'QUESTION') and len(parts) >= 4 and parts[2] == 'QUIZ':
+        return 'quiz', quiz_cache_key(parts[1], parts[3])
+    return None
+
+def _log_entry_time(sort_key: str) -> int:
+    # LOG#<entity type>#<epoch ms>#<id>
+    return int(sort_key.split('#')[2])
+
+class InvalidationLog:
+    """Compact log of changed cache keys per entity type, kept in the app table.
+
+    The cache_invalidator Lambda publishes the keys of every changed community, quiz and question from
+    the table's stream. Each entry is written before its entity type's watermark version is incremented,
+    so a reader that sees a new version finds every entry that led to it.
+    """
+    def __init__(self, dynamodb_controller, retention_seconds: int = INVALIDATION_LOG_RETENTION_SECONDS):
+        self.dynamodb_controller = dynamodb_controller
+        self.retention_seconds = retention_seconds
+
+    def publish(self, entity_type: str, cache_keys: Iterable[str]) -> int:
+        """Logs changed cache keys and advances the entity type's watermark; returns the number of entries written."""
+        keys = sorted(set(cache_keys))
+        if not keys:
+            return 0
+        now_ms = int(time.time() * 1000)
+        entries = [
+            {
+                'PK': INVALIDATION_PK,
+                'SK': f'LOG#{entity_type}#{now_ms:013d}#{uuid.uuid4().hex[:12]}',
+                'EntityType': 'CacheInvalidation',
+                'CreatedAt': now_ms // 1000,
+                'ExpiresAt': now_ms // 1000 + self.retention_seconds,
+                'keys': keys[start:start + MAX_KEYS_PER_LOG_ENTRY],
+            }
+            for start in range(0, len(keys), MAX_KEYS_PER_LOG_ENTRY)
+        ]
+        if len(entries) == 1:
+            self.dynamodb_controller.put_item(entries[0])
+        else:
+            self.dynamodb_controller.batch_write_items(entries)
+        self.dynamodb_controller.increment_counters(INVALIDATION_PK, f'WATERMARK#{entity_type}', {'version': 1}, update_data={'updated_at': now_ms // 1000}, return_values='NONE')
+        return len(entries)
+
+    def watermarks(self) -> Dict[str, int]:
+        """The watermark version of every entity type, with one query."""
+        items, _ = self.dynamodb_controller.query_with_pagination(
+            Key('PK').eq(INVALIDATION_PK), Key('SK').begins_with('WATERMARK#'), limit=len(ENTITY_TYPES) + 1, projection=['SK', 'version']
+        )
+        return {item['SK'].split('#', 1)[1]: int(item.get('version', 0)) for item in items}
+
+    def entries(self, entity_type: str, since_ms: int) -> List[Dict[str, Any]]:
+        """The unexpired log entries of an entity type written at or after ``since_ms``, oldest first."""
+        prefix = f'LOG#{entity_type}#'
+        condition = Key('SK').between(f'{prefix}{max(since_ms, 0):013d}', f'{prefix}~')
+        now = time.time()
+        entries: List[Dict[str, Any]] = []
+        start_key = None
+        while True:
+            items, start_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq(INVALIDATION_PK), condition, limit=LOG_PAGE_SIZE, last_evaluated_key=start_key, projection=['SK', 'keys', 'ExpiresAt']
+            )
+            # TTL deletes expired items lazily
+            entries.extend(item for item in items if int(item.get('ExpiresAt', 0)) >= now)
+            if not start_key:
+                return entries
+
+_MISSING = object()
+
+class EntityCache:
+    """In-process TTL cache of community and quiz reads, kept coherent across containers by the invalidation log.
+
+    Entries are grouped by cache key, one per read variant (e.g. projection), so one invalidation
+    evicts every variant. Reads poll the log's watermarks at most every ``poll_interval`` seconds and
+    evict the keys of entries published since the last poll; writes made through the services evict
+    their keys at once. While the log cannot be polled, reads bypass the cache, and the TTL bounds
+    staleness should the invalidator fall behind.
+    """
+    def __init__(self, log: Optional[InvalidationLog], ttl_seconds: int = ENTITY_CACHE_TTL_SECONDS, max_entries: int = ENTITY_CACHE_MAX_ENTRIES, poll_interval: float = INVALIDATION_POLL_SECONDS, max_staleness: float = INVALIDATION_MAX_STALENESS_SECONDS):
+        self.log = log
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.entries: 'OrderedDict[str, Dict[Hashable, Tuple[float, Any]]]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.poll_lock = threading.Lock()
+        # Incremented by every eviction, so a load that overlapped one is not cached
+        self.generation = 0
+        self.versions: Dict[str, int] = {}
+        self.since_ms: Dict[str, int] = {}
+        # Per entity type, the log entries already applied that a later poll's overlap can return again
+        self.seen: Dict[str, Dict[str, int]] = {}
+        self.last_poll = float('-inf')
+        self.last_success: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.log is not None
+
+    def get_or_load(self, cache_key: str, variant: Hashable, loader: Callable[[], Any]) -> Any:
+        """The cached value of a read, or the result of ``loader`` which is then cached.
+
+        Values are returned as shallow copies, so callers can add attributes without changing the cache.
+        """
+        if not self.enabled or not self.poll():
+            return loader()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(cache_key, {}).get(variant)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(cache_key)
+                value = entry[1]
+            else:
+                value = _MISSING
+            generation = self.generation
+        record_cache_result('entity', value is not _MISSING)
+        if value is _MISSING:
+            value = loader()
+            with self.lock:
+                if self.generation == generation:
+                    self.entries.setdefault(cache_key, {})[variant] = (now + self.ttl_seconds, value)
+                    self.entries.move_to_end(cache_key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        return dict(value) if isinstance(value, dict) else value
+
+    def evict(self, cache_keys: Iterable[str]) -> None:
+        with self.lock:
+            self.generation += 1
+            for cache_key in cache_keys:
+                self.entries.pop(cache_key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def is_fresh(self) -> bool:
+        return self.last_success is not None and time.monotonic() - self.last_success <= self.max_staleness
+
+    def poll(self) -> bool:
+        """Applies the invalidations published since the last poll, if it is due; returns whether reads may use the cache."""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        if now - self.last_poll < self.poll_interval or not self.poll_lock.acquire(blocking=False):
+            # Not due, or another thread is polling
+            return self.is_fresh()
+        try:
+            self.last_poll = now
+            watermarks = self.log.watermarks()
+            if self.last_success is None or now - self.last_success > self.log.retention_seconds / 2:
+                # First poll, or idle for so long that the log may no longer hold what changed
+                self.reset(watermarks)
+            else:
+                for entity_type, version in watermarks.items():
+                    if version != self.versions.get(entity_type):
+                        self.apply_log(entity_type)
+                self.versions = watermarks
+            self.last_success = now
+        except Exception as e:
+            logger.warning(f"Failed to poll the cache invalidation log: {e}")
+        finally:
+            self.poll_lock.release()
+        return self.is_fresh()
+
+    def reset(self, watermarks: Dict[str, int]) -> None:
+        self.clear()
+        now_ms = int(time.time() * 1000)
+        self.versions = watermarks
+        self.since_ms = {entity_type: now_ms for entity_type in ENTITY_TYPES}
+        self.seen = {entity_type: {} for entity_type in ENTITY_TYPES}
+
+    def apply_log(self, entity_type: str) -> None:
+        since_ms = self.since_ms.get(entity_type, 0)
+        seen = self.seen.setdefault(entity_type, {})
+        cache_keys = set()
+        for entry in self.log.entries(entity_type, since_ms - INVALIDATION_LOG_OVERLAP_MS):
+            if entry['SK'] in seen:
+                continue
+            written_ms = _log_entry_time(entry['SK'])
+            seen[entry['SK']] = written_ms
+            cache_keys.update(entry.get('keys', []))
+            since_ms = max(since_ms, written_ms)
+        if cache_keys:
+            self.evict(cache_keys)
+        self.since_ms[entity_type] = since_ms
+        horizon = since_ms - INVALIDATION_LOG_OVERLAP_MS
+        self.seen[entity_type] = {sort_key: written_ms for sort_key, written_ms in seen.items() if written_ms >= horizon}
+
+_entity_cache: Optional[EntityCache] = None
+_entity_cache_lock = threading.Lock()
+
+def get_entity_cache() -> EntityCache:
+    """The container-wide cache shared by every CommunityService and QuizService."""
+    global _entity_cache
+    if _entity_cache is None:
+        with _entity_cache_lock:
+            if _entity_cache is None:
+                _entity_cache = EntityCache(InvalidationLog(get_dynamodb_controller()))
+    return _entity_cache
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+def build_cache_key(model: str, temperature: float, max_tokens: int, prompt_version: str, messages: List[Dict[str, str]]) -> str:
+    """Builds a response cache key from the prompt version, the model settings and the full message list."""
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"{prompt_version}#{model}#{temperature}#{max_tokens}#{digest}"
+
+class InMemoryResponseCache:
+    """Bounded LRU cache of LLM responses, shared by every controller in the container."""
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class DynamoDBResponseCache:
+    """LLM response cache persisted in the app table so it survives across Lambda containers."""
+    def __init__(self, dynamodb_controller, ttl_seconds: int = 7 * 86400):
+        self.dynamodb_controller = dynamodb_controller
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self.dynamodb_controller.get_item('LLM_RESPONSE_CACHE', key)
+        if not item or int(item.get('ExpiresAt', 0)) < time.time():
+            return None
+        return {"response": item['response'], "model": item.get('model')}
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = int(time.time())
+        try:
+            self.dynamodb_controller.put_item({
+                'PK': 'LLM_RESPONSE_CACHE',
+                'SK': key,
+                'EntityType': 'LLMResponseCache',
+                'CreatedAt': now,
+                'ExpiresAt': now + self.ttl_seconds,
+                'response': value['response'],
+                'model': value.get('model'),
+            })
+        except Exception as e:
+            # A failed cache write should never fail the request that produced the response
+            self.logger.warning(f"Failed to cache LLM response: {e}")
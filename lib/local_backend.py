@@ -0,0 +1,130 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from botocore.exceptions import ClientError
+
+def is_local_backend() -> bool:
+    """True when the controllers should use the in-memory stand-ins instead of AWS (AWS_BACKEND=local)."""
+    return os.getenv('AWS_BACKEND', 'aws').lower() == 'local'
+
+class BackendSimulator:
+    """Adds simulated network latency and throttling to the in-memory backends and counts their calls.
+
+    Throttled attempts are retried with exponential backoff like botocore does, so callers only see a
+    ProvisionedThroughputExceededException (or ThrottlingException) once the retries are exhausted.
+    """
+    def __init__(self, latency_ms: float = 0.0, latency_jitter_ms: float = 0.0, throttle_rate: float = 0.0, max_retries: int = 10, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.throttle_rate = throttle_rate
+        self.max_retries = max_retries
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.throttles: Counter = Counter()
+        self.simulated_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'BackendSimulator':
+        seed = os.getenv('LOCAL_BACKEND_SEED')
+        return cls(
+            latency_ms=float(os.getenv('LOCAL_BACKEND_LATENCY_MS', '0')),
+            latency_jitter_ms=float(os.getenv('LOCAL_BACKEND_LATENCY_JITTER_MS', '0')),
+            throttle_rate=float(os.getenv('LOCAL_BACKEND_THROTTLE_RATE', '0')),
+            seed=int(seed) if seed else None
+        )
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self.lock:
+                self.simulated_seconds += seconds
+            time.sleep(seconds)
+
+    def is_throttled(self, name: Optional[str] = None) -> bool:
+        """Draws whether one request (or one entry of a batch request) is throttled, counting it under name."""
+        if not self.throttle_rate:
+            return False
+        with self.lock:
+            throttled = self.random.random() < self.throttle_rate
+            if throttled and name:
+                self.throttles[name] += 1
+            return throttled
+
+    def call(self, service: str, operation: str, throttle_code: str = 'ProvisionedThroughputExceededException') -> None:
+        """Simulates the round trip of one request, raising a ClientError if every attempt is throttled."""
+        name = f"{service}.{operation}"
+        with self.lock:
+            self.calls[name] += 1
+        for attempt in range(self.max_retries + 1):
+            with self.lock:
+                jitter = self.random.uniform(0, self.latency_jitter_ms) if self.latency_jitter_ms else 0.0
+            self._sleep((self.latency_ms + jitter) / 1000)
+            if not self.is_throttled(name):
+                return
+            if attempt == self.max_retries:
+                break
+            with self.lock:
+                backoff = self.random.uniform(0, 0.025 * (2 ** attempt))
+            self._sleep(backoff)
+        raise ClientError(
+            {'Error': {'Code': throttle_code, 'Message': 'Rate of requests exceeds the allowed throughput.'}},
+            operation
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns call and throttle counts per operation and the total simulated wait time."""
+        with self.lock:
+            return {
+                'calls': dict(self.calls),
+                'throttles': dict(self.throttles),
+                'simulated_ms': round(self.simulated_seconds * 1000, 3)
+            }
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.throttles.clear()
+            self.simulated_seconds = 0.0
+
+_lock = threading.Lock()
+_simulator: Optional[BackendSimulator] = None
+_dynamodb = None
+_sqs = None
+
+def get_simulator() -> BackendSimulator:
+    global _simulator
+    with _lock:
+        if _simulator is None:
+            _simulator = BackendSimulator.from_env()
+        return _simulator
+
+def get_local_dynamodb():
+    """Returns the process-wide in-memory DynamoDB resource, so every controller sees the same tables."""
+    global _dynamodb
+    simulator = get_simulator()
+    with _lock:
+        if _dynamodb is None:
+            from app.lib.local_dynamodb import LocalDynamoDBResource
+            _dynamodb = LocalDynamoDBResource(simulator)
+        return _dynamodb
+
+def get_local_sqs():
+    """Returns the process-wide in-memory SQS client, so producers and consumers share the same queues."""
+    global _sqs
+    simulator = get_simulator()
+    with _lock:
+        if _sqs is None:
+            from app.lib.local_sqs import LocalSQSClient
+            _sqs = LocalSQSClient(simulator)
+        return _sqs
+
+def reset_local_backend(simulator: Optional[BackendSimulator] = None) -> None:
+    """Drops every local table and queue, optionally swapping in a differently configured simulator."""
+    global _simulator, _dynamodb, _sqs
+    with _lock:
+        _simulator = simulator
+        _dynamodb = None
+        _sqs = None
@@ -0,0 +1,1069 @@
+import bisect
+import copy
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import ExitStack
+from decimal import Decimal
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import Binary, DYNAMODB_CONTEXT, TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+MISSING = object()
+MAX_PAGE_BYTES = 1024 * 1024
+# Records kept per stream shard; the oldest are trimmed, as DynamoDB trims records after 24 hours
+STREAM_SHARD_RETENTION = 10000
+# How long DynamoDB remembers a transaction's ClientRequestToken
+IDEMPOTENCY_WINDOW_SECONDS = 600
+
+# Mirrors terraform/common/dynamodb.tf
+APP_TABLE_SCHEMA = {
+    'hash_key': 'PK',
+    'range_key': 'SK',
+    'attribute_types': {'PK': 'S', 'SK': 'S', 'EntityType': 'S', 'Owner_ID': 'S', 'CommunityEntity': 'S', 'CreatedAt': 'N'},
+    'indexes': {
+        'GSI1': ('SK', 'PK'),
+        'GSI2': ('Owner_ID', 'CreatedAt', 'KEYS_ONLY'),
+        'GSI3': ('EntityType', 'CreatedAt', 'KEYS_ONLY'),
+        'GSI4': ('CommunityEntity', 'CreatedAt', 'KEYS_ONLY'),
+    },
+    'stream_view_type': 'NEW_AND_OLD_IMAGES',
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+def normalize(value: Any) -> Any:
+    """Round-trips a value through the boto3 type serializer, so it is stored exactly as DynamoDB would return it.
+
+    Numbers become Decimal, bytes become Binary and unsupported types (such as float) are rejected.
+    """
+    return _deserializer.deserialize(_serializer.serialize(value))
+
+def _type_of(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'BOOL'
+    if value is None:
+        return 'NULL'
+    if isinstance(value, Decimal):
+        return 'N'
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, Binary):
+        return 'B'
+    if isinstance(value, set):
+        element = next(iter(value))
+        return {'N': 'NS', 'S': 'SS', 'B': 'BS'}[_type_of(element)]
+    if isinstance(value, list):
+        return 'L'
+    return 'M'
+
+def _sort_value(value: Any) -> Any:
+    return bytes(value) if isinstance(value, Binary) else value
+
+def _item_size(value: Any) -> int:
+    """Approximates the stored size of a value in bytes, as used for the 1 MB page limit."""
+    if isinstance(value, dict):
+        return sum(len(k) + _item_size(v) for k, v in value.items()) + 3
+    if isinstance(value, (list, set)):
+        return sum(_item_size(v) for v in value) + 3
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, Binary):
+        return len(value.value)
+    if isinstance(value, Decimal):
+        return len(str(value)) // 2 + 1
+    return 1
+
+# -- Expressions --------------------------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\s*(?:(<>|<=|>=|=|<|>|\(|\)|\[|\]|,|\.|\+|-)|(:[A-Za-z0-9_]+)|(#?[A-Za-z_][A-Za-z0-9_]*)|(\d+))")
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'ADD', 'REMOVE', 'DELETE'}
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid expression near: {expression[position:]!r}")
+        op, value, name, number = match.groups()
+        if op:
+            tokens.append(('op', op))
+        elif value:
+            tokens.append(('value', value))
+        elif number:
+            tokens.append(('number', number))
+        elif name.upper() in _KEYWORDS:
+            tokens.append(('keyword', name.upper()))
+        else:
+            tokens.append(('name', name))
+        position = match.end()
+    return tokens
+
+class _Context:
+    def __init__(self, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, token: str) -> str:
+        if token.startswith('#'):
+            if token not in self.names:
+                raise ValueError(f"An expression attribute name used in the document path is not defined: {token}")
+            return self.names[token]
+        return token
+
+    def value(self, token: str) -> Any:
+        if token not in self.values:
+            raise ValueError(f"An expression attribute value used in expression is not defined: {token}")
+        return self.values[token]
+
+class _Path:
+    def __init__(self, elements: List[Any]):
+        self.elements = elements
+
+    def resolve(self, ctx: _Context) -> List[Any]:
+        return [element if isinstance(element, int) else ctx.name(element) for element in self.elements]
+
+    def top_level(self, ctx: _Context) -> str:
+        return ctx.name(self.elements[0])
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> Any:
+        current = item
+        for element in self.resolve(ctx):
+            if isinstance(element, int):
+                if not isinstance(current, list) or element >= len(current):
+                    return MISSING
+                current = current[element]
+            else:
+                if not isinstance(current, dict) or element not in current:
+                    return MISSING
+                current = current[element]
+        return current
+
+    def _parent(self, item: Dict[str, Any], ctx: _Context) -> Tuple[Any, Any]:
+        elements = self.resolve(ctx)
+        parent = _Path(self.elements[:-1]).eval(item, ctx) if len(elements) > 1 else item
+        if parent is MISSING:
+            raise ValueError("The document path provided in the update expression is invalid for update")
+        return parent, elements[-1]
+
+    def assign(self, item: Dict[str, Any], value: Any, ctx: _Context) -> None:
+        parent, last = self._parent(item, ctx)
+        if isinstance(last, int):
+            if last >= len(parent):
+                parent.append(value)
+            else:
+                parent[last] = value
+        else:
+            parent[last] = value
+
+    def remove(self, item: Dict[str, Any], ctx: _Context) -> None:
+        parent, last = self._parent(item, ctx)
+        if isinstance(last, int):
+            if last < len(parent):
+                del parent[last]
+        else:
+            parent.pop(last, None)
+
+class _Value:
+    def __init__(self, token: str):
+        self.token = token
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> Any:
+        return ctx.value(self.token)
+
+class _Call:
+    """A function call: size() as an operand, or a condition function such as begins_with()."""
+    def __init__(self, name: str, args: List[Any]):
+        self.name = name
+        self.args = args
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> Any:
+        values = [arg.eval(item, ctx) for arg in self.args]
+        if self.name == 'size':
+            value = values[0]
+            if value is MISSING:
+                return MISSING
+            if isinstance(value, Binary):
+                return Decimal(len(value.value))
+            if isinstance(value, (str, set, list, dict)):
+                return Decimal(len(value))
+            raise ValueError("Invalid operand type for size()")
+        if self.name == 'attribute_exists':
+            return values[0] is not MISSING
+        if self.name == 'attribute_not_exists':
+            return values[0] is MISSING
+        if self.name == 'attribute_type':
+            return values[0] is not MISSING and _type_of(values[0]) == values[1]
+        if self.name == 'begins_with':
+            value, prefix = values
+            if isinstance(value, str) and isinstance(prefix, str):
+                return value.startswith(prefix)
+            if isinstance(value, Binary) and isinstance(prefix, Binary):
+                return value.value.startswith(prefix.value)
+            return False
+        if self.name == 'contains':
+            value, operand = values
+            if isinstance(value, str) and isinstance(operand, str):
+                return operand in value
+            if isinstance(value, (set, list)):
+                return operand in value
+            return False
+        if self.name == 'if_not_exists':
+            return values[1] if values[0] is MISSING else values[0]
+        if self.name == 'list_append':
+            first, second = values
+            if not isinstance(first, list) or not isinstance(second, list):
+                raise ValueError("An operand in the update expression has an incorrect data type")
+            return first + second
+        raise ValueError(f"Invalid function name: {self.name}")
+
+class _Compare:
+    def __init__(self, op: str, left: Any, right: Any):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        left, right = self.left.eval(item, ctx), self.right.eval(item, ctx)
+        if left is MISSING or right is MISSING:
+            return False
+        if self.op == '=':
+            return left == right
+        if self.op == '<>':
+            return left != right
+        if _type_of(left) != _type_of(right) or _type_of(left) not in ('N', 'S', 'B'):
+            return False
+        left, right = _sort_value(left), _sort_value(right)
+        return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[self.op]
+
+class _Between:
+    def __init__(self, operand: Any, low: Any, high: Any):
+        self.operand = operand
+        self.low = low
+        self.high = high
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        return _Compare('>=', self.operand, self.low).eval(item, ctx) and _Compare('<=', self.operand, self.high).eval(item, ctx)
+
+class _In:
+    def __init__(self, operand: Any, options: List[Any]):
+        self.operand = operand
+        self.options = options
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        value = self.operand.eval(item, ctx)
+        return value is not MISSING and any(value == option.eval(item, ctx) for option in self.options)
+
+class _And:
+    def __init__(self, left: Any, right: Any):
+        self.left = left
+        self.right = right
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        return self.left.eval(item, ctx) and self.right.eval(item, ctx)
+
+class _Or:
+    def __init__(self, left: Any, right: Any):
+        self.left = left
+        self.right = right
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        return self.left.eval(item, ctx) or self.right.eval(item, ctx)
+
+class _Not:
+    def __init__(self, operand: Any):
+        self.operand = operand
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> bool:
+        return not self.operand.eval(item, ctx)
+
+class _Arithmetic:
+    def __init__(self, op: str, left: Any, right: Any):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def eval(self, item: Dict[str, Any], ctx: _Context) -> Any:
+        left, right = self.left.eval(item, ctx), self.right.eval(item, ctx)
+        if not isinstance(left, Decimal) or not isinstance(right, Decimal):
+            raise ValueError("An operand in the update expression has an incorrect data type")
+        return DYNAMODB_CONTEXT.add(left, right) if self.op == '+' else DYNAMODB_CONTEXT.subtract(left, right)
+
+class _Parser:
+    """Recursive descent parser for the condition, key condition, projection and update expression grammars."""
+    CONDITION_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'}
+
+    def __init__(self, expression: str):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token[0] is None:
+            raise ValueError("Unexpected end of expression")
+        self.position += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        kind, value = self.take()
+        if value != text:
+            raise ValueError(f"Expected {text!r} but found {value!r}")
+
+    def accept(self, text: str) -> bool:
+        if self.peek()[1] == text:
+            self.position += 1
+            return True
+        return False
+
+    def done(self) -> None:
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token: {self.peek()[1]!r}")
+
+    def path(self) -> _Path:
+        kind, value = self.take()
+        if kind != 'name':
+            raise ValueError(f"Expected an attribute name but found {value!r}")
+        elements: List[Any] = [value]
+        while True:
+            if self.accept('.'):
+                kind, value = self.take()
+                if kind != 'name':
+                    raise ValueError(f"Expected an attribute name but found {value!r}")
+                elements.append(value)
+            elif self.accept('['):
+                kind, value = self.take()
+                if kind != 'number':
+                    raise ValueError(f"Expected a list index but found {value!r}")
+                elements.append(int(value))
+                self.expect(']')
+            else:
+                return _Path(elements)
+
+    def call(self) -> _Call:
+        _, name = self.take()
+        self.expect('(')
+        args = [self.operand()]
+        while self.accept(','):
+            args.append(self.operand())
+        self.expect(')')
+        return _Call(name, args)
+
+    def operand(self) -> Any:
+        kind, value = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return _Value(value)
+        if kind == 'name' and self.peek(1)[1] == '(':
+            return self.call()
+        return self.path()
+
+    # Conditions
+
+    def condition(self) -> Any:
+        node = self.conjunction()
+        while self.accept('OR'):
+            node = _Or(node, self.conjunction())
+        return node
+
+    def conjunction(self) -> Any:
+        node = self.negation()
+        while self.accept('AND'):
+            node = _And(node, self.negation())
+        return node
+
+    def negation(self) -> Any:
+        if self.accept('NOT'):
+            return _Not(self.negation())
+        return self.comparison()
+
+    def comparison(self) -> Any:
+        if self.accept('('):
+            node = self.condition()
+            self.expect(')')
+            return node
+        kind, value = self.peek()
+        if kind == 'name' and value in self.CONDITION_FUNCTIONS and self.peek(1)[1] == '(':
+            return self.call()
+        left = self.operand()
+        kind, op = self.take()
+        if op == 'BETWEEN':
+            low = self.operand()
+            self.expect('AND')
+            return _Between(left, low, self.operand())
+        if op == 'IN':
+            self.expect('(')
+            options = [self.operand()]
+            while self.accept(','):
+                options.append(self.operand())
+            self.expect(')')
+            return _In(left, options)
+        if op not in ('=', '<>', '<', '<=', '>', '>='):
+            raise ValueError(f"Invalid comparison operator: {op!r}")
+        return _Compare(op, left, self.operand())
+
+    # Updates
+
+    def set_value(self) -> Any:
+        left = self.operand()
+        kind, op = self.peek()
+        if op in ('+', '-'):
+            self.position += 1
+            return _Arithmetic(op, left, self.operand())
+        return left
+
+    def update(self) -> List[Tuple[str, _Path, Any]]:
+        actions = []
+        while self.peek()[0] is not None:
+            kind, clause = self.take()
+            if clause not in ('SET', 'ADD', 'REMOVE', 'DELETE'):
+                raise ValueError(f"Invalid update clause: {clause!r}")
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append((clause, path, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append((clause, path, None))
+                else:
+                    actions.append((clause, path, self.operand()))
+                if not self.accept(','):
+                    break
+        return actions
+
+    def projection(self) -> List[_Path]:
+        paths = [self.path()]
+        while self.accept(','):
+            paths.append(self.path())
+        return paths
+
+@lru_cache(maxsize=1024)
+def _parse_condition(expression: str) -> Any:
+    parser = _Parser(expression)
+    node = parser.condition()
+    parser.done()
+    return node
+
+@lru_cache(maxsize=1024)
+def _parse_update(expression: str) -> List[Tuple[str, _Path, Any]]:
+    parser = _Parser(expression)
+    actions = parser.update()
+    parser.done()
+    return actions
+
+@lru_cache(maxsize=1024)
+def _parse_projection(expression: str) -> List[_Path]:
+    parser = _Parser(expression)
+    paths = parser.projection()
+    parser.done()
+    return paths
+
+def _build_condition(condition: Any, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]], is_key_condition: bool = False) -> Tuple[Any, _Context]:
+    """Turns a boto3 condition object or an expression string into a parsed condition and its placeholder context."""
+    names, values = dict(names or {}), dict(values or {})
+    if isinstance(condition, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key_condition)
+        expression = built.condition_expression
+        # Placeholders are numbered from zero on every build, so prefix them to keep them apart from the caller's
+        for placeholder, name in built.attribute_name_placeholders.items():
+            expression = re.sub(re.escape(placeholder) + r'\b', f'#c{placeholder[1:]}', expression)
+            names[f'#c{placeholder[1:]}'] = name
+        for placeholder, value in built.attribute_value_placeholders.items():
+            expression = re.sub(re.escape(placeholder) + r'\b', f':c{placeholder[1:]}', expression)
+            values[f':c{placeholder[1:]}'] = value
+        condition = expression
+    return _parse_condition(condition), _Context(names, {k: normalize(v) for k, v in values.items()})
+
+def _project(item: Dict[str, Any], expression: Optional[str], names: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    """Applies a projection expression. Map paths are projected exactly; a path into a list keeps the whole list."""
+    if not expression:
+        return copy.deepcopy(item)
+    ctx = _Context(names, None)
+    projected: Dict[str, Any] = {}
+    for path in _parse_projection(expression):
+        elements = path.resolve(ctx)
+        if any(isinstance(element, int) for element in elements):
+            elements = elements[:next(i for i, element in enumerate(elements) if isinstance(element, int))]
+        value = _Path(elements).eval(item, _Context(None, None))
+        if value is MISSING:
+            continue
+        target = projected
+        for element in elements[:-1]:
+            target = target.setdefault(element, {})
+        target[elements[-1]] = copy.deepcopy(value)
+    return projected
+
+# -- Tables -------------------------------------------------------------------------------------------------
+
+class _Index:
+    """A sorted view of the items that carry both of an index's key attributes.
+
+    A KEYS_ONLY index only holds the table and index key attributes of each item.
+    """
+    def __init__(self, hash_key: str, range_key: Optional[str], projection: str = 'ALL'):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.projection = projection
+        self.partitions: Dict[Any, List[Tuple]] = {}
+
+    def view(self, item: Dict[str, Any], table_key_names: List[str]) -> Dict[str, Any]:
+        """The item as stored in the index."""
+        if self.projection != 'KEYS_ONLY':
+            return item
+        names = table_key_names + [self.hash_key] + ([self.range_key] if self.range_key else [])
+        return {name: item[name] for name in names if name in item}
+
+    def entry(self, item: Dict[str, Any], table_key: Tuple) -> Optional[Tuple]:
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return None
+        range_value = _sort_value(item[self.range_key]) if self.range_key else None
+        return (range_value,) + table_key
+
+    def add(self, item: Dict[str, Any], table_key: Tuple) -> None:
+        entry = self.entry(item, table_key)
+        if entry is not None:
+            bisect.insort(self.partitions.setdefault(_sort_value(item[self.hash_key]), []), entry)
+
+    def discard(self, item: Dict[str, Any], table_key: Tuple) -> None:
+        entry = self.entry(item, table_key)
+        if entry is None:
+            return
+        partition = self.partitions.get(_sort_value(item[self.hash_key]), [])
+        position = bisect.bisect_left(partition, entry)
+        if position < len(partition) and partition[position] == entry:
+            del partition[position]
+
+class LocalStream:
+    """In-memory stand-in for a table's DynamoDB stream.
+
+    Every write that changes an item appends one INSERT, MODIFY or REMOVE record. Records are spread over
+    ``shard_count`` shards by partition key, so the records of one item are always in order on one shard,
+    and sequence numbers increase across the whole stream. Records are returned in the shape Lambda
+    delivers them, with images in DynamoDB JSON. ``checkpoints`` holds, per consumer, the last sequence
+    number it processed on each shard, as each event source mapping keeps its own.
+    """
+    def __init__(self, table: 'LocalTable', view_type: str = 'NEW_AND_OLD_IMAGES', shard_count: int = 4, retention: int = STREAM_SHARD_RETENTION):
+        self.table = table
+        self.view_type = view_type
+        self.arn = f'arn:aws:dynamodb:local:000000000000:table/{table.name}/stream/local'
+        self.shards = {f'shardId-local-{index:04d}': deque(maxlen=retention) for index in range(shard_count)}
+        self.shard_names = list(self.shards)
+        self.checkpoints: Dict[str, Dict[str, str]] = {}
+        self.next_sequence = 10 ** 20
+
+    def append(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Records a change; called with the table lock held. Images are kept by reference, since stored items are never mutated."""
+        if old == new:
+            return
+        event_name = 'INSERT' if old is None else 'REMOVE' if new is None else 'MODIFY'
+        keys = self.table._key_of(new if new is not None else old)
+        shard = self.shard_names[zlib.crc32(str(keys[self.table.hash_key]).encode('utf-8')) % len(self.shard_names)]
+        self.next_sequence += 1
+        self.shards[shard].append((str(self.next_sequence), uuid.uuid4().hex, event_name, int(time.time()), keys, old, new))
+
+    def shard_ids(self) -> List[str]:
+        return list(self.shard_names)
+
+    def get_records(self, shard_id: str, after_sequence: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Up to ``limit`` records of a shard with a sequence number above ``after_sequence``, oldest first."""
+        self.table.simulator.call('dynamodbstreams', 'GetRecords')
+        with self.table.lock:
+            entries = list(self.shards[shard_id])
+        after = int(after_sequence) if after_sequence else 0
+        return [self._record(*entry) for entry in entries if int(entry[0]) > after][:limit]
+
+    def _record(self, sequence: str, event_id: str, event_name: str, created: int, keys: Dict[str, Any], old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            'ApproximateCreationDateTime': created,
+            'Keys': {name: _serializer.serialize(value) for name, value in keys.items()},
+            'SequenceNumber': sequence,
+            'SizeBytes': _item_size(new if new is not None else old),
+            'StreamViewType': self.view_type,
+        }
+        if new is not None and self.view_type in ('NEW_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            data['NewImage'] = {name: _serializer.serialize(value) for name, value in new.items()}
+        if old is not None and self.view_type in ('OLD_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            data['OldImage'] = {name: _serializer.serialize(value) for name, value in old.items()}
+        return {
+            'eventID': event_id,
+            'eventName': event_name,
+            'eventVersion': '1.1',
+            'eventSource': 'aws:dynamodb',
+            'awsRegion': 'local',
+            'dynamodb': data,
+            'eventSourceARN': self.arn,
+        }
+
+class LocalTable:
+    """In-memory stand-in for a boto3 DynamoDB Table resource.
+
+    Supports get/put/update/delete with condition expressions and ReturnValues, query and scan with key
+    conditions, filters, projections, global secondary indexes and pagination (including the 1 MB page
+    limit), and batch_writer. Conditions may be boto3 condition objects or expression strings with
+    ExpressionAttributeNames/ExpressionAttributeValues. Stored values are normalized the way boto3 returns
+    them, so numbers come back as Decimal. With a ``stream_view_type``, changes are recorded on ``stream``.
+    """
+    def __init__(self, name: str, resource: 'LocalDynamoDBResource', hash_key: str, range_key: Optional[str] = None, indexes: Optional[Dict[str, Tuple[Optional[str], ...]]] = None, attribute_types: Optional[Dict[str, str]] = None, stream_view_type: Optional[str] = None):
+        self.name = name
+        self.resource = resource
+        self.simulator = resource.simulator
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.items: Dict[Tuple, Dict[str, Any]] = {}
+        self.primary = _Index(hash_key, range_key)
+        self.indexes = {name: _Index(*keys) for name, keys in (indexes or {}).items()}
+        self.attribute_types = attribute_types or {}
+        self.lock = threading.RLock()
+        self.stream = LocalStream(self, stream_view_type) if stream_view_type else None
+
+    # Keys
+
+    def key_names(self) -> List[str]:
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def _table_key(self, key: Dict[str, Any], operation: str) -> Tuple:
+        names = self.key_names()
+        if set(key) != set(names):
+            raise client_error('ValidationException', 'The provided key element does not match the schema', operation)
+        values = tuple(normalize(key[name]) for name in names)
+        for value in values:
+            if _type_of(value) not in ('S', 'N', 'B') or value == '':
+                raise client_error('ValidationException', 'The provided key element does not match the schema', operation)
+        return tuple(_sort_value(value) for value in values)
+
+    def _key_of(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: item[name] for name in self.key_names()}
+
+    # Storage
+
+    def _validate_key_attributes(self, item: Dict[str, Any], operation: str) -> None:
+        """Rejects items whose table or index key attributes have a type other than the one defined for the table."""
+        for name, expected in self.attribute_types.items():
+            if name in item and _type_of(item[name]) != expected:
+                raise client_error('ValidationException', f'One or more parameter values were invalid: Type mismatch for key {name} expected: {expected} actual: {_type_of(item[name])}', operation)
+
+    def _store(self, table_key: Tuple, item: Optional[Dict[str, Any]]) -> None:
+        old = self.items.pop(table_key, None)
+        if old is not None:
+            self.primary.discard(old, table_key)
+            for index in self.indexes.values():
+                index.discard(old, table_key)
+        if item is not None:
+            self.items[table_key] = item
+            self.primary.add(item, table_key)
+            for index in self.indexes.values():
+                index.add(item, table_key)
+        if self.stream is not None:
+            self.stream.append(old, item)
+
+    def _check_condition(self, item: Optional[Dict[str, Any]], condition: Any, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]], operation: str) -> None:
+        if condition is None:
+            return
+        try:
+            node, ctx = _build_condition(condition, names, values)
+            passed = node.eval(item or {}, ctx)
+        except ValueError as e:
+            raise client_error('ValidationException', str(e), operation) from None
+        if not passed:
+            raise client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    # Item operations
+
+    def get_item(self, Key: Dict[str, Any], ProjectionExpression: Optional[str] = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ConsistentRead: bool = False) -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'GetItem')
+        table_key = self._table_key(Key, 'GetItem')
+        with self.lock:
+            item = self.items.get(table_key)
+            return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames)} if item is not None else {}
+
+    def put_item(self, Item: Dict[str, Any], ConditionExpression: Any = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ExpressionAttributeValues: Optional[Dict[str, Any]] = None, ReturnValues: str = 'NONE') -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'PutItem')
+        item = normalize(Item)
+        table_key = self._table_key(self._key_of(item), 'PutItem')
+        self._validate_key_attributes(item, 'PutItem')
+        with self.lock:
+            old = self.items.get(table_key)
+            self._check_condition(old, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+            self._store(table_key, item)
+        return {'Attributes': copy.deepcopy(old)} if ReturnValues == 'ALL_OLD' and old is not None else {}
+
+    def update_item(self, Key: Dict[str, Any], UpdateExpression: str, ConditionExpression: Any = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ExpressionAttributeValues: Optional[Dict[str, Any]] = None, ReturnValues: str = 'NONE') -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'UpdateItem')
+        table_key = self._table_key(Key, 'UpdateItem')
+        ctx = _Context(ExpressionAttributeNames, {k: normalize(v) for k, v in (ExpressionAttributeValues or {}).items()})
+        with self.lock:
+            old = self.items.get(table_key)
+            self._check_condition(old, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+            try:
+                new, updated = self._apply_update(old, normalize(Key), _parse_update(UpdateExpression), ctx)
+            except ValueError as e:
+                raise client_error('ValidationException', str(e), 'UpdateItem') from None
+            self._validate_key_attributes(new, 'UpdateItem')
+            self._store(table_key, new)
+
+        if ReturnValues == 'ALL_NEW':
+            attributes = new
+        elif ReturnValues == 'ALL_OLD':
+            attributes = old or {}
+        elif ReturnValues == 'UPDATED_NEW':
+            attributes = {name: new[name] for name in updated if name in new}
+        elif ReturnValues == 'UPDATED_OLD':
+            attributes = {name: old[name] for name in updated if old and name in old}
+        else:
+            return {}
+        return {'Attributes': copy.deepcopy(attributes)} if attributes else {}
+
+    def _apply_update(self, old: Optional[Dict[str, Any]], key: Dict[str, Any], actions: List[Tuple[str, _Path, Any]], ctx: _Context) -> Tuple[Dict[str, Any], List[str]]:
+        # Every operand is evaluated against the item as it was before the update
+        source = old or {}
+        resolved = [(clause, path, operand.eval(source, ctx) if operand is not None else None) for clause, path, operand in actions]
+        new = copy.deepcopy(source) if old else dict(key)
+        updated = []
+        for clause, path, value in resolved:
+            name = path.top_level(ctx)
+            if name in self.key_names():
+                raise ValueError(f"Cannot update attribute {name}. This attribute is part of the key")
+            updated.append(name)
+            if clause == 'SET':
+                if value is MISSING:
+                    raise ValueError("The provided expression refers to an attribute that does not exist in the item")
+                # Copied, so attributes set from the same operand do not share a map or list
+                path.assign(new, copy.deepcopy(value), ctx)
+            elif clause == 'REMOVE':
+                path.remove(new, ctx)
+            elif clause == 'ADD':
+                current = path.eval(new, ctx)
+                if current is MISSING:
+                    path.assign(new, value, ctx)
+                elif isinstance(current, Decimal) and isinstance(value, Decimal):
+                    path.assign(new, DYNAMODB_CONTEXT.add(current, value), ctx)
+                elif isinstance(current, set) and isinstance(value, set) and _type_of(current) == _type_of(value):
+                    path.assign(new, current | value, ctx)
+                else:
+                    raise ValueError("An operand in the update expression has an incorrect data type")
+            elif clause == 'DELETE':
+                current = path.eval(new, ctx)
+                if current is MISSING:
+                    continue
+                if not isinstance(current, set) or not isinstance(value, set):
+                    raise ValueError("An operand in the update expression has an incorrect data type")
+                remaining = current - value
+                if remaining:
+                    path.assign(new, remaining, ctx)
+                else:
+                    path.remove(new, ctx)
+        return new, list(dict.fromkeys(updated))
+
+    def delete_item(self, Key: Dict[str, Any], ConditionExpression: Any = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ExpressionAttributeValues: Optional[Dict[str, Any]] = None, ReturnValues: str = 'NONE') -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'DeleteItem')
+        table_key = self._table_key(Key, 'DeleteItem')
+        with self.lock:
+            old = self.items.get(table_key)
+            self._check_condition(old, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'DeleteItem')
+            self._store(table_key, None)
+        return {'Attributes': copy.deepcopy(old)} if ReturnValues == 'ALL_OLD' and old is not None else {}
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[List[str]] = None) -> BatchWriter:
+        """Returns boto3's own BatchWriter on top of the local batch_write_item, so buffering and retries match."""
+        return BatchWriter(self.name, self.resource, overwrite_by_pkeys=overwrite_by_pkeys)
+
+    # Reads
+
+    def _candidates(self, index: _Index, partition_value: Any, prefix: Optional[str], forward: bool, start_entry: Optional[Tuple]) -> List[Tuple]:
+        partition = index.partitions.get(partition_value, [])
+        low, high = 0, len(partition)
+        if isinstance(prefix, str):
+            low = bisect.bisect_left(partition, (prefix,))
+            high = bisect.bisect_left(partition, (prefix + '\U0010ffff',))
+        if start_entry is not None:
+            if forward:
+                low = max(low, bisect.bisect_right(partition, start_entry))
+            else:
+                high = min(high, bisect.bisect_left(partition, start_entry))
+        entries = partition[low:high]
+        return entries if forward else entries[::-1]
+
+    def _split_key_condition(self, node: Any, index: _Index, ctx: _Context) -> Tuple[Any, Any]:
+        """Finds the partition key equality in a key condition and returns its value and the sort key condition."""
+        def is_hash_equality(candidate: Any) -> bool:
+            return isinstance(candidate, _Compare) and candidate.op == '=' and isinstance(candidate.left, _Path) and candidate.left.resolve(ctx) == [index.hash_key]
+
+        if is_hash_equality(node):
+            return node.right.eval({}, ctx), None
+        if isinstance(node, _And):
+            if is_hash_equality(node.left):
+                return node.left.right.eval({}, ctx), node.right
+            if is_hash_equality(node.right):
+                return node.right.right.eval({}, ctx), node.left
+        raise ValueError(f"Query key condition must contain an equality condition on {index.hash_key}")
+
+    def _page(self, entries: List[Tuple], key_condition: Any, filter_node: Any, ctx: _Context, filter_ctx: _Context, limit: Optional[int], select: Optional[str], projection: Optional[str], names: Optional[Dict[str, str]], index: Optional[_Index]) -> Dict[str, Any]:
+        items, scanned, size = [], 0, 0
+        last_item = None
+        for entry in entries:
+            item = self.items[entry[-2:] if self.range_key else entry[-1:]]
+            if index is not None:
+                item = index.view(item, self.key_names())
+            if key_condition is not None and not key_condition.eval(item, ctx):
+                continue
+            scanned += 1
+            size += _item_size(item)
+            last_item = item
+            if filter_node is None or filter_node.eval(item, filter_ctx):
+                if select != 'COUNT':
+                    items.append(_project(item, projection, names))
+                else:
+                    items.append(None)
+            if (limit and scanned >= limit) or size >= MAX_PAGE_BYTES:
+                break
+        else:
+            last_item = None
+
+        response: Dict[str, Any] = {'Count': len(items), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = items
+        if last_item is not None:
+            last_key = self._key_of(last_item)
+            if index is not None:
+                last_key[index.hash_key] = last_item[index.hash_key]
+                if index.range_key:
+                    last_key[index.range_key] = last_item[index.range_key]
+            response['LastEvaluatedKey'] = copy.deepcopy(last_key)
+        return response
+
+    def _index(self, index_name: Optional[str], operation: str) -> _Index:
+        if not index_name:
+            return self.primary
+        if index_name not in self.indexes:
+            raise client_error('ValidationException', f'The table does not have the specified index: {index_name}', operation)
+        return self.indexes[index_name]
+
+    def _start_entry(self, index: _Index, start_key: Optional[Dict[str, Any]]) -> Optional[Tuple]:
+        if not start_key:
+            return None
+        start_key = normalize(start_key)
+        table_key = tuple(_sort_value(start_key[name]) for name in self.key_names())
+        range_value = _sort_value(start_key[index.range_key]) if index.range_key else None
+        return (range_value,) + table_key
+
+    def query(self, KeyConditionExpression: Any, IndexName: Optional[str] = None, FilterExpression: Any = None, ProjectionExpression: Optional[str] = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ExpressionAttributeValues: Optional[Dict[str, Any]] = None, Limit: Optional[int] = None, ExclusiveStartKey: Optional[Dict[str, Any]] = None, ScanIndexForward: bool = True, Select: Optional[str] = None, ConsistentRead: bool = False) -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'Query')
+        index = self._index(IndexName, 'Query')
+        try:
+            key_node, ctx = _build_condition(KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, is_key_condition=True)
+            filter_node, filter_ctx = (None, ctx)
+            if FilterExpression is not None:
+                filter_node, filter_ctx = _build_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            partition_value, range_node = self._split_key_condition(key_node, index, ctx)
+        except ValueError as e:
+            raise client_error('ValidationException', str(e), 'Query') from None
+
+        prefix = None
+        if isinstance(range_node, _Call) and range_node.name == 'begins_with':
+            prefix = range_node.args[1].eval({}, ctx)
+        with self.lock:
+            entries = self._candidates(index, _sort_value(partition_value), prefix, ScanIndexForward, self._start_entry(index, ExclusiveStartKey))
+            return self._page(entries, range_node, filter_node, ctx, filter_ctx, Limit, Select, ProjectionExpression, ExpressionAttributeNames, index if IndexName else None)
+
+    def scan(self, IndexName: Optional[str] = None, FilterExpression: Any = None, ProjectionExpression: Optional[str] = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, ExpressionAttributeValues: Optional[Dict[str, Any]] = None, Limit: Optional[int] = None, ExclusiveStartKey: Optional[Dict[str, Any]] = None, Select: Optional[str] = None, ConsistentRead: bool = False) -> Dict[str, Any]:
+        self.simulator.call('dynamodb', 'Scan')
+        index = self._index(IndexName, 'Scan')
+        filter_node, filter_ctx = None, None
+        if FilterExpression is not None:
+            try:
+                filter_node, filter_ctx = _build_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            except ValueError as e:
+                raise client_error('ValidationException', str(e), 'Scan') from None
+
+        with self.lock:
+            # Scans walk partitions in a stable order; the exclusive start key names the partition to resume in
+            ordered = [(value, entry) for value in sorted(index.partitions, key=lambda v: (type(v).__name__, v)) for entry in index.partitions[value]]
+            start = 0
+            if ExclusiveStartKey:
+                start_key = normalize(ExclusiveStartKey)
+                marker = (_sort_value(start_key[index.hash_key]), self._start_entry(index, start_key))
+                start = next((i + 1 for i, candidate in enumerate(ordered) if candidate == marker), len(ordered))
+            entries = [entry for _, entry in ordered[start:]]
+            return self._page(entries, None, filter_node, None, filter_ctx, Limit, Select, ProjectionExpression, ExpressionAttributeNames, index if IndexName else None)
+
+class LocalDynamoDBResource:
+    """In-memory stand-in for boto3.resource('dynamodb'): tables plus batch_get_item/batch_write_item.
+
+    It also stands in for ``resource.meta.client`` in the client-only transaction calls.
+    """
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.tables: Dict[str, LocalTable] = {}
+        self.lock = threading.Lock()
+        # ClientRequestToken -> (request, monotonic time of its success)
+        self.transaction_tokens: Dict[str, Tuple[str, float]] = {}
+
+    @property
+    def meta(self) -> SimpleNamespace:
+        return SimpleNamespace(client=self)
+
+    def create_table(self, name: str, hash_key: str, range_key: Optional[str] = None, indexes: Optional[Dict[str, Tuple[Optional[str], ...]]] = None, attribute_types: Optional[Dict[str, str]] = None, stream_view_type: Optional[str] = None) -> LocalTable:
+        with self.lock:
+            self.tables[name] = LocalTable(name, self, hash_key, range_key, indexes, attribute_types, stream_view_type)
+            return self.tables[name]
+
+    def Table(self, name: str) -> LocalTable:
+        """Returns a table, creating it with the app table's key schema and indexes on first use."""
+        with self.lock:
+            if name not in self.tables:
+                self.tables[name] = LocalTable(name, self, APP_TABLE_SCHEMA['hash_key'], APP_TABLE_SCHEMA['range_key'], APP_TABLE_SCHEMA['indexes'], APP_TABLE_SCHEMA['attribute_types'], APP_TABLE_SCHEMA['stream_view_type'])
+            return self.tables[name]
+
+    def _table(self, name: str, operation: str) -> LocalTable:
+        if name not in self.tables:
+            raise client_error('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found', operation)
+        return self.tables[name]
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Applies up to 25 put/delete requests; requests the simulator throttles come back as UnprocessedItems."""
+        self.simulator.call('dynamodb', 'BatchWriteItem')
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise client_error('ValidationException', 'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        for table_name, requests in RequestItems.items():
+            table = self._table(table_name, 'BatchWriteItem')
+            seen = set()
+            for request in requests:
+                key = table._key_of(request['PutRequest']['Item']) if 'PutRequest' in request else request['DeleteRequest']['Key']
+                table_key = table._table_key(key, 'BatchWriteItem')
+                if table_key in seen:
+                    raise client_error('ValidationException', 'Provided list of item keys contains duplicates', 'BatchWriteItem')
+                seen.add(table_key)
+                if 'PutRequest' in request:
+                    table._validate_key_attributes(normalize(request['PutRequest']['Item']), 'BatchWriteItem')
+            for request in requests:
+                if self.simulator.is_throttled('dynamodb.BatchWriteItem'):
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                with table.lock:
+                    if 'PutRequest' in request:
+                        item = normalize(request['PutRequest']['Item'])
+                        table._store(table._table_key(table._key_of(item), 'BatchWriteItem'), item)
+                    else:
+                        table._store(table._table_key(request['DeleteRequest']['Key'], 'BatchWriteItem'), None)
+        return {'UnprocessedItems': unprocessed}
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Reads up to 100 keys; keys the simulator throttles come back as UnprocessedKeys."""
+        self.simulator.call('dynamodb', 'BatchGetItem')
+        if sum(len(request['Keys']) for request in RequestItems.values()) > 100:
+            raise client_error('ValidationException', 'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        unprocessed: Dict[str, Dict[str, Any]] = {}
+        for table_name, request in RequestItems.items():
+            table = self._table(table_name, 'BatchGetItem')
+            responses[table_name] = []
+            for key in request['Keys']:
+                if self.simulator.is_throttled('dynamodb.BatchGetItem'):
+                    unprocessed.setdefault(table_name, {**request, 'Keys': []})['Keys'].append(key)
+                    continue
+                with table.lock:
+                    item = table.items.get(table._table_key(key, 'BatchGetItem'))
+                    if item is not None:
+                        responses[table_name].append(_project(item, request.get('ProjectionExpression'), request.get('ExpressionAttributeNames')))
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]], ClientRequestToken: Optional[str] = None) -> Dict[str, Any]:
+        """Checks every condition, then applies every write under the locks of the tables involved, or none.
+
+        Failed conditions cancel the transaction with a CancellationReasons entry per operation. A token
+        seen within the idempotency window returns success without writing again.
+        """
+        self.simulator.call('dynamodb', 'TransactWriteItems')
+        if not 1 <= len(TransactItems) <= 100:
+            raise client_error('ValidationException', 'Member must have length between 1 and 100', 'TransactWriteItems')
+        operations = []
+        for entry in TransactItems:
+            (kind, params), = entry.items()
+            table = self._table(params['TableName'], 'TransactWriteItems')
+            key = table._key_of(params['Item']) if kind == 'Put' else params['Key']
+            operations.append((kind, params, table, table._table_key(key, 'TransactWriteItems')))
+        if len({(table.name, table_key) for _, _, table, table_key in operations}) != len(operations):
+            raise client_error('ValidationException', 'Transaction request cannot include multiple operations on one item', 'TransactWriteItems')
+
+        request = repr(TransactItems)
+        if ClientRequestToken:
+            with self.lock:
+                seen = self.transaction_tokens.get(ClientRequestToken)
+                if seen is not None and time.monotonic() - seen[1] < IDEMPOTENCY_WINDOW_SECONDS:
+                    if seen[0] != request:
+                        raise client_error('IdempotentParameterMismatchException', 'The request uses the same client token as a previous, but non-identical request', 'TransactWriteItems')
+                    return {}
+
+        with ExitStack() as stack:
+            for table in sorted({table.name: table for _, _, table, _ in operations}.values(), key=lambda table: table.name):
+                stack.enter_context(table.lock)
+            reasons: List[Dict[str, str]] = []
+            writes = []
+            for kind, params, table, table_key in operations:
+                old = table.items.get(table_key)
+                names, values = params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues')
+                try:
+                    table._check_condition(old, params.get('ConditionExpression'), names, values, 'TransactWriteItems')
+                    if kind == 'Put':
+                        new = normalize(params['Item'])
+                        table._validate_key_attributes(new, 'TransactWriteItems')
+                        writes.append((table, table_key, new))
+                    elif kind == 'Update':
+                        ctx = _Context(names, {k: normalize(v) for k, v in (values or {}).items()})
+                        new, _ = table._apply_update(old, normalize(params['Key']), _parse_update(params['UpdateExpression']), ctx)
+                        table._validate_key_attributes(new, 'TransactWriteItems')
+                        writes.append((table, table_key, new))
+                    elif kind == 'Delete':
+                        writes.append((table, table_key, None))
+                    reasons.append({'Code': 'None'})
+                except ClientError as e:
+                    failed = e.response['Error']['Code'] == 'ConditionalCheckFailedException'
+                    reasons.append({'Code': 'ConditionalCheckFailed' if failed else 'ValidationError', 'Message': e.response['Error']['Message']})
+                except ValueError as e:
+                    reasons.append({'Code': 'ValidationError', 'Message': str(e)})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled, please refer cancellation reasons for specific reasons'},
+                    'CancellationReasons': reasons,
+                }, 'TransactWriteItems')
+            for table, table_key, new in writes:
+                table._store(table_key, new)
+
+        if ClientRequestToken:
+            with self.lock:
+                now = time.monotonic()
+                self.transaction_tokens = {token: seen for token, seen in self.transaction_tokens.items() if now - seen[1] < IDEMPOTENCY_WINDOW_SECONDS}
+                self.transaction_tokens[ClientRequestToken] = (request, now)
+        return {}
+
+    def transact_get_items(self, TransactItems: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reads up to 100 items under the locks of the tables involved, so they form one snapshot."""
+        self.simulator.call('dynamodb', 'TransactGetItems')
+        if not 1 <= len(TransactItems) <= 100:
+            raise client_error('ValidationException', 'Member must have length between 1 and 100', 'TransactGetItems')
+        gets = [entry['Get'] for entry in TransactItems]
+        tables = [self._table(get['TableName'], 'TransactGetItems') for get in gets]
+        with ExitStack() as stack:
+            for table in sorted({table.name: table for table in tables}.values(), key=lambda table: table.name):
+                stack.enter_context(table.lock)
+            responses = []
+            for get, table in zip(gets, tables):
+                item = table.items.get(table._table_key(get['Key'], 'TransactGetItems'))
+                responses.append({'Item': _project(item, get.get('ProjectionExpression'), get.get('ExpressionAttributeNames'))} if item is not None else {})
+        return {'Responses': responses}
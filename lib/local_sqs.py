@@ -0,0 +1,318 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from botocore.exceptions import ClientError
+
+MAX_MESSAGE_BYTES = 262144
+LOCAL_QUEUE_URL_PREFIX = 'https://sqs.local/000000000000/'
+
+# Mirrors terraform/common/sqs.tf
+APP_QUEUES = {
+    'knowledge_source_url_initial_ingestion_dlq': {'VisibilityTimeout': '60', 'MessageRetentionPeriod': '1209600'},
+    'knowledge_source_url_initial_ingestion_queue': {
+        'VisibilityTimeout': '60',
+        'MessageRetentionPeriod': '345600',
+        'RedrivePolicy': json.dumps({'deadLetterTargetArn': 'knowledge_source_url_initial_ingestion_dlq', 'maxReceiveCount': 5})
+    },
+    'knowledge_source_chunk_processing_dlq': {'VisibilityTimeout': '60', 'MessageRetentionPeriod': '1209600'},
+    'knowledge_source_chunk_processing_queue': {
+        'VisibilityTimeout': '60',
+        'MessageRetentionPeriod': '345600',
+        'RedrivePolicy': json.dumps({'deadLetterTargetArn': 'knowledge_source_chunk_processing_dlq', 'maxReceiveCount': 5})
+    },
+}
+
+def client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+def queue_name(url_or_arn: str) -> str:
+    """Queues are identified by name, so real queue URLs and ARNs from the environment map onto local queues."""
+    return url_or_arn.rstrip('/').rsplit('/', 1)[-1].rsplit(':', 1)[-1]
+
+class LocalMessage:
+    def __init__(self, body: str, message_attributes: Optional[Dict[str, Any]], sent_at: float, delay_seconds: int):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.md5 = hashlib.md5(body.encode('utf-8')).hexdigest()
+        self.message_attributes = message_attributes or {}
+        self.sent_at = sent_at
+        self.visible_at = sent_at + delay_seconds
+        self.receive_count = 0
+        self.first_received_at: Optional[float] = None
+        self.receipt_handle: Optional[str] = None
+
+class LocalQueue:
+    def __init__(self, name: str, clock):
+        self.name = name
+        self.url = LOCAL_QUEUE_URL_PREFIX + name
+        self.clock = clock
+        self.visibility_timeout = 30
+        self.delay_seconds = 0
+        self.retention_seconds = 345600
+        self.dead_letter_queue: Optional[str] = None
+        self.max_receive_count: Optional[int] = None
+        self.messages: 'OrderedDict[str, LocalMessage]' = OrderedDict()
+        self.receipt_handles: Dict[str, str] = {}
+        self.condition = threading.Condition()
+
+    def set_attributes(self, attributes: Dict[str, str]) -> None:
+        if 'VisibilityTimeout' in attributes:
+            self.visibility_timeout = int(attributes['VisibilityTimeout'])
+        if 'DelaySeconds' in attributes:
+            self.delay_seconds = int(attributes['DelaySeconds'])
+        if 'MessageRetentionPeriod' in attributes:
+            self.retention_seconds = int(attributes['MessageRetentionPeriod'])
+        if 'RedrivePolicy' in attributes:
+            policy = json.loads(attributes['RedrivePolicy']) if attributes['RedrivePolicy'] else {}
+            self.dead_letter_queue = queue_name(policy['deadLetterTargetArn']) if policy else None
+            self.max_receive_count = int(policy['maxReceiveCount']) if policy else None
+
+    def add(self, message: LocalMessage) -> None:
+        with self.condition:
+            self.messages[message.message_id] = message
+            self.condition.notify_all()
+
+class LocalSQSClient:
+    """In-memory stand-in for boto3.client('sqs').
+
+    Supports sending (single and batched), receiving with long polling and visibility timeouts, deleting
+    (single and batched), changing visibility, redrive to a dead-letter queue after maxReceiveCount receives
+    and retention expiry. Queues are created on first use; the app's queues and their redrive policies are
+    set up to match terraform.
+    """
+    def __init__(self, simulator, clock=time.time):
+        self.simulator = simulator
+        self.clock = clock
+        self.queues: Dict[str, LocalQueue] = {}
+        self.lock = threading.Lock()
+        for name, attributes in APP_QUEUES.items():
+            self.queue(name).set_attributes(attributes)
+
+    def queue(self, url_or_name: str) -> LocalQueue:
+        name = queue_name(url_or_name)
+        with self.lock:
+            if name not in self.queues:
+                self.queues[name] = LocalQueue(name, self.clock)
+            return self.queues[name]
+
+    # Queue management
+
+    def create_queue(self, QueueName: str, Attributes: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'CreateQueue', 'RequestThrottled')
+        queue = self.queue(QueueName)
+        queue.set_attributes(Attributes or {})
+        return {'QueueUrl': queue.url}
+
+    def get_queue_url(self, QueueName: str) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'GetQueueUrl', 'RequestThrottled')
+        with self.lock:
+            if QueueName not in self.queues:
+                raise client_error('AWS.SimpleQueueService.NonExistentQueue', 'The specified queue does not exist.', 'GetQueueUrl')
+            return {'QueueUrl': self.queues[QueueName].url}
+
+    def set_queue_attributes(self, QueueUrl: str, Attributes: Dict[str, str]) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'SetQueueAttributes', 'RequestThrottled')
+        self.queue(QueueUrl).set_attributes(Attributes)
+        return {}
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: Optional[List[str]] = None) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'GetQueueAttributes', 'RequestThrottled')
+        queue = self.queue(QueueUrl)
+        now = self.clock()
+        with queue.condition:
+            self._expire(queue, now)
+            messages = list(queue.messages.values())
+        attributes = {
+            'ApproximateNumberOfMessages': str(sum(1 for m in messages if m.visible_at <= now)),
+            'ApproximateNumberOfMessagesNotVisible': str(sum(1 for m in messages if m.visible_at > now and m.receive_count > 0)),
+            'ApproximateNumberOfMessagesDelayed': str(sum(1 for m in messages if m.visible_at > now and m.receive_count == 0)),
+            'VisibilityTimeout': str(queue.visibility_timeout),
+            'DelaySeconds': str(queue.delay_seconds),
+            'MessageRetentionPeriod': str(queue.retention_seconds),
+        }
+        if queue.dead_letter_queue:
+            attributes['RedrivePolicy'] = json.dumps({'deadLetterTargetArn': queue.dead_letter_queue, 'maxReceiveCount': queue.max_receive_count})
+        if AttributeNames and 'All' not in AttributeNames:
+            attributes = {name: value for name, value in attributes.items() if name in AttributeNames}
+        return {'Attributes': attributes}
+
+    def purge_queue(self, QueueUrl: str) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'PurgeQueue', 'RequestThrottled')
+        queue = self.queue(QueueUrl)
+        with queue.condition:
+            queue.messages.clear()
+            queue.receipt_handles.clear()
+        return {}
+
+    # Sending
+
+    def _new_message(self, queue: LocalQueue, body: str, message_attributes: Optional[Dict[str, Any]], delay_seconds: Optional[int]) -> LocalMessage:
+        if len(body.encode('utf-8')) > MAX_MESSAGE_BYTES:
+            raise ValueError(f"Message must be shorter than {MAX_MESSAGE_BYTES} bytes.")
+        return LocalMessage(body, message_attributes, self.clock(), queue.delay_seconds if delay_seconds is None else delay_seconds)
+
+    def send_message(self, QueueUrl: str, MessageBody: str, MessageAttributes: Optional[Dict[str, Any]] = None, DelaySeconds: Optional[int] = None) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'SendMessage', 'RequestThrottled')
+        queue = self.queue(QueueUrl)
+        try:
+            message = self._new_message(queue, MessageBody, MessageAttributes, DelaySeconds)
+        except ValueError as e:
+            raise client_error('InvalidParameterValue', str(e), 'SendMessage') from None
+        queue.add(message)
+        return {'MessageId': message.message_id, 'MD5OfMessageBody': message.md5}
+
+    def send_message_batch(self, QueueUrl: str, Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'SendMessageBatch', 'RequestThrottled')
+        if not Entries:
+            raise client_error('AWS.SimpleQueueService.EmptyBatchRequest', 'There should be at least one SendMessageBatchRequestEntry in the request.', 'SendMessageBatch')
+        if len(Entries) > 10:
+            raise client_error('AWS.SimpleQueueService.TooManyEntriesInBatchRequest', 'Maximum number of entries per request are 10.', 'SendMessageBatch')
+        if len({entry['Id'] for entry in Entries}) != len(Entries):
+            raise client_error('AWS.SimpleQueueService.BatchEntryIdsNotDistinct', 'Two or more batch entries in the request have the same Id.', 'SendMessageBatch')
+        if sum(len(entry['MessageBody'].encode('utf-8')) for entry in Entries) > MAX_MESSAGE_BYTES:
+            raise client_error('AWS.SimpleQueueService.BatchRequestTooLong', 'Batch requests cannot be longer than 262144 bytes.', 'SendMessageBatch')
+
+        queue = self.queue(QueueUrl)
+        successful, failed = [], []
+        for entry in Entries:
+            try:
+                message = self._new_message(queue, entry['MessageBody'], entry.get('MessageAttributes'), entry.get('DelaySeconds'))
+            except ValueError as e:
+                failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': 'InvalidParameterValue', 'Message': str(e)})
+                continue
+            queue.add(message)
+            successful.append({'Id': entry['Id'], 'MessageId': message.message_id, 'MD5OfMessageBody': message.md5})
+        return {'Successful': successful, 'Failed': failed}
+
+    # Receiving
+
+    def _expire(self, queue: LocalQueue, now: float) -> None:
+        expired = [message_id for message_id, message in queue.messages.items() if message.sent_at + queue.retention_seconds <= now]
+        for message_id in expired:
+            del queue.messages[message_id]
+
+    def _redrive(self, queue: LocalQueue, message: LocalMessage) -> None:
+        """Moves a message that has been received maxReceiveCount times to the dead-letter queue."""
+        del queue.messages[message.message_id]
+        dead_letter_queue = self.queue(queue.dead_letter_queue)
+        message.receive_count = 0
+        message.first_received_at = None
+        message.receipt_handle = None
+        message.visible_at = self.clock()
+        dead_letter_queue.add(message)
+
+    def _format(self, message: LocalMessage, attribute_names: Optional[List[str]], message_attribute_names: Optional[List[str]]) -> Dict[str, Any]:
+        formatted = {
+            'MessageId': message.message_id,
+            'ReceiptHandle': message.receipt_handle,
+            'MD5OfBody': message.md5,
+            'Body': message.body,
+        }
+        if attribute_names:
+            attributes = {
+                'ApproximateReceiveCount': str(message.receive_count),
+                'SentTimestamp': str(int(message.sent_at * 1000)),
+                'ApproximateFirstReceiveTimestamp': str(int(message.first_received_at * 1000)),
+            }
+            if 'All' not in attribute_names:
+                attributes = {name: value for name, value in attributes.items() if name in attribute_names}
+            formatted['Attributes'] = attributes
+        if message_attribute_names and message.message_attributes:
+            if 'All' in message_attribute_names or '.*' in message_attribute_names:
+                formatted['MessageAttributes'] = dict(message.message_attributes)
+            else:
+                formatted['MessageAttributes'] = {name: value for name, value in message.message_attributes.items() if name in message_attribute_names}
+        return formatted
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, WaitTimeSeconds: int = 0, VisibilityTimeout: Optional[int] = None, AttributeNames: Optional[List[str]] = None, MessageSystemAttributeNames: Optional[List[str]] = None, MessageAttributeNames: Optional[List[str]] = None) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'ReceiveMessage', 'RequestThrottled')
+        if not 1 <= MaxNumberOfMessages <= 10:
+            raise client_error('InvalidParameterValue', 'Value for parameter MaxNumberOfMessages is invalid. Reason: Must be between 1 and 10.', 'ReceiveMessage')
+        queue = self.queue(QueueUrl)
+        visibility_timeout = queue.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        deadline = time.monotonic() + WaitTimeSeconds
+        with queue.condition:
+            while True:
+                now = self.clock()
+                self._expire(queue, now)
+                received = []
+                for message in list(queue.messages.values()):
+                    if len(received) == MaxNumberOfMessages:
+                        break
+                    if message.visible_at > now:
+                        continue
+                    if queue.dead_letter_queue and queue.max_receive_count and message.receive_count >= queue.max_receive_count:
+                        self._redrive(queue, message)
+                        continue
+                    message.receive_count += 1
+                    message.first_received_at = message.first_received_at or now
+                    message.visible_at = now + visibility_timeout
+                    message.receipt_handle = f"{message.message_id}#{uuid.uuid4().hex}"
+                    queue.receipt_handles[message.receipt_handle] = message.message_id
+                    received.append(message)
+
+                remaining = deadline - time.monotonic()
+                if received or remaining <= 0:
+                    break
+                pending = [message.visible_at - now for message in queue.messages.values() if message.visible_at > now]
+                queue.condition.wait(min([remaining] + pending))
+
+        attribute_names = (AttributeNames or []) + (MessageSystemAttributeNames or [])
+        messages = [self._format(message, attribute_names, MessageAttributeNames) for message in received]
+        return {'Messages': messages} if messages else {}
+
+    # Deleting and visibility
+
+    def _in_flight(self, queue: LocalQueue, receipt_handle: str, operation: str) -> Optional[LocalMessage]:
+        """Returns the message a receipt handle was issued for, or None if it has since been deleted or re-received.
+
+        As in SQS, only the most recent receipt handle of a message can delete it; older handles are accepted
+        but have no effect.
+        """
+        if receipt_handle not in queue.receipt_handles:
+            raise client_error('ReceiptHandleIsInvalid', f'The input receipt handle "{receipt_handle}" is not a valid receipt handle.', operation)
+        message = queue.messages.get(queue.receipt_handles[receipt_handle])
+        return message if message is not None and message.receipt_handle == receipt_handle else None
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'DeleteMessage', 'RequestThrottled')
+        queue = self.queue(QueueUrl)
+        with queue.condition:
+            message = self._in_flight(queue, ReceiptHandle, 'DeleteMessage')
+            if message is not None:
+                del queue.messages[message.message_id]
+        return {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: List[Dict[str, str]]) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'DeleteMessageBatch', 'RequestThrottled')
+        if len(Entries) > 10:
+            raise client_error('AWS.SimpleQueueService.TooManyEntriesInBatchRequest', 'Maximum number of entries per request are 10.', 'DeleteMessageBatch')
+        queue = self.queue(QueueUrl)
+        successful, failed = [], []
+        with queue.condition:
+            for entry in Entries:
+                try:
+                    message = self._in_flight(queue, entry['ReceiptHandle'], 'DeleteMessageBatch')
+                except ClientError as e:
+                    failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': 'ReceiptHandleIsInvalid', 'Message': e.response['Error']['Message']})
+                    continue
+                if message is not None:
+                    del queue.messages[message.message_id]
+                successful.append({'Id': entry['Id']})
+        return {'Successful': successful, 'Failed': failed}
+
+    def change_message_visibility(self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int) -> Dict[str, Any]:
+        self.simulator.call('sqs', 'ChangeMessageVisibility', 'RequestThrottled')
+        queue = self.queue(QueueUrl)
+        with queue.condition:
+            message = self._in_flight(queue, ReceiptHandle, 'ChangeMessageVisibility')
+            now = self.clock()
+            if message is None or message.visible_at <= now:
+                raise client_error('MessageNotInflight', 'The message referred to is not in flight.', 'ChangeMessageVisibility')
+            message.visible_at = now + VisibilityTimeout
+            queue.condition.notify_all()
+        return {}
@@ -1,15 +1,156 @@
+import inspect
+import json
+import logging
+import os
+import random
+import time
 from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+# Payload limits for logged arguments, overridable per container
+MAX_VALUE_CHARS = int(os.getenv('LOG_MAX_VALUE_CHARS', '256'))
+MAX_ITEMS = int(os.getenv('LOG_MAX_ITEMS', '10'))
+MAX_DEPTH = 4
+REDACTED = '[REDACTED]'
+REDACT_KEYS = frozenset(
+    ['password', 'secret', 'token', 'access_token', 'id_token', 'refresh_token', 'authorization', 'cookie', 'api_key']
+    + [key.strip().lower() for key in os.getenv('LOG_REDACT_KEYS', '').split(',') if key.strip()]
+)
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parses LOG_SAMPLE_RATES, e.g. "app.lib.dynamodb_controller=0.01,app.services=0.25"."""
+    rates = {}
+    for entry in spec.split(','):
+        if '=' in entry:
+            name, rate = entry.split('=', 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+_default_sample_rate = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+_sample_rates: Dict[str, float] = parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))
+_resolved_rates: Dict[str, float] = {}
+
+def set_sample_rate(logger_name: str, rate: float) -> None:
+    """Sets the fraction of successful calls logged by ``logger_name`` and the loggers below it."""
+    _sample_rates[logger_name] = rate
+    _resolved_rates.clear()
+
+def sample_rate(logger_name: str) -> float:
+    """The sample rate of the most specific configured logger name, or LOG_SAMPLE_RATE."""
+    rate = _resolved_rates.get(logger_name)
+    if rate is None:
+        rate = _default_sample_rate
+        name = logger_name
+        while name:
+            if name in _sample_rates:
+                rate = _sample_rates[name]
+                break
+            name = name.rpartition('.')[0]
+        _resolved_rates[logger_name] = rate
+    return rate
+
+def is_sampled(logger_name: str) -> bool:
+    rate = sample_rate(logger_name)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+def summarize(value: Any, depth: int = 0) -> Any:
+    """A JSON-friendly copy of ``value`` with long strings truncated, long collections cut short and
+    sensitive keys redacted.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) <= MAX_VALUE_CHARS:
+            return value
+        return f"{value[:MAX_VALUE_CHARS]}...(+{len(value) - MAX_VALUE_CHARS} chars)"
+    if depth >= MAX_DEPTH:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        summary = {}
+        for index, (key, item) in enumerate(value.items()):
+            if index == MAX_ITEMS:
+                summary['...'] = f"+{len(value) - MAX_ITEMS} keys"
+                break
+            key = str(key)
+            summary[key] = REDACTED if key.lower() in REDACT_KEYS else summarize(item, depth + 1)
+        return summary
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        summary = [summarize(item, depth + 1) for item in items[:MAX_ITEMS]]
+        if len(items) > MAX_ITEMS:
+            summary.append(f"...(+{len(items) - MAX_ITEMS} items)")
+        return summary
+    if hasattr(value, 'model_dump'):
+        return summarize(value.model_dump(), depth)
+    return summarize(repr(value), depth)
+
+class Summarized:
+    """Log argument that is only truncated, redacted and serialized if the record is emitted.
+
+    Use as ``logger.info("Received %s", Summarized(payload))`` instead of formatting the payload up front.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        summary = summarize(self.value)
+        return summary if isinstance(summary, str) else json.dumps(summary, default=str)
+
+class CallRecord:
+    """Structured log message for one method call, serialized to JSON only when emitted."""
+    __slots__ = ('method', 'arg_names', 'args', 'kwargs', 'duration_ms', 'error')
+
+    def __init__(self, method: str, arg_names: Tuple[str, ...], args: tuple, kwargs: Dict[str, Any], duration_ms: float, error: Optional[BaseException] = None):
+        self.method = method
+        self.arg_names = arg_names
+        self.args = args
+        self.kwargs = kwargs
+        self.duration_ms = duration_ms
+        self.error = error
+
+    def fields(self) -> Dict[str, Any]:
+        named = dict(zip(self.arg_names, self.args))
+        if len(self.args) > len(self.arg_names):
+            named['*args'] = self.args[len(self.arg_names):]
+        named.update(self.kwargs)
+        fields = {
+            'event': 'call_failed' if self.error else 'call',
+            'method': self.method,
+            'duration_ms': round(self.duration_ms, 3),
+            'args': summarize(named),
+        }
+        if self.error is not None:
+            fields['error'] = summarize(f"{type(self.error).__name__}: {self.error}")
+        return fields
+
+    def __str__(self) -> str:
+        return json.dumps(self.fields(), default=str)
 
 def log_and_handle_exceptions(method):
-    """Decorator for logging method calls and handling exceptions."""
+    """Decorator for logging method calls and handling exceptions.
+
+    Logs one structured record per call with its arguments (truncated and redacted) and duration.
+    Successful calls are logged at INFO, subject to the logger's sample rate; failures are always
+    logged at ERROR and re-raised. Nothing is formatted unless a handler emits the record.
+    """
+    code = inspect.unwrap(method).__code__
+    arg_names = code.co_varnames[1:code.co_argcount]
+    name = method.__qualname__
+
     @wraps(method)
     def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
         try:
-            self.logger.info(f"Calling {method.__name__} with args: {args}, kwargs: {kwargs}")
             result = method(self, *args, **kwargs)
-            self.logger.info(f"{method.__name__} completed successfully")
-            return result
         except Exception as e:
-            self.logger.error(f"Unexpected error in {method.__name__}: {e}")
+            if self.logger.isEnabledFor(logging.ERROR):
+                duration_ms = (time.perf_counter() - start) * 1000
+                self.logger.error(CallRecord(name, arg_names, args, kwargs, duration_ms, e))
             raise
+        logger = self.logger
+        if logger.isEnabledFor(logging.INFO) and is_sampled(logger.name):
+            logger.info(CallRecord(name, arg_names, args, kwargs, (time.perf_counter() - start) * 1000))
+        return result
     return wrapper
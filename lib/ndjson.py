@@ -0,0 +1,59 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Tuple
+from app.lib.responses import dumps
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - every API image installs orjson
+    orjson = None
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+# One question is a few KB at most; a longer line is a broken or hostile body, not a record
+MAX_LINE_BYTES = 256 * 1024
+
+class LineTooLong(ValueError):
+    """Raised when an NDJSON body has a line longer than the limit."""
+
+def encode_lines(records: Iterable[Any]) -> Iterator[bytes]:
+    """Newline-delimited JSON for each record, produced as the records are."""
+    for record in records:
+        yield dumps(record) + b'\n'
+
+def loads(line: bytes) -> Any:
+    """Parses one NDJSON line, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, bytes]]:
+    """The non-blank lines of a body read chunk by chunk, with their 1-based line numbers.
+
+    Only the current partial line is held between chunks, however large the body is.
+
+    Raises:
+        LineTooLong: If a line exceeds ``max_line_bytes``.
+    """
+    buffer = b''
+    line_number = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line_number += 1
+            line = buffer[start:end].strip()
+            start = end + 1
+            if len(line) > max_line_bytes:
+                raise LineTooLong(f"Line {line_number} is longer than {max_line_bytes} bytes")
+            if line:
+                yield line_number, line
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(f"Line {line_number + 1} is longer than {max_line_bytes} bytes")
+    line = buffer.strip()
+    if line:
+        yield line_number + 1, line
@@ -1,21 +1,47 @@
-import openai
 import os
 import logging
-from typing import Dict, List, Optional
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+from app.lib.llm_response_cache import InMemoryResponseCache, DynamoDBResponseCache, build_cache_key
+from app.lib.tracing import record_cache_result, traced
+from app.lib.logging import Summarized
+
+# Shared across controller instances so warm containers reuse responses
+default_response_cache = InMemoryResponseCache()
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether an OpenAI request should be retried; checked lazily so the openai package is only
+    imported once a request has actually been made."""
+    import openai
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.APIError))
 
 class OpenAIController:
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = "gpt-4o-mini", max_tokens: Optional[int] = 16000, temperature: Optional[float] = 0.9, retry_limit: Optional[int] = 3):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = "gpt-4o-mini", max_tokens: Optional[int] = 16000, temperature: Optional[float] = 0.9, retry_limit: Optional[int] = 3, response_cache: Optional[Any] = default_response_cache):
         self.logger = logging.getLogger(__name__)
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        openai.api_key = self.api_key
-        self.client = openai.Client(api_key=self.api_key)
+        # The openai package takes a large share of cold start time, so the client is built on first use
+        self._client = None
         self.model = model
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.retry_limit = retry_limit
+        self.response_cache = response_cache
         self.logger.info(f"OpenAIController initialized with model: {self.model} and max_tokens: {self.max_tokens}")
 
+    @property
+    def client(self) -> Any:
+        """The OpenAI client, created (and the openai package imported) on first use."""
+        if self._client is None:
+            import openai
+            openai.api_key = self.api_key
+            self._client = openai.Client(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        self._client = client
+
     def set_model(self, model: str, max_tokens: int):
         """Sets the model and max_tokens for the current context."""
         self.model = model
@@ -25,19 +51,33 @@ class OpenAIController:
     @retry(
         stop=stop_after_attempt(3),  # Retry up to 3 times
         wait=wait_exponential(multiplier=1, min=4, max=10),  # Exponential backoff
-        retry=retry_if_exception_type((openai.APIConnectionError, openai.RateLimitError, openai.APIError))
+        retry=retry_if_exception(is_retryable_error)
     )
-    def _send_request(self, messages: List[Dict[str, str]]) -> str:
+    @traced('openai', 'chat_completion')
+    def _send_request(self, messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, Any]]:
         """Handles the actual API request with retry logic."""
-        print("requesting")
+        start = time.perf_counter()
         response = self.client.chat.completions.create(
             model=self.model,
             messages=messages,
             max_tokens=self.max_tokens,
             temperature=self.temperature
         )
+        latency_ms = int((time.perf_counter() - start) * 1000)
         output = response.choices[0].message.content
-        return output
+        return output, self.extract_usage(response, latency_ms)
+
+    def extract_usage(self, response: Any, latency_ms: int) -> Dict[str, Any]:
+        """Pulls token accounting out of a chat completion response."""
+        usage = getattr(response, 'usage', None)
+        prompt_details = getattr(usage, 'prompt_tokens_details', None)
+        return {
+            "model": getattr(response, 'model', None) or self.model,
+            "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+            "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+            "cached_tokens": getattr(prompt_details, 'cached_tokens', 0) or 0,
+            "latency_ms": latency_ms,
+        }
 
     def generate_prompt(self, system_message: str, user_message: str) -> List[Dict[str, str]]:
         """Constructs the prompt with system and user roles."""
@@ -46,14 +86,34 @@ class OpenAIController:
             {"role": "user", "content": user_message}
         ]
 
-    def get_response(self, prompt: List[Dict[str, str]]) -> Dict[str, str]:
-        """Handles API interaction and returns parsed response."""
-        response_text = self._send_request(prompt)
-        self.logger.info(f"Received response: {response_text}")
-        
-       
+    def get_response(self, prompt: List[Dict[str, str]], prompt_version: Optional[str] = None) -> Dict[str, Any]:
+        """Handles API interaction and returns parsed response along with its token usage.
+
+        Responses to versioned prompts are cached; the key includes the prompt version, so changing a
+        prompt template never serves a response generated from an older version of it.
+        """
+        cache_key = None
+        if prompt_version and self.response_cache is not None:
+            cache_key = build_cache_key(self.model, self.temperature, self.max_tokens, prompt_version, prompt)
+            cached = self.response_cache.get(cache_key)
+            record_cache_result('llm_response', bool(cached))
+            if cached:
+                self.logger.info(f"Response cache hit for prompt version {prompt_version}")
+                return {
+                    "response": cached["response"],
+                    "usage": {"model": cached.get("model") or self.model, "prompt_tokens": 0, "completion_tokens": 0,
+                              "cached_tokens": 0, "latency_ms": 0, "cache_hit": True},
+                }
+
+        response_text, usage = self._send_request(prompt)
+        self.logger.info("Received response: %s", Summarized(response_text))
+        self.logger.info("Token usage: %s", usage)
+        if cache_key:
+            self.response_cache.set(cache_key, {"response": response_text, "model": usage["model"]})
+
         parsed_response = {
             "response": response_text,  # This assumes the full response is the question text; parsing may be needed
+            "usage": usage,
         }
         return parsed_response
 
@@ -64,5 +124,15 @@ class OpenAIController:
         return background_data
 
 def get_openai_controller() -> OpenAIController:
-    """Factory function for creating OpenAIController instances."""
-    return OpenAIController()
\ No newline at end of file
+    """Factory function for creating OpenAIController instances.
+
+    LLM_RESPONSE_CACHE selects the response cache: "memory" (default), "dynamodb" or "none".
+    """
+    cache_mode = os.getenv('LLM_RESPONSE_CACHE', 'memory')
+    if cache_mode == 'none':
+        return OpenAIController(response_cache=None)
+    if cache_mode == 'dynamodb':
+        from app.lib.dynamodb_controller import DynamoDBController
+        dynamodb_controller = DynamoDBController(os.getenv('TABLE_NAME', 'sharp_app_data'))
+        return OpenAIController(response_cache=DynamoDBResponseCache(dynamodb_controller))
+    return OpenAIController()
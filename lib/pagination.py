@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = '1'
+# Truncated HMAC-SHA256; enough to make forging a cursor impractical while keeping tokens short
+SIGNATURE_BYTES = 16
+MAX_CURSOR_CHARS = 2048
+
+class CursorError(ValueError):
+    """A pagination token that is malformed, tampered with or issued for a different query."""
+
+_signing_key: Optional[bytes] = None
+_signing_key_lock = threading.Lock()
+
+def signing_key() -> bytes:
+    """The key cursors are signed with, from CURSOR_SIGNING_KEY.
+
+    Without one, a random key is generated per container, so cursors only page within the container
+    that issued them.
+    """
+    global _signing_key
+    if _signing_key is None:
+        with _signing_key_lock:
+            if _signing_key is None:
+                configured = os.getenv('CURSOR_SIGNING_KEY')
+                if not configured:
+                    logger.warning("CURSOR_SIGNING_KEY is not set; pagination cursors are only valid in this container")
+                    configured = secrets.token_hex(32)
+                _signing_key = configured.encode('utf-8')
+    return _signing_key
+
+def set_signing_key(key: Optional[str]) -> None:
+    """Replaces the signing key; None reads CURSOR_SIGNING_KEY again on next use."""
+    global _signing_key
+    _signing_key = key.encode('utf-8') if key is not None else None
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _key_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        # Decoded back with parse_float=Decimal, so the key round-trips with the types boto3 expects
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+def _sign(scope: str, payload: str) -> bytes:
+    message = f"{CURSOR_VERSION}\0{scope}\0{payload}".encode('utf-8')
+    return hmac.new(signing_key(), message, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]], scope: str) -> Optional[str]:
+    """Turns a LastEvaluatedKey into an opaque, URL-safe pagination token.
+
+    Args:
+        last_evaluated_key (Optional[Dict[str, Any]]): The key DynamoDB returned for the page.
+        scope (str): Identifies the query, e.g. 'quizzes:<community_id>'; the token is only accepted for the same scope.
+
+    Returns:
+        Optional[str]: The token, or None when there are no more pages.
+    """
+    if not last_evaluated_key:
+        return None
+    payload = _b64encode(json.dumps(last_evaluated_key, default=_key_default, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+    return f"{payload}.{_b64encode(_sign(scope, payload))}"
+
+def decode_cursor(token: Optional[str], scope: str) -> Optional[Dict[str, Any]]:
+    """Verifies a token from ``encode_cursor`` and returns the ExclusiveStartKey it carries.
+
+    Args:
+        token (Optional[str]): The token the client sent back; None or empty for the first page.
+        scope (str): The scope of the query being paged.
+
+    Raises:
+        CursorError: If the token is malformed, its signature does not match or it belongs to another scope.
+    """
+    if not token:
+        return None
+    if len(token) > MAX_CURSOR_CHARS or token.count('.') != 1:
+        raise CursorError("Malformed pagination token")
+    payload, signature = token.split('.')
+    try:
+        signature_matches = hmac.compare_digest(_b64decode(signature), _sign(scope, payload))
+    except ValueError:
+        raise CursorError("Malformed pagination token") from None
+    if not signature_matches:
+        raise CursorError("Pagination token does not match this query")
+    try:
+        key = json.loads(_b64decode(payload), parse_float=Decimal)
+    except ValueError:
+        raise CursorError("Malformed pagination token") from None
+    if not isinstance(key, dict):
+        raise CursorError("Malformed pagination token")
+    return key
@@ -0,0 +1,59 @@
+import hashlib
+import logging
+from typing import Dict, List
+
+class PromptTemplate:
+    """A static system prompt plus a user message template, versioned by the hash of both.
+
+    The system prompt is always sent first so that repeated requests share an identical prefix,
+    which lets the provider's prompt caching reuse it.
+    """
+    def __init__(self, name: str, system: str, user_template: str = "{content}"):
+        self.name = name
+        self.system = system
+        self.user_template = user_template
+        self.version = hashlib.sha256(f"{system}\x00{user_template}".encode('utf-8')).hexdigest()[:12]
+
+    def render_user(self, **kwargs) -> str:
+        return self.user_template.format(**kwargs)
+
+    def build_messages(self, **kwargs) -> List[Dict[str, str]]:
+        """Builds the chat messages with the static prefix first and the variable content last."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.render_user(**kwargs)}
+        ]
+
+    def extend(self, name: str, system_suffix: str = "", user_template: str = None) -> 'PromptTemplate':
+        """Derives a new template that keeps this template's system prompt as its prefix."""
+        return PromptTemplate(name, self.system + system_suffix, user_template or self.user_template)
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate(name={self.name!r}, version={self.version!r})"
+
+class PromptRegistry:
+    def __init__(self):
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        existing = self.templates.get(template.name)
+        if existing and existing.version != template.version:
+            raise ValueError(f"Prompt {template.name} is already registered with version {existing.version}")
+        self.templates[template.name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        try:
+            return self.templates[name]
+        except KeyError:
+            raise KeyError(f"Unknown prompt template: {name}") from None
+
+    def versions(self) -> Dict[str, str]:
+        """Returns the current version of every registered prompt, e.g. for stamping stored outputs."""
+        return {name: template.version for name, template in self.templates.items()}
+
+prompt_registry = PromptRegistry()
+
+def get_prompt(name: str) -> PromptTemplate:
+    return prompt_registry.get(name)
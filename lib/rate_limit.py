@@ -0,0 +1,412 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.responses import FastJSONResponse
+from app.lib.update_expression import UpdateExpression
+
+logger = logging.getLogger(__name__)
+
+# 'dynamodb' shares each bucket between containers, 'memory' keeps one bucket per container, 'off' disables limiting
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'dynamodb')
+RATE_LIMIT_USER_BURST = float(os.getenv('RATE_LIMIT_USER_BURST', '60'))
+RATE_LIMIT_USER_PER_SECOND = float(os.getenv('RATE_LIMIT_USER_PER_SECOND', '10'))
+RATE_LIMIT_COMMUNITY_BURST = float(os.getenv('RATE_LIMIT_COMMUNITY_BURST', '300'))
+RATE_LIMIT_COMMUNITY_PER_SECOND = float(os.getenv('RATE_LIMIT_COMMUNITY_PER_SECOND', '50'))
+# Share of a shared bucket a container takes at once and serves locally, and how long it may hold it.
+# Unused tokens are dropped when the lease expires, so a container never holds capacity for long.
+LEASE_FRACTION = float(os.getenv('RATE_LIMIT_LEASE_FRACTION', '0.1'))
+LEASE_SECONDS = float(os.getenv('RATE_LIMIT_LEASE_SECONDS', '1'))
+METRICS_INTERVAL_SECONDS = float(os.getenv('RATE_LIMIT_METRICS_SECONDS', '60'))
+MAX_TRACKED_BUCKETS = 10000
+# Conditional writes lost to other containers before the shared bucket is treated as unavailable
+MAX_SHARED_ATTEMPTS = 3
+LOWEST_BUCKETS_REPORTED = 10
+
+BUCKET_PK_PREFIX = 'RATE_LIMIT'
+# Idle buckets refill completely; their items expire this long after that, since a missing bucket is a full one
+BUCKET_RETENTION_SECONDS = 3600
+
+COMMUNITY_PATH = re.compile(r'^/communit(?:y|ies)/([^/]+)')
+
+@dataclass(frozen=True)
+class Limit:
+    """A token bucket holding up to ``burst`` tokens, refilled at ``per_second``; each request takes one."""
+    burst: float
+    per_second: float
+
+    @classmethod
+    def per_minute(cls, burst: float, count: float) -> 'Limit':
+        return cls(burst, count / 60.0)
+
+    @property
+    def lease(self) -> int:
+        return max(1, int(self.burst * LEASE_FRACTION))
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(self.burst, tokens + max(0.0, elapsed) * self.per_second)
+
+    def until_full(self, tokens: float) -> float:
+        return (self.burst - tokens) / self.per_second if self.per_second > 0 else 0.0
+
+    def wait(self, tokens: float) -> float:
+        """Seconds until a bucket at ``tokens`` has a whole token again."""
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.per_second if self.per_second > 0 else float(BUCKET_RETENTION_SECONDS)
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """The limits for requests matching ``path`` (a regex searched in the request path) and ``methods``.
+
+    ``user`` limits each caller and ``community`` each community named in the path; either may be None.
+    Each rule has its own buckets, so requests to an expensive route do not use up the default rule's.
+    """
+    name: str
+    path: str = ''
+    methods: FrozenSet[str] = frozenset()
+    user: Optional[Limit] = None
+    community: Optional[Limit] = None
+    pattern: Any = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'pattern', re.compile(self.path))
+
+    def matches(self, method: str, path: str) -> bool:
+        return (not self.methods or method in self.methods) and self.pattern.search(path) is not None
+
+def default_rule() -> RateLimitRule:
+    """Every request to an API, limited per user and per community from the RATE_LIMIT_* settings."""
+    return RateLimitRule(
+        'default',
+        user=Limit(RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_SECOND),
+        community=Limit(RATE_LIMIT_COMMUNITY_BURST, RATE_LIMIT_COMMUNITY_PER_SECOND),
+    )
+
+@dataclass
+class Decision:
+    allowed: bool
+    # Seconds until the request would be allowed, and the fewest whole tokens left in its buckets
+    retry_after: float = 0.0
+    remaining: int = 0
+    limit: int = 0
+
+class MemoryBucketStore:
+    """Token buckets held by this container alone."""
+    def __init__(self, max_buckets: int = MAX_TRACKED_BUCKETS):
+        self.buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, wanted: int) -> Tuple[int, float]:
+        """Takes up to ``wanted`` whole tokens; returns how many were taken and the tokens left."""
+        now = time.time()
+        with self.lock:
+            tokens, updated_at = self.buckets.pop(key, (limit.burst, now))
+            tokens = limit.refill(tokens, now - updated_at)
+            granted = min(wanted, int(tokens))
+            tokens -= granted
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return granted, tokens
+
+def stored_tokens(tokens: float) -> Decimal:
+    """A bucket level as written to the table, so a remembered level compares equal to the stored one."""
+    return Decimal(str(round(tokens, 6)))
+
+class DynamoDBBucketStore:
+    """Token buckets shared by every container through one table item per bucket.
+
+    A take refills the bucket from its last write time and writes it back on the condition that nobody has
+    written it since, so containers never take the same tokens twice. The state seen by this container's
+    last write is tried first, which makes an uncontended take a single conditional write; on a lost race
+    the item is read again and the take retried.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController, max_buckets: int = MAX_TRACKED_BUCKETS):
+        self.dynamodb_controller = dynamodb_controller
+        # key -> (tokens, updated_at_ms) as of the last write or read; (None, None) for no item
+        self.known: 'OrderedDict[str, Tuple[Optional[float], Optional[int]]]' = OrderedDict()
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def item_key(key: str) -> Tuple[str, str]:
+        # One partition per bucket, so a busy user or community never heats a partition shared with others
+        rule, scope = key.split('#', 1)
+        return f'{BUCKET_PK_PREFIX}#{scope}', rule
+
+    def take(self, key: str, limit: Limit, wanted: int) -> Tuple[int, float]:
+        """Takes up to ``wanted`` whole tokens; returns how many were taken and the tokens left.
+
+        Raises:
+            ClientError: If the table cannot be reached or the bucket stays contended.
+        """
+        pk, sk = self.item_key(key)
+        with self.lock:
+            tokens, updated_at_ms = self.known.get(key, (None, None))
+        for attempt in range(MAX_SHARED_ATTEMPTS):
+            now_ms = int(time.time() * 1000)
+            level = limit.burst if updated_at_ms is None else limit.refill(tokens, (now_ms - updated_at_ms) / 1000)
+            granted = min(wanted, int(level))
+            if granted < 1:
+                # Other containers only ever lower a bucket, so one empty in a stale state is empty now
+                return 0, level
+            left = level - granted
+            if updated_at_ms is None:
+                condition = Attr('PK').not_exists()
+            else:
+                # Two takes in the same millisecond share a write time; only the level tells them apart
+                condition = Attr('updated_at_ms').eq(updated_at_ms) & Attr('tokens').eq(stored_tokens(tokens))
+            expression = (UpdateExpression()
+                          .set('tokens', stored_tokens(left))
+                          .set('updated_at_ms', now_ms)
+                          .set('ExpiresAt', int(now_ms / 1000 + limit.until_full(left) + BUCKET_RETENTION_SECONDS))
+                          .set_if_not_exists('EntityType', 'RateLimitBucket')
+                          .set_if_not_exists('CreatedAt', now_ms // 1000))
+            try:
+                self.dynamodb_controller.update_item(pk, sk, expression=expression, condition=condition)
+                self.remember(key, left, now_ms)
+                return granted, left
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAX_SHARED_ATTEMPTS - 1:
+                    raise
+            item = self.dynamodb_controller.get_item(pk, sk, projection=['tokens', 'updated_at_ms'])
+            tokens = float(item['tokens']) if item else None
+            updated_at_ms = int(item['updated_at_ms']) if item else None
+            self.remember(key, tokens, updated_at_ms)
+
+    def remember(self, key: str, tokens: Optional[float], updated_at_ms: Optional[int]) -> None:
+        with self.lock:
+            self.known.pop(key, None)
+            self.known[key] = (tokens, updated_at_ms)
+            while len(self.known) > self.max_buckets:
+                self.known.popitem(last=False)
+
+@dataclass
+class LocalBucket:
+    """This container's view of one bucket: tokens leased from the store and when it last said no."""
+    limit: Limit
+    leased: int = 0
+    lease_expires: float = 0.0
+    blocked_until: float = 0.0
+    # Tokens left in the store after the last take, for the remaining-count header and the metrics
+    level: float = 0.0
+
+    def available(self, now: float) -> int:
+        return self.leased if now < self.lease_expires else 0
+
+class RateLimiter:
+    """Admission control over token buckets, with an in-process fast path in front of the bucket store.
+
+    Each container takes tokens from the store a lease at a time and serves requests from the lease until
+    it runs out or expires, and it remembers when a bucket will next have a token, so neither a steady
+    stream of allowed requests nor a flood of rejected ones costs a store call each. If the store fails,
+    the container falls back to its own buckets rather than rejecting or admitting everything.
+    """
+    def __init__(self, store: Any, fallback: Optional[MemoryBucketStore] = None, max_buckets: int = MAX_TRACKED_BUCKETS):
+        self.store = store
+        self.fallback = fallback or (store if isinstance(store, MemoryBucketStore) else MemoryBucketStore())
+        self.buckets: 'OrderedDict[str, LocalBucket]' = OrderedDict()
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        self.counters = {'allowed': 0, 'limited': 0, 'store_takes': 0, 'store_errors': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['RateLimiter']:
+        """The limiter RATE_LIMIT_BACKEND selects, or None when rate limiting is off."""
+        if RATE_LIMIT_BACKEND == 'off':
+            return None
+        if RATE_LIMIT_BACKEND == 'memory':
+            return cls(MemoryBucketStore())
+        return cls(DynamoDBBucketStore(get_dynamodb_controller()))
+
+    def bucket(self, key: str, limit: Limit) -> LocalBucket:
+        bucket = self.buckets.pop(key, None)
+        if bucket is None or bucket.limit != limit:
+            bucket = LocalBucket(limit, level=limit.burst)
+        self.buckets[key] = bucket
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+        return bucket
+
+    def check_local(self, keys: Sequence[Tuple[str, Limit]]) -> Optional[Decision]:
+        """The decision if this container's leases and blocks settle it; takes the tokens when it allows."""
+        now = time.monotonic()
+        with self.lock:
+            buckets = [self.bucket(key, limit) for key, limit in keys]
+            blocked = [bucket.blocked_until - now for bucket in buckets if bucket.blocked_until > now]
+            if blocked:
+                return self.decide(buckets, max(blocked))
+            if any(bucket.available(now) < 1 for bucket in buckets):
+                return None
+            for bucket in buckets:
+                bucket.leased -= 1
+            return self.decide(buckets, 0.0)
+
+    def check(self, keys: Sequence[Tuple[str, Limit]]) -> Decision:
+        """Takes a token from every bucket, leasing more from the store where the local lease has run out."""
+        decision = self.check_local(keys)
+        if decision is not None:
+            return decision
+        wait = 0.0
+        for key, limit in keys:
+            with self.lock:
+                bucket = self.bucket(key, limit)
+                if bucket.available(time.monotonic()) >= 1:
+                    continue
+            granted, level = self.take(key, limit, limit.lease)
+            now = time.monotonic()
+            with self.lock:
+                bucket.level = level
+                if granted:
+                    bucket.leased, bucket.lease_expires = granted, now + LEASE_SECONDS
+                else:
+                    bucket.leased = 0
+                    bucket.blocked_until = now + limit.wait(level)
+                    wait = max(wait, limit.wait(level))
+        with self.lock:
+            buckets = [self.bucket(key, limit) for key, limit in keys]
+            if wait > 0:
+                return self.decide(buckets, wait)
+            now = time.monotonic()
+            for bucket in buckets:
+                bucket.leased = max(0, bucket.available(now) - 1)
+            return self.decide(buckets, 0.0)
+
+    def take(self, key: str, limit: Limit, wanted: int) -> Tuple[int, float]:
+        self.counters['store_takes'] += 1
+        try:
+            return self.store.take(key, limit, wanted)
+        except Exception as e:
+            if self.store is self.fallback:
+                raise
+            self.counters['store_errors'] += 1
+            logger.warning("Rate limit store unavailable, using this container's buckets: %s", e)
+            return self.fallback.take(key, limit, wanted)
+
+    def decide(self, buckets: List[LocalBucket], wait: float) -> Decision:
+        self.counters['limited' if wait > 0 else 'allowed'] += 1
+        remaining = min((int(bucket.level) + bucket.leased for bucket in buckets), default=0)
+        limit = min((int(bucket.limit.burst) for bucket in buckets), default=0)
+        return Decision(allowed=wait <= 0, retry_after=wait, remaining=remaining, limit=limit)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters since the container started and the levels of its emptiest buckets."""
+        now = time.monotonic()
+        with self.lock:
+            levels = [{
+                'bucket': key,
+                'tokens': round(bucket.level + bucket.available(now), 2),
+                'burst': bucket.limit.burst,
+                'blocked_for': round(max(0.0, bucket.blocked_until - now), 2),
+            } for key, bucket in self.buckets.items()]
+            counters = dict(self.counters)
+        levels.sort(key=lambda entry: entry['tokens'] / entry['burst'] if entry['burst'] else 0)
+        return {
+            **counters,
+            'buckets': len(levels),
+            'blocked_buckets': sum(1 for entry in levels if entry['blocked_for'] > 0),
+            'lowest': levels[:LOWEST_BUCKETS_REPORTED],
+        }
+
+def bearer_token(headers: Headers) -> Optional[str]:
+    scheme, _, token = headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return token.strip() or None
+
+class RateLimitMiddleware:
+    """ASGI middleware admitting each request against its rule's per-user and per-community buckets.
+
+    The first rule matching the request applies. Callers are identified by ``identify``, which maps a bearer
+    token to the user's ``sub`` (or None for a token it does not accept); requests without a usable token are
+    limited by client address instead. Rejected requests get a 429 with Retry-After and never reach the app;
+    admitted ones carry RateLimit-Limit and RateLimit-Remaining headers. The limiter's metrics are logged as
+    JSON at most every RATE_LIMIT_METRICS_SECONDS.
+    """
+    def __init__(self, app: Any, rules: Sequence[RateLimitRule] = (), identify: Optional[Callable[[str], Optional[str]]] = None,
+                 limiter: Optional[RateLimiter] = None, exempt_paths: Sequence[str] = ('/__warmup',)):
+        self.app = app
+        self.rules = list(rules) or [default_rule()]
+        self.identify = identify
+        self.limiter = limiter if limiter is not None else RateLimiter.from_env()
+        self.exempt_paths = frozenset(exempt_paths)
+        self.metrics_logged_at = time.monotonic()
+
+    def rule_for(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    def caller(self, scope: Dict[str, Any]) -> str:
+        token = bearer_token(Headers(scope=scope))
+        subject = self.identify(token) if token and self.identify else None
+        if subject:
+            return f'user#{subject}'
+        client = scope.get('client') or ('unknown', 0)
+        return f'client#{client[0]}'
+
+    def bucket_keys(self, rule: RateLimitRule, scope: Dict[str, Any]) -> List[Tuple[str, Limit]]:
+        keys = []
+        if rule.user is not None:
+            keys.append((f"{rule.name}#{self.caller(scope)}", rule.user))
+        match = COMMUNITY_PATH.match(scope['path'])
+        if rule.community is not None and match:
+            keys.append((f'{rule.name}#community#{match.group(1)}', rule.community))
+        return keys
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http' or self.limiter is None or scope['method'] == 'OPTIONS' or scope['path'] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        rule = self.rule_for(scope['method'], scope['path'])
+        keys = self.bucket_keys(rule, scope) if rule is not None else []
+        if not keys:
+            await self.app(scope, receive, send)
+            return
+
+        decision = self.limiter.check_local(keys)
+        if decision is None:
+            decision = await run_in_threadpool(self.limiter.check, keys)
+        self.log_metrics()
+        if not decision.allowed:
+            retry_after = str(max(1, math.ceil(decision.retry_after)))
+            response = FastJSONResponse(
+                {'detail': 'Too many requests', 'retry_after': int(retry_after)},
+                status_code=429,
+                headers={'Retry-After': retry_after, 'RateLimit-Limit': str(decision.limit), 'RateLimit-Remaining': '0'},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_limits(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'ratelimit-limit', str(decision.limit).encode('latin-1')),
+                    (b'ratelimit-remaining', str(decision.remaining).encode('latin-1')),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
+
+    def log_metrics(self) -> None:
+        now = time.monotonic()
+        if now - self.metrics_logged_at < METRICS_INTERVAL_SECONDS:
+            return
+        self.metrics_logged_at = now
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'rate_limits': self.limiter.metrics()}))
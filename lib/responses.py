@@ -0,0 +1,284 @@
+import base64
+import hashlib
+import importlib
+import json
+import os
+import re
+import zlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, Response
+from app.lib.pagination import CursorError, decode_cursor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - every API image installs orjson
+    orjson = None
+
+# Bodies smaller than this are sent uncompressed; compressing them costs more CPU than it saves bytes
+COMPRESSION_MINIMUM_SIZE = int(os.getenv('COMPRESSION_MINIMUM_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSIBLE_TYPES = frozenset(['application/json', 'application/x-ndjson', 'application/problem+json', 'application/javascript'])
+
+MAX_PROJECTED_FIELDS = 20
+# Attributes every projection keeps, so a projected item is never empty
+KEY_ATTRIBUTES = ('PK', 'SK')
+FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_\-]*(\.[A-Za-z_][A-Za-z0-9_\-]*)*$')
+
+# Maintained by every write to a quiz, question or community item; ETags are derived from them
+VERSION_ATTRIBUTES = ('version', 'updated_at')
+VERSION_PROJECTION = list(KEY_ATTRIBUTES + VERSION_ATTRIBUTES)
+# Conditional responses are revalidated on every use and never stored by shared caches
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+def json_default(value: Any) -> Any:
+    """Serializes the types DynamoDB items and models contain that JSON has no native form for.
+
+    Numbers come back from DynamoDB as Decimal: integral values are rendered as integers, the rest as floats.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value) if all(isinstance(item, str) for item in value) else list(value)
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    if hasattr(value, 'value') and isinstance(value.value, bytes):
+        # boto3.dynamodb.types.Binary
+        return base64.b64encode(value.value).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serializes ``content`` to compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, with native Decimal support.
+
+    Returning one from an endpoint also skips FastAPI's jsonable_encoder pass over the content; use it
+    as ``FastAPI(default_response_class=FastJSONResponse)`` so error and plain dict responses match.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parses a ``fields=`` query parameter into the attributes to project.
+
+    Args:
+        fields (Optional[str]): Comma-separated attribute names; nested map attributes as ``a.b``.
+
+    Returns:
+        Optional[List[str]]: The attributes, key attributes included, or None to return whole items.
+
+    Raises:
+        HTTPException: 400 if a name is not a valid attribute path or too many are requested.
+    """
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    if not requested:
+        return None
+    if len(requested) > MAX_PROJECTED_FIELDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PROJECTED_FIELDS} fields can be requested")
+    invalid = [field for field in requested if not FIELD_PATTERN.match(field)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(invalid)}")
+    projection = list(KEY_ATTRIBUTES)
+    for field in requested:
+        if field not in projection:
+            projection.append(field)
+    return projection
+
+def page_start_key(next_token: Optional[str], scope: str) -> Optional[Dict[str, Any]]:
+    """The ExclusiveStartKey carried by a ``next_token`` query parameter.
+
+    Raises:
+        HTTPException: 400 if the token is invalid or was issued for another query.
+    """
+    try:
+        return decode_cursor(next_token, scope)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def versioned(projection: Optional[List[str]]) -> Optional[List[str]]:
+    """``projection`` plus the version attributes, so an ETag can be computed from a projected read."""
+    if projection is None:
+        return None
+    return projection + [attribute for attribute in VERSION_ATTRIBUTES if attribute not in projection]
+
+def make_etag(entity: str, item: Dict[str, Any], *variant: Any) -> str:
+    """A strong ETag for a representation of ``item``.
+
+    Args:
+        entity (str): The entity type, e.g. 'quiz'.
+        item (Dict[str, Any]): The item, or a projection of it with its version attributes.
+        *variant (Any): Whatever else shapes the body (requested fields, page size, cursor).
+
+    Returns:
+        str: The quoted ETag, e.g. ``"quiz-3-1717171717"``.
+    """
+    tag = f"{entity}-{int(item.get('version', 0))}-{int(item.get('updated_at', 0))}"
+    if any(value is not None for value in variant):
+        tag += '-' + hashlib.sha1(repr(variant).encode('utf-8')).hexdigest()[:12]
+    return f'"{tag}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag``.
+
+    Uses weak comparison, as If-None-Match does, and ignores the suffix CompressionMiddleware adds
+    to the ETags of compressed bodies, so a tag received with a gzip body validates the resource.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        for encoding in ('-gzip"', '-br"'):
+            if candidate.endswith(encoding):
+                candidate = candidate[:-len(encoding)] + '"'
+                break
+        if candidate == etag:
+            return True
+    return False
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {'etag': etag, 'cache-control': CONDITIONAL_CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    """The 304 answer to a matching If-None-Match: no body, the same validators."""
+    return Response(status_code=304, headers=etag_headers(etag))
+
+def negotiate_encoding(accept_encoding: str, available: Tuple[str, ...]) -> Optional[str]:
+    """The first of ``available`` the Accept-Encoding header allows, or None."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+_brotli: Any = None
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodings in order of preference; br only when the brotli package is installed."""
+    global _brotli
+    if _brotli is None:
+        try:
+            _brotli = importlib.import_module('brotli')
+        except ImportError:
+            _brotli = False
+    return ('br', 'gzip') if _brotli else ('gzip',)
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+class _Compressor:
+    """Incremental gzip or brotli compression of one response body."""
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self.brotli = _brotli.Compressor(quality=brotli_quality)
+            self.zlib = None
+        else:
+            self.brotli = None
+            # wbits=31 writes a gzip header and trailer
+            self.zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        if self.brotli is not None:
+            return self.brotli.process(data) + (self.brotli.finish() if finish else self.brotli.flush())
+        return self.zlib.compress(data) + self.zlib.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """ASGI middleware that gzip- or brotli-compresses JSON and text responses.
+
+    Whole bodies of at least ``minimum_size`` bytes are compressed in one pass with a Content-Length;
+    streamed bodies are compressed chunk by chunk and flushed after each, so clients see rows as they
+    are produced. Responses that already carry a Content-Encoding are left alone. Brotli is used when
+    the client accepts it and the ``brotli`` package is installed, gzip otherwise. A strong ETag on a
+    compressed body gets the encoding appended, since the bytes differ from the identity response.
+    """
+    def __init__(self, app: Any, minimum_size: int = COMPRESSION_MINIMUM_SIZE, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Dict[str, Any]] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Dict[str, Any]) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', []))
+                headers = Headers(raw=message['headers'])
+                if 'content-encoding' in headers or not is_compressible(headers.get('content-type', '')) or message['status'] in (204, 304):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether compressing is worth it
+                    start_message = message
+                return
+            if passthrough or message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message['headers'])
+                headers.add_vary_header('Accept-Encoding')
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start_message)
+                    await send(message)
+                    passthrough = True
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers['content-encoding'] = encoding
+                etag = headers.get('etag')
+                if etag and etag.startswith('"'):
+                    headers['etag'] = f'{etag[:-1]}-{encoding}"'
+                if more_body:
+                    del headers['content-length']
+                else:
+                    body = compressor.compress(body, finish=True)
+                    headers['content-length'] = str(len(body))
+                    await send(start_message)
+                    await send({'type': 'http.response.body', 'body': body})
+                    start_message = None
+                    return
+                await send(start_message)
+                start_message = None
+
+            if compressor is None:
+                await send(message)
+                return
+            await send({'type': 'http.response.body', 'body': compressor.compress(body, finish=not more_body), 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
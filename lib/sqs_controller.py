@@ -3,17 +3,29 @@ import logging
 from botocore.exceptions import BotoCoreError, ClientError
 from typing import Dict, Any, List, Optional
 from app.lib.logging import log_and_handle_exceptions
+from app.lib.local_backend import is_local_backend, get_local_sqs
+from app.lib.tracing import traced
 
 class SQSController:
     def __init__(self, queue_url: str, region_name: str = 'us-east-2'):
         self.queue_url = queue_url
         self.region_name = region_name
-        self.session = boto3.Session(region_name=region_name)
-        self.sqs = self.session.client('sqs')
+        if is_local_backend():
+            # In-memory stand-in for offline load tests and benchmarks (AWS_BACKEND=local)
+            self.session = None
+            self.sqs = get_local_sqs()
+        else:
+            self.session = boto3.Session(region_name=region_name)
+            self.sqs = self.session.client('sqs')
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
+    def warm_up(self) -> None:
+        """Resolves the endpoint and opens a pooled connection with a cheap read of the queue's ARN."""
+        self.sqs.get_queue_attributes(QueueUrl=self.queue_url, AttributeNames=['QueueArn'])
+
     @log_and_handle_exceptions
+    @traced('sqs')
     def send_message(self, message_body: str, message_attributes: Optional[Dict[str, Any]] = None) -> None:
         """Send a message to the SQS queue.
 
@@ -31,6 +43,28 @@ class SQSController:
         self.sqs.send_message(**send_params)
 
     @log_and_handle_exceptions
+    @traced('sqs')
+    def send_messages(self, message_bodies: List[str]) -> None:
+        """Send messages to the SQS queue in batches of 10.
+
+        Args:
+            message_bodies (List[str]): The bodies of the messages to send.
+
+        Raises:
+            RuntimeError: If any message in a batch could not be sent.
+        """
+        for start in range(0, len(message_bodies), 10):
+            batch = message_bodies[start:start + 10]
+            response = self.sqs.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(i), 'MessageBody': body} for i, body in enumerate(batch)]
+            )
+            failed = response.get('Failed', [])
+            if failed:
+                raise RuntimeError(f"Failed to send {len(failed)} of {len(batch)} messages: {failed}")
+
+    @log_and_handle_exceptions
+    @traced('sqs')
     def receive_messages(self, max_number: int = 1, wait_time_seconds: int = 0, visibility_timeout: int = 30) -> List[Dict[str, Any]]:
         """Receive messages from the SQS queue.
 
@@ -53,6 +87,7 @@ class SQSController:
         return messages
 
     @log_and_handle_exceptions
+    @traced('sqs')
     def delete_message(self, receipt_handle: str) -> None:
         """Delete a message from the SQS queue.
 
@@ -63,3 +98,20 @@ class SQSController:
             QueueUrl=self.queue_url,
             ReceiptHandle=receipt_handle
         )
+
+    @log_and_handle_exceptions
+    @traced('sqs')
+    def delete_messages(self, receipt_handles: List[str]) -> None:
+        """Delete up to 10 messages from the SQS queue in one request.
+
+        Args:
+            receipt_handles (List[str]): The receipt handles of the messages to delete.
+        """
+        if not receipt_handles:
+            return
+        response = self.sqs.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[{'Id': str(i), 'ReceiptHandle': handle} for i, handle in enumerate(receipt_handles)]
+        )
+        for failure in response.get('Failed', []):
+            self.logger.error(f"Failed to delete message {failure['Id']}: {failure.get('Message')}")
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Spans kept per trace; calls beyond this are still counted and timed, just not listed individually
+MAX_SPANS_PER_TRACE = 500
+
+class RequestTrace:
+    """Backend calls made while handling one request (or one Lambda invocation)."""
+    def __init__(self, name: str, trace_id: Optional[str] = None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped_spans = 0
+        self.calls: Dict[str, int] = {}
+        self.backend_ms: Dict[str, float] = {}
+        self.operations: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+
+    def add_span(self, backend: str, operation: str, start: float, end: float, error: Optional[str] = None) -> None:
+        duration_ms = (end - start) * 1000
+        operation_name = f"{backend}.{operation}"
+        with self.lock:
+            self.calls[backend] = self.calls.get(backend, 0) + 1
+            self.backend_ms[backend] = self.backend_ms.get(backend, 0.0) + duration_ms
+            self.operations[operation_name] = self.operations.get(operation_name, 0) + 1
+            if error:
+                self.errors[operation_name] = self.errors.get(operation_name, 0) + 1
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+                return
+            span = {
+                "backend": backend,
+                "operation": operation,
+                "offset_ms": round((start - self.start) * 1000, 3),
+                "duration_ms": round(duration_ms, 3),
+            }
+            if error:
+                span["error"] = error
+            self.spans.append(span)
+
+    def add_cache_result(self, cache: str, hit: bool) -> None:
+        with self.lock:
+            counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self, **fields: Any) -> Dict[str, Any]:
+        """Aggregated call counts, backend time and cache results, plus any extra ``fields``."""
+        with self.lock:
+            summary = {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                **fields,
+                "duration_ms": round(self.elapsed_ms(), 3),
+                "calls": dict(self.calls),
+                "backend_ms": {backend: round(ms, 3) for backend, ms in self.backend_ms.items()},
+                "operations": dict(self.operations),
+            }
+            if self.errors:
+                summary["errors"] = dict(self.errors)
+            if self.cache:
+                summary["cache"] = {cache: dict(counts) for cache, counts in self.cache.items()}
+            return summary
+
+    def server_timing(self) -> str:
+        """The trace as a Server-Timing header value: one metric per backend plus the total."""
+        with self.lock:
+            metrics = [
+                f'{backend};dur={self.backend_ms[backend]:.2f};desc="{count} call{"" if count == 1 else "s"}"'
+                for backend, count in sorted(self.calls.items())
+            ]
+            for cache, counts in sorted(self.cache.items()):
+                metrics.append(f'cache-{cache};desc="{counts["hits"]} hit, {counts["misses"]} miss"')
+        metrics.append(f"total;dur={self.elapsed_ms():.2f}")
+        return ", ".join(metrics)
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar('request_trace', default=None)
+
+def current_trace() -> Optional[RequestTrace]:
+    """The trace of the request being handled in this context, if one was started."""
+    return _current_trace.get()
+
+def start_trace(name: str, trace_id: Optional[str] = None) -> Token:
+    """Starts recording backend calls made in the current context.
+
+    Returns:
+        Token: Pass to ``end_trace`` to restore the previous trace.
+    """
+    return _current_trace.set(RequestTrace(name, trace_id))
+
+def end_trace(token: Token) -> Optional[RequestTrace]:
+    """Stops recording and returns the finished trace."""
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    return trace
+
+@contextmanager
+def request_trace(name: str, trace_id: Optional[str] = None) -> Iterator[RequestTrace]:
+    """Records backend calls made inside the block, e.g. for a Lambda invocation."""
+    token = start_trace(name, trace_id)
+    try:
+        yield _current_trace.get()
+    finally:
+        end_trace(token)
+
+def record_cache_result(cache: str, hit: bool) -> None:
+    """Counts a cache hit or miss against the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_cache_result(cache, hit)
+
+@contextmanager
+def span(backend: str, operation: str) -> Iterator[None]:
+    """Times the block as one call to ``backend``."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        trace.add_span(backend, operation, start, time.perf_counter(), error)
+
+def traced(backend: str, operation: Optional[str] = None) -> Callable:
+    """Decorator that records each call of a controller method as a span of ``backend``.
+
+    Costs a single context variable lookup when no trace is active.
+
+    Args:
+        backend (str): The backend the method talks to, e.g. 'dynamodb'.
+        operation (Optional[str]): The span name; defaults to the method name.
+    """
+    def decorator(method: Callable) -> Callable:
+        name = operation or method.__name__
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return method(*args, **kwargs)
+            start = time.perf_counter()
+            error = None
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                trace.add_span(backend, name, start, time.perf_counter(), error)
+        return wrapper
+    return decorator
+
+def bind_trace(fn: Callable) -> Callable:
+    """Wraps ``fn`` so it reports into the caller's trace when run on another thread.
+
+    Executor threads do not inherit context variables; wrap work before submitting it.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return wrapper
+
+class TraceExporter:
+    """Appends a sampled subset of finished traces, spans included, to a JSON lines file."""
+    def __init__(self, path: str, sample_rate: float = 0.1):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['TraceExporter']:
+        """Built from TRACE_EXPORT_PATH and TRACE_SAMPLE_RATE; None when no path is configured."""
+        path = os.getenv('TRACE_EXPORT_PATH')
+        if not path:
+            return None
+        return cls(path, float(os.getenv('TRACE_SAMPLE_RATE', '0.1')))
+
+    def export(self, trace: RequestTrace, summary: Dict[str, Any]) -> bool:
+        """Writes the trace if it is sampled. Returns whether it was written."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        with trace.lock:
+            record = {**summary, "started_at": trace.started_at, "spans": list(trace.spans), "dropped_spans": trace.dropped_spans}
+        line = json.dumps(record, default=str)
+        try:
+            with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        except OSError as e:
+            # Tracing must never fail the request it describes
+            logger.warning(f"Failed to export trace {trace.trace_id}: {e}")
+            return False
+        return True
+
+class RequestTracingMiddleware:
+    """ASGI middleware that traces every HTTP request.
+
+    Adds a Server-Timing header with the time spent in each backend, logs a JSON summary of the
+    request (call counts, backend time, cache hits) and hands sampled traces to the exporter,
+    configured from the environment unless one is passed in.
+    """
+    def __init__(self, app: Any, exporter: Optional[TraceExporter] = None, log_summaries: bool = True):
+        self.app = app
+        self.exporter = exporter if exporter is not None else TraceExporter.from_env()
+        self.log_summaries = log_summaries
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        token = start_trace(f"{scope['method']} {scope['path']}")
+        trace = _current_trace.get()
+        response = {'status': 500}
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'server-timing', trace.server_timing().encode('latin-1'))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
+            # The matched route template groups requests to the same endpoint
+            route = scope.get('route')
+            summary = trace.summary(
+                method=scope['method'],
+                path=getattr(route, 'path', scope['path']),
+                status=response['status']
+            )
+            if self.log_summaries and logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(summary))
+            if self.exporter is not None:
+                self.exporter.export(trace, summary)
+
+def traced_handler(name: str, exporter: Optional[TraceExporter] = None) -> Callable:
+    """Decorator that traces each invocation of a Lambda handler and logs its summary.
+
+    Args:
+        name (str): The trace name, usually the Lambda's name.
+        exporter (Optional[TraceExporter]): Where sampled traces go; configured from the environment by default.
+    """
+    exporter = exporter if exporter is not None else TraceExporter.from_env()
+
+    def decorator(handler: Callable) -> Callable:
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Any:
+            with request_trace(name, getattr(context, 'aws_request_id', None)) as trace:
+                try:
+                    return handler(event, context)
+                finally:
+                    records = event.get('Records') if isinstance(event, dict) else None
+                    summary = trace.summary(records=len(records) if records is not None else None)
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(json.dumps(summary))
+                    if exporter is not None:
+                        exporter.export(trace, summary)
+        return wrapper
+    return decorator
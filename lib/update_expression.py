@@ -0,0 +1,108 @@
+import re
+from typing import Any, Dict, List, Sequence, Union
+
+# 'a.b' for a nested map entry, 'a[0]' for a list element; a tuple of segments when a map key holds a dot
+AttributePath = Union[str, Sequence[str]]
+
+_SEGMENT_RE = re.compile(r'(.+?)((?:\[\d+\])*)')
+
+class UpdateExpression:
+    """An UpdateExpression built action by action, with a placeholder for every attribute name and value.
+
+    Attribute names never appear in the expression itself, so reserved words such as ``name``, ``data``
+    or ``status`` are safe. Every method returns the builder, so updates read as one chain::
+
+        UpdateExpression().set('status', 'Completed').add('version', 1).remove('error_message')
+
+    Pass the builder to DynamoDBController.update_item or update_op.
+    """
+    def __init__(self):
+        self.actions: Dict[str, List[str]] = {'SET': [], 'REMOVE': [], 'ADD': [], 'DELETE': []}
+        self.names: Dict[str, str] = {}
+        self.values: Dict[str, Any] = {}
+        self._placeholders: Dict[str, str] = {}
+
+    def __bool__(self) -> bool:
+        return any(self.actions.values())
+
+    def path(self, attribute: AttributePath) -> str:
+        """The expression for an attribute path, with placeholders for its names.
+
+        Raises:
+            ValueError: If the path has an empty segment, e.g. ``'a..b'`` or a trailing dot.
+        """
+        if isinstance(attribute, str):
+            matches = [_SEGMENT_RE.fullmatch(segment) for segment in attribute.split('.')]
+            if not all(matches):
+                raise ValueError(f"Invalid attribute path: {attribute!r}")
+            segments = [match.groups() for match in matches]
+        else:
+            segments = [(segment, '') for segment in attribute]
+            if not segments or not all(name for name, _ in segments):
+                raise ValueError(f"Invalid attribute path: {tuple(attribute)!r}")
+        parts = []
+        for name, indexes in segments:
+            placeholder = self._placeholders.get(name)
+            if placeholder is None:
+                placeholder = self._placeholders[name] = f'#u{len(self._placeholders)}'
+                self.names[placeholder] = name
+            parts.append(placeholder + indexes)
+        return '.'.join(parts)
+
+    def value(self, value: Any) -> str:
+        """A placeholder for a value."""
+        placeholder = f':u{len(self.values)}'
+        self.values[placeholder] = value
+        return placeholder
+
+    def set(self, attribute: AttributePath, value: Any) -> 'UpdateExpression':
+        self.actions['SET'].append(f'{self.path(attribute)} = {self.value(value)}')
+        return self
+
+    def set_if_not_exists(self, attribute: AttributePath, value: Any) -> 'UpdateExpression':
+        """Sets the attribute only if the item does not have it yet."""
+        path = self.path(attribute)
+        self.actions['SET'].append(f'{path} = if_not_exists({path}, {self.value(value)})')
+        return self
+
+    def increment(self, attribute: AttributePath, amount: Any = 1) -> 'UpdateExpression':
+        """Adds to a number, starting from zero; unlike add, it works on nested map entries."""
+        path = self.path(attribute)
+        self.actions['SET'].append(f'{path} = if_not_exists({path}, {self.value(0)}) + {self.value(amount)}')
+        return self
+
+    def append(self, attribute: AttributePath, items: List[Any]) -> 'UpdateExpression':
+        """Appends to a list, creating it if the item does not have it yet."""
+        path = self.path(attribute)
+        self.actions['SET'].append(f'{path} = list_append(if_not_exists({path}, {self.value([])}), {self.value(list(items))})')
+        return self
+
+    def add(self, attribute: AttributePath, value: Any) -> 'UpdateExpression':
+        """Adds to a top-level number or unions into a set, creating either if missing."""
+        self.actions['ADD'].append(f'{self.path(attribute)} {self.value(value)}')
+        return self
+
+    def remove(self, attribute: AttributePath) -> 'UpdateExpression':
+        self.actions['REMOVE'].append(self.path(attribute))
+        return self
+
+    def delete(self, attribute: AttributePath, elements: Any) -> 'UpdateExpression':
+        """Removes elements from a set."""
+        self.actions['DELETE'].append(f'{self.path(attribute)} {self.value(elements)}')
+        return self
+
+    def build(self) -> Dict[str, Any]:
+        """UpdateExpression, ExpressionAttributeNames and ExpressionAttributeValues parameters.
+
+        Raises:
+            ValueError: If no action was added.
+        """
+        if not self:
+            raise ValueError("An update expression needs at least one action.")
+        params: Dict[str, Any] = {
+            'UpdateExpression': ' '.join(f'{action} ' + ', '.join(clauses) for action, clauses in self.actions.items() if clauses),
+            'ExpressionAttributeNames': dict(self.names),
+        }
+        if self.values:
+            params['ExpressionAttributeValues'] = dict(self.values)
+        return params
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Input of the scheduled EventBridge rule that keeps API containers warm
+WARMUP_EVENT = {'warmup': True}
+
+def is_warmup_event(event: Any) -> bool:
+    return isinstance(event, dict) and event.get('warmup') is True
+
+def warm_up_on_init() -> bool:
+    """Whether to warm up at import: always inside Lambda, elsewhere only with WARMUP_ON_INIT=true."""
+    flag = os.getenv('WARMUP_ON_INIT')
+    if flag is None:
+        return 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+    return flag.lower() in ('1', 'true', 'yes')
+
+def warm_asgi_app(app: Any, path: str = '/__warmup') -> None:
+    """Sends one request through an ASGI app so its middleware stack and routing are built before the
+    first real request. The path does not need to exist."""
+    async def request() -> None:
+        async def receive() -> Dict[str, Any]:
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message: Dict[str, Any]) -> None:
+            pass
+
+        await app({
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'https',
+            'path': path,
+            'raw_path': path.encode(),
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(b'host', b'warmup')],
+            'client': ('127.0.0.1', 0),
+            'server': ('warmup', 443),
+        }, receive, send)
+
+    asyncio.run(request())
+
+class Warmup:
+    """Named initialization steps that move first-request work into the Lambda init phase.
+
+    Steps run when the module is imported inside Lambda (``run_on_init``) and again whenever the scheduled
+    warm-up ping reaches the handler returned by ``wrap``, which keeps pooled connections and caches fresh.
+    A failing step is logged and skipped; it never fails the init or the ping.
+    """
+    def __init__(self):
+        self.steps: List[Tuple[str, Callable[[], Any]]] = []
+        self.last_run: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, step: Callable[[], Any]) -> None:
+        self.steps.append((name, step))
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """Runs every step and returns each one's duration and outcome."""
+        results = {}
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+                results[name] = {'ok': True}
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+                results[name] = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            results[name]['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        self.last_run = results
+        logger.info(json.dumps({'event': 'warmup', 'steps': results}))
+        return results
+
+    def run_on_init(self) -> None:
+        if warm_up_on_init():
+            self.run()
+
+    def wrap(self, handler: Callable[[Dict[str, Any], Any], Any]) -> Callable[[Dict[str, Any], Any], Any]:
+        """Returns a Lambda handler that answers warm-up pings itself and passes everything else to ``handler``."""
+        def warmup_handler(event: Dict[str, Any], context: Any) -> Any:
+            if is_warmup_event(event):
+                return {'warmed': True, 'steps': self.run()}
+            return handler(event, context)
+        return warmup_handler
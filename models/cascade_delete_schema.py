@@ -0,0 +1,21 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class DeletionStatus(str, Enum):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+
+class DeletionProgress(BaseModel):
+    target: str
+    community_id: str
+    source_id: Optional[str] = None
+    status: DeletionStatus
+    stage: Optional[str] = None
+    deleted: Dict[str, int] = {}
+    runs: int = 0
+    requested_at_ms: int
+    updated_at_ms: Optional[int] = None
+    completed_at_ms: Optional[int] = None
+    error: Optional[str] = None
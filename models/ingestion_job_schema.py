@@ -0,0 +1,24 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class IngestionState(str, Enum):
+    PENDING = "Pending"
+    SCRAPING = "Scraping"
+    CHUNKING = "Chunking"
+    PROCESSING = "Processing"
+    COMBINING = "Combining"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+
+class IngestionJobProgress(BaseModel):
+    source_id: str
+    community_id: str
+    state: IngestionState
+    chunks_total: int = 0
+    chunks_done: int = 0
+    chunks_failed: int = 0
+    percent_complete: float = 0.0
+    stage_started_at_ms: Dict[str, int] = {}
+    stage_durations_ms: Dict[str, int] = {}
+    error: Optional[str] = None
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    # The best score on a quiz, or the sum of best scores across the community's quizzes
+    score: float
+    quizzes_scored: Optional[int] = None
+    achieved_at: int
+
+class Leaderboard(BaseModel):
+    community_id: str
+    quiz_id: Optional[str] = None
+    entries: List[LeaderboardEntry] = []
+    player_count: Optional[int] = None
+    attempt_count: Optional[int] = None
+    average_score: Optional[float] = None
+    compacted_at: Optional[int] = None
@@ -0,0 +1,32 @@
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class GenerationStatus(str, Enum):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+
+class QuestionGenerationRequest(BaseModel):
+    question_count: int = Field(20, ge=1, le=500, description="How many new questions to add to the quiz")
+    source_ids: Optional[List[str]] = Field(None, description="Knowledge sources to draw from; all of the community's when omitted")
+
+class GenerationProgress(BaseModel):
+    job_id: str
+    quiz_id: str
+    community_id: str
+    status: GenerationStatus
+    requested: int
+    # Questions written to the quiz, and generated questions dropped as duplicates or malformed
+    generated: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    batches_done: int = 0
+    failed_batches: int = 0
+    batches_total: int = 0
+    runs: int = 0
+    requested_at_ms: int
+    updated_at_ms: Optional[int] = None
+    completed_at_ms: Optional[int] = None
+    error: Optional[str] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, UUID4
-from typing import List
+from pydantic import BaseModel, Field, UUID4
+from typing import List, Optional
 
 class QuestionModel(BaseModel):
     question_id: UUID4
@@ -9,3 +9,14 @@ class QuestionModel(BaseModel):
     options: List[str]
     answer: List[str]
     question_type: str
+
+class QuestionRecord(BaseModel):
+    """One question line of an NDJSON quiz export or import.
+
+    A question_id is kept on import, so importing the same export twice overwrites instead of duplicating.
+    """
+    question_id: Optional[UUID4] = None
+    question_text: str = Field(..., min_length=1)
+    options: List[str] = Field(..., min_length=1)
+    answer: List[str] = Field(..., min_length=1)
+    question_type: str = "multiple_choice"
@@ -0,0 +1,30 @@
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class AttemptStatus(str, Enum):
+    IN_PROGRESS = "InProgress"
+    SUBMITTED = "Submitted"
+
+class AnswerSubmission(BaseModel):
+    question_id: str
+    selected: List[str] = Field(..., description="The options chosen; several for multi-select questions")
+
+class AttemptSubmit(BaseModel):
+    answers: List[AnswerSubmission]
+
+class AttemptResult(BaseModel):
+    attempt_id: str
+    quiz_id: str
+    community_id: str
+    user_id: str
+    status: AttemptStatus
+    started_at: int
+    question_count: int
+    submitted_at: Optional[int] = None
+    score: Optional[float] = None
+    max_score: Optional[int] = None
+    correct_count: Optional[int] = None
+    # Per question: the options chosen and the credit given, from 0 to 1
+    answers: Dict[str, List[str]] = {}
+    results: Dict[str, float] = {}
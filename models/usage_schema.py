@@ -0,0 +1,4 @@
+from pydantic import BaseModel, Field
+
+class BudgetUpdate(BaseModel):
+    token_budget: int = Field(..., ge=0, description="Total tokens the community may spend; 0 disables the limit")
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.entity_cache import EntityCache, community_cache_key, get_entity_cache
+from app.lib.logging import log_and_handle_exceptions
+from app.lib.sqs_controller import SQSController
+from app.lib.tracing import bind_trace
+from app.lib.update_expression import UpdateExpression
+from app.models.cascade_delete_schema import DeletionProgress, DeletionStatus
+
+# Set on a community or knowledge source once its deletion is requested; readers treat the item as gone
+TOMBSTONE_ATTRIBUTE = 'deleted_at'
+JOB_PK = 'CASCADE_DELETE'
+TARGETS = ('community', 'knowledge_source')
+# Keys-only pages are small, so each page feeds many parallel batch deletes
+DELETE_PAGE_SIZE = 500
+BATCH_DELETE_SIZE = 25
+MAX_DELETE_WORKERS = int(os.getenv('CASCADE_DELETE_WORKERS', '8'))
+# Finished jobs stay readable for a week
+JOB_RETENTION_SECONDS = 7 * 86400
+
+class DeletionTargetNotFound(Exception):
+    """Raised when the community or knowledge source to delete does not exist."""
+
+class ChildSet(NamedTuple):
+    """One kind of item under a parent: every item in partition ``pk`` whose SK starts with ``prefix``."""
+    name: str
+    pk: str
+    prefix: str
+
+def parent_key(target: str, community_id: str, source_id: Optional[str] = None) -> Tuple[str, str]:
+    if target == 'community':
+        return 'COMMUNITY', f'COMMUNITY#{community_id}'
+    return 'KNOWLEDGE_SOURCE', f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+
+def child_sets(target: str, community_id: str, source_id: Optional[str] = None) -> List[ChildSet]:
+    """The kinds of items deleted with a parent, in deletion order."""
+    if target == 'community':
+        base = f'COMMUNITY#{community_id}#'
+        return [
+            # Sources go first, so ingestion still in flight stops at its next state transition
+            ChildSet('knowledge_sources', 'KNOWLEDGE_SOURCE', f'{base}KNOWLEDGE_SOURCE#'),
+            ChildSet('chunks', 'KNOWLEDGE_SOURCE_CHUNK', f'{base}KNOWLEDGE_SOURCE#'),
+            ChildSet('unchunked_output', 'KNOWLEDGE_SOURCE_UNCHUNK', f'{base}KNOWLEDGE_SOURCE#'),
+            ChildSet('questions', 'QUESTION', f'{base}QUIZ#'),
+            ChildSet('quizzes', 'QUIZ', f'{base}QUIZ#'),
+            ChildSet('members', f'COMMUNITY#{community_id}', 'MEMBER#'),
+            # Added last, so the stage numbers saved by jobs already in flight keep their meaning
+            ChildSet('attempts', 'QUIZ_ATTEMPT', f'{base}QUIZ#'),
+            ChildSet('scores', 'SCORE', base),
+            ChildSet('leaderboards', 'LEADERBOARD', base),
+            ChildSet('question_generations', 'QUESTION_GENERATION', base),
+        ]
+    base = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+    return [
+        ChildSet('chunks', 'KNOWLEDGE_SOURCE_CHUNK', f'{base}#CHUNK#'),
+        ChildSet('unchunked_output', 'KNOWLEDGE_SOURCE_UNCHUNK', base),
+    ]
+
+def user_link_key(user_id: str, community_id: str) -> Dict[str, str]:
+    return {'PK': f'USER#{user_id}', 'SK': f'COMMUNITY#{community_id}'}
+
+class CascadeDeleteService:
+    """Deletes a community or knowledge source with everything under it, in the background.
+
+    A request tombstones the parent, so reads treat it as gone at once, records a job item and queues
+    the job. The cascade_delete Lambda walks each kind of child with paginated keys-only queries,
+    deletes every page with parallel batch writes and records its position and counts on the job after
+    each page, so a redelivered or continued job resumes where it stopped. The parent goes last.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController, sqs_controller: Optional[SQSController] = None, cache: Optional[EntityCache] = None):
+        self.dynamodb_controller = dynamodb_controller
+        self.sqs_controller = sqs_controller
+        self.cache = cache or EntityCache(None)
+        self.logger = logging.getLogger(__name__)
+
+    @log_and_handle_exceptions
+    def request_deletion(self, target: str, community_id: str, source_id: Optional[str] = None, requested_by: Optional[str] = None) -> DeletionProgress:
+        """Tombstones the parent and queues its deletion; requesting it again returns the existing job.
+
+        Raises:
+            DeletionTargetNotFound: If the parent does not exist and no deletion of it is recorded.
+        """
+        pk, sk = parent_key(target, community_id, source_id)
+        now_ms = int(time.time() * 1000)
+        try:
+            parent = self.dynamodb_controller.update_item(
+                pk, sk, {TOMBSTONE_ATTRIBUTE: now_ms // 1000},
+                condition=Attr('PK').exists() & Attr(TOMBSTONE_ATTRIBUTE).not_exists(), return_values='ALL_NEW'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            job = self.get_job(target, community_id, source_id)
+            if job is None:
+                raise DeletionTargetNotFound(f"{target} {source_id or community_id} not found") from None
+            return self.build_progress(job)
+        if target == 'community':
+            self.cache.evict([community_cache_key(community_id)])
+
+        job = {
+            'PK': JOB_PK,
+            'SK': sk,
+            'EntityType': 'CascadeDelete',
+            'CreatedAt': now_ms // 1000,
+            'target': target,
+            'community_id': community_id,
+            'status': DeletionStatus.PENDING.value,
+            'stage': 0,
+            'deleted': {},
+            'runs': 0,
+            'requested_at_ms': now_ms,
+            'updated_at_ms': now_ms,
+        }
+        if source_id:
+            job['source_id'] = source_id
+        if requested_by:
+            job['requested_by'] = requested_by
+        if target == 'community':
+            # The community is gone once deleted, so the job keeps who may read its progress
+            job['owner_ids'] = list(parent.get('owner_ids', []))
+        try:
+            self.dynamodb_controller.put_item(job)
+            self.enqueue(job)
+        except Exception:
+            # Without a queued job nothing would finish the delete, so the parent is restored
+            self.dynamodb_controller.update_item(pk, sk, expression=UpdateExpression().remove(TOMBSTONE_ATTRIBUTE))
+            self.dynamodb_controller.delete_item(JOB_PK, sk)
+            if target == 'community':
+                self.cache.evict([community_cache_key(community_id)])
+            raise
+        return self.build_progress(job)
+
+    def enqueue(self, job: Dict[str, Any]) -> None:
+        if self.sqs_controller is None:
+            raise RuntimeError("CascadeDeleteService needs an SQS controller to queue deletions")
+        self.sqs_controller.send_message(json.dumps({
+            'target': job['target'], 'community_id': job['community_id'], 'source_id': job.get('source_id'),
+        }))
+
+    @log_and_handle_exceptions
+    def get_job(self, target: str, community_id: str, source_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.dynamodb_controller.get_item(JOB_PK, parent_key(target, community_id, source_id)[1])
+
+    @log_and_handle_exceptions
+    def get_progress(self, target: str, community_id: str, source_id: Optional[str] = None) -> Optional[DeletionProgress]:
+        job = self.get_job(target, community_id, source_id)
+        return self.build_progress(job) if job else None
+
+    @staticmethod
+    def build_progress(job: Dict[str, Any]) -> DeletionProgress:
+        sets = child_sets(job['target'], job['community_id'], job.get('source_id'))
+        stage = int(job.get('stage', 0))
+        status = DeletionStatus(job['status'])
+        return DeletionProgress(
+            target=job['target'],
+            community_id=job['community_id'],
+            source_id=job.get('source_id'),
+            status=status,
+            stage=sets[stage].name if stage < len(sets) and status != DeletionStatus.COMPLETED else None,
+            deleted={name: int(count) for name, count in job.get('deleted', {}).items()},
+            runs=int(job.get('runs', 0)),
+            requested_at_ms=int(job['requested_at_ms']),
+            updated_at_ms=int(job['updated_at_ms']) if 'updated_at_ms' in job else None,
+            completed_at_ms=int(job['completed_at_ms']) if 'completed_at_ms' in job else None,
+            error=job.get('error'),
+        )
+
+    @log_and_handle_exceptions
+    def run(self, target: str, community_id: str, source_id: Optional[str] = None, should_stop: Callable[[], bool] = lambda: False) -> bool:
+        """Deletes a job's children page by page, then its parent.
+
+        Args:
+            should_stop (Callable[[], bool]): Checked before each page; when it returns True the job is
+                queued again and the run ends, e.g. as the Lambda nears its timeout.
+
+        Returns:
+            bool: True once the job is complete, False if it was queued to continue.
+        """
+        job = self.get_job(target, community_id, source_id)
+        if job is None or job['status'] == DeletionStatus.COMPLETED.value:
+            return True
+        sk = job['SK']
+        sets = child_sets(target, community_id, source_id)
+        stage = int(job.get('stage', 0))
+        start_key = job.get('start_key')
+        self.update_job(sk, UpdateExpression().set('status', DeletionStatus.RUNNING.value).add('runs', 1))
+
+        with ThreadPoolExecutor(max_workers=MAX_DELETE_WORKERS) as executor:
+            while stage < len(sets):
+                if should_stop():
+                    self.logger.info("Continuing deletion of %s in a new invocation at stage %s", sk, sets[stage].name)
+                    self.enqueue(job)
+                    return False
+                child_set = sets[stage]
+                items, start_key = self.dynamodb_controller.query_with_pagination(
+                    Key('PK').eq(child_set.pk), Key('SK').begins_with(child_set.prefix),
+                    limit=DELETE_PAGE_SIZE, last_evaluated_key=start_key, projection=['PK', 'SK']
+                )
+                keys = [{'PK': item['PK'], 'SK': item['SK']} for item in items]
+                if child_set.name == 'members':
+                    keys += [user_link_key(item['SK'].split('#', 1)[1], community_id) for item in items]
+                self.delete_keys(keys, executor)
+                if not start_key:
+                    stage += 1
+                self.record_page(sk, child_set.name, len(items), stage, start_key)
+
+            pk, _ = parent_key(target, community_id, source_id)
+            parent = self.dynamodb_controller.get_item(pk, sk)
+            if parent is not None and TOMBSTONE_ATTRIBUTE not in parent:
+                # Created again while its old children were deleted; the new parent is left alone
+                self.logger.warning("Not deleting %s: it was created again during its deletion", sk)
+                parent = None
+            if parent is not None and target == 'community':
+                # Members recorded only in the community's list still have links to remove
+                self.delete_keys([user_link_key(member, community_id) for member in parent.get('members', [])], executor)
+        if parent is not None:
+            try:
+                self.dynamodb_controller.delete_item(pk, sk, condition=Attr(TOMBSTONE_ATTRIBUTE).exists())
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                self.logger.warning("Not deleting %s: it was created again during its deletion", sk)
+        now_ms = int(time.time() * 1000)
+        self.update_job(
+            sk, UpdateExpression().set('status', DeletionStatus.COMPLETED.value).set('completed_at_ms', now_ms)
+            .set('ExpiresAt', now_ms // 1000 + JOB_RETENTION_SECONDS).remove('start_key').remove('error')
+        )
+        self.logger.info("Deleted %s and its children", sk)
+        return True
+
+    def delete_keys(self, keys: List[Dict[str, Any]], executor: ThreadPoolExecutor) -> None:
+        """Deletes keys with batch writes of 25, in parallel."""
+        batches = [keys[start:start + BATCH_DELETE_SIZE] for start in range(0, len(keys), BATCH_DELETE_SIZE)]
+        if len(batches) == 1:
+            self.dynamodb_controller.batch_delete_items(batches[0])
+        elif batches:
+            list(executor.map(bind_trace(self.dynamodb_controller.batch_delete_items), batches))
+
+    def record_page(self, sk: str, child_set: str, deleted: int, stage: int, start_key: Optional[Dict[str, Any]]) -> None:
+        """Adds a page's deletions to the job and saves the position the next page starts from."""
+        expression = UpdateExpression().increment(('deleted', child_set), deleted).set('stage', stage)
+        if start_key:
+            expression.set('start_key', start_key)
+        else:
+            expression.remove('start_key')
+        self.update_job(sk, expression)
+
+    @log_and_handle_exceptions
+    def record_error(self, sk: str, error: str) -> None:
+        """Keeps the last error on the job; the queue redelivers it and the next run resumes."""
+        self.update_job(sk, UpdateExpression().set('error', error[:1000]))
+
+    def update_job(self, sk: str, expression: UpdateExpression) -> None:
+        self.dynamodb_controller.update_item(JOB_PK, sk, {'updated_at_ms': int(time.time() * 1000)}, expression=expression)
+
+def get_cascade_delete_service() -> CascadeDeleteService:
+    dynamodb_controller = get_dynamodb_controller()
+    return CascadeDeleteService(dynamodb_controller, SQSController(queue_url=os.getenv('CASCADE_DELETE_QUEUE')), get_entity_cache())
@@ -1,9 +1,15 @@
+import hashlib
 import os
+import threading
+import time
 import requests
 import logging
+from collections import OrderedDict
+from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
+from app.lib.tracing import traced
 
 # Cognito settings
 COGNITO_REGION = os.getenv('COGNITO_REGION')
@@ -11,8 +17,44 @@ USER_POOL_ID = os.getenv('USER_POOL_ID')
 APP_CLIENT_ID = os.getenv('APP_CLIENT_ID')
 COGNITO_JWKS_URL = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
 
+# The user pool's signing keys rarely change; they are cached per container and refetched after the TTL,
+# or early (at most every JWKS_MIN_REFRESH_SECONDS) when a token is signed with an unknown key
+JWKS_TTL_SECONDS = int(os.getenv('JWKS_TTL_SECONDS', '3600'))
+JWKS_MIN_REFRESH_SECONDS = 60
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Subjects of tokens that validated, so per-request rate limiting does not verify every signature again
+TOKEN_SUBJECT_CACHE_SIZE = 1024
+
+_jwks_cache = {'keys': None, 'fetched_at': 0.0}
+_jwks_lock = threading.Lock()
+# Reused so JWKS refreshes go over a kept-alive connection
+_http_session = requests.Session()
+_token_subjects: 'OrderedDict[str, tuple]' = OrderedDict()
+_token_subjects_lock = threading.Lock()
+
+@traced('cognito', 'fetch_jwks')
+def fetch_jwks(url: str = COGNITO_JWKS_URL) -> list:
+    response = _http_session.get(url, timeout=5)
+    response.raise_for_status()
+    return response.json()['keys']
+
+def get_cached_jwks(force_refresh: bool = False) -> list:
+    """The user pool's JSON web keys, fetched once per container and refreshed after JWKS_TTL_SECONDS."""
+    with _jwks_lock:
+        age = time.monotonic() - _jwks_cache['fetched_at']
+        stale = _jwks_cache['keys'] is None or age > JWKS_TTL_SECONDS
+        if stale or (force_refresh and age > JWKS_MIN_REFRESH_SECONDS):
+            _jwks_cache['keys'] = fetch_jwks()
+            _jwks_cache['fetched_at'] = time.monotonic()
+        return _jwks_cache['keys']
+
+def prefetch_jwks() -> None:
+    """Loads the JWKS cache ahead of the first request; does nothing when no user pool is configured."""
+    if USER_POOL_ID and COGNITO_REGION:
+        get_cached_jwks()
+
 class CognitoService:
     def __init__(self):
         self.region = COGNITO_REGION
@@ -21,30 +63,39 @@ class CognitoService:
         self.jwks_url = COGNITO_JWKS_URL
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        self.jwks = self.get_jwks()
 
-    def get_jwks(self):
+    @property
+    def jwks(self):
+        return self.get_jwks()
+
+    def get_jwks(self, force_refresh: bool = False):
         try:
-            response = requests.get(self.jwks_url)
-            response.raise_for_status()
-            return response.json()['keys']
+            return get_cached_jwks(force_refresh)
         except Exception as e:
             self.logger.error(f"Error fetching JWKS: {e}")
             raise HTTPException(status_code=500, detail="Error fetching JWKS")
 
+    def find_signing_key(self, kid: str) -> dict:
+        """The JWK with the given key id, refreshing the cached keys once if the pool has rotated them."""
+        for refresh in (False, True):
+            for key in self.get_jwks(force_refresh=refresh):
+                if key["kid"] == kid:
+                    return key
+        return {}
+
     def validate_token(self, token: str):
         try:
             unverified_headers = jwt.get_unverified_header(token)
             rsa_key = {}
-            for key in self.jwks:
-                if key["kid"] == unverified_headers["kid"]:
-                    rsa_key = {
-                        "kty": key["kty"],
-                        "kid": key["kid"],
-                        "use": key["use"],
-                        "n": key["n"],
-                        "e": key["e"]
-                    }
+            key = self.find_signing_key(unverified_headers["kid"])
+            if key:
+                rsa_key = {
+                    "kty": key["kty"],
+                    "kid": key["kid"],
+                    "use": key["use"],
+                    "n": key["n"],
+                    "e": key["e"]
+                }
             if rsa_key:
                 payload = jwt.decode(
                     token,
@@ -58,6 +109,8 @@ class CognitoService:
             else:
                 self.logger.error(f"Unable to find appropriate key for issuer: https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}")
                 raise HTTPException(status_code=400, detail="Invalid token")
+        except HTTPException:
+            raise
         except jwt.ExpiredSignatureError:
             self.logger.error("Token has expired")
             raise HTTPException(status_code=401, detail="Token has expired")
@@ -77,9 +130,38 @@ class CognitoService:
             "sub": payload.get("sub")
         }
 
+_cognito_service = None
+
 # Dependency
 def get_cognito_service():
-    return CognitoService()
+    global _cognito_service
+    if _cognito_service is None:
+        _cognito_service = CognitoService()
+    return _cognito_service
 
 def get_current_user(token: str = Depends(oauth2_scheme), cognito_service: CognitoService = Depends(get_cognito_service)):
     return cognito_service.extract_claims(token)
+
+def token_subject(token: str) -> Optional[str]:
+    """The ``sub`` of a bearer token that validates, or None; cached by token digest until the token expires.
+
+    Used to key rate limits before routing, while ``get_current_user`` still authenticates every request.
+    """
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+    with _token_subjects_lock:
+        cached = _token_subjects.get(digest)
+        if cached is not None and cached[1] > now:
+            _token_subjects.move_to_end(digest)
+            return cached[0]
+    try:
+        payload = get_cognito_service().validate_token(token)
+    except HTTPException:
+        return None
+    subject = payload.get('sub')
+    if subject:
+        with _token_subjects_lock:
+            _token_subjects[digest] = (subject, float(payload.get('exp', now)))
+            while len(_token_subjects) > TOKEN_SUBJECT_CACHE_SIZE:
+                _token_subjects.popitem(last=False)
+    return subject
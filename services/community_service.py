@@ -1,51 +1,117 @@
 import logging
 import os
 import asyncio
+from datetime import datetime, timezone
 from functools import wraps
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
 from fastapi import HTTPException
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 
-from app.lib.dynamodb_controller import DynamoDBController
+from app.lib.dynamodb_controller import MAX_TRANSACT_ITEMS, DynamoDBController, TransactionCanceledError, get_dynamodb_controller
+from app.lib.entity_cache import EntityCache, community_cache_key, get_entity_cache
 from app.lib.logging import log_and_handle_exceptions
-from app.models.community_schema import CommunityCreate
-from app.models.community_member_schema import CommunityMemberModel
-from app.services.quiz_service import QuizService
+from app.lib.update_expression import UpdateExpression
+from app.models.community_schema import CommunityCreate, MemberAdd
+from app.services.cascade_delete_service import TOMBSTONE_ATTRIBUTE
+
+if TYPE_CHECKING:
+    from app.services.quiz_service import QuizService
+
+# The community item plus a membership item and a user link per member fit in one transaction
+MAX_INITIAL_MEMBERS = (MAX_TRANSACT_ITEMS - 1) // 2
+MEMBER_UPDATE_ATTEMPTS = 3
+
+class CommunityExistsError(Exception):
+    """Raised when creating a community whose ID is already taken."""
+
+def membership_item(community_id: str, user_id: str, joined_at: int) -> Dict[str, Any]:
+    """The community's side of a membership: ``COMMUNITY#<id> / MEMBER#<user id>``."""
+    return {
+        'PK': f'COMMUNITY#{community_id}',
+        'SK': f'MEMBER#{user_id}',
+        'EntityType': 'CommunityMember',
+        'CreatedAt': joined_at,
+        'community_id': community_id,
+        'member_id': user_id,
+        'joined_at': joined_at,
+    }
+
+def user_link_item(user_id: str, community_id: str, joined_at: int) -> Dict[str, Any]:
+    """The user's side of a membership: ``USER#<id> / COMMUNITY#<community id>``, read by UserService.list_communities_for_user."""
+    return {
+        'PK': f'USER#{user_id}',
+        'SK': f'COMMUNITY#{community_id}',
+        'EntityType': 'UserCommunity',
+        'CreatedAt': joined_at,
+        'community_id': community_id,
+        'user_id': user_id,
+        'joined_at': joined_at,
+    }
 
 
 class CommunityService:
-    def __init__(self, dynamodb_controller: DynamoDBController):
+    def __init__(self, dynamodb_controller: DynamoDBController, cache: Optional[EntityCache] = None):
         self.dynamodb_controller = dynamodb_controller
+        # Without a cache, reads go to the table every time
+        self.cache = cache or EntityCache(None)
         self.logger = logging.getLogger(__name__)
 
     @log_and_handle_exceptions
     def create_community(self, community: CommunityCreate) -> None:
+        """Writes the community with both sides of every initial membership in one transaction.
+
+        Raises:
+            CommunityExistsError: If the community ID is taken, including by a community being deleted.
+            ValueError: If there are more than MAX_INITIAL_MEMBERS members.
+        """
+        community_id = str(community.community_id)
+        members = list(dict.fromkeys(str(member) for member in community.members))
+        if len(members) > MAX_INITIAL_MEMBERS:
+            raise ValueError(f"A community can be created with at most {MAX_INITIAL_MEMBERS} members")
         item = {
             'PK': 'COMMUNITY',
             'SK': f'COMMUNITY#{community.community_id}',
             'EntityType': 'Community',
             'CreatedAt': community.created_at,
+            'version': 1,
+            'updated_at': community.created_at,
             'community_id': str(community.community_id),
             'community_name': community.community_name,
             'description': community.description,
-            'members': [str(member) for member in community.members],
+            'members': members,
             'keywords': community.keywords,
             'owner_ids': [str(owner_id) for owner_id in community.owner_ids],
         }
-        self.dynamodb_controller.put_item(item)
+        operations = [self.dynamodb_controller.put_op(item, condition=Attr('PK').not_exists())]
+        for member in members:
+            operations.append(self.dynamodb_controller.put_op(membership_item(community_id, member, community.created_at)))
+            operations.append(self.dynamodb_controller.put_op(user_link_item(member, community_id, community.created_at)))
+        try:
+            self.dynamodb_controller.transact_write(operations)
+        except TransactionCanceledError as e:
+            if e.condition_failed(0):
+                raise CommunityExistsError(f"Community {community_id} already exists") from None
+            raise
+        self.cache.evict([community_cache_key(community_id)])
 
     @log_and_handle_exceptions
-    def get_community(self, community_id: str) -> Dict[str, Any]:
-        return self.dynamodb_controller.get_item('COMMUNITY', f'COMMUNITY#{community_id}')
+    def get_community(self, community_id: str, projection: Optional[List[str]] = None) -> Dict[str, Any]:
+        """The community, or None if it does not exist or is being deleted."""
+        # The tombstone is read with every projection; it is only ever returned as None
+        loaded_projection = projection + [TOMBSTONE_ATTRIBUTE] if projection and TOMBSTONE_ATTRIBUTE not in projection else projection
+        community = self.cache.get_or_load(
+            community_cache_key(community_id), tuple(projection) if projection else None,
+            lambda: self.dynamodb_controller.get_item('COMMUNITY', f'COMMUNITY#{community_id}', projection=loaded_projection)
+        )
+        return None if community is None or TOMBSTONE_ATTRIBUTE in community else community
 
     @log_and_handle_exceptions
     def update_community(self, community_id: str, update_data: Dict[str, Any]) -> None:
-        self.dynamodb_controller.update_item('COMMUNITY', f'COMMUNITY#{community_id}', update_data)
-
-    @log_and_handle_exceptions
-    def delete_community(self, community_id: str) -> None:
-        self.dynamodb_controller.delete_item('COMMUNITY', f'COMMUNITY#{community_id}')
+        update_data = {**update_data, 'updated_at': int(datetime.now(timezone.utc).timestamp())}
+        self.dynamodb_controller.increment_counters('COMMUNITY', f'COMMUNITY#{community_id}', {'version': 1}, update_data=update_data)
+        self.cache.evict([community_cache_key(community_id)])
 
     @log_and_handle_exceptions
     def is_user_owner(self, community_id: str, user_id: str) -> bool:
@@ -73,27 +139,133 @@ class CommunityService:
             raise HTTPException(status_code=403, detail="User is not authorized to view this resource")
 
     @log_and_handle_exceptions
-    def add_owner(self, community_id: str, owner_id: str) -> None:
-        self.dynamodb_controller.update_item(f'COMMUNITY#{community_id}', 'DETAILS', {'OwnerID': owner_id})
+    def add_owner(self, community_id: str, owner_id: str) -> bool:
+        """Appends the user to the community's owner_ids in one conditional update.
+
+        Returns:
+            bool: False if the user was already an owner.
+        """
+        owner_id = str(owner_id)
+        expression = UpdateExpression().append('owner_ids', [owner_id]).set('updated_at', int(datetime.now(timezone.utc).timestamp())).add('version', 1)
+        try:
+            self.dynamodb_controller.update_item(
+                'COMMUNITY', f'COMMUNITY#{community_id}', expression=expression,
+                condition=Attr('PK').exists() & Attr(TOMBSTONE_ATTRIBUTE).not_exists() & ~Attr('owner_ids').contains(owner_id)
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        finally:
+            self.cache.evict([community_cache_key(community_id)])
+        return True
 
     @log_and_handle_exceptions
-    def remove_owner(self, community_id: str, user_id: str) -> None:
-        # Implement the logic to remove owner
-        pass
+    def remove_owner(self, community_id: str, user_id: str) -> bool:
+        """Removes the user from the community's owner_ids by index, checked again on write.
+
+        Returns:
+            bool: False if the user was not an owner.
+
+        Raises:
+            ValueError: If the user is the community's only owner.
+        """
+        for attempt in range(MEMBER_UPDATE_ATTEMPTS):
+            community = self.dynamodb_controller.get_item('COMMUNITY', f'COMMUNITY#{community_id}', projection=['owner_ids'])
+            owner_ids = (community or {}).get('owner_ids', [])
+            if user_id not in owner_ids:
+                return False
+            if len(owner_ids) == 1:
+                raise ValueError("A community must keep at least one owner")
+            index = owner_ids.index(user_id)
+            expression = UpdateExpression().remove(f'owner_ids[{index}]').set('updated_at', int(datetime.now(timezone.utc).timestamp())).add('version', 1)
+            try:
+                self.dynamodb_controller.update_item(
+                    'COMMUNITY', f'COMMUNITY#{community_id}', expression=expression,
+                    condition=Attr(f'owner_ids[{index}]').eq(user_id) & Attr('owner_ids').size().gt(1)
+                )
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MEMBER_UPDATE_ATTEMPTS - 1:
+                    raise
+            finally:
+                self.cache.evict([community_cache_key(community_id)])
+        return False
 
     @log_and_handle_exceptions
-    def add_member(self, community_id: str, member: CommunityMemberModel) -> None:
-        self.dynamodb_controller.put_item(member.dict(by_alias=True))
+    def add_member(self, community_id: str, member: MemberAdd) -> bool:
+        """Adds the user to the community's members list and writes both sides of the membership, atomically.
+
+        Returns:
+            bool: False if the user was already a member; nothing is written then.
+        """
+        user_id = str(member.user_id)
+        now = int(datetime.now(timezone.utc).timestamp())
+        operations = [
+            self.dynamodb_controller.update_op(
+                'COMMUNITY', f'COMMUNITY#{community_id}',
+                UpdateExpression().append('members', [user_id]).set('updated_at', now).add('version', 1),
+                condition=Attr('PK').exists() & Attr(TOMBSTONE_ATTRIBUTE).not_exists() & ~Attr('members').contains(user_id)
+            ),
+            self.dynamodb_controller.put_op(membership_item(community_id, user_id, member.joined_at)),
+            self.dynamodb_controller.put_op(user_link_item(user_id, community_id, member.joined_at)),
+        ]
+        try:
+            self.dynamodb_controller.transact_write(operations)
+        except TransactionCanceledError as e:
+            if e.condition_failed(0):
+                return False
+            raise
+        finally:
+            self.cache.evict([community_cache_key(community_id)])
+        return True
 
     @log_and_handle_exceptions
-    def remove_member(self, community_id: str, user_id: str) -> None:
-        self.dynamodb_controller.delete_item(f'COMMUNITY#{community_id}', f'MEMBER#{user_id}')
+    def remove_member(self, community_id: str, user_id: str) -> bool:
+        """Removes the user from the community's members list and deletes both sides of the membership, atomically.
+
+        The list entry is removed by index, read in the same snapshot as the membership and checked
+        again on write; a concurrent change to the list is retried.
+
+        Returns:
+            bool: False if the user was not a member.
+        """
+        community_key = {'PK': 'COMMUNITY', 'SK': f'COMMUNITY#{community_id}'}
+        membership_key = {'PK': f'COMMUNITY#{community_id}', 'SK': f'MEMBER#{user_id}'}
+        for attempt in range(MEMBER_UPDATE_ATTEMPTS):
+            community, membership = self.dynamodb_controller.transact_get([community_key, membership_key], projection=['members'])
+            members = (community or {}).get('members', [])
+            if user_id not in members and membership is None:
+                return False
+            operations = [
+                self.dynamodb_controller.delete_op(membership_key['PK'], membership_key['SK']),
+                self.dynamodb_controller.delete_op(f'USER#{user_id}', f'COMMUNITY#{community_id}'),
+            ]
+            if user_id in members:
+                index = members.index(user_id)
+                operations.append(self.dynamodb_controller.update_op(
+                    community_key['PK'], community_key['SK'],
+                    UpdateExpression().remove(f'members[{index}]').set('updated_at', int(datetime.now(timezone.utc).timestamp())).add('version', 1),
+                    condition=Attr(f'members[{index}]').eq(user_id)
+                ))
+            try:
+                self.dynamodb_controller.transact_write(operations)
+                return True
+            except TransactionCanceledError as e:
+                if not e.condition_failed(2) or attempt == MEMBER_UPDATE_ATTEMPTS - 1:
+                    raise
+            finally:
+                self.cache.evict([community_cache_key(community_id)])
+        return False
 
     @log_and_handle_exceptions
-    def list_communities(self) -> List[Dict[str, Any]]:
+    def list_communities(self, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         partition_key = Key('PK').eq('COMMUNITY')
         sort_key_condition = Key('SK').begins_with('COMMUNITY#')
-        return self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition)[0]
+        return self.dynamodb_controller.query_with_pagination(
+            partition_key, sort_key_condition, Attr(TOMBSTONE_ATTRIBUTE).not_exists(),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=projection
+        )
 
 def requires_owner(community_id_param: str):
     def decorator(func):
@@ -166,12 +338,12 @@ def requires_quiz_owner(community_id_param: str, quiz_id_param: str):
             community_id = kwargs.get(community_id_param)
             quiz_id = kwargs.get(quiz_id_param)
             current_user = kwargs.get('current_user')
-            quiz_service: QuizService = kwargs.get('quiz_service')
+            quiz_service: 'QuizService' = kwargs.get('quiz_service')
 
             if not quiz_service:
                 raise HTTPException(status_code=500, detail="Quiz service not initialized")
 
-            quiz_metadata = await quiz_service.get_quiz_metadata(community_id, quiz_id)
+            quiz_metadata = quiz_service.get_quiz_metadata(community_id, quiz_id)
             if not quiz_metadata:
                 raise HTTPException(status_code=404, detail="Quiz not found")
 
@@ -185,7 +357,7 @@ def requires_quiz_owner(community_id_param: str, quiz_id_param: str):
             community_id = kwargs.get(community_id_param)
             quiz_id = kwargs.get(quiz_id_param)
             current_user = kwargs.get('current_user')
-            quiz_service: QuizService = kwargs.get('quiz_service')
+            quiz_service: 'QuizService' = kwargs.get('quiz_service')
 
             if not quiz_service:
                 raise HTTPException(status_code=500, detail="Quiz service not initialized")
@@ -208,6 +380,5 @@ def requires_quiz_owner(community_id_param: str, quiz_id_param: str):
 
 
 def get_community_service() -> CommunityService:
-    table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-    dynamodb_controller = DynamoDBController(table_name)
-    return CommunityService(dynamodb_controller)
+    dynamodb_controller = get_dynamodb_controller()
+    return CommunityService(dynamodb_controller, get_entity_cache())
@@ -0,0 +1,168 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+from app.lib.update_expression import UpdateExpression
+
+COUNTER_ATTRIBUTES = ('member_count', 'quiz_count', 'knowledge_source_count')
+MAP_ATTRIBUTES = ('question_counts', 'knowledge_sources_by_status')
+# Stream records are kept for 24 hours, so a shard idle for longer than this is never delivered again
+CHECKPOINT_RETENTION_SECONDS = 2 * 86400
+MAX_INITIALIZED_CACHE = 10000
+
+def empty_deltas() -> Dict[str, Any]:
+    """Deltas of one community over a window; ``first_sequence`` is the sequence number of its first record."""
+    return {'member_count': 0, 'quiz_count': 0, 'knowledge_source_count': 0, 'question_counts': {}, 'knowledge_sources_by_status': {}, 'deleted': False, 'first_sequence': None}
+
+class CommunityStatsService:
+    """Per-community aggregates maintained by the stream processor from the table's stream.
+
+    One COMMUNITY_STATS item per community holds the member, quiz and knowledge source counts, the
+    question count of each quiz and the knowledge source count of each status. Counts lag writes by
+    the stream processor's tumbling window. Each update records, per stream shard, the last sequence
+    number it covered, and only applies if none of the window's records for the community are at or
+    before that checkpoint, so a window the event source mapping delivers again is not counted twice.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController):
+        self.dynamodb_controller = dynamodb_controller
+        self.logger = logging.getLogger(__name__)
+        self._initialized = set()
+
+    @staticmethod
+    def stats_sort_key(community_id: str) -> str:
+        return f'COMMUNITY#{community_id}'
+
+    @log_and_handle_exceptions
+    def get_stats(self, community_id: str, projection: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        return self.dynamodb_controller.get_item('COMMUNITY_STATS', self.stats_sort_key(community_id), projection=projection)
+
+    @log_and_handle_exceptions
+    def get_stats_batch(self, community_ids: List[str], projection: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """The stats items of many communities with one batched read, keyed by community id."""
+        keys = [{'PK': 'COMMUNITY_STATS', 'SK': self.stats_sort_key(community_id)} for community_id in community_ids]
+        items = self.dynamodb_controller.batch_get_items(keys, projection) if keys else []
+        return {item['SK'].split('#', 1)[1]: item for item in items}
+
+    def add_community_counts(self, communities: List[Dict[str, Any]], projection: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Adds the counters to community items; with a projection, only the counters it names."""
+        counters = [name for name in COUNTER_ATTRIBUTES if projection is None or name in projection]
+        if not communities or not counters:
+            return communities
+        stats = self.get_stats_batch([community['SK'].split('#', 1)[1] for community in communities], counters)
+        for community in communities:
+            community_stats = stats.get(community['SK'].split('#', 1)[1], {})
+            for name in counters:
+                community[name] = max(int(community_stats.get(name, 0)), 0)
+        return communities
+
+    def add_question_counts(self, community_id: str, quizzes: List[Dict[str, Any]], projection: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Adds question_count to the quiz items of one community, from a single read of its stats."""
+        if not quizzes or (projection is not None and 'question_count' not in projection):
+            return quizzes
+        counts = (self.get_stats(community_id, ['question_counts']) or {}).get('question_counts', {})
+        for quiz in quizzes:
+            quiz['question_count'] = max(int(counts.get(quiz['SK'].rsplit('#', 1)[1], 0)), 0)
+        return quizzes
+
+    def knowledge_source_counts(self, community_id: str) -> Dict[str, Any]:
+        stats = self.get_stats(community_id, ['knowledge_source_count', 'knowledge_sources_by_status']) or {}
+        return {
+            'total': max(int(stats.get('knowledge_source_count', 0)), 0),
+            'by_status': {status: int(count) for status, count in stats.get('knowledge_sources_by_status', {}).items() if count > 0},
+        }
+
+    @log_and_handle_exceptions
+    def apply_deltas(self, community_id: str, deltas: Dict[str, Any], shard_id: str, sequence_number: str, created_at: int) -> bool:
+        """Adds one tumbling window's deltas to a community's counts.
+
+        Args:
+            community_id (str): The community.
+            deltas (Dict[str, Any]): Counter deltas, shaped like ``empty_deltas()``, with a padded ``first_sequence``.
+            shard_id (str): The stream shard the window was read from.
+            sequence_number (str): The padded sequence number of the window's last record.
+            created_at (int): The approximate creation time of that record; checkpoints are pruned by it.
+
+        Returns:
+            bool: False if the shard's checkpoint shows the window was already applied.
+        """
+        sk = self.stats_sort_key(community_id)
+        if deltas.get('deleted'):
+            # Records of the community's other items may still arrive on other shards; they recreate a partial item
+            self.dynamodb_controller.delete_item('COMMUNITY_STATS', sk)
+            self._initialized.discard(community_id)
+            return True
+
+        expression = UpdateExpression().set(('stream_checkpoints', shard_id), f'{sequence_number}#{created_at}').set('updated_at', int(time.time()))
+        for name in COUNTER_ATTRIBUTES:
+            if deltas.get(name):
+                expression.add(name, deltas[name])
+        for map_name in MAP_ATTRIBUTES:
+            for key, delta in deltas.get(map_name, {}).items():
+                if delta:
+                    expression.increment((map_name, key), delta)
+        checkpoint = Attr(f'stream_checkpoints.{shard_id}')
+        # Checkpoints are '<sequence>#<time>', so one ending at the first record compares above '<first>#'
+        condition = checkpoint.not_exists() | checkpoint.lt(f"{deltas['first_sequence']}#")
+
+        if community_id not in self._initialized:
+            self.initialize(community_id)
+        try:
+            stats = self.dynamodb_controller.update_item('COMMUNITY_STATS', sk, condition=condition, expression=expression, return_values='ALL_NEW')
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'ConditionalCheckFailedException':
+                self.logger.info("Skipping a window of shard %s already applied to community %s", shard_id, community_id)
+                return False
+            if code != 'ValidationException':
+                raise
+            # The item was deleted since this container initialized it, so its maps are gone
+            self.initialize(community_id)
+            stats = self.dynamodb_controller.update_item('COMMUNITY_STATS', sk, condition=condition, expression=expression, return_values='ALL_NEW')
+        self.prune(community_id, stats)
+        return True
+
+    def initialize(self, community_id: str) -> None:
+        """Creates the stats item, or its maps, so that nested counters can be updated."""
+        now = int(time.time())
+        expression = UpdateExpression().set_if_not_exists('CreatedAt', now)
+        for map_name in (*MAP_ATTRIBUTES, 'stream_checkpoints'):
+            expression.set_if_not_exists(map_name, {})
+        self.dynamodb_controller.update_item(
+            'COMMUNITY_STATS', self.stats_sort_key(community_id), {'EntityType': 'CommunityStats', 'community_id': community_id}, expression=expression
+        )
+        if len(self._initialized) >= MAX_INITIALIZED_CACHE:
+            self._initialized.clear()
+        self._initialized.add(community_id)
+
+    def prune(self, community_id: str, stats: Dict[str, Any]) -> None:
+        """Removes map entries whose count fell to zero and checkpoints of shards that can no longer be delivered."""
+        expression = UpdateExpression()
+        conditions = []
+        for map_name in MAP_ATTRIBUTES:
+            for key, count in stats.get(map_name, {}).items():
+                if count == 0:
+                    expression.remove((map_name, key))
+                    conditions.append(Attr(f'{map_name}.{key}').eq(0))
+        expired = int(time.time()) - CHECKPOINT_RETENTION_SECONDS
+        for shard_id, checkpoint in stats.get('stream_checkpoints', {}).items():
+            if int(checkpoint.rsplit('#', 1)[1]) < expired:
+                expression.remove(('stream_checkpoints', shard_id))
+                conditions.append(Attr(f'stream_checkpoints.{shard_id}').eq(checkpoint))
+        if not expression:
+            return
+        condition = conditions[0]
+        for extra in conditions[1:]:
+            condition = condition & extra
+        try:
+            self.dynamodb_controller.update_item('COMMUNITY_STATS', self.stats_sort_key(community_id), condition=condition, expression=expression)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # A concurrent window changed one of the entries; the next window prunes again
+
+def get_community_stats_service() -> CommunityStatsService:
+    return CommunityStatsService(get_dynamodb_controller())
@@ -1,16 +1,33 @@
 import logging
 import json
+import os
 from typing import Optional, Dict, Any, List
 from app.lib.openai_controller import OpenAIController, get_openai_controller
+from app.services.usage_service import UsageService, BudgetExceededError
+from app.lib.prompt_registry import PromptTemplate
+from app.lib.tracing import bind_trace
+from app.services.prompt_templates import KNOWLEDGE_EXTRACTION, KNOWLEDGE_EXTRACTION_PACKED, PACKED_RESPONSE_INSTRUCTIONS
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import tenacity
 import re
 
+SECTION_DELIMITER = "=== SECTION {index} ==="
+
 class ContentProcessorService:
-    def __init__(self, openai_controller: OpenAIController = None):
+    def __init__(self, openai_controller: OpenAIController = None, usage_service: Optional[UsageService] = None, pack_token_budget: Optional[int] = None):
         self.logger = logging.getLogger(__name__)
         self.openai_controller = openai_controller or get_openai_controller()
-        
+        self.usage_service = usage_service
+        if pack_token_budget is None:
+            pack_token_budget = int(os.getenv('CHUNK_PACK_TOKEN_BUDGET', '0'))
+        self.pack_token_budget = pack_token_budget  # 0 disables packing
+        self.packed_prompts: Dict[str, PromptTemplate] = {KNOWLEDGE_EXTRACTION.name: KNOWLEDGE_EXTRACTION_PACKED}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (about four characters per token for English text)."""
+        return len(text) // 4 + 1
+
     @staticmethod
     def validate_and_correct_json(response_text: str) -> Optional[Dict[str, Any]]:
         try:
@@ -35,24 +52,130 @@ class ContentProcessorService:
                 logging.error(f"Problematic content after correction: {corrected_text[:200]}...")
                 return None
             
-    def process_chunk(self, chunk: str, system_message: str) -> Dict[str, Any]:
-        """Processes a single chunk of content using OpenAI GPT-4 with retries."""
-        user_message = f"Extract the following information from the content: {chunk}"
-        prompt = self.openai_controller.generate_prompt(system_message, user_message)
-        response = self.openai_controller.get_response(prompt)
-        
+    def packed_prompt_for(self, prompt: PromptTemplate) -> PromptTemplate:
+        """Returns the multi-section variant of a prompt, which keeps the original system prompt as its prefix."""
+        if prompt.name not in self.packed_prompts:
+            self.packed_prompts[prompt.name] = prompt.extend(
+                f'{prompt.name}_packed', PACKED_RESPONSE_INSTRUCTIONS, KNOWLEDGE_EXTRACTION_PACKED.user_template
+            )
+        return self.packed_prompts[prompt.name]
+
+    def _request_json(self, prompt: PromptTemplate, content: str, community_id: Optional[str] = None, source_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Sends one request and parses its JSON body.
+
+        When a community is given and a usage service is configured, the community's token budget is
+        checked before the request and the request's usage is recorded against the community and source.
+        """
+        track_usage = self.usage_service is not None and community_id is not None
+        if track_usage:
+            self.usage_service.check_budget(community_id)
+
+        messages = prompt.build_messages(content=content)
+        response = self.openai_controller.get_response(messages, prompt_version=prompt.version)
+        if track_usage and response.get('usage'):
+            self.usage_service.record_usage(community_id, source_id, response['usage'])
+
         response_text = response.get('response', '').strip()
         if response_text.startswith('```json'):
             response_text = response_text[7:-3]  # Strip off ```json ... ```
 
         # Validate and correct the JSON format using the updated method
-        processed_data = self.validate_and_correct_json(response_text)
+        return self.validate_and_correct_json(response_text)
+
+    def process_chunk(self, chunk: str, prompt: PromptTemplate = KNOWLEDGE_EXTRACTION, community_id: Optional[str] = None, source_id: Optional[str] = None) -> Dict[str, Any]:
+        """Processes a single chunk of content using OpenAI GPT-4 with retries."""
+        processed_data = self._request_json(prompt, chunk, community_id, source_id)
         if not processed_data:
             logging.error(f"Skipping chunk due to invalid JSON format: {chunk[:200]}...")
             raise ValueError("Failed to process chunk: invalid JSON format")
 
         return processed_data
-            
+
+    def pack_chunks(self, chunks: List[str], token_budget: int) -> List[List[int]]:
+        """Bin-packs chunk indexes into groups whose estimated size fits within the token budget.
+
+        Uses first-fit decreasing. A chunk larger than the budget gets a group of its own, and each
+        group keeps its indexes in original order.
+        """
+        sizes = [self.estimate_tokens(chunk) for chunk in chunks]
+        bins: List[List[int]] = []
+        remaining: List[int] = []
+        for index in sorted(range(len(chunks)), key=lambda i: sizes[i], reverse=True):
+            for bin_index, space in enumerate(remaining):
+                if sizes[index] <= space:
+                    bins[bin_index].append(index)
+                    remaining[bin_index] -= sizes[index]
+                    break
+            else:
+                bins.append([index])
+                remaining.append(token_budget - sizes[index])
+        return [sorted(group) for group in bins]
+
+    def process_packed_chunks(self, chunks: List[str], prompt: PromptTemplate = KNOWLEDGE_EXTRACTION, community_id: Optional[str] = None, source_id: Optional[str] = None) -> List[Optional[Dict[str, Any]]]:
+        """Processes several chunks in one request and splits the combined response back per chunk.
+
+        Returns one result per chunk, in order. Sections missing from the combined response are retried
+        on their own so a partially followed instruction never loses a chunk; a section whose retry fails
+        is None, so the sections that did parse are kept.
+        """
+        if len(chunks) == 1:
+            return [self.process_chunk(chunks[0], prompt, community_id, source_id)]
+
+        sections = "\n\n".join(f"{SECTION_DELIMITER.format(index=i)}\n{chunk}" for i, chunk in enumerate(chunks, start=1))
+        combined = self._request_json(self.packed_prompt_for(prompt), sections, community_id, source_id) or {}
+
+        results = []
+        for i, chunk in enumerate(chunks, start=1):
+            section_result = combined.get(str(i)) if isinstance(combined, dict) else None
+            if isinstance(section_result, dict) and section_result:
+                results.append(section_result)
+            else:
+                self.logger.warning(f"Section {i} missing from packed response; processing it on its own")
+                results.append(self.process_section(chunk, prompt, community_id, source_id))
+        return results
+
+    def process_section(self, chunk: str, prompt: PromptTemplate, community_id: Optional[str], source_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Processes one section of a packed request on its own; None if that fails."""
+        try:
+            return self.process_chunk(chunk, prompt, community_id, source_id)
+        except BudgetExceededError as e:
+            self.logger.warning(f"Skipping section: {e}")
+        except Exception as e:
+            self.logger.error(f"Error processing section on its own: {e}")
+        return None
+
+    def process_chunks(self, chunks: List[str], prompt: PromptTemplate = KNOWLEDGE_EXTRACTION, community_id: Optional[str] = None, source_id: Optional[str] = None, pack_token_budget: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+        """Processes chunks concurrently, packing small ones together when a packing budget is set.
+
+        Returns one entry per input chunk, in order; chunks that failed are None.
+        """
+        if pack_token_budget is None:
+            pack_token_budget = self.pack_token_budget
+        if pack_token_budget:
+            groups = self.pack_chunks(chunks, pack_token_budget)
+        else:
+            groups = [[index] for index in range(len(chunks))]
+        self.logger.info(f"Processing {len(chunks)} chunks in {len(groups)} requests.")
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+        process_packed_chunks = bind_trace(self.process_packed_chunks)
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            future_to_group = {
+                executor.submit(process_packed_chunks, [chunks[i] for i in group], prompt, community_id, source_id): group
+                for group in groups
+            }
+            for future in as_completed(future_to_group):
+                group = future_to_group[future]
+                try:
+                    for index, result in zip(group, future.result()):
+                        results[index] = result
+                except BudgetExceededError as e:
+                    self.logger.warning(f"Skipping chunks {group}: {e}")
+                except Exception as e:
+                    self.logger.error(f"Error processing chunks {group}: {e}")
+        return results
+
+
     def split_content(self, content: str, max_length: int = 2000) -> List[str]:
         """Splits the content into manageable chunks for processing."""
         chunks = []
@@ -67,19 +190,12 @@ class ContentProcessorService:
         self.logger.info(f"Split content into {len(chunks)} chunks.")
         return chunks
     
-    def process_content(self, content: str, system_message: str) -> Optional[List[Dict[str, Any]]]:
+    def process_content(self, content: str, prompt: PromptTemplate = KNOWLEDGE_EXTRACTION, community_id: Optional[str] = None, source_id: Optional[str] = None, pack_token_budget: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
         """Uses OpenAI GPT-4 to extract and summarize information in a structured JSON format."""
         try:
             content_chunks = self.split_content(content)
-            processed_chunks = []
-
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_chunk = {executor.submit(self.process_chunk, chunk, system_message): chunk for chunk in content_chunks}
-                for future in as_completed(future_to_chunk):
-                    try:
-                        processed_chunks.append(future.result())
-                    except Exception as e:
-                        self.logger.error(f"Error processing chunk: {e}")
+            results = self.process_chunks(content_chunks, prompt, community_id, source_id, pack_token_budget)
+            processed_chunks = [result for result in results if result is not None]
 
             if not processed_chunks:
                 self.logger.error("No valid chunks were processed.")
@@ -0,0 +1,22 @@
+"""Adds the index keys that quizzes and knowledge sources created before GSI4 lack.
+
+Run once after the index is created, from any image that ships ``app.services``:
+``python -m app.services.index_backfill``. Items that already have their keys are skipped, so it can be rerun.
+"""
+import logging
+from typing import Dict, Optional
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.services.knowledge_source_service import KnowledgeSourceService
+from app.services.quiz_service import QuizService
+
+def backfill(dynamodb_controller: Optional[DynamoDBController] = None) -> Dict[str, int]:
+    """Backfills every quiz and knowledge source; returns how many of each were updated."""
+    dynamodb_controller = dynamodb_controller or get_dynamodb_controller()
+    return {
+        'quizzes': QuizService(dynamodb_controller).backfill_index_keys(),
+        'knowledge_sources': KnowledgeSourceService(dynamodb_controller).backfill_index_keys(),
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Backfilled index keys: {backfill()}")
@@ -0,0 +1,146 @@
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+from app.models.ingestion_job_schema import IngestionState, IngestionJobProgress
+from app.services.cascade_delete_service import TOMBSTONE_ATTRIBUTE
+
+# The states each state may be entered from. Scraping and chunking can be re-entered so a redelivered
+# ingestion message can restart a scrape that crashed or failed to queue its chunks, and combining so a
+# failed combine can be retried once its claim is released, but nothing moves backwards once every chunk
+# is queued. Chunks are queued while the job is in Chunking, so they can all finish before it moves on.
+ALLOWED_TRANSITIONS = {
+    IngestionState.SCRAPING: [IngestionState.PENDING, IngestionState.SCRAPING, IngestionState.CHUNKING],
+    IngestionState.CHUNKING: [IngestionState.SCRAPING],
+    IngestionState.PROCESSING: [IngestionState.CHUNKING],
+    IngestionState.COMBINING: [IngestionState.CHUNKING, IngestionState.PROCESSING, IngestionState.COMBINING],
+    IngestionState.COMPLETED: [IngestionState.COMBINING],
+    IngestionState.FAILED: [IngestionState.PENDING, IngestionState.SCRAPING, IngestionState.CHUNKING,
+                            IngestionState.PROCESSING, IngestionState.COMBINING],
+}
+
+# Pipeline order, used to turn per-stage start times into stage durations
+STAGE_ORDER = [IngestionState.PENDING, IngestionState.SCRAPING, IngestionState.CHUNKING,
+               IngestionState.PROCESSING, IngestionState.COMBINING, IngestionState.COMPLETED]
+
+class InvalidTransitionError(Exception):
+    """Raised when a job is not in a state the requested transition may start from."""
+    def __init__(self, source_id: str, to_state: IngestionState):
+        self.source_id = source_id
+        self.to_state = to_state
+        super().__init__(f"Knowledge source {source_id} cannot move to {to_state.value} from its current state")
+
+def stage_timestamp_attribute(state: IngestionState) -> str:
+    return f'{state.value.lower()}_at_ms'
+
+class IngestionJobService:
+    """Tracks a knowledge source's ingestion as a job on its KNOWLEDGE_SOURCE item.
+
+    The state is kept in source_status so existing readers of the item keep working.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController):
+        self.dynamodb_controller = dynamodb_controller
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def source_sort_key(community_id: str, source_id: str) -> str:
+        return f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+
+    @log_and_handle_exceptions
+    def transition(self, community_id: str, source_id: str, to_state: IngestionState, **fields: Any) -> None:
+        """Moves the job to a new state if, and only if, it is currently in an allowed predecessor state.
+
+        Extra fields (e.g. chunks_total or error_message) are written in the same conditional update.
+        A source being deleted refuses every transition, so its ingestion stops.
+
+        Raises:
+            InvalidTransitionError: If the job is not in a state that may move to to_state, or is being deleted.
+        """
+        allowed_from = [state.value for state in ALLOWED_TRANSITIONS[to_state]]
+        now_ms = int(time.time() * 1000)
+        update_data = {
+            'source_status': to_state.value,
+            stage_timestamp_attribute(to_state): now_ms,
+            'updated_at_ms': now_ms,
+            **fields,
+        }
+        try:
+            self.dynamodb_controller.update_item(
+                'KNOWLEDGE_SOURCE', self.source_sort_key(community_id, source_id), update_data,
+                condition=Attr('source_status').is_in(allowed_from) & Attr(TOMBSTONE_ATTRIBUTE).not_exists()
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise InvalidTransitionError(source_id, to_state) from None
+            raise
+
+    @log_and_handle_exceptions
+    def fail(self, community_id: str, source_id: str, error: str) -> None:
+        """Marks the job failed, ignoring jobs that have already completed or failed."""
+        try:
+            self.transition(community_id, source_id, IngestionState.FAILED, error_message=error[:1000])
+        except InvalidTransitionError:
+            self.logger.warning(f"Not marking knowledge source {source_id} failed; it has already finished")
+
+    @log_and_handle_exceptions
+    def record_chunk_failures(self, community_id: str, source_id: str, chunk_indexes: List[int]) -> None:
+        """Records chunks whose processing attempt failed; they stay counted as failed until they succeed."""
+        if chunk_indexes:
+            self.dynamodb_controller.increment_counters(
+                'KNOWLEDGE_SOURCE', self.source_sort_key(community_id, source_id), {'failed_chunks': set(chunk_indexes)}
+            )
+
+    @log_and_handle_exceptions
+    def get_state(self, community_id: str, source_id: str) -> Optional[IngestionState]:
+        item = self.dynamodb_controller.get_item('KNOWLEDGE_SOURCE', self.source_sort_key(community_id, source_id))
+        return IngestionState(item['source_status']) if item else None
+
+    @log_and_handle_exceptions
+    def get_progress(self, community_id: str, source_id: str) -> Optional[IngestionJobProgress]:
+        item = self.dynamodb_controller.get_item('KNOWLEDGE_SOURCE', self.source_sort_key(community_id, source_id))
+        if not item:
+            return None
+        return self.build_progress(item)
+
+    @staticmethod
+    def build_progress(item: Dict[str, Any]) -> IngestionJobProgress:
+        processed = set(item.get('processed_chunks', ()))
+        failed = (set(item.get('failed_chunks', ())) | set(item.get('abandoned_chunks', ()))) - processed
+        chunks_total = int(item.get('chunks_total', 0))
+
+        started = {
+            state.value: int(item[stage_timestamp_attribute(state)])
+            for state in STAGE_ORDER if stage_timestamp_attribute(state) in item
+        }
+        if IngestionState.PENDING.value not in started and 'CreatedAt' in item:
+            started[IngestionState.PENDING.value] = int(item['CreatedAt']) * 1000
+
+        # A stage lasts until the next recorded stage starts; the current stage runs until now
+        durations = {}
+        reached = [state.value for state in STAGE_ORDER if state.value in started]
+        for current, following in zip(reached, reached[1:]):
+            durations[current] = started[following] - started[current]
+        state = IngestionState(item.get('source_status', IngestionState.PENDING.value))
+        if reached and state not in (IngestionState.COMPLETED, IngestionState.FAILED):
+            durations[reached[-1]] = int(time.time() * 1000) - started[reached[-1]]
+
+        return IngestionJobProgress(
+            source_id=item['source_id'],
+            community_id=item['community_id'],
+            state=state,
+            chunks_total=chunks_total,
+            chunks_done=len(processed),
+            chunks_failed=len(failed),
+            percent_complete=round(100.0 * len(processed) / chunks_total, 1) if chunks_total else (100.0 if state == IngestionState.COMPLETED else 0.0),
+            stage_started_at_ms=started,
+            stage_durations_ms=durations,
+            error=item.get('error_message'),
+        )
+
+def get_ingestion_job_service() -> IngestionJobService:
+    dynamodb_controller = get_dynamodb_controller()
+    return IngestionJobService(dynamodb_controller)
@@ -1,13 +1,17 @@
 import logging
 from pydantic import BaseModel, HttpUrl, UUID4
 from typing import Optional, Dict, Any, List, Tuple
-from boto3.dynamodb.conditions import Key
-from app.lib.dynamodb_controller import DynamoDBController
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from app.lib.dynamodb_controller import DynamoDBController, community_entity_key, get_dynamodb_controller
 from app.lib.logging import log_and_handle_exceptions
+from app.models.ingestion_job_schema import IngestionState
+from app.services.cascade_delete_service import TOMBSTONE_ATTRIBUTE
 from datetime import datetime, timezone
-import uuid
 import os
 
+BACKFILL_PAGE_SIZE = 100
+
 # Define the Pydantic models for knowledge source creation and updates
 class KnowledgeSourceCreate(BaseModel):
     source_id: UUID4
@@ -31,11 +35,13 @@ class KnowledgeSourceService:
             'PK': 'KNOWLEDGE_SOURCE',
             'SK': f'COMMUNITY#{knowledge_source.community_id}#KNOWLEDGE_SOURCE#{knowledge_source.source_id}',
             'EntityType': 'KnowledgeSource',
+            'CommunityEntity': community_entity_key(str(knowledge_source.community_id), 'KnowledgeSource'),
             'CreatedAt': int(datetime.now(timezone.utc).timestamp()),
             'source_id': str(knowledge_source.source_id),
             'community_id': str(knowledge_source.community_id),
             'url': str(knowledge_source.url),
             'source_status': knowledge_source.source_status,
+            'pending_at_ms': int(datetime.now(timezone.utc).timestamp() * 1000),
         }
         self.dynamodb_controller.put_item(item)
 
@@ -53,21 +59,99 @@ class KnowledgeSourceService:
         
         self.dynamodb_controller.update_item('KNOWLEDGE_SOURCE', sk, update_data_dict)
 
+    @staticmethod
+    def chunk_sort_key(community_id: str, source_id: str, chunk_index: int) -> str:
+        # Zero-padded so chunks sort in content order
+        return f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}#CHUNK#{chunk_index:05d}'
+
     @log_and_handle_exceptions
-    def store_chunks(self, community_id: str, source_id: str, chunks: List[Dict[str, Any]]) -> None:
-        for chunk in chunks:
-            chunk_id = str(uuid.uuid4())  # Generate a unique ID for each chunk
-            item = {
+    def store_chunks(self, community_id: str, source_id: str, chunks: List[Any]) -> None:
+        now = int(datetime.now(timezone.utc).timestamp())
+        items = []
+        for chunk_index, chunk in enumerate(chunks):
+            items.append({
                 'PK': 'KNOWLEDGE_SOURCE_CHUNK',
-                'SK': f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}#CHUNK#{chunk_id}',
+                'SK': self.chunk_sort_key(community_id, source_id, chunk_index),
                 'EntityType': 'KnowledgeSourceChunk',
                 'source_id': source_id,
                 'community_id': community_id,
-                'chunk_id': chunk_id,
+                'chunk_id': f'{chunk_index:05d}',
                 'data': chunk,
-                'CreatedAt': int(datetime.now(timezone.utc).timestamp()),
-            }
-            self.dynamodb_controller.put_item(item)
+                'CreatedAt': now,
+            })
+        self.dynamodb_controller.batch_write_items(items)
+
+    @log_and_handle_exceptions
+    def store_chunk_results(self, community_id: str, source_id: str, results: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+        """Stores processed chunks as (chunk_index, chunk_content, result), replacing the raw chunk items."""
+        now = int(datetime.now(timezone.utc).timestamp())
+        items = [{
+            'PK': 'KNOWLEDGE_SOURCE_CHUNK',
+            'SK': self.chunk_sort_key(community_id, source_id, chunk_index),
+            'EntityType': 'KnowledgeSourceChunk',
+            'source_id': source_id,
+            'community_id': community_id,
+            'chunk_id': f'{chunk_index:05d}',
+            'data': content,
+            'result': result,
+            'CreatedAt': now,
+        } for chunk_index, content, result in results]
+        self.dynamodb_controller.batch_write_items(items)
+
+    @log_and_handle_exceptions
+    def get_chunk_results(self, community_id: str, source_id: str) -> List[Dict[str, Any]]:
+        """Returns the processed result of every chunk of a source, in content order."""
+        partition_key = Key('PK').eq('KNOWLEDGE_SOURCE_CHUNK')
+        sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}#CHUNK#')
+        results, last_evaluated_key = [], None
+        while True:
+            chunks, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                partition_key, sort_key_condition, limit=100, last_evaluated_key=last_evaluated_key
+            )
+            results.extend(chunk['result'] for chunk in chunks if chunk.get('result'))
+            if not last_evaluated_key:
+                break
+        return results
+
+    @log_and_handle_exceptions
+    def record_chunks_processed(self, community_id: str, source_id: str, chunk_indexes: List[int], abandoned_indexes: Optional[List[int]] = None) -> Tuple[int, int]:
+        """Marks chunks as processed, or abandoned after their last delivery failed, and returns (chunks done,
+        chunks total) for the source, where done counts every chunk that is one or the other.
+
+        Chunk indexes are added to number sets, so a redelivered message can never count twice.
+        """
+        sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+        counters = {name: set(indexes) for name, indexes in (('processed_chunks', chunk_indexes), ('abandoned_chunks', abandoned_indexes)) if indexes}
+        if not counters:
+            raise ValueError("Processed or abandoned chunk indexes must be provided.")
+        attributes = self.dynamodb_controller.increment_counters('KNOWLEDGE_SOURCE', sk, counters, return_values='ALL_NEW')
+        done = set(attributes.get('processed_chunks', ())) | set(attributes.get('abandoned_chunks', ()))
+        return len(done), int(attributes.get('chunks_total', 0))
+
+    @log_and_handle_exceptions
+    def claim_combine(self, community_id: str, source_id: str) -> bool:
+        """Atomically claims the combine step for a source; only the first caller gets True."""
+        sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+        attributes = self.dynamodb_controller.increment_counters('KNOWLEDGE_SOURCE', sk, {'combine_claims': 1})
+        return int(attributes.get('combine_claims', 0)) == 1
+
+    @log_and_handle_exceptions
+    def release_combine(self, community_id: str, source_id: str) -> None:
+        """Gives back the combine claim after a failed combine, so the next claim_combine succeeds again.
+
+        Only an unfinished job is released; one that has since completed or failed stays claimed.
+        """
+        sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
+        finished = [IngestionState.COMPLETED.value, IngestionState.FAILED.value]
+        try:
+            self.dynamodb_controller.update_item(
+                'KNOWLEDGE_SOURCE', sk, {'combine_claims': 0},
+                condition=Attr('source_status').exists() & ~Attr('source_status').is_in(finished)
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            self.logger.warning(f"Not releasing the combine claim of knowledge source {source_id}; it has already finished")
 
     @log_and_handle_exceptions
     def store_combined_output(self, community_id: str, source_id: str, combined_output: Dict[str, Any]) -> None:
@@ -84,37 +168,60 @@ class KnowledgeSourceService:
 
     @log_and_handle_exceptions
     def get_knowledge_source(self, community_id: str, source_id: str) -> Optional[Dict[str, Any]]:
+        """The knowledge source, or None if it does not exist or is being deleted."""
         sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
-        return self.dynamodb_controller.get_item('KNOWLEDGE_SOURCE', sk)
+        source = self.dynamodb_controller.get_item('KNOWLEDGE_SOURCE', sk)
+        return None if source is None or TOMBSTONE_ATTRIBUTE in source else source
     
     @log_and_handle_exceptions
-    def list_knowledge_sources(self, community_id: str, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    def list_knowledge_sources(self, community_id: str, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         partition_key = Key('PK').eq('KNOWLEDGE_SOURCE')
         sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#')
         items, last_key = self.dynamodb_controller.query_with_pagination(
-            partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key
+            partition_key, sort_key_condition, Attr(TOMBSTONE_ATTRIBUTE).not_exists(),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=projection
         )
         return items, last_key
 
     @log_and_handle_exceptions
-    def delete_knowledge_source(self, community_id: str, source_id: str) -> None:
-        sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
-        self.dynamodb_controller.delete_item('KNOWLEDGE_SOURCE', sk)
+    def list_newest_knowledge_sources(self, community_id: str, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """The community's knowledge sources, most recently submitted first, from GSI4 (CommunityEntity + CreatedAt).
 
-        # Delete all related chunks
-        chunk_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}#CHUNK#')
-        chunks, _ = self.dynamodb_controller.query_with_pagination(
-            Key('PK').eq('KNOWLEDGE_SOURCE_CHUNK'), chunk_key_condition
+        GSI4 holds keys only, so sources being deleted are dropped after hydration and a page can come up short.
+        """
+        hydrated_projection = projection + [TOMBSTONE_ATTRIBUTE] if projection and TOMBSTONE_ATTRIBUTE not in projection else projection
+        items, last_key = self.dynamodb_controller.query_index(
+            'GSI4', Key('CommunityEntity').eq(community_entity_key(community_id, 'KnowledgeSource')),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=hydrated_projection, scan_index_forward=False
         )
-        for chunk in chunks:
-            self.dynamodb_controller.delete_item('KNOWLEDGE_SOURCE_CHUNK', chunk['SK'])
+        return [item for item in items if TOMBSTONE_ATTRIBUTE not in item], last_key
 
-        # Delete the unchunked data
-        unchunk_sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}'
-        self.dynamodb_controller.delete_item('KNOWLEDGE_SOURCE_UNCHUNK', unchunk_sk)
+    @log_and_handle_exceptions
+    def backfill_index_keys(self) -> int:
+        """Adds CommunityEntity to knowledge sources created without it; returns the number updated."""
+        updated = 0
+        last_evaluated_key = None
+        while True:
+            sources, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq('KNOWLEDGE_SOURCE'), filter_condition=Attr('CommunityEntity').not_exists(),
+                limit=BACKFILL_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=['PK', 'SK', 'community_id']
+            )
+            for source in sources:
+                try:
+                    self.dynamodb_controller.update_item(
+                        'KNOWLEDGE_SOURCE', source['SK'], {'CommunityEntity': community_entity_key(source['community_id'], 'KnowledgeSource')},
+                        condition=Attr('PK').exists()
+                    )
+                except ClientError as e:
+                    # Deleted since the page was read
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    continue
+                updated += 1
+            if not last_evaluated_key:
+                return updated
 
 # Define a factory function to create an instance of KnowledgeSourceService
 def get_knowledge_source_service() -> KnowledgeSourceService:
-    table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-    dynamodb_controller = DynamoDBController(table_name)
+    dynamodb_controller = get_dynamodb_controller()
     return KnowledgeSourceService(dynamodb_controller)
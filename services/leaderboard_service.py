@@ -0,0 +1,296 @@
+import logging
+import os
+import random
+import time
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+from app.lib.update_expression import UpdateExpression
+from app.services.cascade_delete_service import TOMBSTONE_ATTRIBUTE
+
+SCORE_PK = 'SCORE'
+LEADERBOARD_PK = 'LEADERBOARD'
+PENDING_PK_PREFIX = 'LEADERBOARD_PENDING#'
+# Counters and pending updates of one quiz are spread over this many items, so a class submitting at once does not queue on one
+LEADERBOARD_SHARDS = int(os.getenv('LEADERBOARD_SHARDS', '10'))
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '100'))
+PENDING_PAGE_SIZE = 500
+SNAPSHOT_WRITE_ATTEMPTS = 3
+TOTAL_PROJECTION = ['user_id', 'total_score', 'quizzes_scored', 'achieved_at']
+
+def quiz_board_key(community_id: str, quiz_id: str) -> str:
+    return f'COMMUNITY#{community_id}#QUIZ#{quiz_id}'
+
+def community_board_key(community_id: str) -> str:
+    return f'COMMUNITY#{community_id}#MEMBERS'
+
+def quiz_score_key(community_id: str, quiz_id: str, user_id: str) -> str:
+    return f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#USER#{user_id}'
+
+def member_total_key(community_id: str, user_id: str) -> str:
+    return f'COMMUNITY#{community_id}#USER#{user_id}'
+
+def shard_key(community_id: str, quiz_id: str, shard: int) -> str:
+    return f'{quiz_board_key(community_id, quiz_id)}#SHARD#{shard:02d}'
+
+def rank_entries(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The top LEADERBOARD_SIZE entries; equal scores rank by who reached them first."""
+    return sorted(entries, key=lambda entry: (-entry['score'], entry['achieved_at'], entry['user_id']))[:LEADERBOARD_SIZE]
+
+class LeaderboardService:
+    """Per-quiz and per-community leaderboards, kept up to date without ranking on read.
+
+    Recording a score updates the user's best on the quiz (``SCORE`` items), their total across the
+    community's quizzes and one of the quiz's counter shards, then leaves a pending update in one of
+    the ``LEADERBOARD_PENDING#<n>`` partitions. The leaderboard_compactor Lambda merges pending
+    updates into a top-N snapshot per quiz and per community (``LEADERBOARD`` items), so a read is one
+    get_item. Best scores only grow, so merging the pending entries into the previous top N gives the
+    same ranking as sorting every score. Totals fall when a quiz is removed, so community snapshots
+    merge each member's current total rather than the one pending, and removing a quiz requests a
+    full rebuild of the community's leaderboard.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController):
+        self.dynamodb_controller = dynamodb_controller
+        self.logger = logging.getLogger(__name__)
+
+    @log_and_handle_exceptions
+    def record_score(self, community_id: str, quiz_id: str, user_id: str, score: Any, max_score: int, achieved_at: Optional[int] = None) -> bool:
+        """Records a graded attempt; returns True if it is the user's best on the quiz so far."""
+        score = Decimal(str(score))
+        achieved_at = achieved_at or int(time.time())
+        sk = quiz_score_key(community_id, quiz_id, user_id)
+        identity = {'EntityType': 'QuizScore', 'community_id': community_id, 'quiz_id': quiz_id, 'user_id': user_id}
+        try:
+            old = self.dynamodb_controller.update_item(
+                SCORE_PK, sk, identity,
+                expression=UpdateExpression().set('best_score', score).set('max_score', max_score).set('achieved_at', achieved_at)
+                .set_if_not_exists('CreatedAt', achieved_at).add('attempt_count', 1),
+                condition=Attr('best_score').not_exists() | Attr('best_score').lt(score), return_values='UPDATED_OLD'
+            )
+            improved, best, best_at = True, score, achieved_at
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            current = self.dynamodb_controller.update_item(SCORE_PK, sk, expression=UpdateExpression().add('attempt_count', 1), return_values='ALL_NEW')
+            improved, best, best_at, old = False, current['best_score'], int(current['achieved_at']), None
+        first = improved and 'best_score' not in old
+
+        counters = UpdateExpression().add('attempt_count', 1).add('score_total', score)
+        if first:
+            counters.add('player_count', 1)
+        self.dynamodb_controller.update_item(
+            LEADERBOARD_PK, shard_key(community_id, quiz_id, random.randrange(LEADERBOARD_SHARDS)),
+            {'EntityType': 'LeaderboardShard'}, expression=counters.set_if_not_exists('CreatedAt', achieved_at)
+        )
+
+        pending = [self.pending_item(quiz_board_key(community_id, quiz_id), community_id, user_id, best, best_at, quiz_id=quiz_id)]
+        if improved:
+            total = UpdateExpression().add('total_score', score - old.get('best_score', 0)).set('achieved_at', achieved_at).set_if_not_exists('CreatedAt', achieved_at)
+            if first:
+                total.add('quizzes_scored', 1)
+            totals = self.dynamodb_controller.update_item(
+                SCORE_PK, member_total_key(community_id, user_id), {'EntityType': 'MemberScore', 'community_id': community_id, 'user_id': user_id},
+                expression=total, return_values='ALL_NEW'
+            )
+            pending.append(self.pending_item(
+                community_board_key(community_id), community_id, user_id, totals['total_score'], achieved_at, quizzes_scored=totals.get('quizzes_scored', 0)
+            ))
+        self.dynamodb_controller.batch_write_items(pending)
+        return improved
+
+    @staticmethod
+    def pending_item(board: str, community_id: str, user_id: str, score: Any, achieved_at: int, **extra: Any) -> Dict[str, Any]:
+        return {
+            'PK': f'{PENDING_PK_PREFIX}{random.randrange(LEADERBOARD_SHARDS)}',
+            'SK': f'{board}#USER#{user_id}',
+            'EntityType': 'LeaderboardUpdate',
+            'CreatedAt': int(time.time()),
+            'board': board,
+            'community_id': community_id,
+            'user_id': user_id,
+            'score': score,
+            'achieved_at': achieved_at,
+            # Deleting a merged update only succeeds while it is the one that was read
+            'token': uuid.uuid4().hex,
+            **extra,
+        }
+
+    @log_and_handle_exceptions
+    def get_leaderboard(self, community_id: str, quiz_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The compacted snapshot of a quiz's leaderboard, or of the community's when ``quiz_id`` is None."""
+        board = quiz_board_key(community_id, quiz_id) if quiz_id else community_board_key(community_id)
+        return self.dynamodb_controller.get_item(LEADERBOARD_PK, board)
+
+    @log_and_handle_exceptions
+    def remove_quiz(self, community_id: str, quiz_id: str) -> None:
+        """Deletes a quiz's scores, counters and snapshot and takes its best scores out of the members' totals."""
+        last_evaluated_key = None
+        while True:
+            scores, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq(SCORE_PK), Key('SK').begins_with(f'{quiz_board_key(community_id, quiz_id)}#USER#'),
+                limit=100, last_evaluated_key=last_evaluated_key, projection=['PK', 'SK', 'user_id', 'best_score']
+            )
+            for score in scores:
+                try:
+                    self.dynamodb_controller.update_item(
+                        SCORE_PK, member_total_key(community_id, score['user_id']),
+                        expression=UpdateExpression().add('total_score', -score['best_score']).add('quizzes_scored', -1),
+                        condition=Attr('PK').exists()
+                    )
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+            if scores:
+                self.dynamodb_controller.batch_delete_items([{'PK': score['PK'], 'SK': score['SK']} for score in scores])
+            if not last_evaluated_key:
+                break
+        boards, _ = self.dynamodb_controller.query_with_pagination(
+            Key('PK').eq(LEADERBOARD_PK), Key('SK').begins_with(quiz_board_key(community_id, quiz_id)),
+            limit=LEADERBOARD_SHARDS + 1, projection=['PK', 'SK']
+        )
+        if boards:
+            self.dynamodb_controller.batch_delete_items(boards)
+        board = community_board_key(community_id)
+        self.dynamodb_controller.put_item({**self.pending_item(board, community_id, '', 0, int(time.time())), 'SK': f'{board}#REBUILD', 'rebuild': True})
+
+    @log_and_handle_exceptions
+    def compact(self, should_stop: Callable[[], bool] = lambda: False) -> int:
+        """Merges the pending updates of every shard into their snapshots; returns the snapshots written."""
+        written = 0
+        for shard in random.sample(range(LEADERBOARD_SHARDS), LEADERBOARD_SHARDS):
+            if should_stop():
+                break
+            written += self.compact_shard(shard, should_stop)
+        return written
+
+    def compact_shard(self, shard: int, should_stop: Callable[[], bool]) -> int:
+        written = 0
+        live: Dict[Tuple[str, Optional[str]], bool] = {}
+        last_evaluated_key = None
+        while True:
+            updates, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq(f'{PENDING_PK_PREFIX}{shard}'), limit=PENDING_PAGE_SIZE, last_evaluated_key=last_evaluated_key
+            )
+            by_board: Dict[str, List[Dict[str, Any]]] = {}
+            for update in updates:
+                by_board.setdefault(update['board'], []).append(update)
+            for board, board_updates in by_board.items():
+                community_id, quiz_id = board_updates[0]['community_id'], board_updates[0].get('quiz_id')
+                if (community_id, quiz_id) not in live:
+                    live[(community_id, quiz_id)] = self.board_is_live(community_id, quiz_id)
+                # Updates of a deleted quiz or community are dropped with no snapshot
+                if live[(community_id, quiz_id)]:
+                    self.write_snapshot(board, community_id, quiz_id, board_updates)
+                    written += 1
+            for update in updates:
+                try:
+                    self.dynamodb_controller.delete_item(update['PK'], update['SK'], condition=Attr('token').eq(update['token']))
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    # Replaced by a newer update, which the next compaction merges
+            if not last_evaluated_key or should_stop():
+                return written
+
+    def board_is_live(self, community_id: str, quiz_id: Optional[str]) -> bool:
+        community = self.dynamodb_controller.get_item('COMMUNITY', f'COMMUNITY#{community_id}', projection=['PK', TOMBSTONE_ATTRIBUTE])
+        if community is None or TOMBSTONE_ATTRIBUTE in community:
+            return False
+        return quiz_id is None or self.dynamodb_controller.get_item('QUIZ', f'COMMUNITY#{community_id}#QUIZ#{quiz_id}', projection=['PK']) is not None
+
+    def write_snapshot(self, board: str, community_id: str, quiz_id: Optional[str], updates: List[Dict[str, Any]]) -> None:
+        """Merges updates into the board's snapshot, guarded by its version against a concurrent compaction."""
+        rebuild = any(update.get('rebuild') for update in updates)
+        for attempt in range(SNAPSHOT_WRITE_ATTEMPTS):
+            snapshot = self.dynamodb_controller.get_item(LEADERBOARD_PK, board) or {}
+            if rebuild:
+                entries = {entry['user_id']: entry for entry in self.load_entries(community_id)}
+            else:
+                entries = {entry['user_id']: entry for entry in snapshot.get('entries', [])}
+            user_ids = {update['user_id'] for update in updates if not update.get('rebuild')}
+            if quiz_id is None:
+                # A pending total may predate a quiz's removal, which would put its points back
+                totals = {entry['user_id']: entry for entry in self.current_totals(community_id, user_ids)}
+                for user_id in user_ids:
+                    if user_id in totals:
+                        entries[user_id] = totals[user_id]
+                    else:
+                        entries.pop(user_id, None)
+            else:
+                for update in updates:
+                    current = entries.get(update['user_id'])
+                    if current is None or current['score'] < update['score']:
+                        entries[update['user_id']] = self.entry(update)
+            now = int(time.time())
+            item = {
+                'PK': LEADERBOARD_PK,
+                'SK': board,
+                'EntityType': 'Leaderboard',
+                'CreatedAt': snapshot.get('CreatedAt', now),
+                'community_id': community_id,
+                'entries': rank_entries(list(entries.values())),
+                'compacted_at': now,
+                'version': snapshot.get('version', 0) + 1,
+            }
+            if quiz_id:
+                item.update(quiz_id=quiz_id, **self.quiz_counters(community_id, quiz_id))
+            condition = Attr('version').eq(snapshot['version']) if 'version' in snapshot else Attr('PK').not_exists()
+            try:
+                self.dynamodb_controller.put_item(item, condition=condition)
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == SNAPSHOT_WRITE_ATTEMPTS - 1:
+                    raise
+
+    @staticmethod
+    def entry(source: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {'user_id': source['user_id'], 'score': source['score'], 'achieved_at': source['achieved_at']}
+        if 'quizzes_scored' in source:
+            entry['quizzes_scored'] = source['quizzes_scored']
+        return entry
+
+    def load_entries(self, community_id: str) -> List[Dict[str, Any]]:
+        """Every member's total, for rebuilding the community's leaderboard."""
+        entries: List[Dict[str, Any]] = []
+        last_evaluated_key = None
+        while True:
+            totals, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq(SCORE_PK), Key('SK').begins_with(f'COMMUNITY#{community_id}#USER#'),
+                limit=PENDING_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=TOTAL_PROJECTION
+            )
+            entries.extend(self.total_entries(totals))
+            if not last_evaluated_key:
+                return entries
+
+    def current_totals(self, community_id: str, user_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """The entries of the given members' totals as they are now."""
+        keys = [{'PK': SCORE_PK, 'SK': member_total_key(community_id, user_id)} for user_id in user_ids]
+        if not keys:
+            return []
+        return self.total_entries(self.dynamodb_controller.batch_get_items(keys, projection=TOTAL_PROJECTION))
+
+    def total_entries(self, totals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Leaderboard entries of members' totals, leaving out members with no quiz scored."""
+        return [self.entry({**total, 'score': total['total_score']}) for total in totals if total.get('quizzes_scored', 0) > 0]
+
+    def quiz_counters(self, community_id: str, quiz_id: str) -> Dict[str, Any]:
+        """Players, attempts and the average score, summed over the quiz's counter shards."""
+        shards, _ = self.dynamodb_controller.query_with_pagination(
+            Key('PK').eq(LEADERBOARD_PK), Key('SK').begins_with(f'{quiz_board_key(community_id, quiz_id)}#SHARD#'),
+            limit=LEADERBOARD_SHARDS, projection=['player_count', 'attempt_count', 'score_total']
+        )
+        attempts = sum(shard.get('attempt_count', 0) for shard in shards)
+        total = sum(shard.get('score_total', 0) for shard in shards)
+        return {
+            'player_count': sum(shard.get('player_count', 0) for shard in shards),
+            'attempt_count': attempts,
+            'average_score': round(Decimal(total) / attempts, 4) if attempts else Decimal(0),
+        }
+
+def get_leaderboard_service() -> LeaderboardService:
+    return LeaderboardService(get_dynamodb_controller())
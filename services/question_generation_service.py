@@ -0,0 +1,399 @@
+import json
+import logging
+import math
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from boto3.dynamodb.conditions import Key
+
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+from app.lib.openai_controller import OpenAIController, get_openai_controller
+from app.lib.sqs_controller import SQSController
+from app.lib.tracing import bind_trace
+from app.lib.update_expression import UpdateExpression
+from app.models.question_generation_schema import GenerationProgress, GenerationStatus, QuestionGenerationRequest
+from app.services.prompt_templates import QUESTION_GENERATION
+from app.services.quiz_service import QuizService, question_item
+from app.services.usage_service import BudgetExceededError, UsageService
+
+JOB_PK = 'QUESTION_GENERATION'
+# Questions asked for in one LLM call; larger batches share the material and instructions across more questions
+QUESTIONS_PER_CALL = int(os.getenv('QUESTIONS_PER_CALL', '10'))
+# Keywords and insights sent with one call
+MATERIAL_PER_CALL = int(os.getenv('QUESTION_MATERIAL_PER_CALL', '30'))
+MAX_GENERATION_WORKERS = int(os.getenv('QUESTION_GENERATION_WORKERS', '4'))
+# Existing questions listed in each prompt so the model steers clear of them; the rest are deduplicated after
+EXISTING_IN_PROMPT = 40
+QUESTION_PAGE_SIZE = 100
+SOURCE_PAGE_SIZE = 25
+# Finished jobs stay readable for a week
+JOB_RETENTION_SECONDS = 7 * 86400
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+class GenerationJobNotFound(Exception):
+    """Raised when a quiz has no generation job with the given ID."""
+
+def job_sort_key(community_id: str, quiz_id: str, job_id: str = '') -> str:
+    """``COMMUNITY#<id>#QUIZ#<id>#GENERATION#<job id>``; without a job ID, the prefix of the quiz's jobs."""
+    return f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#GENERATION#{job_id}'
+
+def normalize_question(text: str) -> str:
+    """The words of a question, lowercased, so rewordings in case, spacing or punctuation compare equal."""
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+def parse_json(text: Any) -> Optional[Any]:
+    """A JSON response or stored output, with a ```json fence stripped; None if it is not valid JSON."""
+    if not isinstance(text, str):
+        return text
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else text[3:]
+        text = text[4:] if text.startswith('json') else text
+        text = text.rstrip('`').strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+def material_lines(output: Dict[str, Any]) -> List[str]:
+    """The keywords and insights of a source's unchunked output, one line each."""
+    lines = []
+    for keyword in output.get('keywords') or []:
+        if isinstance(keyword, dict) and keyword.get('keyword'):
+            details = ' '.join(str(keyword[field]) for field in ('definition', 'relation_to_topic') if keyword.get(field))
+            lines.append(f"{keyword['keyword']}: {details}".strip())
+        elif isinstance(keyword, str):
+            lines.append(keyword)
+    for insight in output.get('major_insights_or_novel_concepts') or []:
+        if isinstance(insight, dict) and insight.get('insight'):
+            lines.append(f"{insight.get('concept') or 'Insight'}: {insight['insight']}")
+        elif isinstance(insight, str):
+            lines.append(insight)
+    return lines
+
+def validate_question(question: Any) -> Optional[Dict[str, Any]]:
+    """A generated question with clean fields, or None if it cannot be used: no text, fewer than two
+    options, or no answer that is one of its options."""
+    if not isinstance(question, dict):
+        return None
+    text = question.get('question_text')
+    options = question.get('options')
+    answer = question.get('answer')
+    if isinstance(answer, str):
+        answer = [answer]
+    if not isinstance(text, str) or not text.strip() or not isinstance(options, list) or not isinstance(answer, list):
+        return None
+    options = list(dict.fromkeys(str(option).strip() for option in options if str(option).strip()))
+    answer = list(dict.fromkeys(str(option).strip() for option in answer if str(option).strip() in options))
+    if len(options) < 2 or not answer:
+        return None
+    question_type = question.get('question_type') or ('multiple_select' if len(answer) > 1 else 'multiple_choice')
+    return {'question_text': text.strip(), 'options': options, 'answer': answer, 'question_type': str(question_type)}
+
+class QuestionGenerationService:
+    """Generates a quiz's questions from its community's knowledge sources, in the background.
+
+    A request records a job item, ``QUESTION_GENERATION / COMMUNITY#<id>#QUIZ#<id>#GENERATION#<job id>``,
+    and queues it. The question_generator Lambda ranks the keywords and insights of the community's
+    unchunked outputs by how well they match the quiz, and asks for ``QUESTIONS_PER_CALL`` questions per
+    LLM call with a different slice of that material each time. Calls run in parallel groups; after each
+    group the new questions are deduplicated against the quiz, written with batch writes and counted on
+    the job, so a redelivered or continued job resumes at the next batch. Responses are cached by
+    OpenAIController, so a batch repeated against an unchanged quiz costs no tokens.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController, openai_controller: Optional[OpenAIController] = None, sqs_controller: Optional[SQSController] = None, usage_service: Optional[UsageService] = None, quiz_service: Optional[QuizService] = None):
+        self.dynamodb_controller = dynamodb_controller
+        self._openai_controller = openai_controller
+        self.sqs_controller = sqs_controller
+        self.usage_service = usage_service
+        self.quiz_service = quiz_service or QuizService(dynamodb_controller)
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def openai_controller(self) -> OpenAIController:
+        # Only the worker calls the LLM, so the API never needs an OpenAI client
+        if self._openai_controller is None:
+            self._openai_controller = get_openai_controller()
+        return self._openai_controller
+
+    @log_and_handle_exceptions
+    def request_generation(self, community_id: str, quiz_id: str, request: QuestionGenerationRequest, requested_by: Optional[str] = None) -> GenerationProgress:
+        """Records a generation job for the quiz and queues it."""
+        now_ms = int(time.time() * 1000)
+        job_id = str(uuid.uuid4())
+        job = {
+            'PK': JOB_PK,
+            'SK': job_sort_key(community_id, quiz_id, job_id),
+            'EntityType': 'QuestionGeneration',
+            'CreatedAt': now_ms // 1000,
+            'job_id': job_id,
+            'quiz_id': quiz_id,
+            'community_id': community_id,
+            'status': GenerationStatus.PENDING.value,
+            'requested': request.question_count,
+            'generated': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'batches_done': 0,
+            'failed_batches': 0,
+            'batches_total': math.ceil(request.question_count / QUESTIONS_PER_CALL),
+            'runs': 0,
+            'requested_at_ms': now_ms,
+            'updated_at_ms': now_ms,
+        }
+        if request.source_ids:
+            job['source_ids'] = list(dict.fromkeys(request.source_ids))
+        if requested_by:
+            job['requested_by'] = requested_by
+        self.dynamodb_controller.put_item(job)
+        try:
+            self.enqueue(job)
+        except Exception:
+            # A job that is never queued would stay pending forever
+            self.dynamodb_controller.delete_item(JOB_PK, job['SK'])
+            raise
+        return self.build_progress(job)
+
+    def enqueue(self, job: Dict[str, Any]) -> None:
+        if self.sqs_controller is None:
+            raise RuntimeError("QuestionGenerationService needs an SQS controller to queue generation jobs")
+        self.sqs_controller.send_message(json.dumps({
+            'community_id': job['community_id'], 'quiz_id': job['quiz_id'], 'job_id': job['job_id'],
+        }))
+
+    @log_and_handle_exceptions
+    def get_job(self, community_id: str, quiz_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.dynamodb_controller.get_item(JOB_PK, job_sort_key(community_id, quiz_id, job_id))
+
+    @log_and_handle_exceptions
+    def get_progress(self, community_id: str, quiz_id: str, job_id: str) -> Optional[GenerationProgress]:
+        job = self.get_job(community_id, quiz_id, job_id)
+        return self.build_progress(job) if job else None
+
+    @staticmethod
+    def build_progress(job: Dict[str, Any]) -> GenerationProgress:
+        counters = ('requested', 'generated', 'duplicates', 'rejected', 'batches_done', 'failed_batches', 'batches_total', 'runs')
+        return GenerationProgress(
+            job_id=job['job_id'],
+            quiz_id=job['quiz_id'],
+            community_id=job['community_id'],
+            status=GenerationStatus(job['status']),
+            **{name: int(job.get(name, 0)) for name in counters},
+            requested_at_ms=int(job['requested_at_ms']),
+            updated_at_ms=int(job['updated_at_ms']) if 'updated_at_ms' in job else None,
+            completed_at_ms=int(job['completed_at_ms']) if 'completed_at_ms' in job else None,
+            error=job.get('error'),
+        )
+
+    @log_and_handle_exceptions
+    def run(self, community_id: str, quiz_id: str, job_id: str, should_stop: Callable[[], bool] = lambda: False) -> bool:
+        """Generates a job's remaining batches of questions.
+
+        Args:
+            should_stop (Callable[[], bool]): Checked before each group of calls; when it returns True the
+                job is queued again and the run ends, e.g. as the Lambda nears its timeout.
+
+        Returns:
+            bool: True once the job has finished, False if it was queued to continue.
+        """
+        job = self.get_job(community_id, quiz_id, job_id)
+        if job is None:
+            raise GenerationJobNotFound(f"Generation job {job_id} not found")
+        if job['status'] in (GenerationStatus.COMPLETED.value, GenerationStatus.FAILED.value):
+            return True
+        sk = job['SK']
+        quiz = self.dynamodb_controller.get_item('QUIZ', f'COMMUNITY#{community_id}#QUIZ#{quiz_id}', projection=['title', 'description'])
+        if quiz is None:
+            self.finish(sk, GenerationStatus.FAILED, "Quiz not found")
+            return True
+        material = self.select_material(community_id, quiz, job.get('source_ids'))
+        if not material:
+            self.finish(sk, GenerationStatus.FAILED, "The community has no processed knowledge sources to generate questions from")
+            return True
+        self.update_job(sk, UpdateExpression().set('status', GenerationStatus.RUNNING.value).add('runs', 1))
+
+        requested, batches_total = int(job['requested']), int(job['batches_total'])
+        batch = int(job.get('batches_done', 0))
+        generated = int(job.get('generated', 0))
+        existing = self.load_question_texts(community_id, quiz_id)
+        seen = {normalize_question(text) for text in existing}
+        quiz_description = ' - '.join(str(quiz[field]) for field in ('title', 'description') if quiz.get(field))
+        written_this_run = 0
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_GENERATION_WORKERS) as executor:
+                while batch < batches_total and generated < requested:
+                    if should_stop():
+                        self.logger.info("Continuing generation job %s in a new invocation at batch %d", job_id, batch)
+                        self.enqueue(job)
+                        return False
+                    if self.usage_service:
+                        self.usage_service.check_budget(community_id)
+                    group = range(batch, min(batch + MAX_GENERATION_WORKERS, batches_total))
+                    prompt_existing = json.dumps(existing[-EXISTING_IN_PROMPT:])
+                    requests = [
+                        (community_id, quiz_description, prompt_existing, self.batch_size(index, requested), self.batch_material(material, index, batches_total))
+                        for index in group
+                    ]
+                    responses = list(executor.map(bind_trace(lambda args: self.generate_batch(*args)), requests))
+
+                    questions, duplicates, rejected, failed = [], 0, 0, 0
+                    for response in responses:
+                        if response is None:
+                            failed += 1
+                            continue
+                        valid = [validate_question(question) for question in response]
+                        rejected += sum(1 for question in valid if question is None)
+                        for question in valid:
+                            if question is None:
+                                continue
+                            normalized = normalize_question(question['question_text'])
+                            if normalized in seen or len(questions) >= requested - generated:
+                                duplicates += normalized in seen
+                                continue
+                            seen.add(normalized)
+                            questions.append(question)
+                    self.write_questions(community_id, quiz_id, questions)
+                    existing.extend(question['question_text'] for question in questions)
+                    generated += len(questions)
+                    written_this_run += len(questions)
+                    batch = group.stop
+                    self.update_job(
+                        sk, UpdateExpression().set('batches_done', batch).add('generated', len(questions))
+                        .add('duplicates', duplicates).add('rejected', rejected).add('failed_batches', failed)
+                    )
+        except BudgetExceededError as e:
+            self.logger.error("Stopping generation job %s: %s", job_id, e)
+            self.finish(sk, GenerationStatus.FAILED, str(e))
+            return True
+        finally:
+            if written_this_run:
+                # Quiz reads include the questions, so the quiz changes once per run instead of once per question
+                self.quiz_service.bump_quiz_version(community_id, quiz_id)
+
+        if generated == 0 and batches_total:
+            self.finish(sk, GenerationStatus.FAILED, "No usable questions were generated")
+        else:
+            self.finish(sk, GenerationStatus.COMPLETED)
+        self.logger.info("Generation job %s wrote %d of %d questions", job_id, generated, requested)
+        return True
+
+    @staticmethod
+    def batch_size(index: int, requested: int) -> int:
+        return min(QUESTIONS_PER_CALL, requested - index * QUESTIONS_PER_CALL)
+
+    @staticmethod
+    def batch_material(material: List[str], index: int, batches_total: int) -> List[str]:
+        """The material of one call: every ``batches_total``-th line of the ranked material, so calls cover
+        different facts while each still gets some of the best matches."""
+        lines = material[index::batches_total][:MATERIAL_PER_CALL]
+        return lines or material[:MATERIAL_PER_CALL]
+
+    def generate_batch(self, community_id: str, quiz: str, existing: str, count: int, material: List[str]) -> Optional[List[Any]]:
+        """One LLM call for ``count`` questions; None if it failed or its response was not JSON.
+
+        Raises:
+            BudgetExceededError: Passed on, since no further call can succeed either.
+        """
+        try:
+            messages = QUESTION_GENERATION.build_messages(quiz=quiz, existing=existing, count=count, content='\n'.join(material))
+            response = self.openai_controller.get_response(messages, prompt_version=QUESTION_GENERATION.version)
+            if self.usage_service and response.get('usage'):
+                self.usage_service.record_usage(community_id, None, response['usage'])
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Question generation call failed: %s", e)
+            return None
+        parsed = parse_json(response.get('response', ''))
+        if isinstance(parsed, dict):
+            parsed = parsed.get('questions')
+        if not isinstance(parsed, list):
+            self.logger.error("Question generation response was not a list of questions")
+            return None
+        return parsed
+
+    def select_material(self, community_id: str, quiz: Dict[str, Any], source_ids: Optional[List[str]] = None) -> List[str]:
+        """The keywords and insights of the chosen sources, best matches for the quiz's title and description first.
+
+        A line's score is the number of the quiz's words it contains; ties keep the sources' order.
+        """
+        lines: List[str] = []
+        for output in self.load_outputs(community_id, source_ids):
+            data = parse_json(output.get('data'))
+            if isinstance(data, dict):
+                lines.extend(material_lines(data))
+        lines = list(dict.fromkeys(lines))
+        quiz_words = {word for field in ('title', 'description') for word in _WORD_RE.findall(str(quiz.get(field) or '').lower()) if len(word) > 3}
+        if quiz_words:
+            lines.sort(key=lambda line: -len(quiz_words.intersection(_WORD_RE.findall(line.lower()))))
+        return lines
+
+    def load_outputs(self, community_id: str, source_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """The unchunked outputs of the given sources, or of every source in the community, in key order."""
+        prefix = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#'
+        if source_ids:
+            keys = [{'PK': 'KNOWLEDGE_SOURCE_UNCHUNK', 'SK': f'{prefix}{source_id}'} for source_id in sorted(source_ids)]
+            return self.dynamodb_controller.batch_get_items(keys, projection=['data'])
+        outputs: List[Dict[str, Any]] = []
+        last_evaluated_key = None
+        while True:
+            page, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq('KNOWLEDGE_SOURCE_UNCHUNK'), Key('SK').begins_with(prefix),
+                limit=SOURCE_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=['data']
+            )
+            outputs.extend(page)
+            if not last_evaluated_key:
+                return outputs
+
+    def load_question_texts(self, community_id: str, quiz_id: str) -> List[str]:
+        texts: List[str] = []
+        last_evaluated_key = None
+        while True:
+            page, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq('QUESTION'), Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#'),
+                limit=QUESTION_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=['question_text']
+            )
+            texts.extend(str(question['question_text']) for question in page if question.get('question_text'))
+            if not last_evaluated_key:
+                return texts
+
+    def write_questions(self, community_id: str, quiz_id: str, questions: List[Dict[str, Any]]) -> None:
+        """Writes new questions with batch writes of 25; the caller bumps the quiz version."""
+        if not questions:
+            return
+        now = int(time.time())
+        self.dynamodb_controller.batch_write_items([
+            question_item(
+                community_id, quiz_id, str(uuid.uuid4()), question['question_text'],
+                question['options'], question['answer'], question['question_type'], now
+            ) for question in questions
+        ])
+
+    def finish(self, sk: str, status: GenerationStatus, error: Optional[str] = None) -> None:
+        now_ms = int(time.time() * 1000)
+        expression = (
+            UpdateExpression().set('status', status.value).set('completed_at_ms', now_ms)
+            .set('ExpiresAt', now_ms // 1000 + JOB_RETENTION_SECONDS)
+        )
+        if error:
+            expression.set('error', error[:1000])
+        else:
+            expression.remove('error')
+        self.update_job(sk, expression)
+
+    @log_and_handle_exceptions
+    def record_error(self, sk: str, error: str) -> None:
+        """Keeps the last error on the job; the queue redelivers it and the next run resumes."""
+        self.update_job(sk, UpdateExpression().set('error', error[:1000]))
+
+    def update_job(self, sk: str, expression: UpdateExpression) -> None:
+        self.dynamodb_controller.update_item(JOB_PK, sk, {'updated_at_ms': int(time.time() * 1000)}, expression=expression)
+
+def get_question_generation_service() -> QuestionGenerationService:
+    dynamodb_controller = get_dynamodb_controller()
+    return QuestionGenerationService(dynamodb_controller, sqs_controller=SQSController(queue_url=os.getenv('QUESTION_GENERATION_QUEUE')))
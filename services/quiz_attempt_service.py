@@ -0,0 +1,229 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+from app.lib.update_expression import UpdateExpression
+from app.models.quiz_attempt_schema import AttemptStatus, AttemptSubmit
+
+ATTEMPT_PK = 'QUIZ_ATTEMPT'
+ANSWER_KEY_CACHE_SIZE = int(os.getenv('ANSWER_KEY_CACHE_SIZE', '256'))
+QUESTION_PAGE_SIZE = 100
+
+class AttemptNotFound(Exception):
+    """Raised when the user has no attempt with the given ID on the quiz."""
+
+class AttemptAlreadySubmitted(Exception):
+    """Raised when an attempt that was already graded is submitted again."""
+
+def attempt_sort_key(community_id: str, quiz_id: str, user_id: str, attempt_id: str = '') -> str:
+    """``COMMUNITY#<id>#QUIZ#<id>#ATTEMPT#<user id>#<attempt id>``; without an attempt ID, the prefix of the user's attempts."""
+    return f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#ATTEMPT#{user_id}#{attempt_id}'
+
+class AnswerKey:
+    """A quiz's answers compiled for grading, with the options of each question as bits of an integer.
+
+    A submitted multi-select answer becomes one mask, so the right picks are ``mask & correct`` and the
+    wrong ones ``mask & ~correct``: set operations on whole answers instead of loops over their options.
+    """
+    def __init__(self, version: int, questions: Iterable[Dict[str, Any]]):
+        self.version = version
+        # question ID -> (option bits, mask of the correct options, number of correct options)
+        self.questions: Dict[str, Tuple[Dict[str, int], int, int]] = {}
+        for question in questions:
+            bits: Dict[str, int] = {}
+            # Answers that are not among the options still get a bit, so they can be chosen
+            for option in [*question.get('options', []), *question.get('answer', [])]:
+                bits.setdefault(option, 1 << len(bits))
+            correct = 0
+            for option in question.get('answer', []):
+                correct |= bits[option]
+            self.questions[str(question['question_id'])] = (bits, correct, correct.bit_count())
+
+    def grade(self, answers: Dict[str, List[str]]) -> Tuple[Dict[str, float], int]:
+        """Credit from 0 to 1 for every question, and the number answered exactly right.
+
+        Each right pick earns ``1 / number of correct options`` and each wrong pick takes as much away,
+        down to zero; unanswered questions earn nothing.
+        """
+        credits: Dict[str, float] = {}
+        correct_count = 0
+        for question_id, (bits, correct, correct_total) in self.questions.items():
+            mask = 0
+            unknown = 1 << len(bits)
+            for option in answers.get(question_id, ()):
+                mask |= bits.get(option, unknown)
+            if mask == correct and (mask or question_id in answers):
+                credits[question_id] = 1.0
+                correct_count += 1
+            elif correct_total:
+                credits[question_id] = max(0, (mask & correct).bit_count() - (mask & ~correct).bit_count()) / correct_total
+            else:
+                credits[question_id] = 0.0
+        return credits, correct_count
+
+class AnswerKeyCache:
+    """Recently used answer keys, per process. A key is reused while the quiz's version is unchanged;
+    every question write bumps that version, so an edited quiz is loaded again on its next submission."""
+    def __init__(self, max_entries: int = ANSWER_KEY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Hashable, AnswerKey]' = OrderedDict()
+        self.loading: Dict[Hashable, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, key: Hashable, version: int) -> Optional[AnswerKey]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def get_or_load(self, key: Hashable, version: int, load: Callable[[], AnswerKey]) -> AnswerKey:
+        entry = self.lookup(key, version)
+        if entry is not None:
+            return entry
+        with self.lock:
+            load_lock = self.loading.setdefault(key, threading.Lock())
+        # Submissions that arrive together for a quiz that is not loaded yet wait for a single load
+        with load_lock:
+            entry = self.lookup(key, version)
+            if entry is not None:
+                return entry
+            entry = load()
+            with self.lock:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                self.loading.pop(key, None)
+        return entry
+
+class QuizAttemptService:
+    """Starts, grades and reads quiz attempts.
+
+    An attempt is one item, ``QUIZ_ATTEMPT / COMMUNITY#<id>#QUIZ#<id>#ATTEMPT#<user id>#<attempt id>``.
+    Submitting grades every answer against the quiz's cached answer key and writes the result with one
+    conditional update, which only succeeds while the attempt is in progress.
+    """
+    def __init__(self, dynamodb_controller: DynamoDBController, answer_keys: Optional[AnswerKeyCache] = None):
+        self.dynamodb_controller = dynamodb_controller
+        self.answer_keys = answer_keys or AnswerKeyCache()
+        self.logger = logging.getLogger(__name__)
+
+    def answer_key(self, community_id: str, quiz_id: str, quiz_version: int) -> AnswerKey:
+        """The answer key of the quiz at ``quiz_version``, loaded with one paginated query when not cached."""
+        version = int(quiz_version)
+        return self.answer_keys.get_or_load(
+            (community_id, quiz_id), version, lambda: AnswerKey(version, self.load_questions(community_id, quiz_id))
+        )
+
+    def load_questions(self, community_id: str, quiz_id: str) -> List[Dict[str, Any]]:
+        questions: List[Dict[str, Any]] = []
+        last_evaluated_key = None
+        while True:
+            page, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq('QUESTION'), Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#'),
+                limit=QUESTION_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=['question_id', 'options', 'answer']
+            )
+            questions.extend(page)
+            if not last_evaluated_key:
+                return questions
+
+    @log_and_handle_exceptions
+    def start_attempt(self, community_id: str, quiz_id: str, user_id: str, quiz_version: int) -> Dict[str, Any]:
+        """Records a new attempt in progress; loading the answer key here warms it for the submission.
+
+        Raises:
+            ValueError: If the quiz has no questions.
+        """
+        answer_key = self.answer_key(community_id, quiz_id, quiz_version)
+        if not answer_key.questions:
+            raise ValueError("The quiz has no questions")
+        now = int(datetime.now(timezone.utc).timestamp())
+        attempt_id = str(uuid.uuid4())
+        item = {
+            'PK': ATTEMPT_PK,
+            'SK': attempt_sort_key(community_id, quiz_id, user_id, attempt_id),
+            'EntityType': 'QuizAttempt',
+            'CreatedAt': now,
+            'attempt_id': attempt_id,
+            'quiz_id': quiz_id,
+            'community_id': community_id,
+            'user_id': user_id,
+            'status': AttemptStatus.IN_PROGRESS.value,
+            'started_at': now,
+            'question_count': len(answer_key.questions),
+        }
+        self.dynamodb_controller.put_item(item)
+        return item
+
+    @log_and_handle_exceptions
+    def submit_attempt(self, community_id: str, quiz_id: str, user_id: str, attempt_id: str, submission: AttemptSubmit, quiz_version: int) -> Dict[str, Any]:
+        """Grades all answers at once and stores the result on the attempt.
+
+        Returns:
+            Dict[str, Any]: The graded attempt.
+
+        Raises:
+            ValueError: If an answer names a question the quiz does not have, or a question twice.
+            AttemptNotFound: If the user has no such attempt.
+            AttemptAlreadySubmitted: If the attempt was already graded.
+        """
+        answer_key = self.answer_key(community_id, quiz_id, quiz_version)
+        answers: Dict[str, List[str]] = {}
+        for answer in submission.answers:
+            if answer.question_id not in answer_key.questions:
+                raise ValueError(f"Question {answer.question_id} is not part of this quiz")
+            if answer.question_id in answers:
+                raise ValueError(f"Question {answer.question_id} is answered more than once")
+            answers[answer.question_id] = list(answer.selected)
+        credits, correct_count = answer_key.grade(answers)
+
+        results = {question_id: Decimal(str(round(credit, 4))) for question_id, credit in credits.items()}
+        expression = (
+            UpdateExpression()
+            .set('status', AttemptStatus.SUBMITTED.value)
+            .set('submitted_at', int(datetime.now(timezone.utc).timestamp()))
+            .set('answers', answers)
+            .set('results', results)
+            .set('score', Decimal(str(round(sum(credits.values()), 4))))
+            .set('max_score', len(credits))
+            .set('correct_count', correct_count)
+            .set('graded_version', answer_key.version)
+        )
+        sk = attempt_sort_key(community_id, quiz_id, user_id, attempt_id)
+        try:
+            return self.dynamodb_controller.update_item(
+                ATTEMPT_PK, sk, expression=expression,
+                condition=Attr('status').eq(AttemptStatus.IN_PROGRESS.value), return_values='ALL_NEW'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        if self.dynamodb_controller.get_item(ATTEMPT_PK, sk, projection=['PK']) is None:
+            raise AttemptNotFound(f"Attempt {attempt_id} not found")
+        raise AttemptAlreadySubmitted(f"Attempt {attempt_id} was already submitted")
+
+    @log_and_handle_exceptions
+    def get_attempt(self, community_id: str, quiz_id: str, user_id: str, attempt_id: str) -> Optional[Dict[str, Any]]:
+        return self.dynamodb_controller.get_item(ATTEMPT_PK, attempt_sort_key(community_id, quiz_id, user_id, attempt_id))
+
+    @log_and_handle_exceptions
+    def list_attempts(self, community_id: str, quiz_id: str, user_id: str, limit: int = 10, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """The user's attempts on the quiz."""
+        return self.dynamodb_controller.query_with_pagination(
+            Key('PK').eq(ATTEMPT_PK), Key('SK').begins_with(attempt_sort_key(community_id, quiz_id, user_id)),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=projection
+        )
+
+def get_quiz_attempt_service() -> QuizAttemptService:
+    return QuizAttemptService(get_dynamodb_controller())
@@ -1,95 +1,299 @@
 import logging
-from typing import Dict, Any, List, Optional
-from boto3.dynamodb.conditions import Key
-from app.lib.dynamodb_controller import DynamoDBController
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Any, Iterator, List, Optional, Tuple
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from app.lib.dynamodb_controller import DynamoDBController, community_entity_key, get_dynamodb_controller
+from app.lib.entity_cache import EntityCache, get_entity_cache, quiz_cache_key
 from app.models.quiz_schema import QuizCreate, QuizUpdate
-from app.models.question_schema import QuestionModel
+from app.models.question_schema import QuestionModel, QuestionRecord
 from app.lib.logging import log_and_handle_exceptions
+from app.lib.tracing import bind_trace
+from app.services.leaderboard_service import LeaderboardService
 from datetime import datetime, timezone
 import os
 from uuid import UUID
 
+EXPORT_PAGE_SIZE = 100
+IMPORT_BATCH_SIZE = 25
+BACKFILL_PAGE_SIZE = 100
+IMPORT_WRITE_WORKERS = int(os.getenv('QUESTION_IMPORT_WORKERS', '8'))
+
+def question_item(community_id: str, quiz_id: str, question_id: str, question_text: str, options: List[str], answer: List[str], question_type: str, now: int) -> Dict[str, Any]:
+    return {
+        'PK': 'QUESTION',
+        'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question_id}',
+        'EntityType': 'Question',
+        'question_id': question_id,
+        'quiz_id': quiz_id,
+        'community_id': community_id,
+        'question_text': question_text,
+        'options': options,
+        'answer': answer,
+        'CreatedAt': now,
+        'version': 1,
+        'updated_at': now,
+        "type": question_type
+    }
+
+def question_record(question: Dict[str, Any]) -> Dict[str, Any]:
+    """A stored question in the shape of a QuestionRecord, as exported."""
+    return {
+        'question_id': question['question_id'],
+        'question_text': question.get('question_text'),
+        'options': question.get('options', []),
+        'answer': question.get('answer', []),
+        'question_type': question.get('type'),
+    }
+
+class QuestionImport:
+    """Writes a stream of imported questions in batches of 25, with several batches in flight at once.
+
+    ``add`` hands back the batches the caller must wait for before adding more, so no more than
+    ``max_in_flight`` batches are held in memory however long the stream is. ``close`` bumps the quiz
+    version once if anything was written.
+    """
+    def __init__(self, quiz_service: 'QuizService', community_id: str, quiz_id: str, workers: int = IMPORT_WRITE_WORKERS):
+        self.quiz_service = quiz_service
+        self.community_id = community_id
+        self.quiz_id = quiz_id
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_in_flight = workers * 2
+        self.pending: List[Dict[str, Any]] = []
+        self.in_flight: Deque[Future] = deque()
+        self.submitted = 0
+        self.written = 0
+        self.lock = threading.Lock()
+        self.now = int(datetime.now(timezone.utc).timestamp())
+        self.write_batch = bind_trace(self._write_batch)
+
+    def add(self, record: QuestionRecord) -> List[Future]:
+        """Queues a question; returns the batches to wait for before the next add."""
+        question_id = str(record.question_id or uuid.uuid4())
+        self.pending.append(question_item(
+            self.community_id, self.quiz_id, question_id, record.question_text,
+            record.options, record.answer, record.question_type, self.now
+        ))
+        if len(self.pending) < IMPORT_BATCH_SIZE:
+            return []
+        self.submit()
+        waits = []
+        while len(self.in_flight) > self.max_in_flight:
+            waits.append(self.in_flight.popleft())
+        return waits
+
+    def finish(self) -> List[Future]:
+        """Writes the last partial batch; returns every batch still in flight."""
+        if self.pending:
+            self.submit()
+        waits = list(self.in_flight)
+        self.in_flight.clear()
+        return waits
+
+    def submit(self) -> None:
+        batch, self.pending = self.pending, []
+        self.submitted += len(batch)
+        self.in_flight.append(self.executor.submit(self.write_batch, batch))
+        while self.in_flight and self.in_flight[0].done() and self.in_flight[0].exception() is None:
+            self.in_flight.popleft()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        self.quiz_service.dynamodb_controller.batch_write_items(batch)
+        with self.lock:
+            self.written += len(batch)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        if self.written:
+            self.quiz_service.bump_quiz_version(self.community_id, self.quiz_id)
+
 class QuizService:
-    def __init__(self, dynamodb_controller: DynamoDBController):
+    def __init__(self, dynamodb_controller: DynamoDBController, cache: Optional[EntityCache] = None):
         self.dynamodb_controller = dynamodb_controller
+        # Without a cache, reads go to the table every time
+        self.cache = cache or EntityCache(None)
+        self.leaderboards = LeaderboardService(dynamodb_controller)
         self.logger = logging.getLogger(__name__)
 
     @log_and_handle_exceptions
     def create_quiz(self, quiz: QuizCreate) -> None:
+        now = int(datetime.now(timezone.utc).timestamp())
         item = {
             'PK': 'QUIZ',
             'SK': f'COMMUNITY#{quiz.community_id}#QUIZ#{quiz.quiz_id}',
             'EntityType': 'Quiz',
-            'CreatedAt': int(datetime.now(timezone.utc).timestamp()),
+            'CommunityEntity': community_entity_key(str(quiz.community_id), 'Quiz'),
+            'CreatedAt': now,
+            'version': 1,
+            'updated_at': now,
             'quiz_id': str(quiz.quiz_id),
             'community_id': str(quiz.community_id),
             'title': quiz.title,
             'description': quiz.description,
             'owner_ids': [str(owner_id) for owner_id in quiz.owner_ids],
         }
+        if quiz.owner_ids:
+            # The creator, which GSI2 lists the quiz under; owners added later are not indexed
+            item['Owner_ID'] = str(quiz.owner_ids[0])
         self.dynamodb_controller.put_item(item)
+        self.cache.evict([quiz_cache_key(str(quiz.community_id), str(quiz.quiz_id))])
 
     @log_and_handle_exceptions
-    def get_quiz_metadata(self, community_id: str, quiz_id: str) -> Dict[str, Any]:
-        partition_key = Key('PK').eq('QUIZ')
-        sort_key_condition = Key('SK').eq(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}')
-        quizzes = self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition)[0]
-        if not quizzes:
-            return None
-        return quizzes[0]
+    def get_quiz_metadata(self, community_id: str, quiz_id: str, projection: Optional[List[str]] = None) -> Dict[str, Any]:
+        def load():
+            partition_key = Key('PK').eq('QUIZ')
+            sort_key_condition = Key('SK').eq(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}')
+            quizzes = self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, projection=projection)[0]
+            if not quizzes:
+                return None
+            return quizzes[0]
+        return self.cache.get_or_load(quiz_cache_key(community_id, quiz_id), ('metadata', tuple(projection) if projection else None), load)
 
 
     @log_and_handle_exceptions
-    def update_quiz(self, quiz_id: str, quiz_data: QuizUpdate) -> None:
-        sk = f'COMMUNITY#{quiz_data.community_id}#QUIZ#{quiz_id}'
+    def update_quiz(self, community_id: str, quiz_id: str, quiz_data: QuizUpdate) -> None:
+        sk = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}'
         update_data = quiz_data.dict(exclude_unset=True)
-        self.dynamodb_controller.update_item('QUIZ', sk, update_data)
+        update_data['updated_at'] = int(datetime.now(timezone.utc).timestamp())
+        self.dynamodb_controller.increment_counters('QUIZ', sk, {'version': 1}, update_data=update_data)
+        self.cache.evict([quiz_cache_key(community_id, quiz_id)])
+
+    @log_and_handle_exceptions
+    def bump_quiz_version(self, community_id: str, quiz_id: str) -> None:
+        """Marks the quiz as changed when one of its questions is, since quiz reads include the questions."""
+        sk = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}'
+        update_data = {'updated_at': int(datetime.now(timezone.utc).timestamp())}
+        self.dynamodb_controller.increment_counters('QUIZ', sk, {'version': 1}, update_data=update_data)
+        self.cache.evict([quiz_cache_key(community_id, quiz_id)])
 
     @log_and_handle_exceptions
     def delete_quiz(self, community_id: str, quiz_id: str) -> None:
-        # First, delete all questions for this quiz
+        # First, delete all questions and attempts for this quiz
         self.delete_all_questions_for_quiz(community_id, quiz_id)
+        self.delete_all_attempts_for_quiz(community_id, quiz_id)
+        self.leaderboards.remove_quiz(community_id, quiz_id)
         
         # Then, delete the quiz metadata
         sk = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}'
         self.dynamodb_controller.delete_item('QUIZ', sk)
+        self.cache.evict([quiz_cache_key(community_id, quiz_id)])
+
+    @log_and_handle_exceptions
+    def record_score(self, community_id: str, quiz_id: str, user_id: str, score: Any, max_score: int, achieved_at: Optional[int] = None) -> bool:
+        """Adds a graded attempt to the quiz's and the community's leaderboards; returns True if it is the user's best."""
+        return self.leaderboards.record_score(community_id, quiz_id, user_id, score, max_score, achieved_at)
 
     @log_and_handle_exceptions
-    def list_quizzes(self, community_id: str, limit: int = 10, last_evaluated_key: Optional[str] = None) -> (List[Dict[str, Any]], Optional[str]): # type: ignore
+    def get_leaderboard(self, community_id: str, quiz_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The quiz's leaderboard, or the community's when ``quiz_id`` is None, as last compacted."""
+        return self.leaderboards.get_leaderboard(community_id, quiz_id)
+
+    @log_and_handle_exceptions
+    def list_quizzes(self, community_id: str, limit: int = 10, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> (List[Dict[str, Any]], Optional[Dict[str, Any]]): # type: ignore
         partition_key = Key('PK').eq('QUIZ')
         sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#')
-        print(partition_key, sort_key_condition)
-        quizzes, next_token = self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key)
+        quizzes, next_token = self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key, projection=projection)
         return quizzes, next_token
 
     @log_and_handle_exceptions
-    def get_questions_by_quiz_id(self, community_id: str, quiz_id: str, limit: int = 10, last_evaluated_key: Optional[str] = None) -> (List[Dict[str, Any]], Optional[str]):
-        partition_key = Key('PK').eq('QUESTION')
-        sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#')
-        questions, next_token = self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key)
-        return questions, next_token
+    def list_newest_quizzes(self, community_id: str, limit: int = 10, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """The community's quizzes, most recently created first, from GSI4 (CommunityEntity + CreatedAt)."""
+        return self.dynamodb_controller.query_index(
+            'GSI4', Key('CommunityEntity').eq(community_entity_key(community_id, 'Quiz')),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=projection, scan_index_forward=False
+        )
+
+    @log_and_handle_exceptions
+    def list_owned_quizzes(self, owner_id: str, limit: int = 10, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Quizzes the user created, across communities and newest first, from GSI2 (Owner_ID + CreatedAt).
+
+        Only quizzes carry Owner_ID, and it is the creator's: co-owners do not see the quizzes they were added to.
+        """
+        return self.dynamodb_controller.query_index(
+            'GSI2', Key('Owner_ID').eq(owner_id),
+            limit=limit, last_evaluated_key=last_evaluated_key, projection=projection, scan_index_forward=False
+        )
+
+    @log_and_handle_exceptions
+    def backfill_index_keys(self) -> int:
+        """Adds CommunityEntity, and Owner_ID from the first owner, to quizzes created without them; returns the number updated."""
+        updated = 0
+        last_evaluated_key = None
+        while True:
+            quizzes, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                Key('PK').eq('QUIZ'), filter_condition=Attr('CommunityEntity').not_exists() | Attr('Owner_ID').not_exists(),
+                limit=BACKFILL_PAGE_SIZE, last_evaluated_key=last_evaluated_key, projection=['PK', 'SK', 'community_id', 'owner_ids']
+            )
+            for quiz in quizzes:
+                update_data = {'CommunityEntity': community_entity_key(quiz['community_id'], 'Quiz')}
+                if quiz.get('owner_ids'):
+                    update_data['Owner_ID'] = str(quiz['owner_ids'][0])
+                try:
+                    self.dynamodb_controller.update_item('QUIZ', quiz['SK'], update_data, condition=Attr('PK').exists())
+                except ClientError as e:
+                    # Deleted since the page was read
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    continue
+                updated += 1
+            if not last_evaluated_key:
+                return updated
+
+    @log_and_handle_exceptions
+    def get_questions_by_quiz_id(self, community_id: str, quiz_id: str, limit: int = 10, last_evaluated_key: Optional[Dict[str, Any]] = None, projection: Optional[List[str]] = None) -> (List[Dict[str, Any]], Optional[Dict[str, Any]]):
+        def load():
+            partition_key = Key('PK').eq('QUESTION')
+            sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#')
+            return self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key, projection=projection)
+        if last_evaluated_key:
+            # Only the first page, which quiz reads return, is cached
+            return load()
+        questions, next_token = self.cache.get_or_load(quiz_cache_key(community_id, quiz_id), ('questions', limit, tuple(projection) if projection else None), load)
+        return list(questions), next_token
 
     @log_and_handle_exceptions
     def create_question(self, community_id: str, quiz_id: str, question_data: QuestionModel) -> None:
-        item = {
-            'PK': 'QUESTION',
-            'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question_data.question_id}',
-            'EntityType': 'Question',
-            'question_id': str(question_data.question_id),
-            'quiz_id': quiz_id,
-            'community_id': community_id,
-            'question_text': question_data.question_text,
-            'options': question_data.options,
-            'answer': question_data.answer,
-            'CreatedAt': int(datetime.now(timezone.utc).timestamp()),
-            "type": question_data.type
-        }
+        now = int(datetime.now(timezone.utc).timestamp())
+        item = question_item(
+            community_id, quiz_id, str(question_data.question_id), question_data.question_text,
+            question_data.options, question_data.answer, question_data.question_type, now
+        )
         self.dynamodb_controller.put_item(item)
+        self.bump_quiz_version(community_id, quiz_id)
+
+    def iter_questions(self, community_id: str, quiz_id: str, projection: Optional[List[str]] = None, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Every question of the quiz in key order, reading one page at a time, so the quiz is never held whole."""
+        partition_key = Key('PK').eq('QUESTION')
+        sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#')
+        last_evaluated_key = None
+        while True:
+            questions, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                partition_key, sort_key_condition, limit=page_size, last_evaluated_key=last_evaluated_key, projection=projection
+            )
+            yield from questions
+            if not last_evaluated_key:
+                return
+
+    def export_records(self, community_id: str, quiz_id: str, quiz_metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """A quiz as export records: a ``{"quiz": ...}`` header, then one QuestionRecord per question."""
+        yield {'quiz': {field: quiz_metadata.get(field) for field in ('quiz_id', 'community_id', 'title', 'description', 'version')}}
+        projection = ['question_id', 'question_text', 'options', 'answer', 'type']
+        for question in self.iter_questions(community_id, quiz_id, projection):
+            yield question_record(question)
+
+    def start_import(self, community_id: str, quiz_id: str) -> QuestionImport:
+        return QuestionImport(self, community_id, quiz_id)
 
     @log_and_handle_exceptions
-    def get_question(self, community_id: str, quiz_id: str, question_id: str) -> Dict[str, Any]:
+    def get_question(self, community_id: str, quiz_id: str, question_id: str, projection: Optional[List[str]] = None) -> Dict[str, Any]:
         sk = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question_id}'
-        return self.dynamodb_controller.get_item('QUESTION', sk)
+        return self.cache.get_or_load(
+            quiz_cache_key(community_id, quiz_id), ('question', question_id, tuple(projection) if projection else None),
+            lambda: self.dynamodb_controller.get_item('QUESTION', sk, projection=projection)
+        )
 
     @log_and_handle_exceptions
     def update_question(self, community_id: str, quiz_id: str, question_id: str, question_data: QuestionModel) -> None:
@@ -99,13 +303,16 @@ class QuizService:
             key: str(value) if isinstance(value, UUID) else value
             for key, value in question_data.dict(exclude_unset=True).items()
         }
+        update_data['updated_at'] = int(datetime.now(timezone.utc).timestamp())
     
-        self.dynamodb_controller.update_item('QUESTION', sk, update_data)
+        self.dynamodb_controller.increment_counters('QUESTION', sk, {'version': 1}, update_data=update_data)
+        self.bump_quiz_version(community_id, quiz_id)
 
     @log_and_handle_exceptions
     def delete_question(self, community_id: str, quiz_id: str, question_id: str) -> None:
         sk = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question_id}'
         self.dynamodb_controller.delete_item('QUESTION', sk)
+        self.bump_quiz_version(community_id, quiz_id)
 
     @log_and_handle_exceptions
     def delete_all_questions_for_quiz(self, community_id: str, quiz_id: str) -> None:
@@ -119,13 +326,32 @@ class QuizService:
                 sort_key_condition,
                 last_evaluated_key=last_evaluated_key
             )
+            # The quiz itself is deleted next, so its version is left alone
             for question in questions:
-                self.delete_question(community_id, quiz_id, question['question_id'])
+                self.dynamodb_controller.delete_item('QUESTION', question['SK'])
             
             if not last_evaluated_key:
                 break
 
+    @log_and_handle_exceptions
+    def delete_all_attempts_for_quiz(self, community_id: str, quiz_id: str) -> None:
+        partition_key = Key('PK').eq('QUIZ_ATTEMPT')
+        sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#ATTEMPT#')
+        last_evaluated_key = None
+
+        while True:
+            attempts, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                partition_key,
+                sort_key_condition,
+                limit=100,
+                last_evaluated_key=last_evaluated_key,
+                projection=['PK', 'SK']
+            )
+            if attempts:
+                self.dynamodb_controller.batch_delete_items(attempts)
+            if not last_evaluated_key:
+                break
+
 def get_quiz_service() -> QuizService:
-    table_name = os.getenv('TABLE_NAME', 'sharp_app_data')
-    dynamodb_controller = DynamoDBController(table_name)
-    return QuizService(dynamodb_controller)
\ No newline at end of file
+    dynamodb_controller = get_dynamodb_controller()
+    return QuizService(dynamodb_controller, get_entity_cache())
\ No newline at end of file
@@ -0,0 +1,113 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from boto3.dynamodb.conditions import Key
+from app.lib.dynamodb_controller import DynamoDBController, get_dynamodb_controller
+from app.lib.logging import log_and_handle_exceptions
+
+# USD per 1M tokens: (prompt, cached prompt, completion)
+MODEL_PRICING = {
+    'gpt-4o': (2.50, 1.25, 10.00),
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+}
+
+class BudgetExceededError(Exception):
+    """Raised when a community has used up its token budget."""
+    def __init__(self, community_id: str, used: int, budget: int):
+        self.community_id = community_id
+        self.used = used
+        self.budget = budget
+        super().__init__(f"Community {community_id} has used {used} of its {budget} token budget")
+
+class UsageService:
+    def __init__(self, dynamodb_controller: DynamoDBController, default_token_budget: Optional[int] = None):
+        self.dynamodb_controller = dynamodb_controller
+        self.logger = logging.getLogger(__name__)
+        if default_token_budget is None:
+            default_token_budget = int(os.getenv('COMMUNITY_TOKEN_BUDGET', '0'))
+        self.default_token_budget = default_token_budget  # 0 means unlimited
+
+    @staticmethod
+    def estimate_cost_micro_usd(usage: Dict[str, Any]) -> int:
+        """Estimates the cost of a single call in millionths of a dollar."""
+        model = usage.get('model') or ''
+        pricing = next((MODEL_PRICING[name] for name in sorted(MODEL_PRICING, key=len, reverse=True) if model.startswith(name)), None)
+        if not pricing:
+            return 0
+        prompt_price, cached_price, completion_price = pricing
+        cached = usage.get('cached_tokens', 0)
+        uncached = usage.get('prompt_tokens', 0) - cached
+        # Prices are per 1M tokens, so the token count multiplies straight into micro-dollars.
+        return round(uncached * prompt_price + cached * cached_price + usage.get('completion_tokens', 0) * completion_price)
+
+    @log_and_handle_exceptions
+    def record_usage(self, community_id: str, source_id: Optional[str], usage: Dict[str, Any]) -> None:
+        """Adds a single LLM call's usage to the community and knowledge source totals."""
+        counters = {
+            'request_count': 1,
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'cached_tokens': usage.get('cached_tokens', 0),
+            'total_tokens': usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0),
+            'latency_ms_total': usage.get('latency_ms', 0),
+            'cost_micro_usd': self.estimate_cost_micro_usd(usage),
+        }
+        if usage.get('cache_hit'):
+            counters['cache_hits'] = 1
+        if usage.get('model'):
+            counters['models'] = {usage['model']}
+
+        now = int(datetime.now(timezone.utc).timestamp())
+        targets = [(f'COMMUNITY#{community_id}', 'CommunityUsage')]
+        if source_id:
+            targets.append((f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}', 'KnowledgeSourceUsage'))
+
+        for sk, entity_type in targets:
+            defaults = {'EntityType': entity_type, 'CreatedAt': now, 'community_id': community_id}
+            if entity_type == 'KnowledgeSourceUsage':
+                defaults['source_id'] = source_id
+            self.dynamodb_controller.increment_counters('USAGE', sk, counters, update_data={'updated_at': now}, defaults=defaults)
+
+    @log_and_handle_exceptions
+    def get_community_usage(self, community_id: str) -> Dict[str, Any]:
+        usage = self.dynamodb_controller.get_item('USAGE', f'COMMUNITY#{community_id}') or {}
+        usage.setdefault('token_budget', self.default_token_budget)
+        return usage
+
+    @log_and_handle_exceptions
+    def list_source_usage(self, community_id: str) -> List[Dict[str, Any]]:
+        """Returns per knowledge source usage for a community, most expensive first."""
+        partition_key = Key('PK').eq('USAGE')
+        sort_key_condition = Key('SK').begins_with(f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#')
+        items, last_evaluated_key = [], None
+        while True:
+            page, last_evaluated_key = self.dynamodb_controller.query_with_pagination(
+                partition_key, sort_key_condition, limit=100, last_evaluated_key=last_evaluated_key
+            )
+            items.extend(page)
+            if not last_evaluated_key:
+                break
+        return sorted(items, key=lambda item: item.get('cost_micro_usd', 0), reverse=True)
+
+    @log_and_handle_exceptions
+    def set_budget(self, community_id: str, token_budget: int) -> None:
+        now = int(datetime.now(timezone.utc).timestamp())
+        self.dynamodb_controller.increment_counters(
+            'USAGE', f'COMMUNITY#{community_id}', {},
+            update_data={'token_budget': token_budget, 'updated_at': now},
+            defaults={'EntityType': 'CommunityUsage', 'CreatedAt': now, 'community_id': community_id}
+        )
+
+    @log_and_handle_exceptions
+    def check_budget(self, community_id: str) -> None:
+        """Raises BudgetExceededError if the community has no token budget left."""
+        usage = self.get_community_usage(community_id)
+        budget = int(usage.get('token_budget') or 0)
+        used = int(usage.get('total_tokens', 0))
+        if budget and used >= budget:
+            raise BudgetExceededError(community_id, used, budget)
+
+def get_usage_service() -> UsageService:
+    dynamodb_controller = get_dynamodb_controller()
+    return UsageService(dynamodb_controller)
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from boto3.dynamodb.conditions import Key
 from app.lib.dynamodb_controller import DynamoDBController
 from app.models.user_schema import UserCreate, UserUpdate
@@ -24,22 +24,30 @@ class UserService:
 
     @log_and_handle_exceptions
     def get_user(self, user_id: str) -> Dict[str, Any]:
-        return self.dynamodb_controller.get_item(f'USER#{user_id}', 'PROFILE')
+        return self.dynamodb_controller.get_item('USER', f'USER#{user_id}')
 
     @log_and_handle_exceptions
     def update_user(self, user_id: str, update_data: UserUpdate) -> None:
         update_dict = update_data.dict(exclude_unset=True)
-        self.dynamodb_controller.update_item(f'USER#{user_id}', 'PROFILE', update_dict)
+        self.dynamodb_controller.update_item('USER', f'USER#{user_id}', update_dict)
 
     @log_and_handle_exceptions
     def delete_user(self, user_id: str) -> None:
-        self.dynamodb_controller.delete_item(f'USER#{user_id}', 'PROFILE')
+        self.dynamodb_controller.delete_item('USER', f'USER#{user_id}')
 
     @log_and_handle_exceptions
-    def list_users(self) -> List[Dict[str, Any]]:
-        partition_key = Key('PK').begins_with('USER#')
-        sort_key_condition = Key('SK').eq('PROFILE')
-        return self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition)[0]
+    def list_users(self, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        partition_key = Key('PK').eq('USER')
+        sort_key_condition = Key('SK').begins_with('USER#')
+        return self.dynamodb_controller.query_with_pagination(partition_key, sort_key_condition, limit=limit, last_evaluated_key=last_evaluated_key)
+
+    @log_and_handle_exceptions
+    def list_users_joined_since(self, since: int, limit: int = 20, last_evaluated_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Users who joined at or after ``since`` (epoch seconds), oldest first, from GSI3 (EntityType + CreatedAt)."""
+        return self.dynamodb_controller.query_index(
+            'GSI3', Key('EntityType').eq('User'), Key('CreatedAt').gte(since),
+            limit=limit, last_evaluated_key=last_evaluated_key
+        )
 
     @log_and_handle_exceptions
     def list_communities_for_user(self, user_id: str) -> List[Dict[str, Any]]:
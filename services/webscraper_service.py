@@ -1,6 +1,5 @@
 import logging
 import re
-from newspaper import Article
 from typing import Optional
 
 class WebScraperService:
@@ -9,6 +8,8 @@ class WebScraperService:
 
     def scrape_content(self, url: str) -> Optional[str]:
         """Scrapes the main content of the web page from the given URL using newspaper3k."""
+        # newspaper pulls in nltk and lxml; imported here so the rest of the service loads without it
+        from newspaper import Article
         try:
             url = str(url)
             article = Article(url)
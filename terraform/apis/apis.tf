@@ -12,4 +12,8 @@ module "api_deployment" {
   cognito_user_pool_id                         = var.cognito_user_pool_id
   cognito_user_pool_client_id                  = var.cognito_user_pool_client_id
   knowledge_source_url_initial_ingestion_queue = var.knowledge_source_url_initial_ingestion_queue
+  cascade_delete_queue                         = var.cascade_delete_queue
+  question_generation_queue                    = var.question_generation_queue
+  cursor_signing_key                           = var.cursor_signing_key
+  entity_cache_ttl_seconds                     = var.entity_cache_ttl_seconds
 }
@@ -11,6 +11,9 @@ data "aws_cognito_user_pool_clients" "sharp_user_pool_client" {
 resource "aws_api_gateway_rest_api" "api" {
   name        = "${var.api_name}_api"
   description = "API Gateway for ${var.api_name}"
+
+  # Compressed response bodies come back from the Lambda base64-encoded and are returned as binary
+  binary_media_types = ["*/*"]
 }
 
 resource "aws_api_gateway_resource" "proxy" {
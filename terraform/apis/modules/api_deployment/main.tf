@@ -61,6 +61,7 @@ resource "aws_iam_policy" "lambda_dynamodb" {
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
+          "dynamodb:ConditionCheckItem",
           "dynamodb:Scan",
           "dynamodb:Query",
         ],
@@ -97,6 +98,10 @@ resource "aws_lambda_function" "lambda" {
       APP_CLIENT_ID                                = var.cognito_user_pool_client_id
       COGNITO_REGION                               = var.aws_region
       KNOWLEDGE_SOURCE_URL_INITIAL_INGESTION_QUEUE = var.knowledge_source_url_initial_ingestion_queue
+      CASCADE_DELETE_QUEUE                         = var.cascade_delete_queue
+      QUESTION_GENERATION_QUEUE                    = var.question_generation_queue
+      CURSOR_SIGNING_KEY                           = var.cursor_signing_key
+      ENTITY_CACHE_TTL_SECONDS                     = var.entity_cache_ttl_seconds
     }
   }
 }
@@ -112,7 +117,8 @@ resource "aws_iam_policy" "api_lambda_sqs_policy" {
       {
         Effect = "Allow",
         Action = [
-          "sqs:SendMessage"
+          "sqs:SendMessage",
+          "sqs:GetQueueAttributes"
         ],
         Resource = "*"
       }
@@ -68,3 +68,34 @@ variable "knowledge_source_url_initial_ingestion_queue" {
   description = "The SQS URL for the knowledge source ingestion queue"
   type        = string
 }
+
+variable "cascade_delete_queue" {
+  description = "The SQS URL for the cascade delete queue"
+  type        = string
+  default     = ""
+}
+
+variable "question_generation_queue" {
+  description = "The SQS URL for the question generation queue"
+  type        = string
+  default     = ""
+}
+
+variable "cursor_signing_key" {
+  description = "HMAC key for pagination cursors; empty makes each container sign with its own random key"
+  type        = string
+  default     = ""
+  sensitive   = true
+}
+
+variable "entity_cache_ttl_seconds" {
+  description = "Lifetime of cached community and quiz reads; 0 disables the cache. Needs the cache_invalidator Lambda"
+  type        = number
+  default     = 0
+}
+
+variable "warmup_schedule" {
+  description = "EventBridge schedule expression for the warm-up ping; empty disables it"
+  type        = string
+  default     = "rate(5 minutes)"
+}
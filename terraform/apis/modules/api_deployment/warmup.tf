@@ -0,0 +1,23 @@
+# Scheduled warm-up ping; the handler answers {"warmup": true} itself without going through the API
+resource "aws_cloudwatch_event_rule" "warmup" {
+  count               = var.warmup_schedule == "" ? 0 : 1
+  name                = "${var.api_name}_warmup"
+  description         = "Keeps a ${var.api_name} container initialized"
+  schedule_expression = var.warmup_schedule
+}
+
+resource "aws_cloudwatch_event_target" "warmup" {
+  count = var.warmup_schedule == "" ? 0 : 1
+  rule  = aws_cloudwatch_event_rule.warmup[0].name
+  arn   = aws_lambda_function.lambda.arn
+  input = jsonencode({ warmup = true })
+}
+
+resource "aws_lambda_permission" "warmup" {
+  count         = var.warmup_schedule == "" ? 0 : 1
+  statement_id  = "AllowEventBridgeWarmup"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.warmup[0].arn
+}
@@ -31,3 +31,28 @@ variable "knowledge_source_url_initial_ingestion_queue" {
   description = "The SQS URL for the knowledge source ingestion queue"
   type        = string
 }
+
+variable "cascade_delete_queue" {
+  description = "The SQS URL for the cascade delete queue"
+  type        = string
+  default     = ""
+}
+
+variable "question_generation_queue" {
+  description = "The SQS URL for the question generation queue"
+  type        = string
+  default     = ""
+}
+
+variable "cursor_signing_key" {
+  description = "HMAC key for pagination cursors, shared by every container of the API"
+  type        = string
+  default     = ""
+  sensitive   = true
+}
+
+variable "entity_cache_ttl_seconds" {
+  description = "Lifetime of cached community and quiz reads, kept coherent by the cache_invalidator Lambda"
+  type        = number
+  default     = 300
+}
@@ -24,6 +24,11 @@ resource "aws_dynamodb_table" "sharp_app_data" {
     type = "S"
   }
 
+  attribute {
+    name = "CommunityEntity"
+    type = "S"
+  }
+
   attribute {
     name = "CreatedAt"
     type = "N"
@@ -40,19 +45,33 @@ resource "aws_dynamodb_table" "sharp_app_data" {
     name            = "GSI2"
     hash_key        = "Owner_ID"
     range_key       = "CreatedAt"
-    projection_type = "ALL"
+    projection_type = "KEYS_ONLY"
   }
 
   global_secondary_index {
     name            = "GSI3"
     hash_key        = "EntityType"
     range_key       = "CreatedAt"
-    projection_type = "ALL"
+    projection_type = "KEYS_ONLY"
+  }
+
+  # One partition per community and entity type, so a community's newest items are read without a filter
+  global_secondary_index {
+    name            = "GSI4"
+    hash_key        = "CommunityEntity"
+    range_key       = "CreatedAt"
+    projection_type = "KEYS_ONLY"
   }
 
   stream_enabled   = true
   stream_view_type = "NEW_AND_OLD_IMAGES"
 
+  # Cache invalidation log entries and cached LLM responses carry an expiry time
+  ttl {
+    attribute_name = "ExpiresAt"
+    enabled        = true
+  }
+
   tags = {
     Environment = "production"
     Name        = "sharp_app_data"
@@ -36,6 +36,46 @@ resource "aws_sqs_queue" "knowledge_source_chunk_processing_dlq" {
   max_message_size           = 262144  # 256 KB
 }
 
+# Outlives the cascade_delete Lambda's 5 minute timeout, so a running deletion is not delivered twice
+resource "aws_sqs_queue" "cascade_delete_queue" {
+  name                       = "cascade_delete_queue"
+  visibility_timeout_seconds = 360    # 6 minutes
+  message_retention_seconds  = 345600 # 4 days
+  max_message_size           = 262144 # 256 KB
+  delay_seconds              = 0      # No delivery delay
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.cascade_delete_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue" "cascade_delete_dlq" {
+  name                       = "cascade_delete_dlq"
+  visibility_timeout_seconds = 360     # Match the primary queue
+  message_retention_seconds  = 1209600 # 14 days retention for DLQ
+  max_message_size           = 262144  # 256 KB
+}
+
+# Outlives the question_generator Lambda's 15 minute timeout, so a running job is not delivered twice
+resource "aws_sqs_queue" "question_generation_queue" {
+  name                       = "question_generation_queue"
+  visibility_timeout_seconds = 960    # 16 minutes
+  message_retention_seconds  = 345600 # 4 days
+  max_message_size           = 262144 # 256 KB
+  delay_seconds              = 0      # No delivery delay
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.question_generation_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue" "question_generation_dlq" {
+  name                       = "question_generation_dlq"
+  visibility_timeout_seconds = 960     # Match the primary queue
+  message_retention_seconds  = 1209600 # 14 days retention for DLQ
+  max_message_size           = 262144  # 256 KB
+}
+
 # resource "aws_lambda_event_source_mapping" "knowledge_source_processing_trigger" {
 #   event_source_arn = aws_sqs_queue.knowledge_source_processing_queue.arn
 #   function_name    = aws_lambda_function.knowledge_source_processing_lambda.arn
@@ -12,4 +12,6 @@ module "lambda_deployment" {
   openai_api_key                               = var.openai_api_key
   knowledge_source_url_initial_ingestion_queue = var.knowledge_source_url_initial_ingestion_queue
   knowledge_source_chunk_processing_queue      = var.knowledge_source_chunk_processing_queue
+  cascade_delete_queue                         = var.cascade_delete_queue
+  question_generation_queue                    = var.question_generation_queue
 }
@@ -61,6 +61,8 @@ resource "aws_iam_policy" "lambda_dynamodb" {
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
+          "dynamodb:ConditionCheckItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:Scan",
           "dynamodb:Query",
         ],
@@ -102,6 +104,12 @@ resource "aws_lambda_function" "lambda" {
       {
         "KNOWLEDGE_SOURCE_CHUNK_PROCESSING_QUEUE" = var.knowledge_source_chunk_processing_queue
       },
+      {
+        "CASCADE_DELETE_QUEUE" = var.cascade_delete_queue
+      },
+      {
+        "QUESTION_GENERATION_QUEUE" = var.question_generation_queue
+      },
       var.environment_variables
     )
   }
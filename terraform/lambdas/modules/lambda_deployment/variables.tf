@@ -63,3 +63,15 @@ variable "knowledge_source_chunk_processing_queue" {
   description = "The SQS URL for the knowledge source chunk processing queue"
   type        = string
 }
+
+variable "cascade_delete_queue" {
+  description = "The SQS URL for the cascade delete queue"
+  type        = string
+  default     = ""
+}
+
+variable "question_generation_queue" {
+  description = "The SQS URL for the question generation queue"
+  type        = string
+  default     = ""
+}
@@ -0,0 +1,25 @@
+"""Tests run in-process against the in-memory DynamoDB and SQS stand-ins (AWS_BACKEND=local).
+
+Each API and Lambda ships its own ``app`` package; tests load one the way the benchmark harness does, afresh
+for every test, so each test starts with empty tables and queues.
+"""
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Callable
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.harness import load_target  # noqa: E402
+
+@pytest.fixture
+def app_package() -> Callable[[str], Callable[[str], ModuleType]]:
+    """Loads a target's ``app`` package and returns a function importing its modules by name, e.g. ``'lib.pagination'``."""
+    def load(target: str) -> Callable[[str], ModuleType]:
+        load_target(target)
+        return lambda name: importlib.import_module(f'app.{name}')
+    return load
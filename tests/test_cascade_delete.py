@@ -0,0 +1,83 @@
+import json
+import uuid
+import pytest
+
+@pytest.fixture
+def worker(app_package, monkeypatch):
+    """The cascade_delete Lambda with pages small enough that a handful of items spans several."""
+    app = app_package('cascade_delete')
+    module = app('cascade_delete')
+    monkeypatch.setattr(app('services.cascade_delete_service'), 'DELETE_PAGE_SIZE', 2)
+    module.app = app
+    return module
+
+def seed_community(worker, chunks=5, questions=3):
+    community_id, source_id, quiz_id = (str(uuid.uuid4()) for _ in range(3))
+    base = f'COMMUNITY#{community_id}#'
+    items = [
+        {'PK': 'COMMUNITY', 'SK': f'COMMUNITY#{community_id}', 'members': ['member'], 'owner_ids': ['owner']},
+        {'PK': 'KNOWLEDGE_SOURCE', 'SK': f'{base}KNOWLEDGE_SOURCE#{source_id}'},
+        {'PK': 'QUIZ', 'SK': f'{base}QUIZ#{quiz_id}'},
+        {'PK': 'USER#member', 'SK': f'COMMUNITY#{community_id}'},
+        *({'PK': 'KNOWLEDGE_SOURCE_CHUNK', 'SK': f'{base}KNOWLEDGE_SOURCE#{source_id}#CHUNK#{index}'} for index in range(chunks)),
+        *({'PK': 'QUESTION', 'SK': f'{base}QUIZ#{quiz_id}#QUESTION#{index}'} for index in range(questions)),
+    ]
+    worker.dynamodb_controller.batch_write_items([{'EntityType': 'Test', 'CreatedAt': 1, **item} for item in items])
+    worker.cascade_delete_service.request_deletion('community', community_id, requested_by='owner')
+    return community_id, items
+
+def remaining(worker, items):
+    return [item['SK'] for item in items if worker.dynamodb_controller.get_item(item['PK'], item['SK']) is not None]
+
+def stop_after(pages):
+    calls = iter(range(pages + 1))
+    return lambda: next(calls, pages) >= pages
+
+def test_stopped_run_resumes_from_its_stage_and_start_key(worker):
+    community_id, items = seed_community(worker)
+    service = worker.cascade_delete_service
+    # Two of the three chunk pages: the job stops inside the chunks stage with a start key saved
+    assert not service.run('community', community_id, should_stop=stop_after(3))
+    job = service.get_job('community', community_id)
+    assert (job['stage'], job['deleted']) == (1, {'knowledge_sources': 1, 'chunks': 4})
+    assert job['start_key']
+    progress = service.get_progress('community', community_id)
+    assert (progress.status.value, progress.stage) == ('Running', 'chunks')
+
+    # The requested message resumes the job and the queued continuation then finds it complete
+    assert worker.drain() == 2
+    job = service.get_job('community', community_id)
+    assert job['status'] == 'Completed'
+    assert 'start_key' not in job
+    assert job['deleted'] == {'knowledge_sources': 1, 'chunks': 5, 'unchunked_output': 0, 'questions': 3, 'quizzes': 1,
+                              'members': 0, 'attempts': 0, 'scores': 0, 'leaderboards': 0, 'question_generations': 0}
+    assert job['runs'] == 2
+    assert remaining(worker, items) == []
+
+def test_failed_run_keeps_its_position_for_the_redelivery(worker):
+    community_id, items = seed_community(worker)
+    service = worker.cascade_delete_service
+    batch_delete_items = worker.dynamodb_controller.batch_delete_items
+    calls = []
+
+    def fail_on_third_page(keys):
+        calls.append(keys)
+        if len(calls) == 3:
+            raise RuntimeError('throttled')
+        batch_delete_items(keys)
+    worker.dynamodb_controller.batch_delete_items = fail_on_third_page
+
+    message = {'messageId': 'm1', 'body': json.dumps({'target': 'community', 'community_id': community_id})}
+    assert worker.lambda_handler({'Records': [message]}, None) == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+    job = service.get_job('community', community_id)
+    assert (job['stage'], job['deleted']) == (1, {'knowledge_sources': 1, 'chunks': 2})
+    assert 'throttled' in job['error']
+
+    # The redelivered message picks up at the page that failed
+    worker.dynamodb_controller.batch_delete_items = batch_delete_items
+    assert worker.lambda_handler({'Records': [message]}, None) == {'batchItemFailures': []}
+    job = service.get_job('community', community_id)
+    assert job['status'] == 'Completed'
+    assert 'error' not in job
+    assert job['deleted']['chunks'] == 5
+    assert remaining(worker, items) == []
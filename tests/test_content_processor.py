@@ -0,0 +1,21 @@
+import pytest
+
+@pytest.fixture
+def processor(app_package):
+    app = app_package('chunk_processor')
+    return app('services.content_processor_service').ContentProcessorService(openai_controller=object(), pack_token_budget=10000)
+
+def test_packed_response_is_split_per_chunk(processor):
+    processor._request_json = lambda prompt, content, community_id, source_id: {'1': {'summary': 'a'}, '2': {'summary': 'b'}}
+    assert processor.process_chunks(['first', 'second']) == [{'summary': 'a'}, {'summary': 'b'}]
+
+def test_failed_fallback_only_loses_its_own_section(processor):
+    def request_json(prompt, content, community_id, source_id):
+        if content == 'second':
+            raise RuntimeError('LLM unavailable')
+        if content == 'third':
+            return {'summary': 'c'}
+        # The packed request only answers for the first section
+        return {'1': {'summary': 'a'}}
+    processor._request_json = request_json
+    assert processor.process_chunks(['first', 'second', 'third']) == [{'summary': 'a'}, None, {'summary': 'c'}]
@@ -0,0 +1,63 @@
+import uuid
+import pytest
+
+@pytest.fixture
+def app(app_package):
+    return app_package('quiz_management')
+
+@pytest.fixture
+def quiz_service(app):
+    return app('services.quiz_service').get_quiz_service()
+
+def create_quizzes(app, quiz_service, community_id, count, owner_ids=('creator', 'co-owner')):
+    schema = app('models.quiz_schema')
+    quiz_ids = [str(uuid.uuid4()) for _ in range(count)]
+    for quiz_id in quiz_ids:
+        quiz_service.create_quiz(schema.QuizCreate(community_id=community_id, quiz_id=quiz_id, title='Quiz', owner_ids=list(owner_ids)))
+    return quiz_ids
+
+def test_newest_quizzes_read_only_their_community(app, quiz_service):
+    community_id, crowded = str(uuid.uuid4()), str(uuid.uuid4())
+    quiz_ids = create_quizzes(app, quiz_service, community_id, 3)
+    create_quizzes(app, quiz_service, crowded, 300)
+    controller = quiz_service.dynamodb_controller
+    query_with_pagination = controller.query_with_pagination
+    queries = []
+
+    def counted(*args, **kwargs):
+        queries.append(args)
+        return query_with_pagination(*args, **kwargs)
+    controller.query_with_pagination = counted
+
+    quizzes, last_key = quiz_service.list_newest_quizzes(community_id, limit=10)
+    assert sorted(quiz['quiz_id'] for quiz in quizzes) == sorted(quiz_ids)
+    assert last_key is None
+    # One index page, with no filter, however many quizzes other communities have
+    assert len(queries) == 1
+
+def test_owned_quizzes_are_the_ones_the_caller_created(app, quiz_service):
+    quiz_ids = create_quizzes(app, quiz_service, str(uuid.uuid4()), 2)
+    assert sorted(quiz['quiz_id'] for quiz in quiz_service.list_owned_quizzes('creator')[0]) == sorted(quiz_ids)
+    assert quiz_service.list_owned_quizzes('co-owner')[0] == []
+
+def test_backfill_indexes_items_created_before_the_index_keys(app, quiz_service):
+    community_id, quiz_id, source_id = (str(uuid.uuid4()) for _ in range(3))
+    controller = quiz_service.dynamodb_controller
+    controller.put_item({
+        'PK': 'QUIZ', 'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}', 'EntityType': 'Quiz', 'CreatedAt': 1,
+        'quiz_id': quiz_id, 'community_id': community_id, 'title': 'Old quiz', 'owner_ids': ['creator'],
+    })
+    controller.put_item({
+        'PK': 'KNOWLEDGE_SOURCE', 'SK': f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}', 'EntityType': 'KnowledgeSource',
+        'CreatedAt': 1, 'source_id': source_id, 'community_id': community_id, 'url': 'https://example.com',
+    })
+    knowledge_source_service = app('services.knowledge_source_service').get_knowledge_source_service()
+    assert quiz_service.list_newest_quizzes(community_id)[0] == []
+    assert quiz_service.list_owned_quizzes('creator')[0] == []
+
+    assert app('services.index_backfill').backfill(controller) == {'quizzes': 1, 'knowledge_sources': 1}
+    assert [quiz['quiz_id'] for quiz in quiz_service.list_newest_quizzes(community_id)[0]] == [quiz_id]
+    assert [quiz['quiz_id'] for quiz in quiz_service.list_owned_quizzes('creator')[0]] == [quiz_id]
+    assert [source['source_id'] for source in knowledge_source_service.list_newest_knowledge_sources(community_id)[0]] == [source_id]
+    # Nothing is left to backfill
+    assert app('services.index_backfill').backfill(controller) == {'quizzes': 0, 'knowledge_sources': 0}
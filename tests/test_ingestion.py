@@ -0,0 +1,193 @@
+import json
+import uuid
+import pytest
+
+@pytest.fixture
+def worker(app_package):
+    """The chunk processor with its LLM calls replaced by canned results."""
+    app = app_package('chunk_processor')
+    module = app('chunk_processor')
+    module.content_processor_service.process_chunks = lambda contents, **kwargs: [{'summary': content} for content in contents]
+    module.combination_cleanup_service.openai_controller.set_model = lambda *args: None
+    module.combination_cleanup_service.combine_responses = lambda results: {'summary': [result['summary'] for result in results]}
+    module.combination_cleanup_service.clean_up_response = lambda response, community_id, source_id: response
+    module.app = app
+    return module
+
+def create_processing_source(worker, chunks_total):
+    """A knowledge source whose chunks have been queued, as the web scraper leaves it."""
+    state = worker.app('models.ingestion_job_schema').IngestionState
+    community_id, source_id = str(uuid.uuid4()), str(uuid.uuid4())
+    worker.knowledge_source_service.create_knowledge_source(worker.app('services.knowledge_source_service').KnowledgeSourceCreate(
+        source_id=source_id, community_id=community_id, url=f'https://example.com/{source_id}'
+    ))
+    for to_state in (state.SCRAPING, state.CHUNKING):
+        worker.ingestion_job_service.transition(community_id, source_id, to_state)
+    worker.ingestion_job_service.transition(community_id, source_id, state.PROCESSING, chunks_total=chunks_total)
+    return community_id, source_id
+
+def chunk_message(community_id, source_id, chunk_id):
+    return str(uuid.uuid4()), json.dumps({
+        'community_id': community_id, 'source_id': source_id, 'chunk_id': chunk_id, 'chunk_content': f'chunk {chunk_id}',
+    })
+
+def source_item(worker, community_id, source_id):
+    return worker.dynamodb_controller.get_item('KNOWLEDGE_SOURCE', f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}')
+
+def dead_letter_event(*messages):
+    return {'Records': [{
+        'messageId': message_id, 'body': body,
+        'eventSourceARN': 'arn:aws:sqs:us-east-2:000000000000:knowledge_source_chunk_processing_dlq',
+    } for message_id, body in messages]}
+
+def test_last_chunk_combines_the_source_once(worker):
+    community_id, source_id = create_processing_source(worker, 2)
+    assert worker.process_messages([chunk_message(community_id, source_id, 0)]) == []
+    assert source_item(worker, community_id, source_id)['source_status'] == 'Processing'
+
+    assert worker.process_messages([chunk_message(community_id, source_id, 1)]) == []
+    assert source_item(worker, community_id, source_id)['source_status'] == 'Completed'
+    # A redelivered chunk after completion cannot claim the combine again
+    assert not worker.knowledge_source_service.claim_combine(community_id, source_id)
+
+def test_failing_source_only_fails_its_own_messages(worker):
+    healthy, broken = create_processing_source(worker, 1), create_processing_source(worker, 1)
+    process_chunks = worker.content_processor_service.process_chunks
+
+    def fail_for_broken(contents, community_id, source_id):
+        if source_id == broken[1]:
+            raise RuntimeError('LLM unavailable')
+        return process_chunks(contents)
+    worker.content_processor_service.process_chunks = fail_for_broken
+
+    broken_message = chunk_message(*broken, 0)
+    assert worker.process_messages([chunk_message(*healthy, 0), broken_message]) == [broken_message[0]]
+    assert source_item(worker, *healthy)['source_status'] == 'Completed'
+    assert source_item(worker, *broken)['source_status'] == 'Processing'
+
+def test_failed_combine_releases_its_claim(worker):
+    community_id, source_id = create_processing_source(worker, 1)
+    combine_responses = worker.combination_cleanup_service.combine_responses
+
+    def fail(results):
+        raise RuntimeError('LLM unavailable')
+    worker.combination_cleanup_service.combine_responses = fail
+    message = chunk_message(community_id, source_id, 0)
+    assert worker.process_messages([message]) == [message[0]]
+    item = source_item(worker, community_id, source_id)
+    assert item['source_status'] == 'Combining'
+    assert item['combine_claims'] == 0
+
+    # The redelivered message claims the combine again and finishes the job
+    worker.combination_cleanup_service.combine_responses = combine_responses
+    assert worker.process_messages([message]) == []
+    assert source_item(worker, community_id, source_id)['source_status'] == 'Completed'
+
+def test_transitions_only_follow_the_pipeline(worker):
+    state = worker.app('models.ingestion_job_schema').IngestionState
+    errors = worker.app('services.ingestion_job_service')
+    community_id, source_id = create_processing_source(worker, 1)
+    with pytest.raises(errors.InvalidTransitionError):
+        worker.ingestion_job_service.transition(community_id, source_id, state.SCRAPING)
+    with pytest.raises(errors.InvalidTransitionError):
+        worker.ingestion_job_service.transition(community_id, source_id, state.COMPLETED)
+
+    worker.ingestion_job_service.fail(community_id, source_id, 'gave up')
+    # Failing a finished job again is ignored rather than raised
+    worker.ingestion_job_service.fail(community_id, source_id, 'again')
+    progress = worker.ingestion_job_service.get_progress(community_id, source_id)
+    assert progress.state == state.FAILED
+    assert progress.error == 'gave up'
+
+def test_dead_lettered_chunk_lets_the_job_complete_with_the_rest(worker):
+    community_id, source_id = create_processing_source(worker, 2)
+    assert worker.process_messages([chunk_message(community_id, source_id, 0)]) == []
+
+    response = worker.lambda_handler(dead_letter_event(chunk_message(community_id, source_id, 1)), None)
+    assert response == {'batchItemFailures': []}
+    progress = worker.ingestion_job_service.get_progress(community_id, source_id)
+    assert progress.state.value == 'Completed'
+    assert (progress.chunks_done, progress.chunks_failed) == (1, 1)
+
+def test_job_fails_when_every_chunk_is_dead_lettered(worker):
+    community_id, source_id = create_processing_source(worker, 2)
+    worker.lambda_handler(dead_letter_event(*(chunk_message(community_id, source_id, index) for index in range(2))), None)
+    progress = worker.ingestion_job_service.get_progress(community_id, source_id)
+    assert progress.state.value == 'Failed'
+    assert progress.chunks_failed == 2
+
+def test_combine_failing_on_its_last_attempt_fails_the_job(worker):
+    community_id, source_id = create_processing_source(worker, 1)
+
+    def fail(results):
+        raise RuntimeError('LLM unavailable')
+    worker.combination_cleanup_service.combine_responses = fail
+    message = chunk_message(community_id, source_id, 0)
+    assert worker.process_messages([message]) == [message[0]]
+
+    # The message runs out of deliveries and reaches the DLQ, where combining is tried once more
+    assert worker.lambda_handler(dead_letter_event(message), None) == {'batchItemFailures': []}
+    progress = worker.ingestion_job_service.get_progress(community_id, source_id)
+    assert progress.state.value == 'Failed'
+    assert 'LLM unavailable' in progress.error
+
+def test_chunks_finishing_before_processing_still_combine(worker):
+    state = worker.app('models.ingestion_job_schema').IngestionState
+    community_id, source_id = create_processing_source(worker, 1)
+    # The scraper records the chunk count on entering Chunking and queues the chunks before moving on
+    worker.dynamodb_controller.update_item(
+        'KNOWLEDGE_SOURCE', f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{source_id}', {'source_status': state.CHUNKING.value}
+    )
+    assert worker.process_messages([chunk_message(community_id, source_id, 0)]) == []
+    assert source_item(worker, community_id, source_id)['source_status'] == 'Completed'
+
+@pytest.fixture
+def scraper(app_package):
+    """The web scraper with scraping replaced by fixed article text."""
+    app = app_package('web_scraper')
+    module = app('web_scraper')
+    app('services.webscraper_service').WebScraperService.scrape_content = lambda self, url: 'Some article text. ' * 500
+    module.app = app
+    return module
+
+def ingestion_event(source, receive_count=1):
+    return {'Records': [{
+        'messageId': str(uuid.uuid4()), 'body': json.dumps({**source, 'message_type': 'initial_ingestion'}),
+        'attributes': {'ApproximateReceiveCount': str(receive_count)},
+    }]}
+
+def create_pending_source(app):
+    services = app('services.knowledge_source_service')
+    source = {'community_id': str(uuid.uuid4()), 'source_id': str(uuid.uuid4()), 'url': 'https://example.com/article'}
+    services.get_knowledge_source_service().create_knowledge_source(services.KnowledgeSourceCreate(**source))
+    return source
+
+def test_failed_chunk_send_is_retried(scraper):
+    source = create_pending_source(scraper.app)
+    jobs = scraper.app('services.ingestion_job_service').get_ingestion_job_service()
+    send_chunk_messages = scraper.send_chunk_messages
+
+    def fail(*args):
+        raise RuntimeError('SQS unavailable')
+    scraper.send_chunk_messages = fail
+    with pytest.raises(scraper.IngestionRetry):
+        scraper.lambda_handler(ingestion_event(source), None)
+    progress = jobs.get_progress(source['community_id'], source['source_id'])
+    assert progress.state.value == 'Chunking'
+
+    scraper.send_chunk_messages = send_chunk_messages
+    assert scraper.lambda_handler(ingestion_event(source, receive_count=2), None)['statusCode'] == 200
+    progress = jobs.get_progress(source['community_id'], source['source_id'])
+    assert progress.state.value == 'Processing'
+    assert progress.chunks_total > 0
+
+def test_last_failed_delivery_fails_the_job(scraper):
+    source = create_pending_source(scraper.app)
+
+    def fail(*args):
+        raise RuntimeError('SQS unavailable')
+    scraper.send_chunk_messages = fail
+    assert scraper.lambda_handler(ingestion_event(source, receive_count=scraper.MAX_RECEIVE_COUNT), None)['statusCode'] == 200
+    progress = scraper.app('services.ingestion_job_service').get_ingestion_job_service().get_progress(source['community_id'], source['source_id'])
+    assert progress.state.value == 'Failed'
+    assert 'SQS unavailable' in progress.error
@@ -0,0 +1,60 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+
+@pytest.fixture
+def leaderboards(app_package, monkeypatch):
+    """The compactor's LeaderboardService, with the shard each write picks and the compaction order fixed by the test."""
+    app = app_package('leaderboard_compactor')
+    module = app('services.leaderboard_service')
+    shards = SimpleNamespace(next=0)
+    monkeypatch.setattr(module, 'random', SimpleNamespace(
+        randrange=lambda stop: shards.next, sample=lambda population, count: sorted(population)[:count],
+    ))
+    service = app('leaderboard_compactor').leaderboard_service
+    service.shards = shards
+    return service
+
+def create_community(leaderboards, quiz_count):
+    community_id = str(uuid.uuid4())
+    quiz_ids = [str(uuid.uuid4()) for _ in range(quiz_count)]
+    controller = leaderboards.dynamodb_controller
+    controller.put_item({'PK': 'COMMUNITY', 'SK': f'COMMUNITY#{community_id}', 'EntityType': 'Community', 'CreatedAt': 1})
+    for quiz_id in quiz_ids:
+        controller.put_item({'PK': 'QUIZ', 'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}', 'EntityType': 'Quiz', 'CreatedAt': 1})
+    return community_id, quiz_ids
+
+def community_scores(leaderboards, community_id):
+    return {entry['user_id']: entry['score'] for entry in leaderboards.get_leaderboard(community_id)['entries']}
+
+def test_scores_merge_into_quiz_and_community_boards(leaderboards):
+    community_id, (first, second) = create_community(leaderboards, 2)
+    leaderboards.record_score(community_id, first, 'ann', 5, 10)
+    leaderboards.record_score(community_id, first, 'ann', 4, 10)
+    leaderboards.record_score(community_id, second, 'ann', 3, 10)
+    leaderboards.record_score(community_id, first, 'bob', 7, 10)
+    leaderboards.compact()
+
+    quiz_board = leaderboards.get_leaderboard(community_id, first)
+    assert [(entry['user_id'], entry['score']) for entry in quiz_board['entries']] == [('bob', 7), ('ann', 5)]
+    assert (quiz_board['player_count'], quiz_board['attempt_count']) == (2, 3)
+    assert community_scores(leaderboards, community_id) == {'ann': 8, 'bob': 7}
+
+def test_removed_quiz_stays_off_the_community_board(leaderboards):
+    community_id, (kept, removed) = create_community(leaderboards, 2)
+    leaderboards.shards.next = 1
+    leaderboards.record_score(community_id, kept, 'ann', 5, 10)
+    leaderboards.record_score(community_id, removed, 'ann', 3, 10)
+    leaderboards.record_score(community_id, removed, 'bob', 9, 10)
+
+    # The rebuild request lands in a shard compacted before the one still holding the old totals
+    leaderboards.shards.next = 0
+    leaderboards.remove_quiz(community_id, removed)
+    leaderboards.dynamodb_controller.delete_item('QUIZ', f'COMMUNITY#{community_id}#QUIZ#{removed}')
+    leaderboards.compact()
+    assert community_scores(leaderboards, community_id) == {'ann': 5}
+
+    # Later compactions keep it that way
+    leaderboards.record_score(community_id, kept, 'bob', 2, 10)
+    leaderboards.compact()
+    assert community_scores(leaderboards, community_id) == {'ann': 5, 'bob': 2}
@@ -0,0 +1,65 @@
+import uuid
+from decimal import Decimal
+import pytest
+from benchmarks.bench_apis import api_client, seed_community
+
+@pytest.fixture
+def pagination(app_package):
+    module = app_package('quiz_management')('lib.pagination')
+    module.set_signing_key('test-signing-key')
+    yield module
+    module.set_signing_key(None)
+
+KEY = {'PK': 'QUIZ', 'SK': 'COMMUNITY#c1#QUIZ#q1', 'CreatedAt': Decimal(1717171717), 'score': Decimal('0.5')}
+
+def test_cursor_round_trips_the_key(pagination):
+    token = pagination.encode_cursor(KEY, 'quizzes:c1')
+    assert pagination.decode_cursor(token, 'quizzes:c1') == KEY
+    assert pagination.encode_cursor(None, 'quizzes:c1') is None
+    assert pagination.decode_cursor(None, 'quizzes:c1') is None
+
+def test_cursor_from_another_scope_is_rejected(pagination):
+    token = pagination.encode_cursor(KEY, 'quizzes:c1')
+    with pytest.raises(pagination.CursorError, match='does not match'):
+        pagination.decode_cursor(token, 'quizzes:c2')
+
+def test_cursor_signed_with_another_key_is_rejected(pagination):
+    token = pagination.encode_cursor(KEY, 'quizzes:c1')
+    pagination.set_signing_key('rotated-key')
+    with pytest.raises(pagination.CursorError):
+        pagination.decode_cursor(token, 'quizzes:c1')
+
+def test_tampered_payload_is_rejected(pagination):
+    token = pagination.encode_cursor(KEY, 'quizzes:c1')
+    forged = pagination.encode_cursor({**KEY, 'SK': 'COMMUNITY#c2#QUIZ#q9'}, 'quizzes:c1')
+    # The other key's payload under this key's signature
+    with pytest.raises(pagination.CursorError, match='does not match'):
+        pagination.decode_cursor(f"{forged.split('.')[0]}.{token.split('.')[1]}", 'quizzes:c1')
+
+@pytest.mark.parametrize('token', ['no-signature', 'a.b.c', '!!!.???', 'a' * 3000 + '.b'])
+def test_malformed_tokens_are_rejected(pagination, token):
+    with pytest.raises(pagination.CursorError):
+        pagination.decode_cursor(token, 'quizzes:c1')
+
+def test_api_pages_with_tokens_and_rejects_foreign_ones(app_package):
+    app = app_package('quiz_management')
+    main = app('main')
+    quiz_schema = app('models.quiz_schema')
+    member = str(uuid.uuid4())
+    communities = [seed_community([member], [member]) for _ in range(2)]
+    for community_id in communities:
+        for index in range(3):
+            main.quiz_service.create_quiz(quiz_schema.QuizCreate(
+                community_id=community_id, quiz_id=str(uuid.uuid4()), title=f'Quiz {index}', owner_ids=[member]
+            ))
+    client = api_client(main.app, member)
+    first, other = (f'/community/{community_id}/quizzes/' for community_id in communities)
+
+    page = client.get(first, params={'limit': 2}).json()
+    assert len(page['quizzes']) == 2
+    rest = client.get(first, params={'limit': 2, 'next_token': page['next_token']}).json()
+    assert {quiz['quiz_id'] for quiz in rest['quizzes']}.isdisjoint(quiz['quiz_id'] for quiz in page['quizzes'])
+
+    # A token is only good for the query that issued it
+    assert client.get(other, params={'limit': 2, 'next_token': page['next_token']}).status_code == 400
+    assert client.get(first, params={'limit': 2, 'next_token': page['next_token'][:-2]}).status_code == 400
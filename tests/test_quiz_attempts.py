@@ -0,0 +1,82 @@
+import uuid
+import pytest
+
+@pytest.fixture
+def app(app_package):
+    return app_package('quiz_management')
+
+@pytest.fixture
+def attempts(app):
+    return app('services.quiz_attempt_service')
+
+QUESTIONS = [
+    {'question_id': 'single', 'options': ['A', 'B', 'C', 'D'], 'answer': ['B']},
+    {'question_id': 'multi', 'options': ['A', 'B', 'C', 'D'], 'answer': ['A', 'C', 'D']},
+    # An answer missing from the options can still be picked
+    {'question_id': 'free', 'options': [], 'answer': ['Paris']},
+]
+
+@pytest.mark.parametrize('selected, credit', [
+    (['A', 'C', 'D'], 1.0),
+    (['D', 'A', 'C'], 1.0),
+    (['A', 'A', 'C', 'D'], 1.0),
+    (['A', 'C'], 2 / 3),
+    (['A', 'B'], 0.0),
+    (['A', 'C', 'B'], 1 / 3),
+    (['A', 'C', 'D', 'B'], 2 / 3),
+    (['A', 'C', 'D', 'Z'], 2 / 3),
+    (['B'], 0.0),
+    ([], 0.0),
+])
+def test_multi_select_credit(attempts, selected, credit):
+    credits, correct_count = attempts.AnswerKey(1, QUESTIONS).grade({'multi': selected})
+    assert credits['multi'] == pytest.approx(credit)
+    assert correct_count == int(credit == 1.0)
+
+def test_unanswered_and_free_text_questions(attempts):
+    credits, correct_count = attempts.AnswerKey(1, QUESTIONS).grade({'single': ['B'], 'free': ['Paris']})
+    assert credits == {'single': 1.0, 'multi': 0.0, 'free': 1.0}
+    assert correct_count == 2
+
+def seed_quiz(app, questions):
+    community_id, quiz_id = str(uuid.uuid4()), str(uuid.uuid4())
+    app('lib.dynamodb_controller').get_dynamodb_controller().batch_write_items([{
+        'PK': 'QUESTION', 'SK': f"COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#{question['question_id']}",
+        'EntityType': 'Question', 'CreatedAt': 1, 'quiz_id': quiz_id, 'community_id': community_id, **question,
+    } for question in questions])
+    return community_id, quiz_id
+
+def submission(app, answers):
+    schema = app('models.quiz_attempt_schema')
+    return schema.AttemptSubmit(answers=[schema.AnswerSubmission(question_id=question_id, selected=selected)
+                                         for question_id, selected in answers.items()])
+
+def test_submission_is_graded_once(app, attempts):
+    service = attempts.get_quiz_attempt_service()
+    community_id, quiz_id = seed_quiz(app, QUESTIONS)
+    attempt = service.start_attempt(community_id, quiz_id, 'user', 1)
+    graded = service.submit_attempt(community_id, quiz_id, 'user', attempt['attempt_id'],
+                                    submission(app, {'single': ['B'], 'multi': ['A', 'C']}), 1)
+    assert graded['status'] == 'Submitted'
+    assert float(graded['score']) == pytest.approx(1 + 2 / 3, abs=1e-4)
+    assert (graded['max_score'], graded['correct_count']) == (3, 1)
+
+    with pytest.raises(attempts.AttemptAlreadySubmitted):
+        service.submit_attempt(community_id, quiz_id, 'user', attempt['attempt_id'], submission(app, {'single': ['B']}), 1)
+    with pytest.raises(attempts.AttemptNotFound):
+        service.submit_attempt(community_id, quiz_id, 'user', str(uuid.uuid4()), submission(app, {'single': ['B']}), 1)
+    with pytest.raises(ValueError):
+        service.submit_attempt(community_id, quiz_id, 'user', attempt['attempt_id'], submission(app, {'missing': ['A']}), 1)
+
+def test_edited_quiz_is_graded_with_its_new_answers(app, attempts):
+    service = attempts.get_quiz_attempt_service()
+    community_id, quiz_id = seed_quiz(app, QUESTIONS)
+    attempt = service.start_attempt(community_id, quiz_id, 'user', 1)
+    # Editing a question bumps the quiz version, so the cached answer key is not reused
+    app('lib.dynamodb_controller').get_dynamodb_controller().put_item({
+        'PK': 'QUESTION', 'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#multi',
+        'EntityType': 'Question', 'CreatedAt': 1, **QUESTIONS[1], 'answer': ['A'],
+    })
+    graded = service.submit_attempt(community_id, quiz_id, 'user', attempt['attempt_id'], submission(app, {'multi': ['A']}), 2)
+    assert graded['correct_count'] == 1
+    assert graded['graded_version'] == 2
@@ -0,0 +1,100 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+class Clock:
+    """Stands in for the time module so buckets refill only when a test says so."""
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def rate_limit(app_package, monkeypatch):
+    module = app_package('community_management')('lib.rate_limit')
+    clock = Clock()
+    monkeypatch.setattr(module, 'time', clock)
+    module.clock = clock
+    return module
+
+def test_limit_refills_up_to_its_burst(rate_limit):
+    limit = rate_limit.Limit(burst=5, per_second=2)
+    assert limit.refill(0, 1.5) == 3
+    assert limit.refill(4, 10) == 5
+    # A clock that went backwards does not take tokens away
+    assert limit.refill(2, -3) == 2
+    assert limit.wait(0.5) == pytest.approx(0.25)
+    assert limit.wait(1) == 0
+
+def test_empty_bucket_blocks_until_a_token_refills(rate_limit):
+    limit = rate_limit.Limit(burst=3, per_second=0.5)
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryBucketStore())
+    keys = [('default#user#u1', limit)]
+    assert all(limiter.check(keys).allowed for _ in range(3))
+
+    decision = limiter.check(keys)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(2)
+    # Still blocked a moment later, answered without taking from the store
+    rate_limit.clock.advance(1)
+    takes = limiter.counters['store_takes']
+    assert limiter.check(keys).retry_after == pytest.approx(1)
+    assert limiter.counters['store_takes'] == takes
+
+    rate_limit.clock.advance(1)
+    assert limiter.check(keys).allowed
+    assert not limiter.check(keys).allowed
+
+def test_other_callers_keep_their_own_buckets(rate_limit):
+    limit = rate_limit.Limit(burst=1, per_second=0.1)
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryBucketStore())
+    assert limiter.check([('default#user#u1', limit)]).allowed
+    assert not limiter.check([('default#user#u1', limit)]).allowed
+    assert limiter.check([('default#user#u2', limit)]).allowed
+
+def test_shared_bucket_is_taken_once_between_containers(rate_limit):
+    dynamodb_controller = rate_limit.get_dynamodb_controller()
+    limit = rate_limit.Limit(burst=4, per_second=1)
+    first, second = (rate_limit.DynamoDBBucketStore(dynamodb_controller) for _ in range(2))
+    assert first.take('default#user#u1', limit, 3) == (3, 1)
+    # The second container's first write assumes no item and loses, then reads the bucket and takes what is left
+    assert second.take('default#user#u1', limit, 3) == (1, 0)
+    # Still the same millisecond: the first container's remembered state is stale, so it rereads the empty bucket
+    assert first.take('default#user#u1', limit, 1) == (0, 0)
+
+    rate_limit.clock.advance(2)
+    assert first.take('default#user#u1', limit, 3) == (2, 0)
+
+def test_middleware_answers_429_with_retry_after(rate_limit):
+    api = FastAPI()
+
+    @api.get('/communities/{community_id}')
+    def read_community(community_id: str):
+        return {'community_id': community_id}
+
+    limiter = rate_limit.RateLimiter(rate_limit.MemoryBucketStore())
+    rule = rate_limit.RateLimitRule('default', user=rate_limit.Limit(10, 1), community=rate_limit.Limit(2, 0.25))
+    api.add_middleware(rate_limit.RateLimitMiddleware, rules=[rule], limiter=limiter, identify=lambda token: token)
+    client = TestClient(api)
+
+    response = client.get('/communities/c1', headers={'Authorization': 'Bearer u1'})
+    assert response.status_code == 200
+    assert response.headers['RateLimit-Limit'] == '2'
+    assert client.get('/communities/c1', headers={'Authorization': 'Bearer u2'}).status_code == 200
+
+    # The community's bucket is empty for every caller
+    response = client.get('/communities/c1', headers={'Authorization': 'Bearer u3'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '4'
+    assert response.json()['retry_after'] == 4
+    assert client.get('/communities/c2', headers={'Authorization': 'Bearer u3'}).status_code == 200
+
+    rate_limit.clock.advance(4)
+    assert client.get('/communities/c1', headers={'Authorization': 'Bearer u3'}).status_code == 200
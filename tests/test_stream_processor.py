@@ -0,0 +1,89 @@
+import uuid
+import pytest
+
+@pytest.fixture
+def processor(app_package):
+    app = app_package('stream_processor')
+    module = app('stream_processor')
+    module.app = app
+    return module
+
+def write_community(processor, members=('ann', 'bob')):
+    community_id = str(uuid.uuid4())
+    processor.dynamodb_controller.put_item({
+        'PK': 'COMMUNITY', 'SK': f'COMMUNITY#{community_id}', 'EntityType': 'Community', 'CreatedAt': 1, 'members': list(members),
+    })
+    return community_id
+
+def write_quiz(processor, community_id, question_count):
+    quiz_id = str(uuid.uuid4())
+    base = f'COMMUNITY#{community_id}#QUIZ#{quiz_id}'
+    processor.dynamodb_controller.put_item({'PK': 'QUIZ', 'SK': base, 'EntityType': 'Quiz', 'CreatedAt': 1})
+    processor.dynamodb_controller.batch_write_items([
+        {'PK': 'QUESTION', 'SK': f'{base}#QUESTION#{index}', 'EntityType': 'Question', 'CreatedAt': 1} for index in range(question_count)
+    ])
+    return quiz_id
+
+def write_source(processor, community_id, *statuses):
+    sk = f'COMMUNITY#{community_id}#KNOWLEDGE_SOURCE#{uuid.uuid4()}'
+    processor.dynamodb_controller.put_item({'PK': 'KNOWLEDGE_SOURCE', 'SK': sk, 'EntityType': 'KnowledgeSource', 'CreatedAt': 1, 'source_status': statuses[0]})
+    for status in statuses[1:]:
+        processor.dynamodb_controller.update_item('KNOWLEDGE_SOURCE', sk, {'source_status': status})
+
+def counts(processor, community_id):
+    stats = processor.community_stats_service.get_stats(community_id)
+    # Counters a community never changed are not on its item
+    return {
+        'members': stats.get('member_count', 0), 'quizzes': stats.get('quiz_count', 0), 'sources': stats.get('knowledge_source_count', 0),
+        'questions': dict(stats['question_counts']), 'by_status': dict(stats['knowledge_sources_by_status']),
+    }
+
+def redeliver_everything(processor):
+    """Forgets the replay positions, as an event source mapping retrying from an older position would."""
+    processor.dynamodb_controller.table.stream.checkpoints['stream_processor'] = {}
+
+def test_replay_counts_each_community(processor):
+    community_id, other = write_community(processor), write_community(processor, ['cat'])
+    quiz_id = write_quiz(processor, community_id, 3)
+    write_quiz(processor, community_id, 0)
+    write_source(processor, community_id, 'Pending', 'Processing', 'Completed')
+    write_source(processor, community_id, 'Pending')
+    assert processor.replay() > 0
+
+    assert counts(processor, community_id) == {
+        'members': 2, 'quizzes': 2, 'sources': 2, 'questions': {quiz_id: 3}, 'by_status': {'Completed': 1, 'Pending': 1},
+    }
+    assert counts(processor, other)['members'] == 1
+    # A second replay has nothing new to deliver
+    assert processor.replay() == 0
+
+def test_redelivered_windows_are_not_counted_twice(processor):
+    community_id = write_community(processor)
+    quiz_id = write_quiz(processor, community_id, 2)
+    processor.replay()
+    before = counts(processor, community_id)
+
+    redeliver_everything(processor)
+    assert processor.replay() > 0
+    assert counts(processor, community_id) == before
+
+    # Records written after the checkpoint still count
+    processor.dynamodb_controller.put_item({
+        'PK': 'QUESTION', 'SK': f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#new', 'EntityType': 'Question', 'CreatedAt': 1,
+    })
+    processor.replay()
+    assert counts(processor, community_id)['questions'] == {quiz_id: 3}
+
+def test_deleted_items_are_subtracted(processor):
+    community_id = write_community(processor)
+    quiz_id = write_quiz(processor, community_id, 2)
+    processor.replay()
+    processor.dynamodb_controller.delete_item('QUESTION', f'COMMUNITY#{community_id}#QUIZ#{quiz_id}#QUESTION#0')
+    processor.dynamodb_controller.update_item('COMMUNITY', f'COMMUNITY#{community_id}', {'members': ['ann']})
+    processor.replay()
+    assert counts(processor, community_id)['questions'] == {quiz_id: 1}
+    assert counts(processor, community_id)['members'] == 1
+
+    processor.dynamodb_controller.delete_item('COMMUNITY', f'COMMUNITY#{community_id}')
+    processor.replay()
+    assert processor.community_stats_service.get_stats(community_id) is None
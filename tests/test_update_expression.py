@@ -0,0 +1,45 @@
+import pytest
+
+@pytest.fixture
+def app(app_package):
+    return app_package('chunk_processor')
+
+@pytest.fixture
+def UpdateExpression(app):
+    return app('lib.update_expression').UpdateExpression
+
+def test_every_name_gets_one_placeholder(UpdateExpression):
+    params = UpdateExpression().set('name', 'x').set_if_not_exists('status', 'new').add('version', 1).remove('status').build()
+    assert params['UpdateExpression'] == (
+        'SET #u0 = :u0, #u1 = if_not_exists(#u1, :u1) REMOVE #u1 ADD #u2 :u2'
+    )
+    assert params['ExpressionAttributeNames'] == {'#u0': 'name', '#u1': 'status', '#u2': 'version'}
+    assert params['ExpressionAttributeValues'] == {':u0': 'x', ':u1': 'new', ':u2': 1}
+
+def test_nested_paths_and_list_indexes(UpdateExpression):
+    expression = UpdateExpression()
+    assert expression.path('stats.answers[2][0]') == '#u0.#u1[2][0]'
+    # A sequence of segments keeps a map key that contains a dot whole
+    assert expression.path(('stats', 'example.com')) == '#u0.#u2'
+    assert expression.names == {'#u0': 'stats', '#u1': 'answers', '#u2': 'example.com'}
+
+@pytest.mark.parametrize('attribute', ['a..b', 'a.', '.a', '', ('a', '')])
+def test_empty_segments_are_rejected(UpdateExpression, attribute):
+    with pytest.raises(ValueError):
+        UpdateExpression().set(attribute, 1)
+
+def test_an_expression_needs_an_action(UpdateExpression):
+    with pytest.raises(ValueError):
+        UpdateExpression().build()
+
+def test_actions_apply_to_the_table(app, UpdateExpression):
+    table = app('lib.dynamodb_controller').get_dynamodb_controller()
+    table.put_item({'PK': 'TEST', 'SK': 'ITEM', 'EntityType': 'Test', 'CreatedAt': 1, 'data': {'count': 1}, 'tags': {'a', 'b'}})
+    attributes = table.update_item('TEST', 'ITEM', expression=(
+        UpdateExpression().increment('data.count', 2).increment('data.missing').append('history', ['x'])
+        .delete('tags', {'a'}).set('status', 'Done')
+    ), return_values='ALL_NEW')
+    assert attributes['data'] == {'count': 3, 'missing': 1}
+    assert attributes['history'] == ['x']
+    assert attributes['tags'] == {'b'}
+    assert attributes['status'] == 'Done'
@@ -0,0 +1,78 @@
+import pytest
+
+@pytest.fixture
+def warmup(app_package):
+    return app_package('community_management')('lib.warmup')
+
+class Handler:
+    """Stands in for the Mangum handler and records the events that reach it."""
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event, context):
+        self.events.append(event)
+        return {'statusCode': 200}
+
+def test_ping_is_answered_without_the_app(warmup):
+    steps = warmup.Warmup()
+    calls = []
+    steps.add('dynamodb', lambda: calls.append('dynamodb'))
+    app_handler = Handler()
+    handler = steps.wrap(app_handler)
+
+    response = handler(warmup.WARMUP_EVENT, None)
+    assert response['warmed'] is True
+    assert response['steps']['dynamodb']['ok'] is True
+    assert calls == ['dynamodb']
+    assert app_handler.events == []
+
+    # Anything else, including a look-alike, goes to the app
+    assert handler({'warmup': 'true'}, None) == {'statusCode': 200}
+    assert handler({'httpMethod': 'GET', 'path': '/communities/'}, None) == {'statusCode': 200}
+    assert len(app_handler.events) == 2
+    assert calls == ['dynamodb']
+
+def test_failing_step_is_reported_and_the_rest_still_run(warmup):
+    steps = warmup.Warmup()
+    calls = []
+
+    def fail():
+        raise ConnectionError('JWKS unreachable')
+    steps.add('jwks', fail)
+    steps.add('openapi', lambda: calls.append('openapi'))
+
+    results = steps.run()
+    assert results['jwks']['ok'] is False
+    assert results['jwks']['error'] == 'ConnectionError: JWKS unreachable'
+    assert results['openapi']['ok'] is True
+    assert calls == ['openapi']
+    assert steps.last_run == results
+
+@pytest.mark.parametrize('flag, function_name, runs', [
+    (None, None, False),
+    (None, 'quiz-management', True),
+    ('true', None, True),
+    ('1', None, True),
+    ('false', 'quiz-management', False),
+])
+def test_run_on_init_follows_the_environment(warmup, monkeypatch, flag, function_name, runs):
+    for name, value in (('WARMUP_ON_INIT', flag), ('AWS_LAMBDA_FUNCTION_NAME', function_name)):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    steps = warmup.Warmup()
+    calls = []
+    steps.add('step', lambda: calls.append('step'))
+    steps.run_on_init()
+    assert calls == (['step'] if runs else [])
+
+def test_asgi_warmup_sends_one_request_through_the_app(warmup):
+    requests = []
+
+    async def app(scope, receive, send):
+        requests.append((scope['method'], scope['path']))
+        await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    warmup.warm_asgi_app(app)
+    assert requests == [('GET', '/__warmup')]